@@ -5,3 +5,7 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
     verbose_name = 'Core - Sistema Base'
+
+    def ready(self):
+        """Registrar signals cuando la app está lista"""
+        import core.signals  # noqa: F401
@@ -1,14 +1,72 @@
 from proyectos.models import Proyecto, Vivienda
 from incidencias.models import Observacion
+from core.utils import stats_cache
 from core.permisos import (
     tiene_rol,
     puede_acceder_panel_maestro,
 )
 
+SIN_ESTADISTICAS = {
+    'total_proyectos': 0,
+    'viviendas_total': 0,
+    'obs_total': 0,
+}
+
+
+def _vivienda_familia(user):
+    """Id de la vivienda asociada al usuario FAMILIA (0 si no se encuentra)."""
+    from django.db.models import Q
+
+    # Buscar viviendas del beneficiario
+    mi_vivienda = Vivienda.objects.filter(
+        Q(beneficiario__nombre__icontains=user.nombre) |
+        Q(beneficiario__apellido_paterno__icontains=user.nombre) |
+        Q(familia_beneficiaria__icontains=user.nombre)
+    ).values_list('id', flat=True).first()
+    return mi_vivienda or 0
+
+
+def _estadisticas_familia(user):
+    """Estadísticas de la vivienda del usuario FAMILIA (en cero si no tiene una)."""
+    vivienda_id = _vivienda_familia(user)
+    if not vivienda_id:
+        return dict(SIN_ESTADISTICAS)
+    return {
+        'total_proyectos': 1,  # Solo su proyecto
+        'viviendas_total': 1,  # Solo su vivienda
+        'obs_total': Observacion.objects.filter(vivienda_id=vivienda_id).count(),
+    }
+
+
+def _estadisticas_constructora(proyectos_constructora, observaciones_constructora):
+    # Viviendas de esos proyectos
+    viviendas_constructora = Vivienda.objects.filter(
+        proyecto__in=proyectos_constructora,
+        activa=True
+    )
+    return {
+        'total_proyectos': proyectos_constructora.count(),
+        'viviendas_total': viviendas_constructora.count(),
+        'obs_total': observaciones_constructora.count(),
+    }
+
+
+def _estadisticas_globales():
+    return {
+        'total_proyectos': Proyecto.objects.count(),
+        'viviendas_total': Vivienda.objects.filter(activa=True).count(),
+        'obs_total': Observacion.objects.count(),
+    }
+
+
 def global_stats_context(request):
     """
     Context processor para agregar estadísticas globales a todas las plantillas.
     Personalizado según el rol del usuario.
+
+    Los contadores se cachean por alcance (global, constructora o usuario
+    FAMILIA) en core.utils.stats_cache; con la caché vigente solo se ejecuta
+    la consulta de la versión de las estadísticas.
     """
     if request.user.is_authenticated:
         user = request.user
@@ -17,80 +75,45 @@ def global_stats_context(request):
         if user.rol and user.rol.nombre == 'FAMILIA':
             # Solo mostrar estadísticas de SU vivienda
             try:
-                from django.db.models import Q
-                
-                # Buscar viviendas del beneficiario
-                mis_viviendas = Vivienda.objects.filter(
-                    Q(beneficiario__nombre__icontains=user.nombre) |
-                    Q(beneficiario__apellido_paterno__icontains=user.nombre) |
-                    Q(familia_beneficiaria__icontains=user.nombre)
-                )
-                
-                if mis_viviendas.exists():
-                    mi_vivienda = mis_viviendas.first()
-                    mis_observaciones = Observacion.objects.filter(vivienda=mi_vivienda)
-                    
-                    return {
-                        'total_proyectos': 1,  # Solo su proyecto
-                        'viviendas_total': 1,  # Solo su vivienda
-                        'obs_total': mis_observaciones.count(),
-                    }
+                # Vivienda y contadores en una sola entrada: una consulta de versión por request
+                return stats_cache.obtener(f'familia:{user.pk}', lambda: _estadisticas_familia(user))
             except:
                 pass
             
             # Si no encuentra vivienda, mostrar 0
-            return {
-                'total_proyectos': 0,
-                'viviendas_total': 0,
-                'obs_total': 0,
-            }
+            return dict(SIN_ESTADISTICAS)
         
         # **CASO ESPECIAL PARA CONSTRUCTORA**
         if user.rol and user.rol.nombre == 'CONSTRUCTORA' and getattr(user, 'empresa', None):
             # Solo mostrar estadísticas de SU constructora
             try:
                 # Usar el nuevo campo constructora (ForeignKey)
-                if getattr(user, 'constructora', None):
-                    proyectos_constructora = Proyecto.objects.filter(constructora=user.constructora)
-                    observaciones_constructora = Observacion.objects.filter(vivienda__proyecto__constructora=user.constructora)
-                elif getattr(user, 'empresa', None):
-                    # Fallback al campo legacy
-                    empresa_usuario = user.empresa.strip().lower()
-                    proyectos_constructora = Proyecto.objects.filter(constructora__nombre__icontains=empresa_usuario)
-                    observaciones_constructora = Observacion.objects.filter(vivienda__proyecto__constructora__nombre__icontains=empresa_usuario)
-                else:
-                    proyectos_constructora = Proyecto.objects.none()
-                    observaciones_constructora = Observacion.objects.none()
-                
-                # Viviendas de esos proyectos
-                viviendas_constructora = Vivienda.objects.filter(
-                    proyecto__in=proyectos_constructora,
-                    activa=True
+                if getattr(user, 'constructora_id', None):
+                    constructora_id = user.constructora_id
+                    return stats_cache.obtener(
+                        f'constructora:{constructora_id}',
+                        lambda: _estadisticas_constructora(
+                            Proyecto.objects.filter(constructora_id=constructora_id),
+                            Observacion.objects.filter(vivienda__proyecto__constructora_id=constructora_id),
+                        ),
+                    )
+                # Fallback al campo legacy
+                empresa_usuario = user.empresa.strip().lower()
+                return stats_cache.obtener(
+                    stats_cache.alcance_empresa(empresa_usuario),
+                    lambda: _estadisticas_constructora(
+                        Proyecto.objects.filter(constructora__nombre__icontains=empresa_usuario),
+                        Observacion.objects.filter(vivienda__proyecto__constructora__nombre__icontains=empresa_usuario),
+                    ),
                 )
-                return {
-                    'total_proyectos': proyectos_constructora.count(),
-                    'viviendas_total': viviendas_constructora.count(),
-                    'obs_total': observaciones_constructora.count(),
-                }
             except:
                 pass
             
             # Si hay error, mostrar 0
-            return {
-                'total_proyectos': 0,
-                'viviendas_total': 0,
-                'obs_total': 0,
-            }
+            return dict(SIN_ESTADISTICAS)
         
         # **PARA OTROS ROLES**: Estadísticas globales
-        total_proyectos = Proyecto.objects.count()
-        viviendas_total = Vivienda.objects.filter(activa=True).count()
-        obs_total = Observacion.objects.count()
-        return {
-            'total_proyectos': total_proyectos,
-            'viviendas_total': viviendas_total,
-            'obs_total': obs_total,
-        }
+        return stats_cache.obtener('global', _estadisticas_globales)
     return {}
 
 
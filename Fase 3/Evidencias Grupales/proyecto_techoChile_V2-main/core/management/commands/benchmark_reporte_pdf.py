@@ -0,0 +1,80 @@
+import multiprocessing
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.utils.pdf_dashboard import MOTORES
+
+
+def _rss_pico_kb():
+    """Pico de memoria residente del proceso en KB, o None si la plataforma no lo informa."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS lo informa en bytes, Linux en KB
+    return pico // 1024 if sys.platform == 'darwin' else pico
+
+
+def _medir(motor, contexto, repeticiones, cola):
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        # Con el método 'spawn' (Windows/macOS) el proceso hijo parte sin Django cargado
+        django.setup()
+    from core.utils import pdf_dashboard
+
+    rss_inicial = _rss_pico_kb()
+    tiempos, tamano = [], 0
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        tamano = len(pdf_dashboard.MOTORES[motor](contexto))
+        tiempos.append(time.perf_counter() - inicio)
+    rss_final = _rss_pico_kb()
+    cola.put({
+        'tiempos': tiempos,
+        'tamano': tamano,
+        'rss_pico': rss_final,
+        'rss_incremento': rss_final - rss_inicial if rss_final is not None else None,
+    })
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara tiempo y memoria de los motores del reporte PDF del dashboard. El contexto '
+        'se calcula una vez y cada motor se mide en un proceso propio, para que el pico de '
+        'RSS de uno no contamine al otro.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=3)
+        parser.add_argument('--region', help='Id de región para filtrar el reporte')
+        parser.add_argument('--motor', action='append', choices=sorted(MOTORES), help='Motor a medir (por defecto, todos)')
+
+    def handle(self, *args, **options):
+        from core.views_dashboard_pdf import contexto_reporte_dashboard
+
+        if options['repeticiones'] < 1:
+            raise CommandError('--repeticiones debe ser al menos 1')
+
+        # Sin usuario: el contexto no depende del alcance, solo de los filtros
+        contexto = contexto_reporte_dashboard(None, {'region': options['region']})
+        for motor in options['motor'] or sorted(MOTORES):
+            cola = multiprocessing.Queue()
+            proceso = multiprocessing.Process(target=_medir, args=(motor, contexto, options['repeticiones'], cola))
+            proceso.start()
+            resultado = cola.get()
+            proceso.join()
+
+            tiempos = resultado['tiempos']
+            rss = (
+                f"RSS pico {resultado['rss_pico'] / 1024:.1f} MB (+{resultado['rss_incremento'] / 1024:.1f} MB)"
+                if resultado['rss_pico'] is not None else 'RSS no disponible'
+            )
+            self.stdout.write(
+                f"{motor:<10} mín {min(tiempos) * 1000:8.1f} ms | prom {sum(tiempos) / len(tiempos) * 1000:8.1f} ms | "
+                f"{rss} | {resultado['tamano'] / 1024:.1f} KB"
+            )
@@ -0,0 +1,98 @@
+import csv
+from collections import Counter
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from core.models import Constructora, Usuario
+from core.utils.rut import validar_ruts
+from proyectos.models import Beneficiario
+
+TAMANO_LOTE = 5000
+NORMALIZADO_DESACTUALIZADO = 'rut_normalizado desactualizado'
+RUT_REPETIDO = 'RUT repetido'
+
+
+class Command(BaseCommand):
+    help = (
+        'Audita las columnas de RUT (Beneficiario, Usuario y Constructora): RUTs con formato o dígito '
+        'verificador inválido, rut_normalizado desactualizado y RUTs repetidos. No modifica datos. '
+        'Ej: python manage.py verificar_ruts --csv problemas_rut.csv'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help=f'Filas validadas por lote (por defecto {TAMANO_LOTE})')
+        parser.add_argument('--detalle', action='store_true', help='Listar cada registro con problemas')
+        parser.add_argument('--csv', type=str, help='Ruta de archivo CSV para volcar los registros con problemas')
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser al menos 1')
+
+        problemas = []
+        for modelo in (Beneficiario, Usuario, Constructora):
+            encontrados = self.verificar(modelo, options['lote'])
+            resumen = Counter(p['problema'] for p in encontrados)
+            revisados = modelo.objects.exclude(rut__isnull=True).exclude(rut='').count()
+            estilo = self.style.WARNING if encontrados else self.style.SUCCESS
+            self.stdout.write(estilo(f'{modelo.__name__}: {revisados} RUT(s) revisados, {len(encontrados)} con problemas'))
+            for problema, cantidad in resumen.most_common():
+                self.stdout.write(f'  - {problema}: {cantidad}')
+            if options['detalle']:
+                for p in encontrados:
+                    self.stdout.write(f"    id={p['id']} rut={p['rut']} ({p['problema']})")
+            problemas.extend(encontrados)
+
+        if options['csv']:
+            with open(options['csv'], 'w', newline='', encoding='utf-8') as fh:
+                writer = csv.DictWriter(fh, fieldnames=['modelo', 'id', 'rut', 'rut_normalizado', 'problema'])
+                writer.writeheader()
+                writer.writerows(problemas)
+            self.stdout.write(self.style.SUCCESS(f'CSV escrito en: {options["csv"]}'))
+
+        if not problemas:
+            self.stdout.write(self.style.SUCCESS('✓ Todos los RUTs son válidos'))
+
+    def verificar(self, modelo, tamano_lote):
+        """Registros de ``modelo`` con problemas de RUT, validando la columna de a ``tamano_lote`` filas."""
+        problemas = []
+        filas = modelo.objects.exclude(rut__isnull=True).exclude(rut='').order_by('pk').values_list(
+            'pk', 'rut', 'rut_normalizado'
+        )
+        lote = []
+        for fila in filas.iterator(chunk_size=tamano_lote):
+            lote.append(fila)
+            if len(lote) == tamano_lote:
+                problemas.extend(self._verificar_lote(modelo, lote))
+                lote = []
+        if lote:
+            problemas.extend(self._verificar_lote(modelo, lote))
+
+        # Distintas escrituras del mismo RUT (ej: con y sin puntos) comparten rut_normalizado
+        repetidos = modelo.objects.exclude(rut_normalizado='').values('rut_normalizado').annotate(
+            n=Count('pk')
+        ).filter(n__gt=1).values('rut_normalizado')
+        for pk, rut, rut_normalizado in modelo.objects.filter(rut_normalizado__in=repetidos).order_by(
+            'rut_normalizado', 'pk'
+        ).values_list('pk', 'rut', 'rut_normalizado'):
+            problemas.append(self._problema(modelo, pk, rut, rut_normalizado, RUT_REPETIDO))
+        return problemas
+
+    def _verificar_lote(self, modelo, lote):
+        datos = pd.DataFrame.from_records(lote, columns=['id', 'rut', 'rut_normalizado'])
+        resultado = validar_ruts(datos['rut'])
+        invalidos = ~resultado['valido']
+        desactualizados = resultado['valido'] & (resultado['rut_normalizado'] != datos['rut_normalizado'])
+        problemas = [
+            self._problema(modelo, fila.id, fila.rut, fila.rut_normalizado, motivo)
+            for fila, motivo in zip(datos[invalidos].itertuples(), resultado.loc[invalidos, 'motivo'])
+        ]
+        problemas.extend(
+            self._problema(modelo, fila.id, fila.rut, fila.rut_normalizado, NORMALIZADO_DESACTUALIZADO)
+            for fila in datos[desactualizados].itertuples()
+        )
+        return problemas
+
+    def _problema(self, modelo, pk, rut, rut_normalizado, problema):
+        return {'modelo': modelo.__name__, 'id': pk, 'rut': rut, 'rut_normalizado': rut_normalizado, 'problema': problema}
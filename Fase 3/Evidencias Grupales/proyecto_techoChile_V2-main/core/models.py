@@ -1,6 +1,6 @@
 
 from django.db import models
-from .validators import validar_rut
+from .validators import validar_rut, normalizar_rut
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager, Group, Permission
 from datetime import timedelta, datetime
 
@@ -86,6 +86,7 @@ class Usuario(AbstractBaseUser, PermissionsMixin):
         validators=[validar_rut],
         db_index=True
     )
+    rut_normalizado = models.CharField(max_length=12, blank=True, default='', editable=False, db_index=True)
     nombre = models.CharField(max_length=100, verbose_name="Nombre")
     apellido_paterno = models.CharField(max_length=100, verbose_name="Apellido paterno", blank=True, null=True)
     apellido_materno = models.CharField(max_length=100, verbose_name="Apellido materno", blank=True, null=True)
@@ -123,6 +124,10 @@ class Usuario(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return f"{self.nombre} ({self.email})"
 
+    def save(self, *args, **kwargs):
+        self.rut_normalizado = normalizar_rut(self.rut)
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Usuario"
         verbose_name_plural = "Usuarios"
@@ -131,6 +136,7 @@ class Constructora(models.Model):
     nombre = models.CharField(max_length=150, unique=True, verbose_name="Nombre Constructora")
     direccion = models.CharField(max_length=255, blank=True, verbose_name="Dirección")
     rut = models.CharField(max_length=15, blank=True, null=True, verbose_name="RUT", db_index=True, validators=[validar_rut])
+    rut_normalizado = models.CharField(max_length=12, blank=True, default='', editable=False, db_index=True)
     region = models.ForeignKey(Region, on_delete=models.SET_NULL, null=True, blank=True)
     comuna = models.ForeignKey(Comuna, on_delete=models.SET_NULL, null=True, blank=True)
     contacto = models.CharField(max_length=100, blank=True, verbose_name="Contacto")
@@ -141,6 +147,10 @@ class Constructora(models.Model):
     def __str__(self):
         return self.nombre
 
+    def save(self, *args, **kwargs):
+        self.rut_normalizado = normalizar_rut(self.rut)
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Constructora"
         verbose_name_plural = "Constructoras"
@@ -1,6 +1,8 @@
 """
 Funciones auxiliares para verificar permisos por rol
 """
+from django.core.cache import cache
+
 
 def tiene_rol(usuario, *roles):
     """
@@ -180,6 +182,32 @@ def puede_editar_observacion(usuario, observacion):
     return False
 
 
+def anotar_permisos_observaciones(usuario, observaciones):
+    """
+    Anota una página de observaciones con ``puede_ver``, ``puede_editar`` y
+    ``puede_cambiar_estado``.
+
+    Las relaciones que usan las reglas (vivienda, proyecto, constructora,
+    beneficiario y estado) se cargan en bloque; luego se evalúan en memoria
+    las mismas funciones puede_* de este módulo, sin consultas por fila.
+
+    Returns:
+        list: las observaciones anotadas
+    """
+    from django.db.models import prefetch_related_objects
+
+    observaciones = list(observaciones)
+    prefetch_related_objects(
+        observaciones, 'estado', 'vivienda__beneficiario', 'vivienda__proyecto__constructora'
+    )
+    for obs in observaciones:
+        obs.puede_ver = puede_ver_observacion(usuario, obs)
+        obs.puede_editar = puede_editar_observacion(usuario, obs)
+        # El cambio de estado se rige por el permiso de edición (ver cambiar_estado_movil)
+        obs.puede_cambiar_estado = obs.puede_editar
+    return observaciones
+
+
 def puede_crear_observacion(usuario, vivienda=None):
     """
     Verifica si el usuario puede crear observaciones.
@@ -306,6 +334,173 @@ def puede_ver_reporte(usuario, tipo_reporte, proyecto=None, vivienda=None):
     return False
 
 
+VERSION_ALCANCES = 'alcances'
+ALCANCE_TIMEOUT = 60 * 30
+
+
+def invalidar_alcances():
+    """
+    Invalida los alcances cacheados de todos los usuarios (ver core.signals).
+    La versión está en la base de datos (reportes.VersionDatos): el cambio lo
+    ven todos los procesos web, no solo el que guardó el registro.
+    """
+    from core.utils.cache_reportes import incrementar_version_datos
+
+    incrementar_version_datos(VERSION_ALCANCES)
+
+
+class ScopeResolver:
+    """
+    Alcance de datos de un usuario, precalculado como conjuntos de IDs.
+
+    Las búsquedas por nombre (``icontains`` sobre beneficiarios o constructoras)
+    se ejecutan una sola vez por usuario; el resultado se guarda en la caché y
+    se invalida mediante signals cuando cambian usuarios, beneficiarios,
+    viviendas o proyectos. Las escrituras que no disparan signals
+    (``QuerySet.update()``, ``bulk_create``) deben llamar a ``invalidar_alcances()``.
+    Los filtros resultantes usan ``id__in`` y FKs indexadas.
+    """
+
+    TODO = 'todo'
+    NINGUNO = 'ninguno'
+
+    def __init__(self, usuario):
+        self.usuario = usuario
+        self._alcance = None
+
+    @classmethod
+    def para(cls, usuario):
+        """Resolver asociado a la instancia del usuario (uno por request)."""
+        resolver = getattr(usuario, '_scope_resolver', None)
+        if resolver is None:
+            resolver = cls(usuario)
+            try:
+                usuario._scope_resolver = resolver
+            except AttributeError:
+                pass
+        return resolver
+
+    @property
+    def alcance(self):
+        if self._alcance is None:
+            self._alcance = self._alcance_cacheado()
+        return self._alcance
+
+    def _alcance_cacheado(self):
+        usuario = self.usuario
+        if not usuario.is_authenticated:
+            return {'tipo': self.NINGUNO}
+        if usuario.is_superuser or (usuario.rol and usuario.rol.nombre in ['ADMINISTRADOR', 'TECHO', 'SERVIU']):
+            return {'tipo': self.TODO}
+        from core.utils.cache_reportes import version_datos
+
+        llave = f'alcance_usuario:v{version_datos(VERSION_ALCANCES)}:{usuario.pk}'
+        alcance = cache.get(llave)
+        if alcance is None:
+            alcance = self._calcular()
+            cache.set(llave, alcance, ALCANCE_TIMEOUT)
+        return alcance
+
+    def _calcular(self):
+        from django.db.models import Q
+        from core.models import Constructora
+        from core.utils.rut import filtro_rut_usuario
+        from proyectos.models import Vivienda
+
+        usuario = self.usuario
+        rol = usuario.rol.nombre if usuario.rol else None
+
+        # CONSTRUCTORA: sus proyectos, por FK o por el campo empresa legacy
+        if rol == 'CONSTRUCTORA':
+            if getattr(usuario, 'constructora_id', None):
+                ids = [usuario.constructora_id]
+                return {'tipo': rol, 'constructoras_proyectos': ids, 'constructoras_observaciones': ids}
+            if getattr(usuario, 'empresa', None):
+                empresa_usuario = usuario.empresa.strip().lower()
+                return {
+                    'tipo': rol,
+                    'constructoras_proyectos': list(
+                        Constructora.objects.filter(nombre__iexact=usuario.empresa).values_list('id', flat=True)
+                    ),
+                    'constructoras_observaciones': list(
+                        Constructora.objects.filter(nombre__icontains=empresa_usuario).values_list('id', flat=True)
+                    ),
+                }
+            return {'tipo': self.NINGUNO}
+
+        # FAMILIA: viviendas donde es beneficiario (por RUT y, de respaldo, por nombre)
+        if rol == 'FAMILIA':
+            por_nombre = (
+                Q(beneficiario__nombre__icontains=usuario.nombre) |
+                Q(beneficiario__apellido_paterno__icontains=usuario.nombre) |
+                Q(familia_beneficiaria__icontains=usuario.nombre)
+            )
+            por_rut = filtro_rut_usuario(usuario, 'beneficiario__rut_normalizado')
+            filtro_viviendas = por_nombre | por_rut if por_rut else por_nombre
+            # Los proyectos se buscan solo por RUT si el usuario lo tiene (más preciso)
+            filtro_proyectos = por_rut or por_nombre
+            return {
+                'tipo': rol,
+                'viviendas': list(Vivienda.objects.filter(filtro_viviendas).values_list('id', flat=True)),
+                'proyectos': list(
+                    Vivienda.objects.filter(filtro_proyectos)
+                    .order_by().values_list('proyecto_id', flat=True).distinct()
+                ),
+            }
+
+        return {'tipo': self.NINGUNO}
+
+    def filter_proyectos(self, queryset):
+        alcance = self.alcance
+        if alcance['tipo'] == self.TODO:
+            return queryset
+        if alcance['tipo'] == 'CONSTRUCTORA':
+            return queryset.filter(constructora_id__in=alcance['constructoras_proyectos'])
+        if alcance['tipo'] == 'FAMILIA':
+            return queryset.filter(id__in=alcance['proyectos'])
+        return queryset.none()
+
+    def filter_viviendas(self, queryset):
+        alcance = self.alcance
+        if alcance['tipo'] == self.TODO:
+            return queryset
+        if alcance['tipo'] == 'CONSTRUCTORA':
+            return queryset.filter(proyecto__constructora_id__in=alcance['constructoras_observaciones'])
+        if alcance['tipo'] == 'FAMILIA':
+            return queryset.filter(id__in=alcance['viviendas'])
+        return queryset.none()
+
+    def filter_observaciones(self, queryset):
+        alcance = self.alcance
+        if alcance['tipo'] == self.TODO:
+            return queryset
+        if alcance['tipo'] == 'CONSTRUCTORA':
+            return queryset.filter(vivienda__proyecto__constructora_id__in=alcance['constructoras_observaciones'])
+        if alcance['tipo'] == 'FAMILIA':
+            return queryset.filter(vivienda_id__in=alcance['viviendas'])
+        return queryset.none()
+
+    def filter_registros_eliminacion(self, queryset):
+        """
+        Tombstones (incidencias.RegistroEliminacion) del alcance. Se filtran por los
+        datos copiados al eliminar, no por viviendas vigentes: si la vivienda o el
+        proyecto se borró en cascada ya no aparece en el alcance.
+        """
+        from django.db.models import Q
+
+        alcance = self.alcance
+        if alcance['tipo'] == self.TODO:
+            return queryset
+        if alcance['tipo'] == 'CONSTRUCTORA':
+            return queryset.filter(constructora_id__in=alcance['constructoras_observaciones'])
+        if alcance['tipo'] == 'FAMILIA':
+            filtro = Q(vivienda_id__in=alcance['viviendas'])
+            if self.usuario.rut_normalizado:
+                filtro |= Q(rut_beneficiario=self.usuario.rut_normalizado)
+            return queryset.filter(filtro)
+        return queryset.none()
+
+
 def filtrar_proyectos_por_rol(usuario, queryset):
     """
     Filtra el queryset de proyectos según el rol del usuario.
@@ -317,45 +512,7 @@ def filtrar_proyectos_por_rol(usuario, queryset):
     Returns:
         QuerySet filtrado
     """
-    if not usuario.is_authenticated:
-        return queryset.none()
-    
-    if usuario.is_superuser:
-        return queryset
-    
-    if not usuario.rol:
-        return queryset.none()
-    
-    rol = usuario.rol.nombre
-    
-    # ADMIN, TECHO y SERVIU ven todos
-    if rol in ['ADMINISTRADOR', 'TECHO', 'SERVIU']:
-        return queryset
-    
-    # CONSTRUCTORA solo sus proyectos
-    if rol == 'CONSTRUCTORA':
-        # Usar la nueva relación ForeignKey si existe
-        if hasattr(usuario, 'constructora') and usuario.constructora:
-            return queryset.filter(constructora=usuario.constructora)
-        # Fallback al campo empresa legacy
-        elif usuario.empresa:
-            return queryset.filter(constructora__nombre__iexact=usuario.empresa)
-    
-    # FAMILIA solo proyectos donde tiene vivienda - buscar por RUT (más preciso)
-    if rol == 'FAMILIA':
-        if usuario.rut:
-            # Búsqueda exacta por RUT (más confiable)
-            return queryset.filter(viviendas__beneficiario__rut=usuario.rut).distinct()
-        else:
-            # Fallback: buscar por nombre si no tiene RUT (usuarios antiguos)
-            from django.db.models import Q
-            return queryset.filter(
-                Q(viviendas__beneficiario__nombre__icontains=usuario.nombre) |
-                Q(viviendas__beneficiario__apellido_paterno__icontains=usuario.nombre) |
-                Q(viviendas__familia_beneficiaria__icontains=usuario.nombre)
-            ).distinct()
-    
-    return queryset.none()
+    return ScopeResolver.para(usuario).filter_proyectos(queryset)
 
 
 def filtrar_observaciones_por_rol(usuario, queryset):
@@ -369,34 +526,4 @@ def filtrar_observaciones_por_rol(usuario, queryset):
     Returns:
         QuerySet filtrado
     """
-    # No autenticados no ven nada
-    if not usuario.is_authenticated:
-        return queryset.none()
-    # Superusuario y roles ADMINISTRADOR, TECHO, SERVIU ven todo
-    if usuario.is_superuser or (usuario.rol and usuario.rol.nombre in ['ADMINISTRADOR', 'TECHO', 'SERVIU']):
-        return queryset
-    # CONSTRUCTORA solo observa sus proyectos
-    if usuario.rol and usuario.rol.nombre == 'CONSTRUCTORA':
-        # Usar el nuevo campo constructora (ForeignKey)
-        if getattr(usuario, 'constructora', None):
-            return queryset.filter(vivienda__proyecto__constructora=usuario.constructora)
-        # Fallback al campo empresa legacy
-        elif getattr(usuario, 'empresa', None):
-            empresa_usuario = usuario.empresa.strip().lower()
-            return queryset.filter(vivienda__proyecto__constructora__nombre__icontains=empresa_usuario)
-        else:
-            return queryset.none()
-    # FAMILIA solo ve sus propias observaciones
-    is_familia = usuario.rol and usuario.rol.nombre == 'FAMILIA'
-    if is_familia:
-        from django.db.models import Q
-        # Combinar filtros por RUT y nombre/familia_beneficiaria
-        filtros = Q()
-        if getattr(usuario, 'rut', None):
-            filtros |= Q(vivienda__beneficiario__rut=usuario.rut)
-        filtros |= Q(vivienda__beneficiario__nombre__icontains=usuario.nombre)
-        filtros |= Q(vivienda__beneficiario__apellido_paterno__icontains=usuario.nombre)
-        filtros |= Q(vivienda__familia_beneficiaria__icontains=usuario.nombre)
-        return queryset.filter(filtros)
-    # Otros roles no ven observaciones
-    return queryset.none()
+    return ScopeResolver.para(usuario).filter_observaciones(queryset)
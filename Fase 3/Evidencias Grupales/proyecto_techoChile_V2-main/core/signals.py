@@ -0,0 +1,97 @@
+"""
+Signals de core: invalidan la caché de estadísticas globales del navbar
+cuando cambian proyectos, viviendas u observaciones (y beneficiarios, que
+determinan la vivienda de un usuario FAMILIA).
+
+Además invalidan los alcances precalculados de core.permisos.ScopeResolver,
+avanzan la versión de datos de la caché de reportes (core.utils.cache_reportes)
+y marcan los días del snapshot de métricas que quedaron desactualizados
+(core.utils.metricas_diarias).
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from django.utils import timezone
+
+from core.permisos import invalidar_alcances
+from core.utils.cache_reportes import incrementar_version_datos
+from core.utils.metricas_diarias import dias_de_observaciones, marcar_dias_pendientes
+from core.utils.stats_cache import invalidar
+from incidencias.models import Observacion
+
+
+@receiver(post_save, sender='proyectos.Proyecto')
+@receiver(post_delete, sender='proyectos.Proyecto')
+@receiver(post_save, sender='proyectos.Vivienda')
+@receiver(post_delete, sender='proyectos.Vivienda')
+@receiver(post_save, sender='proyectos.Beneficiario')
+@receiver(post_save, sender='incidencias.Observacion')
+@receiver(post_delete, sender='incidencias.Observacion')
+def invalidar_estadisticas_globales(sender, **kwargs):
+    invalidar()
+
+
+@receiver(post_save, sender='core.Usuario')
+@receiver(post_save, sender='core.Constructora')
+@receiver(post_save, sender='proyectos.Proyecto')
+@receiver(post_delete, sender='proyectos.Proyecto')
+@receiver(post_save, sender='proyectos.Vivienda')
+@receiver(post_delete, sender='proyectos.Vivienda')
+@receiver(post_save, sender='proyectos.Beneficiario')
+def invalidar_alcances_usuarios(sender, update_fields=None, **kwargs):
+    # El login solo actualiza last_login: no cambia el alcance
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalidar_alcances()
+
+
+@receiver(post_save, sender='proyectos.Proyecto')
+@receiver(post_delete, sender='proyectos.Proyecto')
+@receiver(post_save, sender='proyectos.Vivienda')
+@receiver(post_delete, sender='proyectos.Vivienda')
+@receiver(post_save, sender='incidencias.Observacion')
+@receiver(post_delete, sender='incidencias.Observacion')
+# Datos que solo aparecen en los reportes Excel (reportes.registro)
+@receiver(post_save, sender='proyectos.Beneficiario')
+@receiver(post_delete, sender='proyectos.Beneficiario')
+@receiver(post_save, sender='incidencias.SeguimientoObservacion')
+@receiver(post_save, sender='reportes.ActaRecepcion')
+@receiver(post_delete, sender='reportes.ActaRecepcion')
+# Nombres y correos que los reportes copian de catálogos y usuarios
+@receiver(post_save, sender='core.Usuario')
+@receiver(post_delete, sender='core.Usuario')
+@receiver(post_save, sender='core.Constructora')
+@receiver(post_delete, sender='core.Constructora')
+@receiver(post_save, sender='core.Region')
+@receiver(post_delete, sender='core.Region')
+@receiver(post_save, sender='core.Comuna')
+@receiver(post_delete, sender='core.Comuna')
+@receiver(post_save, sender='proyectos.TipologiaVivienda')
+@receiver(post_delete, sender='proyectos.TipologiaVivienda')
+def invalidar_reportes_generados(sender, update_fields=None, **kwargs):
+    # El login solo actualiza last_login: no aparece en los reportes
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    incrementar_version_datos()
+
+
+@receiver(post_save, sender='incidencias.Observacion')
+@receiver(post_delete, sender='incidencias.Observacion')
+def marcar_dia_observacion(sender, instance, **kwargs):
+    # Si se movió la fecha de creación, el día anterior también deja de contarla
+    fechas = {instance.fecha_creacion, getattr(instance, '_fecha_creacion_guardada', None)} - {None}
+    if fechas:
+        marcar_dias_pendientes({timezone.localdate(fecha) for fecha in fechas})
+    instance._fecha_creacion_guardada = instance.fecha_creacion
+
+
+# Al borrar una vivienda o proyecto, sus observaciones se borran en cascada
+# y marcan sus días con el post_delete de arriba
+@receiver(post_save, sender='proyectos.Vivienda')
+@receiver(post_save, sender='proyectos.Proyecto')
+def marcar_dias_vivienda_o_proyecto(sender, instance, created, **kwargs):
+    # Las filas del snapshot copian proyecto, región, comuna y constructora
+    if created:
+        return
+    filtro = 'vivienda' if sender._meta.model_name == 'vivienda' else 'vivienda__proyecto'
+    marcar_dias_pendientes(dias_de_observaciones(Observacion.objects.filter(**{filtro: instance})))
@@ -0,0 +1,69 @@
+"""
+Datos mínimos compartidos por los tests (región, proyecto, viviendas y observaciones).
+"""
+from datetime import date, timedelta
+
+from django.utils import timezone
+
+from core.models import Comuna, Constructora, Region, Rol, Usuario
+from incidencias.models import EstadoObservacion, Observacion, TipoObservacion
+from proyectos.models import Proyecto, TipologiaVivienda, Vivienda
+
+
+def crear_catalogos():
+    """Estados, tipo de observación, tipología y usuario creador."""
+    estados = {
+        nombre: EstadoObservacion.objects.get_or_create(codigo=codigo, defaults={'nombre': nombre})[0]
+        for codigo, nombre in [(1, 'Abierta'), (2, 'En Proceso'), (3, 'Cerrada')]
+    }
+    tipo = TipoObservacion.objects.get_or_create(nombre='Terminaciones')[0]
+    tipologia = TipologiaVivienda.objects.get_or_create(codigo=1, defaults={'nombre': 'Tipo A'})[0]
+    rol_admin = Rol.objects.get_or_create(nombre='ADMINISTRADOR')[0]
+    admin = Usuario.objects.filter(email='admin@test.cl').first() or Usuario.objects.create_user(
+        email='admin@test.cl', password='x', nombre='Admin', rol=rol_admin
+    )
+    return {'estados': estados, 'tipo': tipo, 'tipologia': tipologia, 'admin': admin}
+
+
+def crear_region(codigo, nombre=None):
+    region = Region.objects.create(codigo=codigo, nombre=nombre or f'Región {codigo}')
+    comuna = Comuna.objects.create(nombre=f'Comuna {codigo}', region=region)
+    return region, comuna
+
+
+def crear_proyecto(codigo, region, comuna, creado_por, constructora=None):
+    return Proyecto.objects.create(
+        codigo=codigo, siglas=codigo[:10], nombre=f'Proyecto {codigo}',
+        region=region, comuna=comuna, constructora=constructora,
+        fecha_entrega=date.today(), creado_por=creado_por,
+    )
+
+
+def crear_vivienda(proyecto, codigo, tipologia, estado='entregada', beneficiario=None):
+    return Vivienda.objects.create(
+        proyecto=proyecto, codigo=codigo, tipologia=tipologia, estado=estado, beneficiario=beneficiario,
+    )
+
+
+def crear_observacion(vivienda, catalogos, estado='Abierta', dias_resolucion=None, vencida=False, **extra):
+    """Crea una observación; si ``dias_resolucion`` se indica, queda cerrada con esa duración."""
+    obs = Observacion.objects.create(
+        proyecto=vivienda.proyecto, vivienda=vivienda, elemento='Pintura', detalle='Detalle',
+        tipo=catalogos['tipo'], estado=catalogos['estados'][estado], creado_por=catalogos['admin'],
+        **extra
+    )
+    cambios = {}
+    if dias_resolucion is not None:
+        creacion = timezone.now() - timedelta(days=dias_resolucion + 1)
+        cambios.update(fecha_creacion=creacion, fecha_cierre=creacion + timedelta(days=dias_resolucion))
+    if vencida:
+        creacion = timezone.now() - timedelta(days=10)
+        cambios.update(fecha_creacion=creacion, fecha_vencimiento=(creacion + timedelta(days=1)).date())
+    if cambios:
+        Observacion.objects.filter(pk=obs.pk).update(**cambios)
+        obs.refresh_from_db()
+    return obs
+
+
+def crear_constructora(nombre, **extra):
+    return Constructora.objects.create(nombre=nombre, **extra)
@@ -0,0 +1,86 @@
+import os
+import tempfile
+import time
+import zipfile
+from io import BytesIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from core.tests.fixtures import crear_catalogos, crear_proyecto, crear_region, crear_vivienda
+from proyectos.models import Beneficiario
+from reportes.models import ActaRecepcion
+from reportes.pdf_actas import MOTOR_XHTML2PDF, actas_para_pdf, zip_actas
+
+
+# Las actas que no se cuelgan responden al instante: con una conversión real
+# un equipo cargado podría superar el tiempo máximo de 2 s de los tests
+PDF_FALSO = (b'%PDF-1.4 falso', MOTOR_XHTML2PDF)
+
+
+def _cuelga_la_primera(html, datos):
+    if datos['numero_acta'] == 'ACT-T-001':
+        time.sleep(30)
+    return PDF_FALSO
+
+
+def _cuelgan_las_dos_primeras(html, datos):
+    if datos['numero_acta'] in ('ACT-T-001', 'ACT-T-002'):
+        time.sleep(30)
+    return PDF_FALSO
+
+
+class ActasLoteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cat = crear_catalogos()
+        region, comuna = crear_region('R01')
+        cls.proyecto = crear_proyecto('LC1', region, comuna, cls.cat['admin'])
+        for i in (1, 2, 3):
+            beneficiario = Beneficiario.objects.create(nombre=f'Benef {i}', apellido_paterno='Pérez')
+            vivienda = crear_vivienda(cls.proyecto, f'A{i}', cls.cat['tipologia'], beneficiario=beneficiario)
+            ActaRecepcion.objects.create(
+                vivienda=vivienda, numero_acta=f'ACT-T-00{i}', fecha_entrega=timezone.now(),
+                lugar_entrega='Sede', representante_techo='Rep', cargo_representante='Jefe',
+                rut_representante='1-9', telefono_representante='123', superficie_construida=18,
+                numero_ambientes=2, tipo_estructura='madera',
+            )
+
+    def _actas(self):
+        return actas_para_pdf(ActaRecepcion.objects.filter(proyecto=self.proyecto).order_by('numero_acta'))
+
+    def test_zip_del_proyecto_en_paralelo(self):
+        self.client.force_login(self.cat['admin'])
+        respuesta = self.client.get(f'/reportes/actas/proyecto/{self.proyecto.pk}/zip/')
+        self.assertEqual(respuesta['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(BytesIO(b''.join(respuesta.streaming_content))) as archivo:
+            nombres = archivo.namelist()
+            self.assertEqual(nombres, [f'Acta de Recepción - ACT-T-00{i}.pdf' for i in (1, 2, 3)])
+            self.assertTrue(archivo.read(nombres[0]).startswith(b'%PDF'))
+
+    def test_un_acta_colgada_no_detiene_el_lote(self):
+        with mock.patch('reportes.pdf_actas._renderizar_en_proceso', _cuelga_la_primera):
+            inicio = time.monotonic()
+            contenido = b''.join(zip_actas(self._actas(), workers=2, timeout=2))
+        self.assertLess(time.monotonic() - inicio, 20)
+        with zipfile.ZipFile(BytesIO(contenido)) as archivo:
+            self.assertEqual(archivo.namelist(), ['Acta de Recepción - ACT-T-002.pdf', 'Acta de Recepción - ACT-T-003.pdf', 'ERRORES.txt'])
+            self.assertIn('ACT-T-001', archivo.read('ERRORES.txt').decode())
+
+    def test_actas_colgadas_no_agotan_los_workers(self):
+        # Con tantas actas colgadas como workers, las siguientes igual se convierten
+        with mock.patch('reportes.pdf_actas._renderizar_en_proceso', _cuelgan_las_dos_primeras):
+            inicio = time.monotonic()
+            contenido = b''.join(zip_actas(self._actas(), workers=2, timeout=2))
+        self.assertLess(time.monotonic() - inicio, 20)
+        with zipfile.ZipFile(BytesIO(contenido)) as archivo:
+            self.assertEqual(archivo.namelist(), ['Acta de Recepción - ACT-T-003.pdf', 'ERRORES.txt'])
+
+    def test_comando_generar_actas(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            salida = os.path.join(directorio, 'actas.zip')
+            call_command('generar_actas', '--proyecto', 'LC1', '--workers', '1', '--salida', salida, stdout=open(os.devnull, 'w'))
+            with zipfile.ZipFile(salida) as archivo:
+                self.assertEqual(len(archivo.namelist()), 3)
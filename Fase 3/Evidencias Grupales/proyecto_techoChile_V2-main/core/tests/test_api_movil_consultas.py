@@ -0,0 +1,75 @@
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core.tests.fixtures import crear_catalogos, crear_observacion, crear_proyecto, crear_region, crear_vivienda
+from incidencias.models import ArchivoAdjuntoObservacion, SeguimientoObservacion
+
+
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class ApiMovilConsultasTests(TestCase):
+    URL = '/incidencias/movil/api/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cat = crear_catalogos()
+        region, comuna = crear_region('R01')
+        cls.vivienda = crear_vivienda(crear_proyecto('P1', region, comuna, cls.cat['admin']), 'A1', cls.cat['tipologia'])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.cat['admin'])
+
+    def _poblar(self, cantidad, adjuntos=5, seguimientos=4):
+        for _ in range(cantidad):
+            obs = crear_observacion(self.vivienda, self.cat)
+            for i in range(adjuntos):
+                adjunto = ArchivoAdjuntoObservacion(observacion=obs, subido_por=self.cat['admin'])
+                adjunto.archivo.save(f'foto{i}.jpg', ContentFile(b'x' * (i + 1)), save=False)
+                adjunto.save()
+            for i in range(seguimientos):
+                SeguimientoObservacion.objects.create(observacion=obs, usuario=self.cat['admin'], accion=f'Acción {i}')
+
+    def _consultas(self, por_pagina):
+        with CaptureQueriesContext(connection) as consultas:
+            datos = self.client.get(self.URL, {'cursor': '', 'per_page': por_pagina}).json()
+        return datos, len(consultas)
+
+    def test_consultas_constantes(self):
+        self._poblar(20)
+        _, con_5 = self._consultas(5)
+        datos, con_20 = self._consultas(20)
+        self.assertEqual(len(datos['observaciones']), 20)
+        self.assertEqual(con_5, con_20)
+
+    def test_contenido(self):
+        self._poblar(1)
+        crear_observacion(self.vivienda, self.cat)
+        datos, _ = self._consultas(20)
+        sin_adjuntos, con_adjuntos = datos['observaciones']
+        self.assertEqual((sin_adjuntos['total_archivos'], sin_adjuntos['archivos']), (0, []))
+        self.assertEqual(con_adjuntos['total_archivos'], 5)
+        self.assertEqual(con_adjuntos['total_comentarios'], 4)
+        # Los 3 más recientes, con el tamaño guardado en la base de datos
+        self.assertEqual([a['tamaño'] for a in con_adjuntos['archivos']], [5, 4, 3])
+        self.assertEqual([c['accion'] for c in con_adjuntos['comentarios']], ['Acción 3', 'Acción 2', 'Acción 1'])
+
+    def test_tamano_se_recalcula_al_reemplazar_el_archivo(self):
+        self._poblar(1, adjuntos=1, seguimientos=0)
+        adjunto = ArchivoAdjuntoObservacion.objects.get()
+        self.assertEqual(adjunto.tamano, 1)
+        adjunto.descripcion = 'Sin cambio de archivo'
+        adjunto.save()
+        adjunto.archivo.save('nueva.jpg', ContentFile(b'x' * 42))
+        self.assertEqual(ArchivoAdjuntoObservacion.objects.get().tamano, 42)
+        recargado = ArchivoAdjuntoObservacion.objects.get()
+        recargado.archivo = ArchivoAdjuntoObservacion.objects.create(
+            observacion=recargado.observacion, subido_por=self.cat['admin'], archivo=ContentFile(b'y' * 7, name='otra.jpg'),
+        ).archivo
+        recargado.save()
+        self.assertEqual(ArchivoAdjuntoObservacion.objects.get(pk=recargado.pk).tamano, 7)
@@ -0,0 +1,99 @@
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import Rol, Usuario
+from core.tests.fixtures import (
+    crear_catalogos, crear_constructora, crear_observacion, crear_proyecto, crear_region, crear_vivienda,
+)
+from core.utils.cache_reportes import clave_reporte, ruta_absoluta, version_datos
+from core.views_dashboard_pdf import contexto_reporte_dashboard, generar_reporte_dashboard_pdf
+from reportes.models import ReporteGenerado, TrabajoReporte
+
+
+class CacheReportesTests(TestCase):
+    PARAMETROS = {'region': None, 'estado': None, 'fecha_inicio': None, 'fecha_fin': None, 'periodo': 'Enero 2025'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cat = crear_catalogos()
+        region, comuna = crear_region('R01')
+        cls.vivienda = crear_vivienda(crear_proyecto('P1', region, comuna, cls.cat['admin']), 'A1', cls.cat['tipologia'])
+        cls.otro_admin = Usuario.objects.create_user(email='otro@test.cl', password='x', nombre='Otro', rol=cls.cat['admin'].rol)
+        cls.constructora = Usuario.objects.create_user(
+            email='c@test.cl', password='x', nombre='Const', rol=Rol.objects.get_or_create(nombre='CONSTRUCTORA')[0],
+            constructora=crear_constructora('Constructora Uno'),
+        )
+
+    def setUp(self):
+        cache.clear()
+        # Los PDFs y gráficos generados quedan en un directorio temporal
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(BASE_DIR=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def _generar(self, usuario, **parametros):
+        reporte = generar_reporte_dashboard_pdf(usuario, {**self.PARAMETROS, **parametros})
+        ruta = ruta_absoluta(reporte.ruta_archivo)
+        self.addCleanup(lambda: os.path.exists(ruta) and os.remove(ruta))
+        return reporte
+
+    def test_mismo_alcance_comparte_archivo(self):
+        primero = self._generar(self.cat['admin'])
+        # Valores vacíos y espacios no cambian la clave
+        segundo = self._generar(self.otro_admin, region='', fecha_fin='  ')
+        self.assertEqual(primero.pk, segundo.pk)
+        self.assertEqual(ReporteGenerado.objects.count(), 1)
+        self.assertEqual(os.path.basename(primero.ruta_archivo), f'{primero.clave_contenido}.pdf')
+        # El archivo compartido no lleva datos del solicitante ni la hora en que se generó
+        contexto = contexto_reporte_dashboard(self.cat['admin'], self.PARAMETROS)
+        self.assertEqual(contexto, contexto_reporte_dashboard(self.otro_admin, self.PARAMETROS))
+        self.assertNotIn(self.cat['admin'].email, str(contexto))
+        self.assertNotIn('Admin', str(contexto))
+
+    def test_reporte_sincrono_requiere_login(self):
+        respuesta = self.client.get('/dashboard/reporte-pdf/', {'periodo': 'Enero 2025'})
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertFalse(ReporteGenerado.objects.exists())
+
+    def test_alcance_distinto_no_comparte(self):
+        tipo = TrabajoReporte.TIPO_DASHBOARD_PDF
+        self.assertNotEqual(
+            clave_reporte(tipo, self.cat['admin'], self.PARAMETROS),
+            clave_reporte(tipo, self.constructora, self.PARAMETROS),
+        )
+        self.assertNotEqual(
+            clave_reporte(tipo, self.cat['admin'], self.PARAMETROS),
+            clave_reporte(tipo, self.cat['admin'], {**self.PARAMETROS, 'region': '1'}),
+        )
+
+    def test_cambio_de_dia_no_comparte(self):
+        tipo = TrabajoReporte.TIPO_DASHBOARD_PDF
+        hoy = clave_reporte(tipo, self.cat['admin'], self.PARAMETROS)
+        with mock.patch.object(timezone, 'localdate', return_value=timezone.localdate() + timedelta(days=1)):
+            self.assertNotEqual(clave_reporte(tipo, self.cat['admin'], self.PARAMETROS), hoy)
+
+    def test_escribir_observacion_invalida(self):
+        antes = version_datos()
+        primero = self._generar(self.cat['admin'])
+        crear_observacion(self.vivienda, self.cat)
+        self.assertGreater(version_datos(), antes)
+        segundo = self._generar(self.cat['admin'])
+        self.assertNotEqual(segundo.pk, primero.pk)
+        # La generación anterior se borra: archivo y registro
+        self.assertFalse(os.path.exists(ruta_absoluta(primero.ruta_archivo)))
+        self.assertEqual(list(ReporteGenerado.objects.values_list('pk', flat=True)), [segundo.pk])
+
+    def test_pagina_de_espera_con_reporte_en_cache(self):
+        self._generar(self.cat['admin'])
+        self.client.force_login(self.otro_admin)
+        self.client.get('/dashboard/generando-reporte/', {'periodo': 'Enero 2025'})
+        trabajo = TrabajoReporte.objects.get()
+        self.assertEqual(trabajo.estado, TrabajoReporte.COMPLETADO)
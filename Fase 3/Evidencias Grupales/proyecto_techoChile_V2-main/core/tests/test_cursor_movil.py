@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.tests.fixtures import crear_catalogos, crear_observacion, crear_proyecto, crear_region, crear_vivienda
+from core.utils.cursor import codificar_cursor, decodificar_cursor
+from incidencias.models import Observacion
+
+
+class CursorMovilTests(TestCase):
+    URL = '/incidencias/movil/api/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cat = crear_catalogos()
+        region, comuna = crear_region('R01')
+        proyecto = crear_proyecto('P1', region, comuna, cls.cat['admin'])
+        vivienda = crear_vivienda(proyecto, 'A1', cls.cat['tipologia'])
+        base = timezone.now() - timedelta(days=1)
+        for i in range(25):
+            obs = crear_observacion(vivienda, cls.cat)
+            # Varias observaciones comparten fecha para ejercitar el desempate por id
+            Observacion.objects.filter(pk=obs.pk).update(fecha_creacion=base - timedelta(minutes=i // 3))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.cat['admin'])
+
+    def _recorrer(self, por_pagina):
+        ids, cursor, paginas = [], '', 0
+        while True:
+            datos = self.client.get(self.URL, {'cursor': cursor, 'per_page': por_pagina}).json()
+            ids += [o['id'] for o in datos['observaciones']]
+            paginas += 1
+            if not datos['pagination']['has_next']:
+                return ids, paginas
+            cursor = datos['pagination']['next_cursor']
+
+    def test_recorre_todo_sin_repetir(self):
+        esperados = list(Observacion.objects.order_by('-fecha_creacion', '-id').values_list('id', flat=True))
+        ids, paginas = self._recorrer(por_pagina=7)
+        self.assertEqual(ids, esperados)
+        self.assertEqual(paginas, 4)
+
+    def test_sin_count_y_costo_constante(self):
+        primera = self.client.get(self.URL, {'cursor': '', 'per_page': 5}).json()
+        with CaptureQueriesContext(connection) as q1:
+            self.client.get(self.URL, {'cursor': '', 'per_page': 5})
+        with CaptureQueriesContext(connection) as q2:
+            self.client.get(self.URL, {'cursor': primera['pagination']['next_cursor'], 'per_page': 5})
+        self.assertEqual(len(q1), len(q2))
+        conteos = [c for c in q2.captured_queries if 'COUNT(' in c['sql'] and 'FROM "incidencias_observacion"' in c['sql']]
+        self.assertEqual(conteos, [])
+
+    def test_total_opcional_cacheado(self):
+        datos = self.client.get(self.URL, {'cursor': '', 'total': '1'}).json()
+        self.assertEqual(datos['pagination']['total_items'], 25)
+        self.assertNotIn('total_items', self.client.get(self.URL, {'cursor': ''}).json()['pagination'])
+
+    def test_cursor_invalido(self):
+        self.assertEqual(self.client.get(self.URL, {'cursor': 'no-es-un-cursor'}).status_code, 400)
+
+    def test_codificacion_ida_y_vuelta(self):
+        fecha = timezone.now()
+        self.assertEqual(decodificar_cursor(codificar_cursor(fecha, 42)), (fecha, 42))
@@ -0,0 +1,135 @@
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from core.tests.fixtures import crear_catalogos, crear_observacion, crear_proyecto, crear_region, crear_vivienda
+from core.models import Rol, Usuario
+from core.utils.dashboard_metrics import DashboardMetrics, desempeno_equipo
+from incidencias.models import Observacion
+from proyectos.models import Beneficiario, Proyecto, Vivienda
+
+
+class DashboardMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cat = crear_catalogos()
+        region, comuna = crear_region('05')
+        proyecto = crear_proyecto('LC1', region, comuna, cls.cat['admin'])
+        benef = Beneficiario.objects.create(nombre='Ana', apellido_paterno='Pérez')
+        v1 = crear_vivienda(proyecto, 'A1', cls.cat['tipologia'], beneficiario=benef)
+        v2 = crear_vivienda(proyecto, 'A2', cls.cat['tipologia'], estado='construccion')
+        crear_observacion(v1, cls.cat)
+        crear_observacion(v1, cls.cat, es_urgente=True)
+        crear_observacion(v2, cls.cat, vencida=True)
+        crear_observacion(v2, cls.cat, estado='Cerrada', dias_resolucion=4)
+        crear_observacion(v2, cls.cat, estado='Cerrada', dias_resolucion=6)
+
+    def _metrics(self):
+        return DashboardMetrics(
+            proyectos=Proyecto.objects.all(),
+            viviendas=Vivienda.objects.all(),
+            observaciones=Observacion.objects.all(),
+        )
+
+    def test_resumen_valores(self):
+        resumen = self._metrics().resumen()
+        self.assertEqual(resumen.total_proyectos, 1)
+        self.assertEqual(resumen.viviendas_total, 2)
+        self.assertEqual(resumen.viviendas_entregadas, 1)
+        self.assertEqual(resumen.viviendas_asignadas, 1)
+        self.assertEqual(resumen.obs_total, 5)
+        self.assertEqual(resumen.obs_abiertas, 3)
+        self.assertEqual(resumen.obs_cerradas, 2)
+        self.assertEqual(resumen.obs_urgentes, 1)
+        self.assertEqual(resumen.obs_vencidas, 1)
+        self.assertEqual(resumen.tiempo_promedio_resolucion, 5)
+        self.assertEqual(resumen.porc_cerradas, 40.0)
+
+    def test_resumen_numero_fijo_de_consultas(self):
+        with self.assertNumQueries(3):
+            self._metrics().resumen()
+
+    def test_resumen_vacio(self):
+        resumen = DashboardMetrics(observaciones=Observacion.objects.none()).resumen()
+        self.assertEqual(resumen.obs_total, 0)
+        self.assertIsNone(resumen.tiempo_promedio_resolucion)
+        self.assertEqual(resumen.porc_abiertas, 0)
+
+
+class DesempenoEquipoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cat = crear_catalogos()
+        region, comuna = crear_region('05')
+        vivienda = crear_vivienda(crear_proyecto('LC1', region, comuna, cls.cat['admin']), 'A1', cls.cat['tipologia'])
+        tecnico = Rol.objects.get_or_create(nombre='TECNICO')[0]
+        cls.ana = Usuario.objects.create_user(email='ana@test.cl', password='x', nombre='Ana', apellido_paterno='Rojas', rol=tecnico)
+        cls.beto = Usuario.objects.create_user(
+            email='beto@test.cl', password='x', nombre='Beto', rol=Rol.objects.get_or_create(nombre='COORDINADOR')[0],
+        )
+        inactivo = Usuario.objects.create_user(email='x@test.cl', password='x', nombre='Inactivo', rol=tecnico, is_active=False)
+        crear_observacion(vivienda, cls.cat, asignado_a=cls.ana)
+        crear_observacion(vivienda, cls.cat, estado='Cerrada', dias_resolucion=4, asignado_a=cls.ana)
+        crear_observacion(vivienda, cls.cat, estado='Cerrada', dias_resolucion=6, asignado_a=cls.ana)
+        crear_observacion(vivienda, cls.cat, asignado_a=inactivo)
+        crear_observacion(vivienda, cls.cat, asignado_a=cls.cat['admin'])
+
+    def test_valores_por_tecnico(self):
+        with self.assertNumQueries(2):
+            filas = desempeno_equipo(Observacion.objects.all())
+        self.assertEqual(filas, [
+            {'usuario_id': self.ana.pk, 'nombre': 'Ana Rojas', 'asignados': 3, 'cerrados': 2, 'tasa_cierre': 66.7, 'tiempo_promedio': 5},
+            {'usuario_id': self.beto.pk, 'nombre': 'Beto', 'asignados': 0, 'cerrados': 0, 'tasa_cierre': 0, 'tiempo_promedio': None},
+        ])
+
+    def test_respeta_el_filtro_de_observaciones(self):
+        filas = desempeno_equipo(Observacion.objects.filter(estado__nombre='Abierta'))
+        self.assertEqual([(f['asignados'], f['cerrados']) for f in filas], [(1, 0), (0, 0)])
+
+
+class DashboardVistasConsultasTests(TestCase):
+    """Las vistas del dashboard hacen un número fijo de consultas, sin importar cuántas observaciones haya."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cat = crear_catalogos()
+        cls.cat['admin'].is_superuser = True
+        cls.cat['admin'].save()
+        cls.region, cls.comuna = crear_region('05', 'Valparaíso')
+        cls.vivienda = crear_vivienda(crear_proyecto('LC1', cls.region, cls.comuna, cls.cat['admin']), 'A1', cls.cat['tipologia'])
+        for _ in range(3):
+            crear_observacion(cls.vivienda, cls.cat)
+        crear_observacion(cls.vivienda, cls.cat, estado='Cerrada', dias_resolucion=3)
+
+    def setUp(self):
+        cache.clear()
+        # Los gráficos del reporte PDF se escriben bajo BASE_DIR
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(BASE_DIR=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.client.force_login(self.cat['admin'])
+
+    def _agregar_datos(self, codigo):
+        vivienda = crear_vivienda(crear_proyecto(codigo, self.region, self.comuna, self.cat['admin']), 'B1', self.cat['tipologia'])
+        for _ in range(5):
+            crear_observacion(vivienda, self.cat, es_urgente=True)
+        crear_observacion(vivienda, self.cat, estado='Cerrada', dias_resolucion=8)
+        cache.clear()
+
+    def _assert_consultas(self, url, cantidad):
+        for codigo in ['LC2', 'LC3']:
+            with self.assertNumQueries(cantidad):
+                self.assertEqual(self.client.get(url).status_code, 200)
+            self._agregar_datos(codigo)
+
+    def test_dashboard(self):
+        self._assert_consultas('/', 20)
+
+    def test_reporte_pdf(self):
+        self._assert_consultas('/dashboard/reporte-pdf/?preview=1', 21)
+
+    def test_reporte_excel(self):
+        self._assert_consultas('/dashboard/reporte-excel/', 17)
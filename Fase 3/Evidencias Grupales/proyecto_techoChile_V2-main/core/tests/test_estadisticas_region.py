@@ -0,0 +1,56 @@
+from io import BytesIO
+
+import openpyxl
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.tests.fixtures import (
+    crear_catalogos, crear_constructora, crear_observacion, crear_proyecto, crear_region, crear_vivienda,
+)
+
+
+class EstadisticasRegionExcelTests(TestCase):
+    URL = '/reportes/estadisticas/region_excel/'
+    # Sesión, usuario y la consulta agregada de proyectos
+    PRESUPUESTO_CONSULTAS = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cat = crear_catalogos()
+        cls.region, cls.comuna = crear_region('R01')
+
+    def setUp(self):
+        self.client.force_login(self.cat['admin'])
+
+    def _crear_proyecto(self, codigo):
+        proyecto = crear_proyecto(codigo, self.region, self.comuna, self.cat['admin'], constructora=crear_constructora(f'C {codigo}'))
+        con_obs = crear_vivienda(proyecto, 'A1', self.cat['tipologia'])
+        crear_vivienda(proyecto, 'A2', self.cat['tipologia'])
+        crear_observacion(con_obs, self.cat, es_urgente=True)
+        crear_observacion(con_obs, self.cat)
+        crear_observacion(con_obs, self.cat, estado='Cerrada')
+        return proyecto
+
+    def _descargar(self):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(self.URL)
+        libro = openpyxl.load_workbook(BytesIO(respuesta.content))
+        return libro.active, len(consultas)
+
+    def test_presupuesto_de_consultas(self):
+        self._crear_proyecto('P1')
+        _, con_uno = self._descargar()
+        for codigo in ('P2', 'P3', 'P4'):
+            self._crear_proyecto(codigo)
+        hoja, con_cuatro = self._descargar()
+        self.assertEqual(hoja.max_row, 5)
+        self.assertEqual(con_uno, con_cuatro)
+        self.assertLessEqual(con_cuatro, self.PRESUPUESTO_CONSULTAS)
+
+    def test_valores_y_grafico(self):
+        self._crear_proyecto('P1')
+        hoja, _ = self._descargar()
+        fila = [c.value for c in hoja[2]]
+        self.assertEqual(fila, ['Región R01', 'Proyecto P1', 'C P1', 2, 1, 2, 1, 1, 66.7, 33.3, 33.3])
+        self.assertEqual(len(hoja._charts), 1)
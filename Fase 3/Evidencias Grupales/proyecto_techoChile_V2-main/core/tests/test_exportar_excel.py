@@ -0,0 +1,106 @@
+import tempfile
+from io import BytesIO
+
+import openpyxl
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core.tests.fixtures import crear_catalogos, crear_observacion, crear_proyecto, crear_region, crear_vivienda
+from incidencias.models import SeguimientoObservacion
+from proyectos.models import Beneficiario
+
+
+class ExportarExcelTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cat = crear_catalogos()
+        region, comuna = crear_region('R01')
+        cls.proyecto = crear_proyecto('P1', region, comuna, cls.cat['admin'])
+        cls.beneficiario = Beneficiario.objects.create(
+            rut='11.111.111-1', nombre='Ana', apellido_paterno='Pérez', apellido_materno='Soto',
+        )
+        cls.vivienda = crear_vivienda(cls.proyecto, 'A1', cls.cat['tipologia'], beneficiario=cls.beneficiario)
+
+    def setUp(self):
+        cache.clear()
+        # Los archivos de la caché de reportes se escriben bajo BASE_DIR
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajuste = override_settings(BASE_DIR=directorio.name)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+        self.client.force_login(self.cat['admin'])
+
+    def _filas(self, url, **params):
+        respuesta = self.client.get(url, params)
+        self.assertEqual(respuesta.status_code, 200)
+        libro = openpyxl.load_workbook(BytesIO(b''.join(respuesta.streaming_content)))
+        return [list(fila) for fila in libro.active.iter_rows(values_only=True)]
+
+    def test_consultas_no_crecen_con_las_filas(self):
+        # Ambas mediciones generan el archivo y purgan una generación anterior
+        crear_observacion(self.vivienda, self.cat)
+        self._filas('/reportes/observaciones/abiertas_excel/')
+        crear_observacion(self.vivienda, self.cat)
+        with CaptureQueriesContext(connection) as una:
+            self._filas('/reportes/observaciones/abiertas_excel/')
+        for _ in range(30):
+            crear_observacion(self.vivienda, self.cat)
+        with CaptureQueriesContext(connection) as muchas:
+            filas = self._filas('/reportes/observaciones/abiertas_excel/')
+        self.assertEqual(len(filas), 33)
+        self.assertEqual(len(una), len(muchas))
+
+    def test_segunda_descarga_desde_cache(self):
+        crear_observacion(self.vivienda, self.cat)
+        primera = self._filas('/reportes/excel/observaciones_abiertas/')
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self._filas('/reportes/observaciones/abiertas_excel/'), primera)
+        self.assertFalse([c for c in consultas.captured_queries if 'incidencias_observacion' in c['sql']])
+        # Un cambio en los datos invalida la caché
+        crear_observacion(self.vivienda, self.cat)
+        self.assertEqual(len(self._filas('/reportes/observaciones/abiertas_excel/')), 3)
+
+    def test_cambio_en_catalogos_invalida_la_cache(self):
+        crear_observacion(self.vivienda, self.cat)
+        self._filas('/reportes/observaciones/abiertas_excel/')
+        self.cat['admin'].email = 'nuevo@test.cl'
+        self.cat['admin'].save()
+        _, fila = self._filas('/reportes/observaciones/abiertas_excel/')
+        self.assertEqual(fila[7], 'nuevo@test.cl')
+
+        crear_vivienda(self.proyecto, 'A2', self.cat['tipologia'])
+        self._filas('/reportes/viviendas_sin_observaciones_excel/')
+        self.cat['tipologia'].nombre = 'Tipología renombrada'
+        self.cat['tipologia'].save()
+        _, vivienda = self._filas('/reportes/viviendas_sin_observaciones_excel/')
+        self.assertEqual(vivienda[2], 'Tipología renombrada')
+
+    def test_reporte_inexistente(self):
+        self.assertEqual(self.client.get('/reportes/excel/no-existe/').status_code, 404)
+
+    def test_contenido_de_columnas_relacionadas(self):
+        crear_observacion(self.vivienda, self.cat)
+        encabezados, fila = self._filas('/reportes/observaciones/abiertas_excel/')
+        datos = dict(zip(encabezados, fila))
+        self.assertEqual(datos['Proyecto'], 'Proyecto P1')
+        self.assertEqual(datos['Usuario'], 'admin@test.cl')
+        self.assertIsNotNone(datos['Fecha'])
+
+        _, vivienda = self._filas('/reportes/reporte_total_excel/')
+        self.assertEqual(vivienda[4], 'Ana Pérez Soto')
+
+    def test_filtradas_una_fila_por_seguimiento(self):
+        con_historial = crear_observacion(self.vivienda, self.cat)
+        sin_historial = crear_observacion(self.vivienda, self.cat)
+        for accion in ('Visita', 'Reparación'):
+            SeguimientoObservacion.objects.create(observacion=con_historial, usuario=self.cat['admin'], accion=accion)
+        filas = self._filas('/reportes/observaciones/filtrar_excel/', proyecto=self.proyecto.pk)[1:]
+        por_observacion = {}
+        for fila in filas:
+            por_observacion.setdefault(fila[0], []).append(fila[11])
+        self.assertEqual(sorted(por_observacion[con_historial.pk]), ['Reparación', 'Visita'])
+        self.assertEqual(por_observacion[sin_historial.pk], [None])
+        self.assertEqual(filas[0][3], 'Ana Pérez Soto')
@@ -0,0 +1,49 @@
+import glob
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from core.utils import graficos
+from core.utils.cache_reportes import DIRECTORIO, incrementar_version_datos, ruta_absoluta
+
+BARRAS = {'categorias': ['Pintura', 'Techo'], 'series': [['Cerrados', [3, 1]], ['Pendientes', [0, 2]]]}
+
+
+class GraficosTests(TestCase):
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(BASE_DIR=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def _archivos(self):
+        return sorted(glob.glob(ruta_absoluta(f'{DIRECTORIO}/*/{graficos.DIRECTORIO}/*')))
+
+    def test_todos_los_tipos_se_dibujan(self):
+        series = {
+            'torta': [['Entregada', 3], ['Construccion', 5]],
+            'barras': BARRAS,
+            'lineas': {'categorias': ['Enero', 'Febrero'], 'series': [['Abiertos', [4, 2]], ['Cerrados', [1, 3]]]},
+            'mapa_calor': {'filas': ['Valparaíso', 'Biobío'], 'columnas': ['Total', 'Casos'], 'valores': [[10, 4], [0, 0]]},
+        }
+        for tipo, datos in series.items():
+            uri = graficos.grafico(tipo, datos)
+            self.assertTrue(uri.startswith('data:image/'), tipo)
+            self.assertIsNotNone(graficos.flowable(uri, 300))
+        self.assertEqual(graficos.grafico('barras', []), '')
+
+    def test_misma_serie_y_version_reutiliza_la_imagen(self):
+        with mock.patch.dict(graficos.DIBUJOS, barras=mock.Mock(wraps=graficos.dibujo_barras)) as dibujos:
+            primero = graficos.grafico('barras', BARRAS)
+            self.assertEqual(graficos.grafico('barras', BARRAS), primero)
+            self.assertEqual(dibujos['barras'].call_count, 1)
+            self.assertEqual(len(self._archivos()), 1)
+
+            # Otra serie u otra versión de los datos generan una imagen nueva
+            graficos.grafico('barras', {**BARRAS, 'categorias': ['Pintura', 'Muros']})
+            incrementar_version_datos()
+            graficos.grafico('barras', BARRAS)
+            self.assertEqual(dibujos['barras'].call_count, 3)
+        self.assertEqual(len(self._archivos()), 3)
@@ -0,0 +1,129 @@
+import io
+import os
+import tempfile
+from unittest import mock
+
+import pandas as pd
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase
+
+from core.tests.fixtures import crear_catalogos
+from core.utils.cache_reportes import version_datos
+from incidencias.management.commands.importar_observaciones import Command
+from incidencias.models import EstadoObservacion, Observacion, TipoObservacion
+from proyectos.models import Recinto
+
+
+def fila(pv_id, vivienda=758, elemento='Ventana', estado=0, urgente=None, recinto=579, detalle=None):
+    return {
+        'PV_ID': pv_id, 'PV_ELEMENTO': elemento, 'PV_ESURGENTE': urgente, 'PV_DESCRIPCION': detalle or f'Detalle {pv_id}',
+        'PV_FECHAREGISTRO': '2020-10-01 09:41:50.0', 'PV_ESTADO': estado,
+        'PYTO_COD': 10, 'PYTO_SIGLAS': 'LC1', 'PYTO_NOMBRE': 'La Cruz', 'PYTO_S': 32, 'PYTO_W': 71,
+        'CONSTRUCTORA': 'DYR', 'COMUNA': 'La Cruz',
+        'RECINTO_TIPOLOGIA': 1, 'RECINTO_COD': recinto, 'RECINTO_NOMBRE': f'Recinto {recinto}',
+        'RECINTO_ELEMENTOS': 'Ventana, Puerta',
+        'VDA_CODIGO': vivienda, 'VDA_FAMILIA': 'Familia', 'VDA_CALLE': 'Calle', 'VDA_NUMERODIRECCION': '1',
+        'VDA_TIPOLOGIA': 1,
+    }
+
+
+class ImportarObservacionesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        crear_catalogos()
+        EstadoObservacion.objects.create(codigo=99, nombre='Rechazada')
+        TipoObservacion.objects.create(nombre='General')
+
+    def _importar(self, filas, *argumentos):
+        with tempfile.TemporaryDirectory() as directorio:
+            archivo = os.path.join(directorio, 'observaciones.xlsx')
+            pd.DataFrame(filas).to_excel(archivo, index=False)
+            salida = io.StringIO()
+            call_command('importar_observaciones', '--archivo', archivo, *argumentos, stdout=salida)
+        return salida.getvalue()
+
+    def test_importa_en_bloque(self):
+        salida = self._importar([
+            fila(1),
+            fila(2, elemento='Lavamanos', estado=1, urgente=1.0),
+            fila(3, vivienda=759, elemento=None, estado=99, recinto=None),
+            fila(1, elemento='Duplicado en el archivo'),
+            fila(4, vivienda=None),
+        ], '--lote', '2')
+        self.assertIn('Importación completada exitosamente', salida)
+        self.assertIn('Total observaciones creadas: 3', salida)
+
+        obs = {o.id_externo: o for o in Observacion.objects.select_related('tipo', 'estado', 'proyecto', 'recinto')}
+        self.assertEqual(sorted(obs), ['1', '2', '3'])
+        self.assertEqual((obs['1'].tipo.nombre, obs['1'].estado.nombre, obs['1'].prioridad), ('Carpintería', 'Abierta', 'media'))
+        self.assertEqual((obs['2'].tipo.nombre, obs['2'].estado.nombre, obs['2'].es_urgente), ('Sanitario', 'Cerrada', True))
+        self.assertEqual((obs['3'].tipo.nombre, obs['3'].estado.nombre, obs['3'].elemento), ('General', 'Rechazada', ''))
+        self.assertEqual(obs['1'].proyecto.codigo, '10-LC1')
+        self.assertEqual(obs['1'].recinto, Recinto.objects.get(codigo='579'))
+        self.assertIsNone(obs['3'].recinto)
+        self.assertEqual(obs['2'].vivienda_id, obs['1'].vivienda_id)
+        self.assertNotEqual(obs['3'].vivienda_id, obs['1'].vivienda_id)
+
+    def test_omite_las_ya_importadas(self):
+        self._importar([fila(1), fila(2)])
+        salida = self._importar([fila(1), fila(2), fila(3)], '--dry-run')
+        self.assertIn('[dry-run] Observaciones que se crearían: 1', salida)
+        self.assertIn('Total observaciones creadas: 1', self._importar([fila(1), fila(2), fila(3)]))
+        self.assertEqual(Observacion.objects.count(), 3)
+
+    def test_upsert_actualiza_solo_lo_que_cambio(self):
+        self._importar([fila(1), fila(2), fila(3)])
+        Observacion.objects.filter(id_externo='3').update(fecha_ultima_actualizacion='2020-01-01T00:00:00Z')
+        sin_cambio = Observacion.objects.get(id_externo='3').fecha_ultima_actualizacion
+
+        salida = self._importar([
+            fila(1, detalle='Corregido'), fila(2, estado=1, urgente=1.0), fila(3), fila(4),
+        ], '--upsert')
+        self.assertIn('Upsert: 1 insertadas, 2 actualizadas, 1 sin cambios', salida)
+
+        obs = {o.id_externo: o for o in Observacion.objects.select_related('estado')}
+        self.assertEqual(len(obs), 4)
+        self.assertEqual(obs['1'].detalle, 'Corregido')
+        self.assertEqual((obs['2'].estado.nombre, obs['2'].prioridad, obs['2'].es_urgente), ('Cerrada', 'alta', True))
+        self.assertGreater(obs['2'].fecha_ultima_actualizacion, sin_cambio)
+        self.assertEqual(obs['3'].fecha_ultima_actualizacion, sin_cambio)
+
+        # Sin --upsert las ya importadas no se tocan
+        self._importar([fila(1, detalle='Otra corrección')])
+        self.assertEqual(Observacion.objects.get(id_externo='1').detalle, 'Corregido')
+
+    def test_fila_invalida_no_descarta_el_bloque(self):
+        bulk_create = Observacion.objects.bulk_create
+
+        def falla_con_la_fila_2(observaciones, **kwargs):
+            if any(obs.id_externo == '2' for obs in observaciones):
+                raise IntegrityError('fila inválida')
+            return bulk_create(observaciones, **kwargs)
+
+        antes = version_datos()
+        with mock.patch.object(Observacion.objects, 'bulk_create', side_effect=falla_con_la_fila_2), \
+                self.captureOnCommitCallbacks(execute=True):
+            salida = self._importar([fila(1), fila(2), fila(3)])
+        self.assertIn('Error guardando observación 2: fila inválida', salida)
+        self.assertIn('Total observaciones creadas: 2', salida)
+        self.assertEqual(sorted(Observacion.objects.values_list('id_externo', flat=True)), ['1', '3'])
+        self.assertGreater(version_datos(), antes)
+
+    def test_error_en_un_bloque_conserva_e_invalida_los_anteriores(self):
+        importar_recintos = Command.importar_recintos
+        llamadas = []
+
+        def falla_en_el_segundo_bloque(comando, df, **kwargs):
+            llamadas.append(df)
+            if len(llamadas) == 2:
+                raise ValueError('bloque roto')
+            return importar_recintos(comando, df, **kwargs)
+
+        antes = version_datos()
+        with mock.patch.object(Command, 'importar_recintos', falla_en_el_segundo_bloque), \
+                self.captureOnCommitCallbacks(execute=True):
+            salida = self._importar([fila(1), fila(2), fila(3)], '--lote', '2')
+        self.assertIn('Error durante la importación en el bloque 2 (registros 3 a 3)', salida)
+        self.assertEqual(sorted(Observacion.objects.values_list('id_externo', flat=True)), ['1', '2'])
+        self.assertGreater(version_datos(), antes)
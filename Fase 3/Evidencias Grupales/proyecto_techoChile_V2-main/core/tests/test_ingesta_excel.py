@@ -0,0 +1,77 @@
+import io
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from openpyxl import Workbook
+
+from core.utils.ingesta_excel import Alias, HojaExcel, detectar_columnas, leer_bloques
+from proyectos.models import Beneficiario
+
+
+def crear_libro(directorio, filas, nombre='datos.xlsx'):
+    libro = Workbook()
+    for fila in filas:
+        libro.active.append(fila)
+    ruta = os.path.join(directorio, nombre)
+    libro.save(ruta)
+    return ruta
+
+
+class IngestaExcelTests(SimpleTestCase):
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.ruta = crear_libro(directorio.name, [
+            ['PYTO_COD', 'PV_TELEFONO', None, 'PYTO_COD', 'VACIA'],
+            [10, '569.', 'a', 11, None],
+            [None, None, None, None, None],
+            [20, 42, 'b', 21],
+            [30, '', 'c', 31, None],
+        ])
+
+    def test_bloques_como_read_excel(self):
+        bloques = list(leer_bloques(self.ruta, tamano=2))
+        self.assertEqual([len(b) for b in bloques], [2, 1])
+        primero = bloques[0]
+        self.assertEqual(list(primero.columns), ['PYTO_COD', 'PV_TELEFONO', 'Unnamed: 2', 'PYTO_COD.1', 'VACIA'])
+        # El índice es la posición en la hoja: la fila vacía se omite sin correr la numeración
+        self.assertEqual([list(b.index) for b in bloques], [[0, 2], [3]])
+        self.assertEqual(list(primero['PV_TELEFONO']), [569.0, 42.0])
+        self.assertEqual(primero['VACIA'].dtype, float)
+        self.assertEqual(list(primero['Unnamed: 2']), ['a', 'b'])
+
+    def test_filas_y_hoja_por_indice_en_texto(self):
+        with HojaExcel(self.ruta, '0') as hoja:
+            self.assertEqual([indice for indice, _ in hoja.filas(1)], [0, 2, 3])
+
+    def test_detectar_columnas(self):
+        columnas = detectar_columnas(
+            [' Nombre Beneficiario ', 'Teléfono Familia', 'RUT Beneficiario', 'Empresa'],
+            {
+                'nombre': Alias(alguna=('benef', 'famil'), excluye=('rut', 'tel')),
+                'rut': Alias(alguna=('benef', 'famil'), todas=('rut',)),
+                'constructora_rut': Alias(alguna=('empresa',), todas=('rut',)),
+            },
+        )
+        self.assertEqual(columnas, {
+            'nombre': ' Nombre Beneficiario ', 'rut': 'RUT Beneficiario', 'constructora_rut': None,
+        })
+
+
+class ImportarBeneficiariosTests(TestCase):
+    def test_actualiza_por_bloques(self):
+        Beneficiario.objects.create(nombre='Familia Uno', rut='11.111.111-1')
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = crear_libro(directorio, [
+                ['RUT_BENEFICIARIO', 'VDA_FAMILIA'],
+                ['11.111.111-1', 'Familia Uno Corregida'],
+                [None, None],
+                ['22.222.222-2', 'Familia Nueva'],
+            ])
+            salida = io.StringIO()
+            call_command('importar_beneficiarios', ruta, '--apply', '--bloque', '1', stdout=salida)
+        self.assertIn('Filas leídas: 2', salida.getvalue())
+        self.assertIn('Beneficiarios actualizados: 1', salida.getvalue())
+        self.assertEqual(Beneficiario.objects.get(rut_normalizado='111111111').nombre, 'Familia Uno Corregida')
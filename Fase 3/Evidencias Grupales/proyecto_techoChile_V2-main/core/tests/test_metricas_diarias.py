@@ -0,0 +1,115 @@
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from core.tests.fixtures import (
+    crear_catalogos, crear_constructora, crear_observacion, crear_proyecto, crear_region, crear_vivienda,
+)
+from core.utils.cumplimiento_constructora import get_cumplimiento_plazos_por_constructora
+from core.utils.dashboard_metrics import DashboardMetrics, _mes
+from core.utils.metricas_diarias import metricas_filtradas, refrescar_metricas_diarias
+from incidencias.models import Observacion
+from reportes.models import DiaPendienteMetrica, MetricaDiaria
+
+
+class MetricaDiariaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cat = crear_catalogos()
+        region, comuna = crear_region('05')
+        proyecto = crear_proyecto('LC1', region, comuna, cls.cat['admin'])
+        cls.vivienda = crear_vivienda(proyecto, 'A1', cls.cat['tipologia'])
+        crear_observacion(cls.vivienda, cls.cat, es_urgente=True, vencida=True)
+        crear_observacion(cls.vivienda, cls.cat, estado='Cerrada', dias_resolucion=3)
+        crear_observacion(cls.vivienda, cls.cat, estado='Cerrada', dias_resolucion=8)
+        crear_observacion(cls.vivienda, cls.cat)
+
+    def _metrics(self, con_snapshot):
+        return DashboardMetrics(
+            observaciones=Observacion.objects.filter(activo=True),
+            metricas=metricas_filtradas(solo_activas=True) if con_snapshot else None,
+        )
+
+    def _comparar(self):
+        crudo, snapshot = self._metrics(False), self._metrics(True)
+        self.assertEqual(crudo.resumen(), snapshot.resumen())
+        self.assertEqual(
+            [(t['tipo__nombre'], t['totales'], t['cerrados'], t['pendientes']) for t in crudo.observaciones_por_tipo()],
+            [(t['tipo__nombre'], t['totales'], t['cerrados'], t['pendientes']) for t in snapshot.observaciones_por_tipo()],
+        )
+        def meses(metrics):
+            return [(_mes(m['mes']), m['abiertos'], m['cerrados']) for m in metrics.tendencia_mensual()]
+        self.assertEqual(meses(crudo), meses(snapshot))
+
+    def test_snapshot_coincide_con_datos_crudos(self):
+        self._comparar()  # sin snapshot: ambos caminos usan datos crudos
+        call_command('refrescar_metricas_diarias', verbosity=0)
+        self.assertTrue(MetricaDiaria.objects.exists())
+        self._comparar()
+
+    def test_cambios_posteriores_al_refresco_se_leen_crudos(self):
+        refrescar_metricas_diarias()
+        obs = Observacion.objects.filter(estado__nombre='Abierta').first()
+        obs.estado = self.cat['estados']['Cerrada']
+        obs.fecha_cierre = timezone.now()
+        obs.save()
+        self._comparar()
+
+    def test_refresco_incremental_solo_dias_modificados(self):
+        refrescar_metricas_diarias()
+        self.assertEqual(refrescar_metricas_diarias(), (0, 0))
+        obs = Observacion.objects.order_by('fecha_creacion').first()
+        obs.detalle = 'Editada'
+        obs.save()
+        dias, _ = refrescar_metricas_diarias()
+        self.assertEqual(dias, 1)
+
+    def test_mover_fecha_de_creacion_marca_ambos_dias(self):
+        refrescar_metricas_diarias()
+        obs = Observacion.objects.filter(estado__nombre='Abierta', es_urgente=False).get()
+        obs.fecha_creacion -= timedelta(days=14)
+        obs.save(update_fields=['fecha_creacion'])
+        dias, _ = refrescar_metricas_diarias()
+        self.assertEqual(dias, 2)
+        self.assertEqual(
+            sum(MetricaDiaria.objects.values_list('total', flat=True)), Observacion.objects.count()
+        )
+        self._comparar()
+
+    def test_cambio_de_proyecto_reagrupa_sus_filas(self):
+        refrescar_metricas_diarias()
+        proyecto = self.vivienda.proyecto
+        proyecto.constructora = crear_constructora('Constructora Nueva')
+        proyecto.save()
+        dias, _ = refrescar_metricas_diarias()
+        self.assertGreater(dias, 0)
+        self.assertEqual(
+            set(MetricaDiaria.objects.values_list('constructora_id', flat=True)), {proyecto.constructora_id}
+        )
+        self._comparar()
+
+    def test_borrado_marca_el_dia(self):
+        refrescar_metricas_diarias()
+        self.assertFalse(DiaPendienteMetrica.objects.exists())
+        Observacion.objects.filter(estado__nombre='Cerrada').first().delete()
+        self._comparar()
+        dias, _ = refrescar_metricas_diarias()
+        self.assertEqual(dias, 1)
+        self.assertFalse(DiaPendienteMetrica.objects.exists())
+        self._comparar()
+
+    def test_cumplimiento_usa_snapshot(self):
+        esperado = get_cumplimiento_plazos_por_constructora()
+        refrescar_metricas_diarias()
+        self.assertEqual(get_cumplimiento_plazos_por_constructora(), esperado)
+
+    def test_snapshot_no_se_usa_para_hoy(self):
+        refrescar_metricas_diarias()
+        hoy = timezone.localdate()
+        consolidadas, recientes = DashboardMetrics(
+            observaciones=Observacion.objects.all(), metricas=metricas_filtradas()
+        )._particion()
+        self.assertFalse(consolidadas.filter(dia=hoy).exists())
+        self.assertTrue(consolidadas.filter(dia__lt=hoy - timedelta(days=1)).exists())
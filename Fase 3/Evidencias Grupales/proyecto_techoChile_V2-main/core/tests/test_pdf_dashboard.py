@@ -0,0 +1,44 @@
+import tempfile
+
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+
+from core.tests.fixtures import crear_catalogos, crear_observacion, crear_proyecto, crear_region, crear_vivienda
+from core.utils.pdf_dashboard import MOTOR_REPORTLAB, renderizar_reportlab
+from core.views_dashboard_pdf import contexto_reporte_dashboard, parametros_reporte
+
+
+class MotoresReportePDFTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cat = crear_catalogos()
+        region, comuna = crear_region('R01')
+        vivienda = crear_vivienda(crear_proyecto('P1', region, comuna, cls.cat['admin']), 'A1', cls.cat['tipologia'])
+        obs = crear_observacion(vivienda, cls.cat)
+        # Aparece en los anexos; el marcado de Paragraph no debe interpretarlo
+        obs.detalle = 'Filtración <baño> & cocina'
+        obs.save()
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(BASE_DIR=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def test_motor_por_defecto_no_cambia_los_parametros(self):
+        self.assertIsNone(parametros_reporte(QueryDict('engine=desconocido'))['engine'])
+        self.assertIsNone(parametros_reporte(QueryDict(''))['engine'])
+        self.assertEqual(parametros_reporte(QueryDict('engine=reportlab'))['engine'], MOTOR_REPORTLAB)
+
+    def test_reportlab_escapa_textos_del_contexto(self):
+        pdf = renderizar_reportlab(contexto_reporte_dashboard(self.cat['admin'], {}))
+        self.assertTrue(pdf.startswith(b'%PDF'))
+
+    def test_cada_motor_tiene_su_archivo(self):
+        self.client.force_login(self.cat['admin'])
+        html = self.client.get('/dashboard/reporte-pdf/', {'periodo': 'Enero'})
+        reportlab = self.client.get('/dashboard/reporte-pdf/', {'periodo': 'Enero', 'engine': 'reportlab'})
+        self.assertEqual(reportlab['Content-Type'], 'application/pdf')
+        self.assertTrue(reportlab.content.startswith(b'%PDF'))
+        self.assertNotEqual(html.content, reportlab.content)
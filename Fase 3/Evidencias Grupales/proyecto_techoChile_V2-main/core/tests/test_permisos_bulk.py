@@ -0,0 +1,55 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Rol, Usuario
+from core.permisos import anotar_permisos_observaciones, puede_editar_observacion, puede_ver_observacion
+from core.tests.fixtures import (
+    crear_catalogos, crear_constructora, crear_observacion, crear_proyecto, crear_region, crear_vivienda,
+)
+from incidencias.models import Observacion
+
+
+class AnotarPermisosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cat = crear_catalogos()
+        region, comuna = crear_region('R01')
+        cls.constructora = crear_constructora('Constructora Uno')
+        propio = crear_proyecto('P1', region, comuna, cls.cat['admin'], constructora=cls.constructora)
+        ajeno = crear_proyecto('P2', region, comuna, cls.cat['admin'], constructora=crear_constructora('Otra'))
+        for i in range(10):
+            crear_observacion(crear_vivienda(propio, f'A{i}', cls.cat['tipologia']), cls.cat)
+            crear_observacion(crear_vivienda(ajeno, f'B{i}', cls.cat['tipologia']), cls.cat)
+        cls.usuario = Usuario.objects.create_user(
+            email='c@test.cl', password='x', nombre='Const', rol=Rol.objects.get_or_create(nombre='CONSTRUCTORA')[0],
+            constructora=cls.constructora,
+        )
+
+    def test_coincide_con_reglas_por_fila(self):
+        usuario = Usuario.objects.select_related('rol', 'constructora').get(pk=self.usuario.pk)
+        anotadas = anotar_permisos_observaciones(usuario, Observacion.objects.order_by('id'))
+        self.assertEqual(sum(o.puede_editar for o in anotadas), 10)
+        for obs in Observacion.objects.order_by('id'):
+            anotada = next(o for o in anotadas if o.pk == obs.pk)
+            self.assertEqual(anotada.puede_editar, puede_editar_observacion(usuario, obs))
+            self.assertEqual(anotada.puede_ver, puede_ver_observacion(usuario, obs))
+            self.assertEqual(anotada.puede_cambiar_estado, anotada.puede_editar)
+
+    def test_consultas_constantes(self):
+        usuario = Usuario.objects.select_related('rol', 'constructora').get(pk=self.usuario.pk)
+        with CaptureQueriesContext(connection) as consultas:
+            anotar_permisos_observaciones(usuario, Observacion.objects.all()[:20])
+        # observaciones + estado + vivienda + beneficiario + proyecto + constructora
+        self.assertLessEqual(len(consultas), 6)
+
+    def test_api_movil(self):
+        self.client.force_login(self.usuario)
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get('/incidencias/movil/api/', {'per_page': 20})
+        datos = respuesta.json()['observaciones']
+        self.assertEqual(len(datos), 10)
+        self.assertTrue(all(o['puede_editar'] and o['puede_cambiar_estado'] and o['puede_ver'] for o in datos))
+        # La constructora de cada fila llega en la consulta principal, no por fila
+        consultas_constructora = [c for c in consultas.captured_queries if 'FROM "core_constructora"' in c['sql']]
+        self.assertLessEqual(len(consultas_constructora), 1)
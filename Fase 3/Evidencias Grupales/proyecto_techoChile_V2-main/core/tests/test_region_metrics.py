@@ -0,0 +1,52 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.tests.fixtures import crear_catalogos, crear_observacion, crear_proyecto, crear_region, crear_vivienda
+from core.utils.region_metrics import get_region_metrics
+
+
+class RegionMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cat = crear_catalogos()
+
+    def _poblar(self, regiones, proyectos_por_region, inicio=0):
+        for r in range(inicio, inicio + regiones):
+            region, comuna = crear_region(f'R{r:02d}', f'Región {r:02d}')
+            for p in range(proyectos_por_region):
+                proyecto = crear_proyecto(f'P{r}-{p}', region, comuna, self.cat['admin'])
+                vivienda = crear_vivienda(proyecto, 'A1', self.cat['tipologia'])
+                crear_vivienda(proyecto, 'A2', self.cat['tipologia'], estado='construccion')
+                crear_observacion(vivienda, self.cat)
+                crear_observacion(vivienda, self.cat, estado='Cerrada', dias_resolucion=2)
+
+    def test_valores_por_region(self):
+        self._poblar(regiones=2, proyectos_por_region=2)
+        crear_region('R99', 'Región sin viviendas')
+        metrics = get_region_metrics()
+        self.assertEqual([m['region'] for m in metrics], ['Región 00', 'Región 01'])
+        primera = metrics[0]
+        self.assertEqual(primera['total_viviendas'], 4)
+        self.assertEqual(primera['entregadas'], 2)
+        self.assertEqual(primera['casos_postventa'], 4)
+        self.assertEqual(primera['promedio_dias'], 2)
+
+    def test_filtro_region(self):
+        self._poblar(regiones=2, proyectos_por_region=1)
+        region_id = get_region_metrics()[1]['region_id']
+        metrics = get_region_metrics(region_id=region_id)
+        self.assertEqual([m['region_id'] for m in metrics], [region_id])
+
+    def test_benchmark_consultas_constantes(self):
+        """La cantidad de consultas no crece con el número de regiones ni de proyectos."""
+        conteos = []
+        inicio = 0
+        for regiones, proyectos in [(1, 1), (4, 3), (8, 5)]:
+            self._poblar(regiones, proyectos, inicio=inicio)
+            inicio += regiones
+            with CaptureQueriesContext(connection) as ctx:
+                metrics = get_region_metrics()
+            conteos.append(len(ctx.captured_queries))
+            self.assertEqual(len(metrics), inicio)
+        self.assertEqual(conteos, [2, 2, 2])
@@ -0,0 +1,76 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.models import Constructora, Rol, Usuario
+from core.utils.rut import filtro_rut, filtro_rut_usuario
+from core.validators import normalizar_rut
+from proyectos.models import Beneficiario
+from reportes.forms import ActaRecepcionForm
+
+
+class RutNormalizadoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.benef = Beneficiario.objects.create(nombre='Ana', apellido_paterno='Pérez', rut='5.852.140-k')
+        cls.admin = Usuario.objects.create_user(
+            email='admin@test.cl', password='x', nombre='Admin', rol=Rol.objects.get_or_create(nombre='ADMINISTRADOR')[0],
+        )
+
+    def test_normalizar(self):
+        self.assertEqual(normalizar_rut('5.852.140-k'), '5852140K')
+        self.assertEqual(normalizar_rut('5852140K'), '5852140K')
+        self.assertEqual(normalizar_rut(' 5852140-K '), '5852140K')
+        self.assertEqual(normalizar_rut(None), '')
+
+    def test_se_mantiene_al_guardar(self):
+        self.assertEqual(self.benef.rut_normalizado, '5852140K')
+        constructora = Constructora.objects.create(nombre='C1', rut='76.543.210-3')
+        self.assertEqual(constructora.rut_normalizado, '765432103')
+        self.benef.rut = '11.111.111-1'
+        self.benef.save()
+        self.assertEqual(Beneficiario.objects.get(pk=self.benef.pk).rut_normalizado, '111111111')
+
+    def test_filtro_rut(self):
+        for texto in ['5852140-K', '5.852.140-k', '5852140k']:
+            self.assertEqual(list(Beneficiario.objects.filter(filtro_rut(texto))), [self.benef])
+        # Un fragmento sigue funcionando como búsqueda parcial
+        self.assertEqual(list(Beneficiario.objects.filter(filtro_rut('852.14'))), [self.benef])
+        self.assertIn('"rut_normalizado" = ', str(Beneficiario.objects.filter(filtro_rut('5852140-K')).query))
+
+    def test_filtro_rut_usuario(self):
+        familia = Rol.objects.get_or_create(nombre='FAMILIA')[0]
+        usuario = Usuario.objects.create_user(email='f@test.cl', password='x', nombre='Ana', rut='5852140k', rol=familia)
+        self.assertEqual(list(Beneficiario.objects.filter(filtro_rut_usuario(usuario))), [self.benef])
+        # Un RUT que normaliza a '' no debe coincidir con los beneficiarios sin RUT
+        Beneficiario.objects.create(nombre='Luis', apellido_paterno='Soto', rut=None)
+        for rut in [' ', '.', None]:
+            usuario.rut = rut
+            usuario.save()
+            self.assertIsNone(filtro_rut_usuario(usuario))
+
+    def test_busqueda_ajax_una_consulta(self):
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(
+                '/maestro/buscar-beneficiario/', {'rut': '5852140k'}, HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+            )
+        self.assertEqual(respuesta.json()['beneficiario']['id'], self.benef.id)
+        sql_beneficiario = [c['sql'] for c in consultas.captured_queries if 'proyectos_beneficiario' in c['sql']]
+        self.assertEqual(len(sql_beneficiario), 1)
+        self.assertIn('rut_normalizado', sql_beneficiario[0])
+
+    def test_rut_repetido_con_otra_escritura(self):
+        # '5852140-K' y '5.852.140-k' son RUTs distintos para la columna única 'rut'
+        Beneficiario.objects.create(nombre='Ana', apellido_paterno='Duplicada', rut='5852140-K')
+        form = ActaRecepcionForm(data={'rut_beneficiario': '5852140k'})
+        self.assertFalse(form.is_valid())
+        self.assertIn('más de un beneficiario', form.errors['rut_beneficiario'][0])
+
+        self.client.force_login(self.admin)
+        respuesta = self.client.get(
+            reverse('reportes:buscar_beneficiario_ajax'), {'rut': '5852140k'}, HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        self.assertFalse(respuesta.json()['success'])
+        self.assertIn('más de un beneficiario', respuesta.json()['error'])
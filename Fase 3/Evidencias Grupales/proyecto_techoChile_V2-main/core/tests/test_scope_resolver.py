@@ -0,0 +1,91 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Rol, Usuario
+from core.permisos import VERSION_ALCANCES, ScopeResolver, filtrar_observaciones_por_rol, filtrar_proyectos_por_rol
+from core.tests.fixtures import (
+    crear_catalogos, crear_constructora, crear_observacion, crear_proyecto, crear_region, crear_vivienda,
+)
+from incidencias.models import Observacion
+from proyectos.models import Beneficiario, Proyecto, Vivienda
+from reportes.models import VersionDatos
+
+
+class ScopeResolverTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cat = crear_catalogos()
+        region, comuna = crear_region('R01')
+        cls.constructora = crear_constructora('Constructora Uno')
+        cls.proyecto = crear_proyecto('P1', region, comuna, cls.cat['admin'], constructora=cls.constructora)
+        cls.otro = crear_proyecto('P2', region, comuna, cls.cat['admin'])
+        benef = Beneficiario.objects.create(nombre='Ana', apellido_paterno='Pérez', rut='11.111.111-1')
+        cls.vivienda = crear_vivienda(cls.proyecto, 'A1', cls.cat['tipologia'], beneficiario=benef)
+        cls.obs = crear_observacion(cls.vivienda, cls.cat)
+        crear_observacion(crear_vivienda(cls.proyecto, 'A2', cls.cat['tipologia']), cls.cat)
+        crear_observacion(crear_vivienda(cls.otro, 'B1', cls.cat['tipologia']), cls.cat)
+        cls.familia = Usuario.objects.create_user(
+            email='f@test.cl', password='x', nombre='Ana', rut='11.111.111-1',
+            rol=Rol.objects.get_or_create(nombre='FAMILIA')[0],
+        )
+        cls.constructor = Usuario.objects.create_user(
+            email='c@test.cl', password='x', nombre='Const', empresa='constructora uno',
+            rol=Rol.objects.get_or_create(nombre='CONSTRUCTORA')[0],
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def _usuario(self, usuario):
+        return Usuario.objects.select_related('rol').get(pk=usuario.pk)
+
+    def test_familia(self):
+        usuario = self._usuario(self.familia)
+        self.assertEqual(list(filtrar_observaciones_por_rol(usuario, Observacion.objects.all())), [self.obs])
+        self.assertEqual(list(filtrar_proyectos_por_rol(usuario, Proyecto.objects.all())), [self.proyecto])
+
+    def test_constructora_legacy(self):
+        usuario = self._usuario(self.constructor)
+        self.assertEqual(filtrar_observaciones_por_rol(usuario, Observacion.objects.all()).count(), 2)
+        self.assertEqual(list(filtrar_proyectos_por_rol(usuario, Proyecto.objects.all())), [self.proyecto])
+
+    def test_alcance_cacheado_entre_requests(self):
+        ScopeResolver.para(self._usuario(self.familia)).alcance
+        usuario = self._usuario(self.familia)
+        with CaptureQueriesContext(connection) as consultas:
+            ScopeResolver.para(usuario).filter_observaciones(Observacion.objects.all())
+        # Solo se lee la versión vigente de los alcances
+        self.assertEqual(len(consultas), 1)
+        self.assertIn('reportes_versiondatos', consultas[0]['sql'])
+
+    def test_version_de_otro_proceso_invalida(self):
+        ScopeResolver.para(self._usuario(self.familia)).alcance
+        # Otro worker reasigna la vivienda: su signal avanza la versión en la base de datos
+        Vivienda.objects.filter(pk=self.vivienda.pk).update(beneficiario=None)
+        VersionDatos.objects.update_or_create(nombre=VERSION_ALCANCES, defaults={'version': 99})
+        self.assertNotIn(self.vivienda.id, ScopeResolver.para(self._usuario(self.familia)).alcance['viviendas'])
+
+    def test_signal_invalida_alcance(self):
+        ScopeResolver.para(self._usuario(self.familia)).alcance
+        nueva = crear_vivienda(self.otro, 'B2', self.cat['tipologia'], beneficiario=None)
+        nueva.familia_beneficiaria = 'Familia de Ana'
+        nueva.save()
+        usuario = self._usuario(self.familia)
+        self.assertIn(nueva.id, ScopeResolver.para(usuario).alcance['viviendas'])
+
+    def test_rut_que_normaliza_a_vacio_no_coincide_con_beneficiarios_sin_rut(self):
+        ajena = crear_vivienda(
+            self.otro, 'B3', self.cat['tipologia'],
+            beneficiario=Beneficiario.objects.create(nombre='Luis', apellido_paterno='Soto', rut=None),
+        )
+        usuario = Usuario.objects.create_user(
+            email='blanco@test.cl', password='x', nombre='Ana', rut=' ',
+            rol=Rol.objects.get_or_create(nombre='FAMILIA')[0],
+        )
+        self.assertEqual(usuario.rut_normalizado, '')
+        viviendas = ScopeResolver.para(self._usuario(usuario)).filter_viviendas(Vivienda.objects.all())
+        # Sin RUT utilizable se usa solo el nombre
+        self.assertNotIn(ajena, viviendas)
+        self.assertIn(self.vivienda, viviendas)
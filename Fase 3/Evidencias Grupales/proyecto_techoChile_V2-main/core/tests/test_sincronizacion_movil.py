@@ -0,0 +1,137 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import Rol, Usuario
+from core.tests.fixtures import (
+    crear_catalogos, crear_constructora, crear_observacion, crear_proyecto, crear_region, crear_vivienda,
+)
+from core.utils.sincronizacion import RETENCION_TOKEN, cambios_desde, codificar_token, decodificar_token
+from incidencias.models import ArchivoAdjuntoObservacion, Observacion, RegistroEliminacion, SeguimientoObservacion
+
+
+class SincronizacionMovilTests(TestCase):
+    URL = '/incidencias/movil/api/cambios/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cat = crear_catalogos()
+        region, comuna = crear_region('R01')
+        cls.constructora = crear_constructora('Constructora Uno')
+        propio = crear_proyecto('P1', region, comuna, cls.cat['admin'], constructora=cls.constructora)
+        ajeno = crear_proyecto('P2', region, comuna, cls.cat['admin'])
+        cls.vivienda = crear_vivienda(propio, 'A1', cls.cat['tipologia'])
+        cls.vivienda_ajena = crear_vivienda(ajeno, 'B1', cls.cat['tipologia'])
+        cls.usuario = Usuario.objects.create_user(
+            email='c@test.cl', password='x', nombre='Const', rol=Rol.objects.get_or_create(nombre='CONSTRUCTORA')[0],
+            constructora=cls.constructora,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+        self.antigua = crear_observacion(self.vivienda, self.cat)
+        hace_una_hora = timezone.now() - timedelta(hours=1)
+        Observacion.objects.filter(pk=self.antigua.pk).update(fecha_ultima_actualizacion=hace_una_hora)
+        self.token = codificar_token(timezone.now() - timedelta(minutes=1))
+
+    def test_sin_token_pide_carga_completa(self):
+        datos = self.client.get(self.URL).json()
+        self.assertTrue(datos['requiere_carga_completa'])
+        self.assertIn('token', datos)
+
+    def test_token_invalido(self):
+        self.assertEqual(self.client.get(self.URL, {'since': '%%%'}).status_code, 400)
+
+    def test_solo_cambios_en_alcance(self):
+        nueva = crear_observacion(self.vivienda, self.cat)
+        crear_observacion(self.vivienda_ajena, self.cat)
+        SeguimientoObservacion.objects.create(observacion=self.antigua, usuario=self.usuario, accion='Comentario')
+        datos = self.client.get(self.URL, {'since': self.token}).json()
+        self.assertEqual([o['id'] for o in datos['observaciones']], [nueva.id])
+        self.assertEqual([s['observacion_id'] for s in datos['seguimientos']], [self.antigua.id])
+        self.assertFalse(datos['has_more'])
+        # Con el nuevo token solo se reenvía lo que cae dentro del margen de seguridad
+        Observacion.objects.update(fecha_ultima_actualizacion=timezone.now() - timedelta(hours=1))
+        SeguimientoObservacion.objects.update(fecha=timezone.now() - timedelta(hours=1))
+        siguiente = self.client.get(self.URL, {'since': datos['token']}).json()
+        self.assertEqual((siguiente['observaciones'], siguiente['seguimientos']), ([], []))
+
+    def test_desactivadas_y_eliminadas(self):
+        self.antigua.activo = False
+        self.antigua.save()
+        eliminada = crear_observacion(self.vivienda, self.cat)
+        eliminada_id = eliminada.id
+        eliminada.delete()
+        crear_observacion(self.vivienda_ajena, self.cat).delete()
+        datos = self.client.get(self.URL, {'since': self.token}).json()
+        self.assertEqual(datos['observaciones_eliminadas'], [self.antigua.id])
+        self.assertEqual(
+            datos['eliminados'],
+            [{'modelo': RegistroEliminacion.MODELO_OBSERVACION, 'objeto_id': eliminada_id, 'observacion_id': eliminada_id}],
+        )
+
+    def test_eliminacion_en_cascada_de_la_vivienda(self):
+        SeguimientoObservacion.objects.create(observacion=self.antigua, usuario=self.usuario, accion='Comentario')
+        eliminados = {
+            (RegistroEliminacion.MODELO_OBSERVACION, self.antigua.id),
+            (RegistroEliminacion.MODELO_SEGUIMIENTO, self.antigua.seguimientos.get().id),
+        }
+        self.vivienda.delete()
+        crear_observacion(self.vivienda_ajena, self.cat).delete()
+        for usuario in (self.usuario, self.cat['admin']):
+            self.client.force_login(usuario)
+            datos = self.client.get(self.URL, {'since': self.token}).json()
+            recibidos = {(t['modelo'], t['objeto_id']) for t in datos['eliminados']}
+            if usuario is self.usuario:
+                self.assertEqual(recibidos, eliminados)
+            else:
+                self.assertLess(eliminados, recibidos)
+
+    def test_purga_tombstones_fuera_de_la_retencion(self):
+        crear_observacion(self.vivienda, self.cat).delete()
+        reciente = crear_observacion(self.vivienda, self.cat)
+        reciente_id = reciente.id
+        reciente.delete()
+        RegistroEliminacion.objects.exclude(objeto_id=reciente_id).update(
+            fecha=timezone.now() - RETENCION_TOKEN - timedelta(days=1)
+        )
+        salida = StringIO()
+        call_command('purgar_registros_eliminacion', stdout=salida)
+        self.assertIn('1 registro(s)', salida.getvalue())
+        self.assertEqual(list(RegistroEliminacion.objects.values_list('objeto_id', flat=True)), [reciente_id])
+
+    def test_pagina_filas_con_la_misma_fecha(self):
+        # Actualizaciones masivas (sincronizar_prioridad_urgente, --upsert) comparten la fecha
+        for _ in range(6):
+            crear_observacion(self.vivienda, self.cat)
+        for i in range(4):
+            SeguimientoObservacion.objects.create(observacion=self.antigua, usuario=self.usuario, accion=f'Acción {i}')
+        misma_fecha = timezone.now() - timedelta(seconds=30)
+        Observacion.objects.update(fecha_ultima_actualizacion=misma_fecha)
+        SeguimientoObservacion.objects.update(fecha=misma_fecha)
+
+        desde, posiciones = decodificar_token(self.token)
+        vistas, seguimientos, paginas = [], [], 0
+        while True:
+            cambios = cambios_desde(
+                desde, Observacion.objects.all(), SeguimientoObservacion.objects.all(),
+                ArchivoAdjuntoObservacion.objects.all(), RegistroEliminacion.objects.all(),
+                posiciones=posiciones, max_por_tipo=3,
+            )
+            paginas += 1
+            vistas += [o.pk for o in cambios['observaciones']]
+            seguimientos += [s.pk for s in cambios['seguimientos']]
+            if not cambios['has_more']:
+                break
+            desde, posiciones = decodificar_token(cambios['token'])
+            self.assertLess(paginas, 5)
+        self.assertEqual(paginas, 3)
+        self.assertEqual(sorted(vistas), sorted(Observacion.objects.values_list('id', flat=True)))
+        self.assertEqual(sorted(seguimientos), sorted(SeguimientoObservacion.objects.values_list('id', flat=True)))
+        # La última página entrega un token de fecha simple
+        self.assertIsNone(decodificar_token(cambios['token'])[1])
@@ -0,0 +1,80 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.context_processors import global_stats_context
+from core.models import Rol, Usuario
+from core.utils.stats_cache import VERSION_ESTADISTICAS
+from proyectos.models import Beneficiario
+from reportes.models import VersionDatos
+from core.tests.fixtures import (
+    crear_catalogos, crear_constructora, crear_observacion, crear_proyecto, crear_region, crear_vivienda,
+)
+
+
+class GlobalStatsCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cat = crear_catalogos()
+        region, comuna = crear_region('R01')
+        cls.constructora = crear_constructora('Constructora Uno')
+        proyecto = crear_proyecto('P1', region, comuna, cls.cat['admin'], constructora=cls.constructora)
+        cls.vivienda = crear_vivienda(proyecto, 'A1', cls.cat['tipologia'])
+        crear_observacion(cls.vivienda, cls.cat)
+        otro = crear_proyecto('P2', region, comuna, cls.cat['admin'])
+        crear_observacion(crear_vivienda(otro, 'B1', cls.cat['tipologia']), cls.cat)
+        cls.usuario_constructora = Usuario.objects.create_user(
+            email='c@test.cl', password='x', nombre='Const', empresa='Constructora Uno',
+            rol=Rol.objects.get_or_create(nombre='CONSTRUCTORA')[0], constructora=cls.constructora,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def _contexto(self, usuario):
+        request = RequestFactory().get('/')
+        request.user = Usuario.objects.select_related('rol').get(pk=usuario.pk)
+        with CaptureQueriesContext(connection) as consultas:
+            contexto = global_stats_context(request)
+        return contexto, len(consultas)
+
+    def test_cache_hit_solo_lee_la_version(self):
+        contexto, consultas = self._contexto(self.cat['admin'])
+        self.assertEqual(contexto, {'total_proyectos': 2, 'viviendas_total': 2, 'obs_total': 2})
+        self.assertEqual(consultas, 4)
+        self.assertEqual(self._contexto(self.cat['admin']), (contexto, 1))
+
+    def test_alcance_constructora(self):
+        contexto, _ = self._contexto(self.usuario_constructora)
+        self.assertEqual(contexto, {'total_proyectos': 1, 'viviendas_total': 1, 'obs_total': 1})
+        self.assertEqual(self._contexto(self.usuario_constructora), (contexto, 1))
+
+    def test_alcance_familia(self):
+        vivienda = crear_vivienda(self.vivienda.proyecto, 'A2', self.cat['tipologia'],
+                                  beneficiario=Beneficiario.objects.create(nombre='Ana', apellido_paterno='Pérez'))
+        crear_observacion(vivienda, self.cat)
+        familia = Usuario.objects.create_user(
+            email='f@test.cl', password='x', nombre='Ana', rol=Rol.objects.get_or_create(nombre='FAMILIA')[0],
+        )
+        contexto, _ = self._contexto(familia)
+        self.assertEqual(contexto, {'total_proyectos': 1, 'viviendas_total': 1, 'obs_total': 1})
+        # Vivienda y contadores comparten la entrada: solo se lee la versión una vez
+        self.assertEqual(self._contexto(familia), (contexto, 1))
+
+    def test_version_de_otro_proceso_invalida(self):
+        # Otro worker guarda una observación: su signal avanza la versión en la base de datos
+        self._contexto(self.cat['admin'])
+        VersionDatos.objects.update_or_create(nombre=VERSION_ESTADISTICAS, defaults={'version': 99})
+        self.assertEqual(self._contexto(self.cat['admin'])[1], 4)
+
+    def test_signals_invalidan(self):
+        self._contexto(self.cat['admin'])
+        self._contexto(self.usuario_constructora)
+        crear_observacion(self.vivienda, self.cat)
+        contexto, consultas = self._contexto(self.cat['admin'])
+        self.assertEqual(contexto['obs_total'], 3)
+        self.assertEqual(consultas, 4)
+        self.assertEqual(self._contexto(self.usuario_constructora)[0]['obs_total'], 2)
+        self.vivienda.delete()
+        self.assertEqual(self._contexto(self.cat['admin'])[0]['viviendas_total'], 1)
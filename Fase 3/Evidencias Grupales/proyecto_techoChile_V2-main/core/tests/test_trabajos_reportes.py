@@ -0,0 +1,95 @@
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import Usuario
+from core.tests.fixtures import crear_catalogos, crear_observacion, crear_proyecto, crear_region, crear_vivienda
+from core.utils.cache_reportes import ruta_absoluta
+from core.utils.trabajos_reportes import MAX_INTENTOS, encolar, recuperar_abandonados, tomar_siguiente
+from reportes.management.commands.procesar_reportes import _bucle_worker
+from reportes.models import TrabajoReporte
+
+
+class TrabajosReportesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cat = crear_catalogos()
+        region, comuna = crear_region('R01')
+        vivienda = crear_vivienda(crear_proyecto('P1', region, comuna, cls.cat['admin']), 'A1', cls.cat['tipologia'])
+        crear_observacion(vivienda, cls.cat)
+        cls.otro = Usuario.objects.create_user(email='otro@test.cl', password='x', nombre='Otro', rol=cls.cat['admin'].rol)
+
+    def setUp(self):
+        self.client.force_login(self.cat['admin'])
+        # Los PDFs y gráficos generados quedan en un directorio temporal
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(BASE_DIR=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def _borrar_archivo(self, reporte):
+        ruta = ruta_absoluta(reporte.ruta_archivo)
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+    def test_pagina_de_espera_encola_sin_duplicar(self):
+        self.client.get('/dashboard/generando-reporte/', {'periodo': 'Enero'})
+        self.client.get('/dashboard/generando-reporte/', {'periodo': 'Enero'})
+        trabajo = TrabajoReporte.objects.get()
+        self.assertEqual((trabajo.estado, trabajo.parametros['periodo']), (TrabajoReporte.PENDIENTE, 'Enero'))
+        estado = self.client.get(f'/dashboard/reporte-pdf/trabajos/{trabajo.pk}/estado/').json()
+        self.assertEqual(estado['estado'], TrabajoReporte.PENDIENTE)
+        self.assertNotIn('url_descarga', estado)
+
+    def test_un_trabajo_lo_toma_un_solo_worker(self):
+        trabajo = encolar(self.cat['admin'], {'region': None})
+        self.assertEqual(tomar_siguiente('w1').pk, trabajo.pk)
+        self.assertIsNone(tomar_siguiente('w2'))
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.worker, trabajo.intentos), (TrabajoReporte.PROCESANDO, 'w1', 1))
+
+    def test_recupera_trabajos_abandonados(self):
+        reintentable = encolar(self.cat['admin'], {'region': '1'})
+        agotado = encolar(self.cat['admin'], {'region': '2'})
+        hace_una_hora = timezone.now() - timedelta(hours=1)
+        TrabajoReporte.objects.filter(pk=reintentable.pk).update(estado=TrabajoReporte.PROCESANDO, fecha_inicio=hace_una_hora, intentos=1)
+        TrabajoReporte.objects.filter(pk=agotado.pk).update(estado=TrabajoReporte.PROCESANDO, fecha_inicio=hace_una_hora, intentos=MAX_INTENTOS)
+        self.assertEqual(recuperar_abandonados(), (1, 1))
+        self.assertEqual(TrabajoReporte.objects.get(pk=reintentable.pk).estado, TrabajoReporte.PENDIENTE)
+        self.assertEqual(TrabajoReporte.objects.get(pk=agotado.pk).estado, TrabajoReporte.ERROR)
+
+    def test_worker_en_ejecucion_recupera_abandonados(self):
+        trabajo = encolar(self.cat['admin'], {'region': None})
+        # El worker que lo tomó se cayó después de que el comando ya había iniciado
+        TrabajoReporte.objects.filter(pk=trabajo.pk).update(
+            estado=TrabajoReporte.PROCESANDO, fecha_inicio=timezone.now() - timedelta(hours=1), intentos=1,
+        )
+        # La primera espera con la cola vacía detiene el bucle
+        with mock.patch('reportes.management.commands.procesar_reportes.time.sleep', side_effect=KeyboardInterrupt):
+            self.assertEqual(_bucle_worker(0, False, 0, timedelta(minutes=30)), 1)
+        trabajo.refresh_from_db()
+        self.addCleanup(self._borrar_archivo, trabajo.reporte)
+        self.assertEqual(trabajo.estado, TrabajoReporte.COMPLETADO, trabajo.error)
+
+    def test_worker_genera_y_se_descarga(self):
+        self.client.get('/dashboard/generando-reporte/')
+        trabajo = TrabajoReporte.objects.get()
+        call_command('procesar_reportes', '--una-vez', stdout=open(os.devnull, 'w'))
+        trabajo.refresh_from_db()
+        self.addCleanup(self._borrar_archivo, trabajo.reporte)
+        self.assertEqual(trabajo.estado, TrabajoReporte.COMPLETADO, trabajo.error)
+
+        estado = self.client.get(f'/dashboard/reporte-pdf/trabajos/{trabajo.pk}/estado/').json()
+        respuesta = self.client.get(estado['url_descarga'])
+        self.assertEqual(respuesta['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(respuesta.streaming_content).startswith(b'%PDF'))
+
+        # Otro usuario no puede consultar ni descargar el trabajo
+        self.client.force_login(self.otro)
+        self.assertEqual(self.client.get(estado['url_descarga']).status_code, 404)
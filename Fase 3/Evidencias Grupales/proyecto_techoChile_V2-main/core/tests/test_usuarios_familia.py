@@ -0,0 +1,75 @@
+import io
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.hashers import check_password
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.models import Rol, Usuario
+from proyectos.models import Beneficiario
+from proyectos.usuarios_familia import provisionar_usuarios_familia, sin_usuario_familia_automatico
+
+RUTS = ['11.111.111-1', '22.222.222-2', '33.333.333-3', '44.444.444-4', '55.555.555-5']
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UsuariosFamiliaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.rol = Rol.objects.create(nombre='FAMILIA')
+
+    def _beneficiario(self, rut, email, **extra):
+        return Beneficiario.objects.create(nombre='Ana', apellido_paterno='Pérez', rut=rut, email=email, **extra)
+
+    def test_el_signal_se_desactiva_dentro_del_bloque(self):
+        with sin_usuario_familia_automatico():
+            self._beneficiario(RUTS[0], 'a@test.cl')
+        self.assertFalse(Usuario.objects.exists())
+        self._beneficiario(RUTS[1], 'b@test.cl')
+        self.assertEqual(Usuario.objects.get().rut, RUTS[1])
+
+    def test_provisiona_en_bloque(self):
+        with sin_usuario_familia_automatico():
+            for i, rut in enumerate(RUTS[:4]):
+                self._beneficiario(rut, f'familia{i}@test.cl', apellido_materno='Soto')
+            self._beneficiario(RUTS[4], 'familia0@test.cl')   # email ya usado en este lote
+            self._beneficiario(None, 'sin-rut@test.cl')
+        Usuario.objects.create_user(email='otra@test.cl', password='x', nombre='Existente', rut=RUTS[3])
+
+        resumen = provisionar_usuarios_familia(workers=2, tamano_lote=2)
+        self.assertEqual((resumen['creados'], resumen['repetidos']), (3, 1))
+
+        usuario = Usuario.objects.get(rut_normalizado='111111111')
+        self.assertEqual((usuario.email, usuario.nombre, usuario.rol), ('familia0@test.cl', 'Ana Pérez Soto', self.rol))
+        self.assertTrue(check_password('111111', usuario.password))
+        self.assertEqual(Usuario.objects.filter(rol=self.rol).count(), 3)
+
+        # El repetido quedó cubierto por la cuenta de su email: una segunda pasada no tiene pendientes
+        salida = io.StringIO()
+        call_command('provisionar_usuarios_familia', '--workers', '1', stdout=salida)
+        self.assertIn('Beneficiarios sin cuenta: 0', salida.getvalue())
+        self.assertIn('0 cuenta(s) FAMILIA creada(s)', salida.getvalue())
+
+    def test_email_con_dominio_en_mayusculas(self):
+        Usuario.objects.create_user(email='ana@techo.cl', password='x', nombre='Existente')
+        with sin_usuario_familia_automatico():
+            self._beneficiario(RUTS[0], 'ana@TECHO.cl')
+            self._beneficiario(RUTS[1], 'otra@test.cl')
+        resumen = provisionar_usuarios_familia(workers=1)
+        self.assertEqual(resumen['creados'], 1)
+        self.assertTrue(Usuario.objects.filter(rut_normalizado='222222222').exists())
+
+    def test_importador_sin_rol_familia(self):
+        from core.tests.test_ingesta_excel import crear_libro
+
+        salida, errores = io.StringIO(), io.StringIO()
+        # Los beneficiarios del Excel no traen email: se simula la falta del rol al provisionar
+        with tempfile.TemporaryDirectory() as directorio, mock.patch(
+            'proyectos.management.commands.importar_beneficiarios.provisionar_usuarios_familia',
+            side_effect=Rol.DoesNotExist,
+        ):
+            ruta = crear_libro(directorio, [['RUT_BENEFICIARIO', 'VDA_FAMILIA'], ['22.222.222-2', 'Familia Nueva']])
+            call_command('importar_beneficiarios', ruta, '--apply', '--create-missing', stdout=salida, stderr=errores)
+        self.assertIn('No existe el rol FAMILIA', errores.getvalue())
+        self.assertTrue(Beneficiario.objects.filter(rut='22222222-2').exists())
@@ -0,0 +1,73 @@
+import io
+import tempfile
+
+import pandas as pd
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from core.tests.test_ingesta_excel import crear_libro
+from core.utils.rut import MOTIVO_DV, MOTIVO_FORMATO, MOTIVO_VACIO, normalizar_ruts, validar_ruts
+from core.validators import clean_rut, normalizar_rut, validar_rut
+from proyectos.models import Beneficiario
+
+RUTS = [
+    '12.345.678-5', '12345678-5', '1-9', '7645123-0', '5.852.140-k', ' 5852140K ', '000012345-6',
+    '12.345.678-0', 'abcdef', '12345678', '123456789-0', '1-2-3', 'K', '-5', 12345678,
+]
+
+
+class ValidarRutsTests(SimpleTestCase):
+    def test_igual_que_validar_rut(self):
+        resultado = validar_ruts(pd.Series(RUTS + [None, '', float('nan')], index=range(10, 28)))
+        self.assertEqual(list(resultado.index), list(range(10, 28)))
+        for valor, fila in zip(RUTS, resultado.itertuples()):
+            try:
+                validar_rut(str(valor))
+                esperado = ''
+            except ValidationError as error:
+                esperado = error.messages[0]
+            self.assertEqual((fila.valido, fila.motivo), (not esperado, esperado), valor)
+            self.assertEqual(fila.rut, clean_rut(str(valor)))
+            self.assertEqual(fila.rut_normalizado, normalizar_rut(str(valor)))
+        self.assertEqual(list(resultado['motivo'][-3:]), [MOTIVO_VACIO] * 3)
+        self.assertEqual(list(resultado['rut_normalizado'][-3:]), [''] * 3)
+
+    def test_motivos_y_listas(self):
+        resultado = validar_ruts(['12.345.678-5', '12.345.678-0', 'abc', None])
+        self.assertEqual(list(resultado['valido']), [True, False, False, False])
+        self.assertEqual(list(resultado['motivo']), ['', MOTIVO_DV, MOTIVO_FORMATO, MOTIVO_VACIO])
+        self.assertEqual(validar_ruts([]).shape, (0, 4))
+        self.assertEqual(list(normalizar_ruts(['5.852.140-k', None])), ['5852140K', ''])
+
+
+class VerificarRutsTests(TestCase):
+    def test_audita_las_columnas_de_rut(self):
+        Beneficiario.objects.create(nombre='Válido', rut='12.345.678-5')
+        Beneficiario.objects.create(nombre='Mismo RUT', rut='12345678-5')
+        Beneficiario.objects.create(nombre='DV', rut='11.111.111-2')
+        desactualizado = Beneficiario.objects.create(nombre='Normalizado', rut='5.852.140-k')
+        Beneficiario.objects.filter(pk=desactualizado.pk).update(rut='7645123-0')
+
+        salida = io.StringIO()
+        with tempfile.NamedTemporaryFile(suffix='.csv') as archivo:
+            call_command('verificar_ruts', '--lote', '2', '--csv', archivo.name, stdout=salida)
+            problemas = pd.read_csv(archivo.name)
+        self.assertIn('Beneficiario: 4 RUT(s) revisados, 4 con problemas', salida.getvalue())
+        self.assertEqual(sorted(problemas['problema']), [
+            'Dígito verificador inválido', 'RUT repetido', 'RUT repetido', 'rut_normalizado desactualizado',
+        ])
+        self.assertIn('Usuario: 0 RUT(s) revisados, 0 con problemas', salida.getvalue())
+
+    def test_importador_omite_ruts_invalidos(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = crear_libro(directorio, [
+                ['RUT_BENEFICIARIO', 'VDA_FAMILIA'],
+                ['11.111.111-2', 'Familia DV'],
+                ['22.222.222-2', 'Familia Nueva'],
+            ])
+            salida = io.StringIO()
+            call_command('importar_beneficiarios', ruta, '--apply', '--create-missing', stdout=salida)
+        self.assertIn('Fila 2: RUT "11111111-2" inválido (Dígito verificador inválido)', salida.getvalue())
+        self.assertIn('RUTs inválidos: 1', salida.getvalue())
+        self.assertEqual(list(Beneficiario.objects.values_list('rut', flat=True)), ['22222222-2'])
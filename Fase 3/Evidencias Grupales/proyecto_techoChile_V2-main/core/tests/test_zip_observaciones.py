@@ -0,0 +1,83 @@
+import csv
+import io
+import os
+import tempfile
+import zipfile
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.models import Rol, Usuario
+from core.tests.fixtures import (
+    crear_catalogos, crear_constructora, crear_observacion, crear_proyecto, crear_region, crear_vivienda,
+)
+from incidencias.models import ArchivoAdjuntoObservacion
+
+MEDIA = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA)
+class ZipObservacionesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cat = crear_catalogos()
+        region, comuna = crear_region('R01')
+        cls.proyecto = crear_proyecto('LC1', region, comuna, cls.cat['admin'], constructora=crear_constructora('Constructora Uno'))
+        otro = crear_proyecto('P2', region, comuna, cls.cat['admin'])
+        cls.obs = crear_observacion(crear_vivienda(cls.proyecto, 'A1', cls.cat['tipologia']), cls.cat)
+        cls.obs.archivo_adjunto.save('plano.pdf', ContentFile(b'%PDF plano'))
+        for nombre, contenido in [('foto 1.jpg', b'jpg-1'), ('foto/2.jpg', b'jpg-2' * 40000)]:
+            adjunto = ArchivoAdjuntoObservacion(observacion=cls.obs, nombre_original=nombre, subido_por=cls.cat['admin'])
+            adjunto.archivo.save('foto.jpg', ContentFile(contenido))
+        cls.sin_archivos = crear_observacion(crear_vivienda(cls.proyecto, 'A2', cls.cat['tipologia']), cls.cat)
+        perdido = crear_observacion(crear_vivienda(otro, 'B1', cls.cat['tipologia']), cls.cat)
+        perdido.archivo_adjunto.name = 'observaciones/no-existe.pdf'
+        perdido.save()
+        cls.constructor = Usuario.objects.create_user(
+            email='c@test.cl', password='x', nombre='Const', empresa='constructora uno',
+            rol=Rol.objects.get_or_create(nombre='CONSTRUCTORA')[0],
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        import shutil
+        shutil.rmtree(MEDIA, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def _zip(self, respuesta):
+        self.assertEqual(respuesta['Content-Type'], 'application/zip')
+        return zipfile.ZipFile(io.BytesIO(b''.join(respuesta.streaming_content)))
+
+    def _manifiesto(self, archivo):
+        return list(csv.reader(io.StringIO(archivo.read('manifiesto.csv').decode('utf-8-sig'))))[1:]
+
+    def test_manifiesto_y_archivos(self):
+        self.client.force_login(self.cat['admin'])
+        with self._zip(self.client.get('/reportes/observaciones/zip/')) as archivo:
+            filas = self._manifiesto(archivo)
+            self.assertEqual([(f[0], f[8]) for f in filas], [
+                (str(self.obs.pk), 'Observación'), (str(self.obs.pk), 'Adjunto'), (str(self.obs.pk), 'Adjunto'),
+                (str(self.sin_archivos.pk), ''), (filas[-1][0], 'Observación'),
+            ])
+            self.assertEqual(archivo.read(filas[0][9]), b'%PDF plano')
+            self.assertEqual(archivo.read(filas[2][9]), b'jpg-2' * 40000)
+            self.assertEqual(filas[2][10], 'foto/2.jpg')
+            self.assertIn('no-existe.pdf', archivo.read('ERRORES.txt').decode())
+
+    def test_respeta_el_alcance_del_rol(self):
+        self.client.force_login(self.constructor)
+        with self._zip(self.client.get('/reportes/observaciones/zip/')) as archivo:
+            self.assertEqual({f[1] for f in self._manifiesto(archivo)}, {'LC1'})
+            self.assertNotIn('ERRORES.txt', archivo.namelist())
+
+    def test_comando(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            salida = os.path.join(directorio, 'obs.zip')
+            call_command('exportar_observaciones_zip', '--proyecto', 'LC1', '--salida', salida, stdout=io.StringIO())
+            with zipfile.ZipFile(salida) as archivo:
+                self.assertEqual(len(archivo.namelist()), 4)
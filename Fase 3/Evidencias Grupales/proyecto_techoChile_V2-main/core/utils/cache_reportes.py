@@ -0,0 +1,194 @@
+"""
+Caché de reportes generados, direccionada por contenido.
+
+Cada archivo se identifica por el hash de:
+
+- el tipo de reporte,
+- los filtros normalizados,
+- el alcance del rol del solicitante (core.permisos.ScopeResolver),
+- la versión de los datos (reportes.VersionDatos),
+- el día en curso (vencimientos y cumplimiento se calculan contra hoy).
+
+Dos usuarios con el mismo alcance que piden los mismos filtros reciben el
+mismo archivo, y cualquier escritura en los modelos que alimentan los
+reportes (ver core.signals) incrementa la versión, con lo que el siguiente
+pedido genera un reporte nuevo.
+
+Los archivos quedan en ``reportes_generados/<generación>/``, donde la
+generación es la versión de datos más el día (``v<versión>-<AAAAMMDD>``).
+Al escribir un archivo nuevo se borran las generaciones anteriores y sus
+ReporteGenerado: su contenido ya no se vuelve a servir.
+
+``version_datos`` / ``incrementar_version_datos`` aceptan el nombre del
+contador: la caché del navbar (core.utils.stats_cache) y la de alcances
+(core.permisos) usan sus propios contadores en la misma tabla, así la
+invalidación llega a todos los procesos aunque la caché sea local.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+VERSION_REPORTES = 'reportes'
+DIRECTORIO = 'reportes_generados'
+PATRON_GENERACION = re.compile(r'^v(\d+)-(\d{8})$')
+
+
+def version_datos(nombre=VERSION_REPORTES):
+    from reportes.models import VersionDatos
+
+    return VersionDatos.objects.filter(nombre=nombre).values_list('version', flat=True).first() or 0
+
+
+def incrementar_version_datos(nombre=VERSION_REPORTES):
+    from reportes.models import VersionDatos
+
+    actualizadas = VersionDatos.objects.filter(nombre=nombre).update(
+        version=F('version') + 1, fecha_actualizacion=timezone.now(),
+    )
+    if not actualizadas:
+        VersionDatos.objects.get_or_create(nombre=nombre)
+
+
+def fecha_version_datos(nombre=VERSION_REPORTES):
+    """Fecha del último cambio del contador, o None si aún no existe."""
+    from reportes.models import VersionDatos
+
+    return VersionDatos.objects.filter(nombre=nombre).values_list('fecha_actualizacion', flat=True).first()
+
+
+def normalizar_parametros(parametros):
+    """Quita espacios y trata los valores vacíos como ausentes."""
+    normalizados = {}
+    for clave, valor in parametros.items():
+        if isinstance(valor, str):
+            valor = valor.strip()
+        if valor not in (None, ''):
+            normalizados[clave] = valor
+    return normalizados
+
+
+def _alcance(usuario):
+    from core.permisos import ScopeResolver
+
+    if usuario is None or not usuario.is_authenticated:
+        return {'tipo': 'ANONIMO'}
+    alcance = ScopeResolver.para(usuario).alcance
+    return {clave: sorted(valor) if isinstance(valor, list) else valor for clave, valor in alcance.items()}
+
+
+def clave_reporte(tipo, usuario, parametros, generacion_actual=None):
+    contenido = {
+        'tipo': tipo,
+        'parametros': normalizar_parametros(parametros),
+        'alcance': _alcance(usuario),
+        # Versión de datos y día en curso
+        'generacion': generacion_actual or generacion(),
+    }
+    crudo = json.dumps(contenido, sort_keys=True, default=str)
+    return hashlib.sha256(crudo.encode('utf-8')).hexdigest()
+
+
+def ruta_absoluta(ruta_archivo):
+    return os.path.join(settings.BASE_DIR, ruta_archivo)
+
+
+def buscar(clave):
+    """ReporteGenerado vigente para ``clave``, o None si no existe o su archivo se borró."""
+    from reportes.models import ReporteGenerado
+
+    reporte = ReporteGenerado.objects.filter(clave_contenido=clave).first()
+    if reporte and os.path.exists(ruta_absoluta(reporte.ruta_archivo)):
+        return reporte
+    return None
+
+
+def generacion():
+    """Directorio (dentro de DIRECTORIO) de los archivos generados con los datos y el día actuales."""
+    return f'v{version_datos()}-{timezone.localdate():%Y%m%d}'
+
+
+def _orden_generacion(nombre):
+    version, fecha = PATRON_GENERACION.match(nombre).groups()
+    return int(version), fecha
+
+
+def purgar_generaciones_anteriores(actual):
+    """
+    Borra los archivos de generaciones anteriores a ``actual`` y los
+    ReporteGenerado que apuntan a ellos. Un proceso que aún escribe con una
+    versión vieja nunca borra generaciones más nuevas que la suya.
+    """
+    from reportes.models import ReporteGenerado
+
+    raiz = ruta_absoluta(DIRECTORIO)
+    if not os.path.isdir(raiz):
+        return
+    anteriores = [
+        nombre for nombre in os.listdir(raiz)
+        if PATRON_GENERACION.match(nombre) and _orden_generacion(nombre) < _orden_generacion(actual)
+    ]
+    for nombre in anteriores:
+        ReporteGenerado.objects.filter(
+            clave_contenido__isnull=False, ruta_archivo__startswith=os.path.join(DIRECTORIO, nombre, ''),
+        ).delete()
+        shutil.rmtree(os.path.join(raiz, nombre), ignore_errors=True)
+
+
+def ruta_reporte(clave, extension, generacion_actual=None):
+    """Ruta (relativa a BASE_DIR) del archivo para ``clave``."""
+    return os.path.join(DIRECTORIO, generacion_actual or generacion(), f'{clave}.{extension}')
+
+
+def escribir_atomico(ruta_archivo, escribir):
+    """
+    Llama a ``escribir(archivo)`` sobre un temporal en el mismo directorio y
+    lo renombra al destino: nunca se sirve un archivo a medio escribir, y si
+    dos procesos generan el mismo contenido el último reemplazo es idéntico.
+    """
+    destino = ruta_absoluta(ruta_archivo)
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(destino), suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as f:
+            escribir(f)
+        os.replace(temporal, destino)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    return destino
+
+
+def guardar(clave, contenido, usuario, nombre_archivo, filtros, extension='pdf'):
+    """
+    Escribe el archivo en ``reportes_generados/<generación>/<clave>.<extension>``
+    y lo registra. Si otro proceso generó el mismo contenido en paralelo, se
+    retorna su registro (el archivo es idéntico).
+    """
+    from reportes.models import ReporteGenerado
+
+    generacion_actual = generacion()
+    ruta_archivo = ruta_reporte(clave, extension, generacion_actual)
+    escribir_atomico(ruta_archivo, lambda f: f.write(contenido))
+    purgar_generaciones_anteriores(generacion_actual)
+
+    try:
+        with transaction.atomic():
+            reporte, _ = ReporteGenerado.objects.update_or_create(
+                clave_contenido=clave,
+                defaults={
+                    'usuario': usuario, 'nombre_archivo': nombre_archivo,
+                    'ruta_archivo': ruta_archivo, 'filtros': filtros,
+                },
+            )
+    except IntegrityError:
+        reporte = ReporteGenerado.objects.get(clave_contenido=clave)
+    return reporte
@@ -1,6 +1,6 @@
-from django.db.models import Count, Q, F
+from django.db.models import Count, Q, F, Sum
 from core.models import Constructora
-from proyectos.models import Proyecto, Vivienda
+from proyectos.models import Proyecto
 from incidencias.models import Observacion
 
 def get_cumplimiento_plazos_por_constructora(region_id=None, estado=None, fecha_inicio=None, fecha_fin=None):
@@ -8,8 +8,10 @@ def get_cumplimiento_plazos_por_constructora(region_id=None, estado=None, fecha_
     Retorna un diccionario con el porcentaje de cumplimiento de plazos por constructora:
     Cumplimiento = (observaciones cerradas antes de la fecha de vencimiento / total observaciones cerradas) * 100
     Permite filtrar por región, estado, fechas.
+    Las observaciones cerradas de días ya consolidados se leen de MetricaDiaria.
     """
     from django.utils import timezone
+    from core.utils.metricas_diarias import metricas_filtradas, particionar
     today = timezone.now().date()
     proyectos = Proyecto.objects.all()
     if region_id:
@@ -20,30 +22,47 @@ def get_cumplimiento_plazos_por_constructora(region_id=None, estado=None, fecha_
         proyectos = proyectos.filter(fecha_creacion__date__gte=fecha_inicio)
     if fecha_fin:
         proyectos = proyectos.filter(fecha_creacion__date__lte=fecha_fin)
-    viviendas = Vivienda.objects.filter(proyecto__in=proyectos)
-    obs_cerradas = Observacion.objects.filter(
-        vivienda__in=viviendas,
-        estado__nombre='Cerrada',
-        fecha_cierre__isnull=False,
-        fecha_vencimiento__isnull=False
-    )
-    obs_abiertas = Observacion.objects.filter(
-        vivienda__in=viviendas,
-        estado__nombre='Abierta',
-        fecha_vencimiento__isnull=False
-    )
+    obs_qs = Observacion.objects.filter(vivienda__proyecto__in=proyectos)
+    metricas = metricas_filtradas(proyectos=proyectos, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
     if estado:
-        obs_cerradas = obs_cerradas.filter(estado=estado)
-        obs_abiertas = obs_abiertas.filter(estado=estado)
+        obs_qs = obs_qs.filter(estado=estado)
+        metricas = metricas.filter(estado=estado)
     if fecha_inicio:
-        obs_cerradas = obs_cerradas.filter(fecha_creacion__date__gte=fecha_inicio)
-        obs_abiertas = obs_abiertas.filter(fecha_creacion__date__gte=fecha_inicio)
+        obs_qs = obs_qs.filter(fecha_creacion__date__gte=fecha_inicio)
     if fecha_fin:
-        obs_cerradas = obs_cerradas.filter(fecha_creacion__date__lte=fecha_fin)
-        obs_abiertas = obs_abiertas.filter(fecha_creacion__date__lte=fecha_fin)
-    total = obs_cerradas.count() + obs_abiertas.count()
-    en_plazo_cerradas = obs_cerradas.filter(fecha_cierre__date__lte=F('fecha_vencimiento')).count()
-    en_plazo_abiertas = obs_abiertas.filter(fecha_vencimiento__gt=today).count()
-    en_plazo = en_plazo_cerradas + en_plazo_abiertas
+        obs_qs = obs_qs.filter(fecha_creacion__date__lte=fecha_fin)
+
+    q_cerradas = Q(estado__nombre='Cerrada', fecha_cierre__isnull=False, fecha_vencimiento__isnull=False)
+    q_cerradas_en_plazo = q_cerradas & Q(fecha_cierre__date__lte=F('fecha_vencimiento'))
+    q_abiertas = Q(estado__nombre='Abierta', fecha_vencimiento__isnull=False)
+
+    particion = particionar(obs_qs, metricas)
+    if particion is None:
+        datos = obs_qs.aggregate(
+            cerradas=Count('id', filter=q_cerradas),
+            cerradas_en_plazo=Count('id', filter=q_cerradas_en_plazo),
+            abiertas=Count('id', filter=q_abiertas),
+            abiertas_en_plazo=Count('id', filter=q_abiertas & Q(fecha_vencimiento__gt=today)),
+        )
+    else:
+        consolidadas, recientes = particion
+        hist = consolidadas.aggregate(
+            cerradas=Sum('cerradas_con_vencimiento', filter=Q(estado__nombre='Cerrada')),
+            en_plazo=Sum('cerradas_en_plazo', filter=Q(estado__nombre='Cerrada')),
+        )
+        crudo = recientes.aggregate(
+            cerradas=Count('id', filter=q_cerradas),
+            cerradas_en_plazo=Count('id', filter=q_cerradas_en_plazo),
+        )
+        # Las abiertas dependen de la fecha actual: siempre sobre datos vivos
+        datos = obs_qs.aggregate(
+            abiertas=Count('id', filter=q_abiertas),
+            abiertas_en_plazo=Count('id', filter=q_abiertas & Q(fecha_vencimiento__gt=today)),
+        )
+        datos['cerradas'] = (hist['cerradas'] or 0) + crudo['cerradas']
+        datos['cerradas_en_plazo'] = (hist['en_plazo'] or 0) + crudo['cerradas_en_plazo']
+
+    total = datos['cerradas'] + datos['abiertas']
+    en_plazo = datos['cerradas_en_plazo'] + datos['abiertas_en_plazo']
     porcentaje = int((en_plazo / total) * 100) if total > 0 else 0
     return {'global': porcentaje}
@@ -0,0 +1,46 @@
+"""
+Paginación por cursor (keyset) sobre (fecha_creacion, id).
+
+A diferencia de Paginator, no ejecuta COUNT(*) ni OFFSET: cada página filtra
+por la última fila entregada, por lo que la página N cuesta lo mismo que la 1.
+El cursor es opaco para el cliente (base64 de "fecha_iso|id").
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+ORDEN_CURSOR = ('-fecha_creacion', '-id')
+
+
+def codificar_cursor(fecha, pk):
+    crudo = f'{fecha.isoformat()}|{pk}'.encode('utf-8')
+    return base64.urlsafe_b64encode(crudo).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Retorna (fecha, id); lanza ValueError si el cursor no es válido."""
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        fecha, pk = base64.urlsafe_b64decode(cursor + relleno).decode('utf-8').split('|')
+        return datetime.fromisoformat(fecha), int(pk)
+    except (TypeError, UnicodeDecodeError, ValueError) as e:
+        raise ValueError('Cursor inválido') from e
+
+
+def paginar_por_cursor(queryset, cursor=None, por_pagina=20):
+    """
+    Retorna (filas, siguiente_cursor) ordenando por ORDEN_CURSOR.
+    ``siguiente_cursor`` es None cuando no hay más resultados.
+    """
+    queryset = queryset.order_by(*ORDEN_CURSOR)
+    if cursor:
+        fecha, pk = decodificar_cursor(cursor)
+        queryset = queryset.filter(Q(fecha_creacion__lt=fecha) | Q(fecha_creacion=fecha, id__lt=pk))
+    filas = list(queryset[:por_pagina + 1])
+    siguiente = None
+    if len(filas) > por_pagina:
+        filas = filas[:por_pagina]
+        ultima = filas[-1]
+        siguiente = codificar_cursor(ultima.fecha_creacion, ultima.pk)
+    return filas, siguiente
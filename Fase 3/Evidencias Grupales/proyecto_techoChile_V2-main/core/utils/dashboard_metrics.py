@@ -0,0 +1,350 @@
+"""
+Servicio de métricas para el dashboard y sus reportes (PDF / Excel).
+
+Calcula el bloque completo de KPIs con agregaciones condicionales
+(Count/Avg con filter=Q(...)), de modo que cada página ejecuta un número
+fijo y pequeño de consultas sin importar el volumen de observaciones.
+Si se entrega un QuerySet de MetricaDiaria equivalente, los días ya
+consolidados se leen del snapshot y solo hoy (y los días modificados desde
+el último refresco) se calculan sobre observaciones crudas.
+"""
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional
+
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+ESTADO_ABIERTA = 'Abierta'
+ESTADO_CERRADA = 'Cerrada'
+
+DURACION_RESOLUCION = ExpressionWrapper(F('fecha_cierre') - F('fecha_creacion'), output_field=DurationField())
+Q_CERRADA_CON_FECHAS = Q(estado__nombre=ESTADO_CERRADA, fecha_cierre__isnull=False, fecha_creacion__isnull=False)
+
+
+def duracion_a_dias(duracion):
+    """Convierte un timedelta promedio a días enteros (None si no hay dato)."""
+    if duracion is None:
+        return None
+    return int(duracion.total_seconds() // 86400)
+
+
+def promedio_en_dias(duracion_total, cantidad):
+    """Promedio en días a partir de una suma de duraciones y su cantidad."""
+    if not duracion_total or not cantidad:
+        return None
+    return duracion_a_dias(duracion_total / cantidad)
+
+
+def _sumar(a, b):
+    """Suma dos agregados que pueden venir vacíos (None)."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return a + b
+
+
+def _combinar(grupos, campos, clave, orden):
+    """Suma filas agrupadas provenientes del snapshot y de datos crudos."""
+    combinadas = {}
+    for grupo in grupos:
+        for fila in grupo:
+            k = clave(fila)
+            if k not in combinadas:
+                combinadas[k] = dict(fila)
+                continue
+            destino = combinadas[k]
+            for campo in campos:
+                destino[campo] = _sumar(destino[campo], fila[campo])
+    for fila in combinadas.values():
+        for campo in campos:
+            if fila[campo] is None and campo != 'duracion':
+                fila[campo] = 0
+    return sorted(combinadas.values(), key=orden)
+
+
+def _mes(valor):
+    """Normaliza el resultado de TruncMonth (date o datetime) a date."""
+    return valor.date() if hasattr(valor, 'date') else valor
+
+
+def porcentaje(parte, total):
+    return round((parte / total) * 100, 1) if total else 0
+
+
+@dataclass
+class ResumenDashboard:
+    """Resultado tipado del bloque de KPIs del dashboard."""
+    total_proyectos: int = 0
+    viviendas_total: int = 0
+    viviendas_entregadas: int = 0
+    viviendas_asignadas: int = 0
+    obs_total: int = 0
+    obs_abiertas: int = 0
+    obs_cerradas: int = 0
+    obs_urgentes: int = 0
+    obs_vencidas: int = 0
+    tiempo_promedio_resolucion: Optional[int] = None
+
+    @property
+    def porc_cerradas(self):
+        return porcentaje(self.obs_cerradas, self.obs_total)
+
+    @property
+    def porc_abiertas(self):
+        return porcentaje(self.obs_abiertas, self.obs_total)
+
+    @property
+    def porc_vencidas(self):
+        return porcentaje(self.obs_vencidas, self.obs_total)
+
+    @property
+    def porc_viviendas_entregadas(self):
+        return porcentaje(self.viviendas_entregadas, self.viviendas_total)
+
+    @property
+    def porc_viviendas_asignadas(self):
+        return porcentaje(self.viviendas_asignadas, self.viviendas_total)
+
+    def as_context(self):
+        """Claves que consume la plantilla dashboard/index.html."""
+        return {
+            'total_proyectos': self.total_proyectos,
+            'viviendas_total': self.viviendas_total,
+            'viviendas_entregadas': self.viviendas_entregadas,
+            'viviendas_asignadas': self.viviendas_asignadas,
+            'obs_total': self.obs_total,
+            'obs_abiertas': self.obs_abiertas,
+            'obs_cerradas': self.obs_cerradas,
+            'obs_urgentes': self.obs_urgentes,
+            'obs_vencidas': self.obs_vencidas,
+            'porc_cerradas': self.porc_cerradas,
+            'porc_abiertas': self.porc_abiertas,
+            'porc_vencidas': self.porc_vencidas,
+        }
+
+
+class DashboardMetrics:
+    """
+    Calcula las métricas del dashboard a partir de querysets ya filtrados
+    (por rol, región y fechas).
+
+    Uso:
+        metrics = DashboardMetrics(proyectos=proyectos_qs, viviendas=viviendas_qs, observaciones=obs_qs)
+        resumen = metrics.resumen()          # 3 consultas como máximo
+        tipos = metrics.observaciones_por_tipo()
+
+    ``metricas`` (opcional) es un QuerySet de reportes.MetricaDiaria con los
+    mismos filtros que ``observaciones`` (proyecto, región, fechas por ``dia``).
+    """
+
+    def __init__(self, proyectos=None, viviendas=None, observaciones=None, metricas=None):
+        self.proyectos = proyectos
+        self.viviendas = viviendas
+        self.observaciones = observaciones
+        self.metricas = metricas
+
+    def _particion(self):
+        if self.metricas is None or self.observaciones is None:
+            return None
+        if not hasattr(self, '_particion_cache'):
+            from core.utils.metricas_diarias import particionar
+            self._particion_cache = particionar(self.observaciones, self.metricas)
+        return self._particion_cache
+
+    def resumen(self, hoy=None):
+        hoy = hoy or date.today()
+        resultado = ResumenDashboard()
+
+        if self.proyectos is not None:
+            resultado.total_proyectos = self.proyectos.count()
+
+        if self.viviendas is not None:
+            datos = self.viviendas.aggregate(
+                total=Count('id', filter=Q(activa=True)),
+                entregadas=Count('id', filter=Q(estado='entregada')),
+                asignadas=Count('id', filter=Q(activa=True, beneficiario__isnull=False)),
+            )
+            resultado.viviendas_total = datos['total']
+            resultado.viviendas_entregadas = datos['entregadas']
+            resultado.viviendas_asignadas = datos['asignadas']
+
+        if self.observaciones is None:
+            return resultado
+
+        abierta = Q(estado__nombre=ESTADO_ABIERTA)
+        particion = self._particion()
+        if particion is None:
+            datos = self.observaciones.aggregate(
+                total=Count('id'),
+                abiertas=Count('id', filter=abierta),
+                cerradas=Count('id', filter=Q(estado__nombre=ESTADO_CERRADA)),
+                urgentes=Count('id', filter=abierta & Q(es_urgente=True)),
+                vencidas=Count('id', filter=abierta & Q(fecha_vencimiento__lt=hoy)),
+                promedio=Avg(DURACION_RESOLUCION, filter=Q_CERRADA_CON_FECHAS),
+            )
+            tiempo_promedio = duracion_a_dias(datos['promedio'])
+        else:
+            consolidadas, recientes = particion
+            cerrada = Q(estado__nombre=ESTADO_CERRADA)
+            hist = consolidadas.aggregate(
+                observaciones=Sum('total'),
+                abiertas=Sum('total', filter=abierta),
+                cerradas=Sum('total', filter=cerrada),
+                urgentes_abiertas=Sum('urgentes', filter=abierta),
+                cerradas_con_fecha=Sum('con_cierre', filter=cerrada),
+                duracion=Sum('duracion_resolucion', filter=cerrada),
+            )
+            crudo = recientes.aggregate(
+                observaciones=Count('id'),
+                abiertas=Count('id', filter=abierta),
+                cerradas=Count('id', filter=cerrada),
+                urgentes_abiertas=Count('id', filter=abierta & Q(es_urgente=True)),
+                cerradas_con_fecha=Count('id', filter=Q_CERRADA_CON_FECHAS),
+                duracion=Sum(DURACION_RESOLUCION, filter=Q_CERRADA_CON_FECHAS),
+            )
+            suma = {k: _sumar(hist[k], crudo[k]) for k in hist}
+            datos = {
+                'total': suma['observaciones'] or 0,
+                'abiertas': suma['abiertas'] or 0,
+                'cerradas': suma['cerradas'] or 0,
+                'urgentes': suma['urgentes_abiertas'] or 0,
+                # El vencimiento depende de la fecha actual: se cuenta siempre sobre datos vivos
+                'vencidas': self.observaciones.filter(abierta, fecha_vencimiento__lt=hoy).count(),
+            }
+            tiempo_promedio = promedio_en_dias(suma['duracion'], suma['cerradas_con_fecha'])
+
+        resultado.obs_total = datos['total']
+        resultado.obs_abiertas = datos['abiertas']
+        resultado.obs_cerradas = datos['cerradas']
+        resultado.obs_urgentes = datos['urgentes']
+        resultado.obs_vencidas = datos['vencidas']
+        resultado.tiempo_promedio_resolucion = tiempo_promedio
+        return resultado
+
+    def estados_vivienda(self):
+        """Cantidad de viviendas por estado, de mayor a menor."""
+        return self.viviendas.values('estado').annotate(cantidad=Count('id')).order_by('-cantidad')
+
+    def observaciones_por_tipo(self):
+        """Totales, cerradas, pendientes y tiempo promedio (timedelta) por tipo de observación."""
+        particion = self._particion()
+        if particion is None:
+            return self.observaciones.values('tipo__nombre').annotate(
+                totales=Count('id'),
+                cerrados=Count('id', filter=Q(estado__nombre=ESTADO_CERRADA)),
+                pendientes=Count('id', filter=Q(estado__nombre=ESTADO_ABIERTA)),
+                tiempo_promedio=Avg(DURACION_RESOLUCION, filter=Q_CERRADA_CON_FECHAS),
+            ).order_by('-totales')
+
+        consolidadas, recientes = particion
+        cerrada = Q(estado__nombre=ESTADO_CERRADA)
+        hist = consolidadas.values('tipo__nombre').annotate(
+            totales=Sum('total'),
+            cerrados=Sum('total', filter=cerrada),
+            pendientes=Sum('total', filter=Q(estado__nombre=ESTADO_ABIERTA)),
+            con_cierre=Sum('con_cierre', filter=cerrada),
+            duracion=Sum('duracion_resolucion', filter=cerrada),
+        ).order_by()
+        crudo = recientes.values('tipo__nombre').annotate(
+            totales=Count('id'),
+            cerrados=Count('id', filter=cerrada),
+            pendientes=Count('id', filter=Q(estado__nombre=ESTADO_ABIERTA)),
+            con_cierre=Count('id', filter=Q_CERRADA_CON_FECHAS),
+            duracion=Sum(DURACION_RESOLUCION, filter=Q_CERRADA_CON_FECHAS),
+        ).order_by()
+        filas = _combinar(
+            (hist, crudo), ('totales', 'cerrados', 'pendientes', 'con_cierre', 'duracion'),
+            clave=lambda fila: fila['tipo__nombre'],
+            orden=lambda fila: -fila['totales'],
+        )
+        for fila in filas:
+            fila['tiempo_promedio'] = fila['duracion'] / fila['con_cierre'] if fila['duracion'] and fila['con_cierre'] else None
+        return filas
+
+    def tendencia_mensual(self):
+        """Observaciones abiertas/cerradas agrupadas por mes de creación."""
+        particion = self._particion()
+        if particion is None:
+            return self.observaciones.annotate(mes=TruncMonth('fecha_creacion')).values('mes').annotate(
+                abiertos=Count('id', filter=Q(estado__nombre=ESTADO_ABIERTA)),
+                cerrados=Count('id', filter=Q(estado__nombre=ESTADO_CERRADA)),
+            ).order_by('mes')
+
+        consolidadas, recientes = particion
+        hist = consolidadas.annotate(mes=TruncMonth('dia')).values('mes').annotate(
+            abiertos=Sum('total', filter=Q(estado__nombre=ESTADO_ABIERTA)),
+            cerrados=Sum('total', filter=Q(estado__nombre=ESTADO_CERRADA)),
+        ).order_by()
+        crudo = recientes.annotate(mes=TruncMonth('fecha_creacion')).values('mes').annotate(
+            abiertos=Count('id', filter=Q(estado__nombre=ESTADO_ABIERTA)),
+            cerrados=Count('id', filter=Q(estado__nombre=ESTADO_CERRADA)),
+        ).order_by()
+        filas = _combinar(
+            (hist, crudo), ('abiertos', 'cerrados'),
+            clave=lambda fila: _mes(fila['mes']),
+            orden=lambda fila: _mes(fila['mes']),
+        )
+        for fila in filas:
+            fila['mes'] = _mes(fila['mes'])
+        return filas
+
+    def cerradas_por_mes(self):
+        """Observaciones cerradas agrupadas por mes de cierre."""
+        return (
+            self.observaciones
+            .filter(estado__nombre=ESTADO_CERRADA)
+            .annotate(mes=TruncMonth('fecha_cierre'))
+            .values('mes')
+            .annotate(total=Count('id'))
+            .order_by('mes')
+        )
+
+
+ROLES_EQUIPO = ('TECNICO', 'COORDINADOR')
+
+
+def nombre_usuario(nombre, apellido_paterno, apellido_materno, email):
+    """Nombre para mostrar de un Usuario a partir de sus campos (no tiene get_full_name)."""
+    completo = ' '.join(parte for parte in (nombre, apellido_paterno, apellido_materno) if parte)
+    return completo or email or 'Usuario'
+
+
+def desempeno_equipo(observaciones):
+    """
+    Asignadas, cerradas, tasa de cierre (%) y tiempo promedio de resolución
+    (días, o None) por cada técnico/coordinador activo, sobre ``observaciones``
+    ya filtradas por región, fechas o rol.
+
+    Dos consultas sin importar el tamaño del equipo: la lista de técnicos (para
+    incluir a los que no tienen casos) y una agregación agrupada por ``asignado_a``.
+    """
+    from django.contrib.auth import get_user_model
+
+    tecnicos = get_user_model().objects.filter(is_active=True, rol__nombre__in=ROLES_EQUIPO).order_by('nombre', 'id').values_list(
+        'id', 'nombre', 'apellido_paterno', 'apellido_materno', 'email',
+    )
+    por_tecnico = {
+        fila['asignado_a']: fila
+        for fila in observaciones.filter(
+            asignado_a__is_active=True, asignado_a__rol__nombre__in=ROLES_EQUIPO,
+        ).values('asignado_a').annotate(
+            asignados=Count('id'),
+            cerrados=Count('id', filter=Q(estado__nombre=ESTADO_CERRADA)),
+            promedio=Avg(DURACION_RESOLUCION, filter=Q_CERRADA_CON_FECHAS),
+        ).order_by()
+    }
+    filas = []
+    for usuario_id, *campos_nombre in tecnicos:
+        datos = por_tecnico.get(usuario_id, {})
+        asignados, cerrados = datos.get('asignados', 0), datos.get('cerrados', 0)
+        filas.append({
+            'usuario_id': usuario_id,
+            'nombre': nombre_usuario(*campos_nombre),
+            'asignados': asignados,
+            'cerrados': cerrados,
+            'tasa_cierre': porcentaje(cerrados, asignados),
+            'tiempo_promedio': duracion_a_dias(datos.get('promedio')),
+        })
+    return filas
@@ -0,0 +1,127 @@
+"""
+Exportación de reportes Excel en modo streaming.
+
+- Las filas salen de ``values_list(...).iterator(chunk_size=...)``: una sola
+  consulta con los JOIN necesarios, sin instanciar modelos ni acceder a FKs
+  fila por fila.
+- El libro se escribe con openpyxl en modo ``write_only``, que vuelca cada
+  fila a disco en vez de mantener todas las celdas en memoria.
+- El .xlsx terminado queda en un archivo temporal que FileResponse envía por
+  partes.
+
+Así la memoria usada no crece con la cantidad de filas exportadas.
+"""
+import tempfile
+from datetime import datetime
+
+from django.http import FileResponse
+from django.utils import timezone
+
+CONTENT_TYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+TAMANO_LOTE = 2000
+
+
+class Columna:
+    """
+    Columna de un reporte: encabezado, campos de ``values_list`` (se admiten
+    lookups con ``__``) y un formato opcional que recibe los valores de esos
+    campos en el mismo orden. Sin formato se usa el valor del único campo.
+    """
+
+    def __init__(self, encabezado, *campos, formato=None, ancho=None):
+        self.encabezado = encabezado
+        self.campos = campos
+        self.formato = formato
+        self.ancho = ancho
+
+
+# --- Formatos de uso común ---
+
+def nombre_completo(nombre, apellido_paterno, apellido_materno):
+    """Equivalente a Beneficiario.nombre_completo a partir de sus campos."""
+    if nombre is None:
+        return ''
+    return f"{nombre} {apellido_paterno} {apellido_materno or ''}".strip()
+
+
+def si_no(valor):
+    return 'Sí' if valor else 'No'
+
+
+def fecha_texto(formato):
+    def formatear(valor):
+        if not valor:
+            return ''
+        if isinstance(valor, datetime) and timezone.is_aware(valor):
+            valor = timezone.localtime(valor)
+        return valor.strftime(formato)
+    return formatear
+
+
+def display(choices):
+    """Muestra la etiqueta de un campo con choices (como get_FOO_display)."""
+    etiquetas = dict(choices)
+    return lambda valor: etiquetas.get(valor, valor) if valor is not None else ''
+
+
+def _celda(valor):
+    if valor is None:
+        return ''
+    # openpyxl no admite fechas con zona horaria
+    if isinstance(valor, datetime) and timezone.is_aware(valor):
+        return timezone.localtime(valor).replace(tzinfo=None)
+    return valor
+
+
+def filas_queryset(queryset, columnas, tamano_lote=TAMANO_LOTE):
+    """Genera las filas de ``columnas`` leyendo el queryset por lotes."""
+    campos, indices = [], {}
+    for columna in columnas:
+        for campo in columna.campos:
+            if campo not in indices:
+                indices[campo] = len(campos)
+                campos.append(campo)
+    posiciones = [(tuple(indices[c] for c in columna.campos), columna.formato) for columna in columnas]
+
+    for fila in queryset.values_list(*campos).iterator(chunk_size=tamano_lote):
+        yield [
+            formato(*(fila[i] for i in idx)) if formato else fila[idx[0]]
+            for idx, formato in posiciones
+        ]
+
+
+def escribir_xlsx(destino, titulo, columnas, filas):
+    """Escribe una hoja en modo write_only con encabezados en negrita."""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=titulo[:31])
+    # En modo write_only los anchos deben definirse antes de la primera fila
+    for i, columna in enumerate(columnas, 1):
+        ws.column_dimensions[get_column_letter(i)].width = columna.ancho or max(12, len(columna.encabezado) + 2)
+
+    negrita = Font(bold=True)
+    encabezados = []
+    for columna in columnas:
+        celda = WriteOnlyCell(ws, value=columna.encabezado)
+        celda.font = negrita
+        encabezados.append(celda)
+    ws.append(encabezados)
+    for fila in filas:
+        ws.append([_celda(valor) for valor in fila])
+    wb.save(destino)
+
+
+def respuesta_excel(nombre_archivo, titulo, columnas, filas):
+    archivo = tempfile.TemporaryFile()
+    escribir_xlsx(archivo, titulo, columnas, filas)
+    archivo.seek(0)
+    return FileResponse(archivo, as_attachment=True, filename=nombre_archivo, content_type=CONTENT_TYPE_XLSX)
+
+
+def exportar_queryset(nombre_archivo, titulo, queryset, columnas):
+    """Respuesta .xlsx con una fila por registro de ``queryset``."""
+    return respuesta_excel(nombre_archivo, titulo, columnas, filas_queryset(queryset, columnas))
@@ -0,0 +1,224 @@
+"""
+Gráficos del reporte PDF del dashboard, dibujados en el servidor con
+reportlab.graphics (en el navegador los dibuja chart.js).
+
+Cada gráfico se guarda en ``reportes_generados/<generación>/graficos/<hash>.<formato>``,
+donde el hash cubre el tipo de gráfico y sus series, y la generación
+(versión de los datos y día, ver core.utils.cache_reportes) se borra junto
+con los reportes cuando queda obsoleta. Generar de nuevo un reporte con los mismos datos
+reutiliza las imágenes en vez de redibujarlas.
+
+El formato es PNG si reportlab tiene un backend para renderPM (rlPyCairo o
+rl_renderPM) y SVG en caso contrario; xhtml2pdf y el motor reportlab aceptan ambos.
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+from functools import lru_cache
+from io import BytesIO
+
+from core.utils import cache_reportes
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO = 'graficos'
+ANCHO, ALTO = 450, 220
+PALETA = ['#1976d2', '#43a047', '#fbc02d', '#e53935', '#8e24aa', '#00897b', '#f4511e', '#546e7a']
+TIPOS_MIME = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+
+def _color(indice):
+    from reportlab.lib import colors
+
+    return colors.HexColor(PALETA[indice % len(PALETA)])
+
+
+def _leyenda(x, y, pares):
+    from reportlab.graphics.charts.legends import Legend
+
+    leyenda = Legend()
+    leyenda.x, leyenda.y = x, y
+    leyenda.fontName, leyenda.fontSize = 'Helvetica', 8
+    leyenda.alignment = 'right'
+    leyenda.colorNamePairs = pares
+    return leyenda
+
+
+def dibujo_torta(series):
+    """``series``: lista de (etiqueta, valor)."""
+    from reportlab.graphics.charts.piecharts import Pie
+    from reportlab.graphics.shapes import Drawing
+
+    dibujo = Drawing(ANCHO, ALTO)
+    torta = Pie()
+    torta.x, torta.y, torta.width, torta.height = 30, 20, 180, 180
+    torta.data = [valor for _, valor in series]
+    torta.slices.strokeColor = None
+    for i in range(len(series)):
+        torta.slices[i].fillColor = _color(i)
+    dibujo.add(torta)
+    dibujo.add(_leyenda(250, ALTO - 20, [(_color(i), f'{etiqueta} ({valor})') for i, (etiqueta, valor) in enumerate(series)]))
+    return dibujo
+
+
+def dibujo_barras(series):
+    """``series``: {'categorias': [...], 'series': [(nombre, [valores]), ...]}."""
+    from reportlab.graphics.charts.barcharts import VerticalBarChart
+    from reportlab.graphics.shapes import Drawing
+
+    dibujo = Drawing(ANCHO, ALTO)
+    barras = VerticalBarChart()
+    barras.x, barras.y, barras.width, barras.height = 40, 50, 300, ALTO - 70
+    barras.data = [valores for _, valores in series['series']]
+    barras.categoryAxis.categoryNames = series['categorias']
+    barras.categoryAxis.labels.fontName, barras.categoryAxis.labels.fontSize = 'Helvetica', 7
+    barras.categoryAxis.labels.angle, barras.categoryAxis.labels.boxAnchor = 30, 'ne'
+    barras.valueAxis.valueMin = 0
+    barras.valueAxis.labels.fontName, barras.valueAxis.labels.fontSize = 'Helvetica', 7
+    for i in range(len(series['series'])):
+        barras.bars[i].fillColor = _color(i)
+        barras.bars[i].strokeColor = None
+    dibujo.add(barras)
+    dibujo.add(_leyenda(360, ALTO - 20, [(_color(i), nombre) for i, (nombre, _) in enumerate(series['series'])]))
+    return dibujo
+
+
+def dibujo_lineas(series):
+    """Mismo formato de ``series`` que ``dibujo_barras``."""
+    from reportlab.graphics.charts.linecharts import HorizontalLineChart
+    from reportlab.graphics.shapes import Drawing
+    from reportlab.graphics.widgets.markers import makeMarker
+
+    dibujo = Drawing(ANCHO, ALTO)
+    lineas = HorizontalLineChart()
+    lineas.x, lineas.y, lineas.width, lineas.height = 40, 40, 300, ALTO - 60
+    lineas.data = [valores for _, valores in series['series']]
+    lineas.categoryAxis.categoryNames = series['categorias']
+    lineas.categoryAxis.labels.fontName, lineas.categoryAxis.labels.fontSize = 'Helvetica', 7
+    lineas.valueAxis.valueMin = 0
+    lineas.valueAxis.labels.fontName, lineas.valueAxis.labels.fontSize = 'Helvetica', 7
+    for i in range(len(series['series'])):
+        lineas.lines[i].strokeColor = _color(i)
+        lineas.lines[i].strokeWidth = 2
+        lineas.lines[i].symbol = makeMarker('FilledCircle', size=4, fillColor=_color(i))
+    dibujo.add(lineas)
+    dibujo.add(_leyenda(360, ALTO - 20, [(_color(i), nombre) for i, (nombre, _) in enumerate(series['series'])]))
+    return dibujo
+
+
+def dibujo_mapa_calor(series):
+    """
+    ``series``: {'filas': [...], 'columnas': [...], 'valores': [[...], ...]}.
+    La intensidad de cada celda es relativa al máximo de su columna.
+    """
+    from reportlab.graphics.shapes import Drawing, Rect, String
+    from reportlab.lib import colors
+
+    filas, columnas, valores = series['filas'], series['columnas'], series['valores']
+    alto_fila, ancho_etiqueta = 18, 150
+    ancho_celda = (ANCHO - ancho_etiqueta) / len(columnas)
+    dibujo = Drawing(ANCHO, alto_fila * (len(filas) + 1) + 4)
+    claro, oscuro = colors.HexColor('#e3f2fd'), colors.HexColor('#1976d2')
+    maximos = [max([fila[j] for fila in valores] + [0]) for j in range(len(columnas))]
+
+    y = dibujo.height - alto_fila
+    for j, columna in enumerate(columnas):
+        dibujo.add(String(ancho_etiqueta + (j + 0.5) * ancho_celda, y + 5, columna, fontName='Helvetica-Bold', fontSize=8, textAnchor='middle'))
+    for etiqueta, fila in zip(filas, valores):
+        y -= alto_fila
+        dibujo.add(String(ancho_etiqueta - 6, y + 5, etiqueta[:32], fontName='Helvetica', fontSize=8, textAnchor='end'))
+        for j, valor in enumerate(fila):
+            intensidad = valor / maximos[j] if maximos[j] else 0
+            dibujo.add(Rect(
+                ancho_etiqueta + j * ancho_celda, y, ancho_celda, alto_fila,
+                fillColor=colors.linearlyInterpolatedColor(claro, oscuro, 0, 1, intensidad),
+                strokeColor=colors.white,
+            ))
+            dibujo.add(String(
+                ancho_etiqueta + (j + 0.5) * ancho_celda, y + 5, str(valor), fontName='Helvetica', fontSize=8,
+                textAnchor='middle', fillColor=colors.white if intensidad > 0.5 else colors.black,
+            ))
+    return dibujo
+
+
+DIBUJOS = {
+    'torta': dibujo_torta,
+    'barras': dibujo_barras,
+    'lineas': dibujo_lineas,
+    'mapa_calor': dibujo_mapa_calor,
+}
+
+
+@lru_cache(maxsize=None)
+def formato_disponible():
+    from reportlab.graphics import renderPM
+    from reportlab.graphics.shapes import Drawing
+
+    try:
+        renderPM.drawToString(Drawing(1, 1), fmt='PNG')
+        return 'png'
+    except Exception:
+        return 'svg'
+
+
+def _renderizar(dibujo, formato):
+    if formato == 'png':
+        from reportlab.graphics import renderPM
+        return renderPM.drawToString(dibujo, fmt='PNG', dpi=144)
+    from reportlab.graphics import renderSVG
+    svg = renderSVG.drawToString(dibujo)
+    if isinstance(svg, bytes):
+        svg = svg.decode('utf-8')
+    # renderSVG escribe 'fill: None' en las líneas sin relleno; en SVG el valor es 'none'
+    return svg.replace('fill: None', 'fill: none').encode('utf-8')
+
+
+def clave_grafico(tipo, series, formato):
+    contenido = {'tipo': tipo, 'series': series, 'formato': formato}
+    return hashlib.sha256(json.dumps(contenido, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def grafico(tipo, series, formato=None):
+    """
+    Imagen del gráfico como data URI (para ``<img src>``), o '' si no hay
+    datos o el dibujo falla: un gráfico nunca impide generar el reporte.
+    """
+    if not series:
+        return ''
+    formato = formato or formato_disponible()
+    ruta_archivo = os.path.join(
+        cache_reportes.DIRECTORIO, cache_reportes.generacion(), DIRECTORIO, f'{clave_grafico(tipo, series, formato)}.{formato}',
+    )
+    destino = cache_reportes.ruta_absoluta(ruta_archivo)
+    try:
+        if not os.path.exists(destino):
+            contenido = _renderizar(DIBUJOS[tipo](series), formato)
+            cache_reportes.escribir_atomico(ruta_archivo, lambda f: f.write(contenido))
+        with open(destino, 'rb') as f:
+            datos = f.read()
+    except Exception:
+        logger.exception('No se pudo generar el gráfico %s', tipo)
+        return ''
+    return f"data:{TIPOS_MIME[formato]};base64,{base64.b64encode(datos).decode('ascii')}"
+
+
+def flowable(uri, ancho):
+    """Convierte un data URI de ``grafico`` en un flowable de platypus de ancho ``ancho``."""
+    encabezado, _, datos = uri.partition(',')
+    contenido = BytesIO(base64.b64decode(datos))
+    if TIPOS_MIME['svg'] in encabezado:
+        from svglib.svglib import svg2rlg
+
+        dibujo = svg2rlg(contenido)
+        escala = ancho / dibujo.width
+        dibujo.width, dibujo.height = ancho, dibujo.height * escala
+        dibujo.scale(escala, escala)
+        return dibujo
+    from reportlab.platypus import Image
+
+    imagen = Image(contenido)
+    imagen.drawHeight = imagen.drawHeight * ancho / imagen.drawWidth
+    imagen.drawWidth = ancho
+    return imagen
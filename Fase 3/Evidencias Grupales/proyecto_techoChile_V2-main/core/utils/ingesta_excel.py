@@ -0,0 +1,153 @@
+"""
+Lectura por bloques de planillas Excel para los comandos de importación.
+
+``pd.read_excel`` carga la hoja completa en un DataFrame antes de entregar la
+primera fila. ``HojaExcel`` recorre la hoja con openpyxl en modo
+``read_only`` (fila a fila, sin cargar el libro en memoria) y entrega
+DataFrames de ``tamano`` filas: la memoria queda acotada por el bloque y el
+importador puede escribir cada bloque antes de leer el siguiente.
+
+Los encabezados se nombran como en ``read_excel`` (repetidos con sufijo
+'.1', '.2'; vacíos como 'Unnamed: N') y el índice de cada bloque es la
+posición de la fila en la hoja (fila Excel = índice + 2), así los comandos
+que ya trabajaban con el DataFrame completo no cambian. Las filas vacías se
+omiten.
+
+``detectar_columnas`` ubica columnas por palabras del encabezado, con las
+reglas que ya usaban importar_beneficiarios y actualizar_ruts.
+"""
+from dataclasses import dataclass
+
+import pandas as pd
+
+TAMANO_BLOQUE = 1000
+
+
+@dataclass(frozen=True)
+class Alias:
+    """
+    Regla para reconocer una columna por su encabezado (sin mayúsculas ni
+    espacios al borde): debe contener alguna palabra de ``alguna`` (si se
+    indica), todas las de ``todas`` y ninguna de ``excluye``.
+    """
+    alguna: tuple = ()
+    todas: tuple = ()
+    excluye: tuple = ()
+
+    def coincide(self, encabezado):
+        texto = str(encabezado).strip().lower()
+        return (
+            (not self.alguna or any(palabra in texto for palabra in self.alguna))
+            and all(palabra in texto for palabra in self.todas)
+            and not any(palabra in texto for palabra in self.excluye)
+        )
+
+
+def detectar_columnas(columnas, alias):
+    """{clave: primera columna que cumple ``alias[clave]``, o None si ninguna la cumple}."""
+    return {
+        clave: next((columna for columna in columnas if regla.coincide(columna)), None)
+        for clave, regla in alias.items()
+    }
+
+
+def _encabezados(valores):
+    """Nombres de columna como los arma ``pd.read_excel``."""
+    nombres, vistos = [], {}
+    for i, valor in enumerate(valores):
+        nombre = f'Unnamed: {i}' if valor is None or str(valor).strip() == '' else valor
+        repeticiones = vistos.get(nombre, 0)
+        vistos[nombre] = repeticiones + 1
+        nombres.append(f'{nombre}.{repeticiones}' if repeticiones else nombre)
+    return nombres
+
+
+def _tipar(bloque):
+    """
+    Tipos como los deja ``read_excel``: una columna de texto cuyos valores
+    son todos números (ej: '569.') pasa a numérica y una columna vacía queda
+    como float con NaN.
+    """
+    for columna in bloque.columns:
+        serie = bloque[columna]
+        if serie.isna().all():
+            bloque[columna] = serie.astype(float)
+        elif not pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_datetime64_any_dtype(serie):
+            numeros = pd.to_numeric(serie, errors='coerce')
+            if numeros.notna().sum() == serie.notna().sum():
+                bloque[columna] = numeros
+    return bloque
+
+
+class HojaExcel:
+    """
+    Hoja de un libro Excel abierta en modo lectura por filas.
+
+        with HojaExcel('base.xlsx') as hoja:
+            hoja.columnas
+            for bloque in hoja.bloques(500):   # o: for indice, fila in hoja.filas()
+                ...
+
+    ``hoja`` es el índice o el nombre de la hoja ('0' desde la línea de
+    comandos se interpreta como índice si no hay una hoja con ese nombre).
+    """
+
+    def __init__(self, archivo, hoja=0):
+        from openpyxl import load_workbook
+
+        self.libro = load_workbook(archivo, read_only=True, data_only=True)
+        try:
+            if isinstance(hoja, str) and hoja not in self.libro.sheetnames and hoja.isdigit():
+                hoja = int(hoja)
+            self.hoja = self.libro.worksheets[hoja] if isinstance(hoja, int) else self.libro[hoja]
+            self._filas = self.hoja.iter_rows(values_only=True)
+            self.columnas = _encabezados(next(self._filas, ()))
+        except Exception:
+            self.libro.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def cerrar(self):
+        self.libro.close()
+
+    def bloques(self, tamano=TAMANO_BLOQUE):
+        """Genera DataFrames de hasta ``tamano`` filas con las columnas de la hoja."""
+        ancho = len(self.columnas)
+        filas, indice = [], []
+        for posicion, valores in enumerate(self._filas):
+            if all(valor is None or valor == '' for valor in valores):
+                continue
+            valores = tuple(valores[:ancho])
+            filas.append(valores + (None,) * (ancho - len(valores)))
+            indice.append(posicion)
+            if len(filas) == tamano:
+                yield self._bloque(filas, indice)
+                filas, indice = [], []
+        if filas:
+            yield self._bloque(filas, indice)
+
+    def filas(self, tamano=TAMANO_BLOQUE, preparar=None):
+        """
+        (índice, fila) como ``DataFrame.iterrows()``, leyendo la hoja de a
+        ``tamano`` filas. ``preparar(bloque)``, si se indica, transforma cada
+        bloque antes de recorrerlo (ej: agregar columnas calculadas por columna).
+        """
+        for bloque in self.bloques(tamano):
+            if preparar is not None:
+                bloque = preparar(bloque)
+            yield from bloque.iterrows()
+
+    def _bloque(self, filas, indice):
+        bloque = pd.DataFrame.from_records(filas, columns=self.columnas, index=indice, coerce_float=True)
+        return _tipar(bloque)
+
+
+def leer_bloques(archivo, hoja=0, tamano=TAMANO_BLOQUE):
+    """Atajo de ``HojaExcel(archivo, hoja).bloques(tamano)`` que cierra el libro al terminar."""
+    with HojaExcel(archivo, hoja) as lector:
+        yield from lector.bloques(tamano)
@@ -0,0 +1,175 @@
+"""
+Snapshot diario de KPIs de observaciones (reportes.MetricaDiaria).
+
+- Los signals de core marcan en reportes.DiaPendienteMetrica el día de
+  creación de cada observación guardada o borrada, y los de todas las
+  observaciones de una vivienda o proyecto que cambió (así un cambio de
+  región, comuna o constructora reagrupa sus filas). Las escrituras en bloque
+  (``QuerySet.update()``, ``bulk_create``) deben llamar a ``marcar_dias_pendientes``.
+- ``refrescar_metricas_diarias`` recalcula solo los días marcados y luego
+  borra sus marcas.
+- ``particionar`` divide una consulta en filas pre-agregadas (días ya
+  consolidados) y observaciones crudas (hoy y días marcados), de modo que los
+  resultados siempre coinciden con los datos vivos.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from incidencias.models import Observacion
+from reportes.models import DiaPendienteMetrica, MetricaDiaria
+from core.utils.dashboard_metrics import DURACION_RESOLUCION
+
+Q_CON_CIERRE = Q(fecha_cierre__isnull=False)
+Q_CON_VENCIMIENTO = Q_CON_CIERRE & Q(fecha_vencimiento__isnull=False)
+
+
+def ultimo_refresco():
+    """Fecha de la última corrida de refresco, o None si el snapshot está vacío."""
+    return MetricaDiaria.objects.aggregate(ultimo=Max('fecha_calculo'))['ultimo']
+
+
+def dias_de_observaciones(observaciones):
+    """Días de creación (en la zona horaria local) de un QuerySet de Observacion."""
+    return set(
+        observaciones.annotate(dia=TruncDate('fecha_creacion'))
+        .order_by()
+        .values_list('dia', flat=True)
+        .distinct()
+    )
+
+
+def marcar_dias_pendientes(dias):
+    """Registra días cuyo snapshot quedó desactualizado (ver reportes.DiaPendienteMetrica)."""
+    dias = {dia for dia in dias if dia is not None}
+    if not dias:
+        return
+    marcados = DiaPendienteMetrica.objects.filter(dia__in=dias)
+    # La fecha de la marca avanza: un refresco en curso no la borra (ver refrescar_metricas_diarias)
+    if marcados.update(fecha_marca=timezone.now()) < len(dias):
+        existentes = set(marcados.values_list('dia', flat=True))
+        DiaPendienteMetrica.objects.bulk_create(
+            [DiaPendienteMetrica(dia=dia) for dia in dias - existentes], ignore_conflicts=True,
+        )
+
+
+def dias_pendientes():
+    return set(DiaPendienteMetrica.objects.values_list('dia', flat=True))
+
+
+def refrescar_metricas_diarias(dias=None, completo=False, tamano_lote=500):
+    """
+    Recalcula las filas de MetricaDiaria.
+
+    Args:
+        dias: fechas adicionales a recalcular; siempre se suman los días
+            marcados como pendientes.
+        completo: reconstruye todo el snapshot (también cuando aún no existe).
+
+    Returns:
+        (cantidad de días recalculados, cantidad de filas escritas)
+    """
+    inicio = timezone.now()
+    if completo or ultimo_refresco() is None:
+        # Sin snapshot previo no hay marcas que alcancen: se construye completo
+        dias = None
+    else:
+        dias = set(dias or ()) | dias_pendientes()
+        if not dias:
+            return 0, 0
+
+    obs_qs = Observacion.objects.annotate(dia=TruncDate('fecha_creacion'))
+    if dias is not None:
+        obs_qs = obs_qs.filter(dia__in=dias)
+
+    filas = (
+        obs_qs.order_by()
+        .values(
+            'dia', 'tipo_id', 'estado_id', 'activo',
+            proyecto_ref=F('vivienda__proyecto_id'),
+            region_ref=F('vivienda__proyecto__region_id'),
+            comuna_ref=F('vivienda__proyecto__comuna_id'),
+            constructora_ref=F('vivienda__proyecto__constructora_id'),
+        )
+        .annotate(
+            total=Count('id'),
+            urgentes=Count('id', filter=Q(es_urgente=True)),
+            con_cierre=Count('id', filter=Q_CON_CIERRE),
+            duracion_resolucion=Sum(DURACION_RESOLUCION, filter=Q_CON_CIERRE),
+            cerradas_con_vencimiento=Count('id', filter=Q_CON_VENCIMIENTO),
+            cerradas_en_plazo=Count('id', filter=Q_CON_VENCIMIENTO & Q(fecha_cierre__date__lte=F('fecha_vencimiento'))),
+        )
+    )
+    nuevas = [
+        MetricaDiaria(
+            dia=f['dia'],
+            proyecto_id=f['proyecto_ref'],
+            region_id=f['region_ref'],
+            comuna_id=f['comuna_ref'],
+            constructora_id=f['constructora_ref'],
+            tipo_id=f['tipo_id'],
+            estado_id=f['estado_id'],
+            activo=f['activo'],
+            total=f['total'],
+            urgentes=f['urgentes'],
+            con_cierre=f['con_cierre'],
+            duracion_resolucion=f['duracion_resolucion'],
+            cerradas_con_vencimiento=f['cerradas_con_vencimiento'],
+            cerradas_en_plazo=f['cerradas_en_plazo'],
+            fecha_calculo=inicio,
+        )
+        for f in filas
+    ]
+
+    with transaction.atomic():
+        existentes = MetricaDiaria.objects.all()
+        if dias is not None:
+            existentes = existentes.filter(dia__in=dias)
+        existentes.delete()
+        MetricaDiaria.objects.bulk_create(nuevas, batch_size=tamano_lote)
+        # Las marcas hechas durante la corrida quedan para el próximo refresco
+        consolidados = DiaPendienteMetrica.objects.filter(fecha_marca__lte=inicio)
+        if dias is not None:
+            consolidados = consolidados.filter(dia__in=dias)
+        consolidados.delete()
+
+    dias_recalculados = len(dias) if dias is not None else len({m.dia for m in nuevas})
+    return dias_recalculados, len(nuevas)
+
+
+def metricas_filtradas(proyectos=None, region_id=None, fecha_inicio=None, fecha_fin=None, solo_activas=False):
+    """QuerySet de MetricaDiaria con los mismos filtros que usan dashboard y reportes sobre Observacion."""
+    qs = MetricaDiaria.objects.all()
+    if proyectos is not None:
+        qs = qs.filter(proyecto__in=proyectos)
+    if region_id:
+        qs = qs.filter(region_id=region_id)
+    if fecha_inicio:
+        qs = qs.filter(dia__gte=fecha_inicio)
+    if fecha_fin:
+        qs = qs.filter(dia__lte=fecha_fin)
+    if solo_activas:
+        qs = qs.filter(activo=True)
+    return qs
+
+
+def particionar(observaciones, metricas):
+    """
+    Divide el cálculo entre el snapshot y las observaciones crudas.
+
+    Args:
+        observaciones: QuerySet de Observacion ya filtrado.
+        metricas: QuerySet de MetricaDiaria con los filtros equivalentes.
+
+    Returns:
+        (metricas_consolidadas, observaciones_recientes) o None si aún no
+        existe snapshot (en ese caso se debe usar solo la consulta cruda).
+    """
+    if ultimo_refresco() is None:
+        return None
+    pendientes = dias_pendientes() | {timezone.localdate()}
+    return (
+        metricas.exclude(dia__in=pendientes),
+        observaciones.filter(fecha_creacion__date__in=pendientes),
+    )
@@ -0,0 +1,220 @@
+"""
+Motores de renderizado del reporte ejecutivo del dashboard.
+
+Ambos reciben el mismo contexto (core.views_dashboard_pdf.contexto_reporte_dashboard)
+y retornan los bytes del PDF:
+
+- ``html``: renderiza templates/dashboard/reporte_pdf.html y lo convierte con
+  xhtml2pdf. Es el motor por defecto.
+- ``reportlab``: arma la misma estructura (KPIs, gráficos, tablas, alertas,
+  anexos) directamente con platypus, sin generar ni parsear HTML/CSS. Es bastante más
+  rápido y usa menos memoria; se elige con ``?engine=reportlab``.
+
+``python manage.py benchmark_reporte_pdf`` compara ambos motores.
+"""
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+MOTOR_HTML = 'html'
+MOTOR_REPORTLAB = 'reportlab'
+
+AZUL = '#1976d2'
+AZUL_CLARO = '#e3f2fd'
+GRIS = '#bdc3c7'
+
+
+class ErrorGeneracionPDF(Exception):
+    pass
+
+
+def renderizar_html(contexto):
+    from django.template.loader import render_to_string
+    from xhtml2pdf import pisa
+
+    html_string = render_to_string('dashboard/reporte_pdf.html', contexto)
+    pdf_buffer = BytesIO()
+    pisa_status = pisa.CreatePDF(html_string, dest=pdf_buffer)
+    if pisa_status.err:
+        raise ErrorGeneracionPDF('Error al generar el PDF')
+    return pdf_buffer.getvalue()
+
+
+def _texto(valor):
+    """Escapa el valor para el marcado de Paragraph y respeta los saltos de línea."""
+    return escape(str(valor)).replace('\n', '<br/>')
+
+
+def renderizar_reportlab(contexto):
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import (
+        KeepTogether, ListFlowable, ListItem, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle,
+    )
+
+    azul, azul_claro, gris = colors.HexColor(AZUL), colors.HexColor(AZUL_CLARO), colors.HexColor(GRIS)
+    base = getSampleStyleSheet()['Normal']
+    normal = ParagraphStyle('Normal11', parent=base, fontName='Helvetica', fontSize=11, leading=15, textColor=colors.HexColor('#333333'))
+    kpi = ParagraphStyle('Kpi', parent=normal, spaceAfter=6)
+    titulo = ParagraphStyle('Titulo', parent=normal, fontName='Helvetica-Bold', fontSize=13, textColor=azul, alignment=TA_CENTER, spaceAfter=4)
+    subtitulo = ParagraphStyle('Subtitulo', parent=titulo, fontSize=11, textColor=colors.HexColor('#2c3e50'))
+    encabezado = ParagraphStyle('Encabezado', parent=normal, alignment=TA_CENTER)
+    seccion = ParagraphStyle(
+        'Seccion', parent=normal, fontName='Helvetica-Bold', textColor=colors.white,
+        backColor=azul, borderPadding=(6, 12, 6, 12), spaceBefore=6, spaceAfter=14,
+    )
+    celda = ParagraphStyle('Celda', parent=normal, leading=13)
+    celda_th = ParagraphStyle('CeldaTh', parent=celda, fontName='Helvetica-Bold', textColor=azul)
+    alerta = ParagraphStyle('Alerta', parent=normal, fontName='Helvetica-Bold', textColor=colors.HexColor('#e53935'))
+    mejora = ParagraphStyle('Mejora', parent=alerta, textColor=colors.HexColor('#fbc02d'), spaceBefore=12)
+    fortaleza = ParagraphStyle('Fortaleza', parent=alerta, textColor=colors.HexColor('#43a047'), spaceBefore=12)
+    nota = ParagraphStyle('Nota', parent=normal, fontSize=9, textColor=colors.HexColor('#7f8c8d'), alignment=TA_CENTER)
+
+    ancho = A4[0] - 4 * cm
+
+    def tabla(encabezados, filas):
+        datos = [[Paragraph(_texto(h), celda_th) for h in encabezados]]
+        datos += [[Paragraph(_texto(v), celda) for v in fila] for fila in filas]
+        t = Table(datos, colWidths=[ancho / len(encabezados)] * len(encabezados), repeatRows=1)
+        t.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), azul_claro),
+            ('GRID', (0, 0), (-1, -1), 1, gris),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ]))
+        return t
+
+    story = []
+
+    def agregar_seccion(nombre, contenido, grafico=None):
+        if grafico:
+            from core.utils.graficos import flowable
+            contenido = [flowable(grafico, ancho * 0.8), Spacer(1, 12), *contenido]
+        story.append(KeepTogether([Paragraph(_texto(nombre), seccion), *contenido, Spacer(1, 18)]))
+
+    c = contexto
+    # === Encabezado ===
+    story += [
+        Paragraph('Reporte de Gestión DS-49', titulo),
+        Paragraph('Recepción, Observaciones y Postventa', subtitulo),
+        Paragraph(f"<b>Periodo del reporte:</b> {_texto(c['periodo_reporte'])} | <b>Datos al:</b> {_texto(c['fecha_datos'])}", encabezado),
+        Paragraph(
+            f"<b>Filtros:</b> Región: <b>{_texto(c['region_nombre'])}</b> | "
+            f"Fecha inicio: <b>{_texto(c.get('fecha_inicio') or 'Todas')}</b> | "
+            f"Fecha fin: <b>{_texto(c.get('fecha_fin') or 'Todas')}</b>",
+            encabezado,
+        ),
+        Spacer(1, 20),
+    ]
+
+    # === Resumen ejecutivo ===
+    k = c['kpi']
+    lineas_kpi = [
+        (k.get('total_viviendas'), f"Total de viviendas gestionadas: <b>{k.get('total_viviendas')}</b>"),
+        (k.get('viviendas_entregadas'), f"Viviendas entregadas: <b>{k.get('viviendas_entregadas')}</b> ({k.get('porc_viviendas_entregadas')}%)"),
+        (k.get('casos_postventa_abiertos'), f"Casos de postventa abiertos: <b>{k.get('casos_postventa_abiertos')}</b>"),
+        (k.get('tiempo_promedio_resolucion'), f"Tiempo promedio de resolución: <b>{k.get('tiempo_promedio_resolucion')}</b> días"),
+        (k.get('familias_acompañadas'), f"Familias acompañadas: <b>{k.get('familias_acompañadas')}</b> ({k.get('porc_familias_acompañadas')}%)"),
+        (k.get('tasa_cumplimiento'), f"Tasa de cumplimiento de plazos: <b>{k.get('tasa_cumplimiento')}%</b>"),
+    ]
+    agregar_seccion('Resumen Ejecutivo', [Paragraph(texto, kpi) for valor, texto in lineas_kpi if valor])
+
+    # === Tablas ===
+    if c.get('tabla_estado_vivienda'):
+        agregar_seccion('Análisis de Estados de Vivienda', [tabla(
+            ['Estado', 'Cantidad', 'Porcentaje'],
+            [[e['nombre'], e['cantidad'], f"{e['porcentaje']}%"] for e in c['tabla_estado_vivienda']],
+        )], c.get('grafico_estado_vivienda'))
+    if c.get('tabla_observaciones'):
+        agregar_seccion('Diagnóstico Técnico - Observaciones', [tabla(
+            ['Tipo de Observación', 'Casos Totales', 'Casos Cerrados', 'Pendientes', 'Tiempo Promedio'],
+            [[o['tipo'], o['totales'], o['cerrados'], o['pendientes'], o['tiempo_promedio']] for o in c['tabla_observaciones']],
+        )], c.get('grafico_observaciones_tipo'))
+    if c.get('tabla_tendencia_mensual'):
+        agregar_seccion('Análisis de Tendencias Temporales', [tabla(
+            ['Mes', 'Casos Abiertos', 'Casos Cerrados', 'Variación'],
+            [[m['nombre'], m['abiertos'], m['cerrados'], m['variacion']] for m in c['tabla_tendencia_mensual']],
+        )], c.get('grafico_tendencia_mensual'))
+    if c.get('tabla_regional'):
+        agregar_seccion('Desempeño Regional', [tabla(
+            ['Región', 'Total', 'Entregadas', 'Casos', 'Tiempo', 'Estado'],
+            [[r['region'], r['total'], r['entregadas'], r['casos'], r['tiempo'], r['estado']] for r in c['tabla_regional']],
+        )], c.get('grafico_mapa_calor'))
+    if c.get('tabla_equipo'):
+        agregar_seccion('Desempeño del Equipo', [tabla(
+            ['Técnico', 'Casos Asignados', 'Casos Cerrados', 'Tasa Cierre', 'Tiempo Promedio'],
+            [[t['nombre'], t['asignados'], t['cerrados'], t['tasa_cierre'], t['tiempo_promedio']] for t in c['tabla_equipo']],
+        )])
+
+    # === Alertas, áreas de mejora y fortalezas ===
+    bloques = [
+        (c.get('alertas_criticas'), 'ALERTAS CRÍTICAS:', alerta),
+        (c.get('areas_mejora'), 'ÁREAS DE MEJORA:', mejora),
+        (c.get('fortalezas'), 'FORTALEZAS:', fortaleza),
+    ]
+    if any(texto for texto, _, _ in bloques):
+        agregar_seccion('Alertas, Áreas de Mejora y Fortalezas', [
+            Paragraph(f"{etiqueta}<br/>{_texto(texto)}", estilo) for texto, etiqueta, estilo in bloques if texto
+        ])
+
+    recomendaciones = [r for r in c.get('recomendaciones') or [] if r]
+    if recomendaciones:
+        agregar_seccion('Recomendaciones', [ListFlowable(
+            [ListItem(Paragraph(_texto(r), normal)) for r in recomendaciones],
+            bulletType='1', bulletFontSize=11, leftIndent=18,
+        )])
+
+    # === Proyecciones y anexos ===
+    proyecciones = [
+        (c.get('proyeccion_casos'), 'Proyección de casos esperados próximo mes'),
+        (c.get('metas_trimestre'), 'Metas del siguiente trimestre'),
+        (c.get('recursos_estimados'), 'Recursos necesarios estimados'),
+    ]
+    if any(valor for valor, _ in proyecciones):
+        agregar_seccion('Proyecciones y Metas', [
+            Paragraph(f"{etiqueta}: <b>{_texto(valor)}</b>", kpi) for valor, etiqueta in proyecciones if valor
+        ])
+
+    anexos = [
+        (c.get('anexos_casos_criticos'), 'Listado detallado de casos críticos:'),
+        (c.get('anexos_datos_complementarios'), 'Datos estadísticos complementarios:'),
+        (c.get('anexos_metodologia'), 'Metodología de cálculo de indicadores:'),
+    ]
+    if any(valor for valor, _ in anexos):
+        contenido = []
+        for valor, etiqueta in anexos:
+            if valor:
+                contenido += [Paragraph(f"<b>{etiqueta}</b>", normal), Paragraph(_texto(valor), normal), Spacer(1, 12)]
+        # Los casos críticos pueden ser largos: se deja que la sección se divida entre páginas
+        story += [Paragraph('Anexos Técnicos', seccion), *contenido]
+
+    story += [
+        Spacer(1, 20),
+        Paragraph(f"Reporte generado automáticamente por el Sistema de Gestión TECHO Chile - Datos al {_texto(c['fecha_datos'])}", nota),
+    ]
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer, pagesize=A4, leftMargin=2 * cm, rightMargin=2 * cm, topMargin=2 * cm, bottomMargin=2 * cm,
+        title='Reporte de Gestión DS-49 - TECHO Chile',
+    )
+    doc.build(story)
+    return buffer.getvalue()
+
+
+MOTORES = {
+    MOTOR_HTML: renderizar_html,
+    MOTOR_REPORTLAB: renderizar_reportlab,
+}
+
+
+def motor_valido(nombre):
+    """Nombre del motor pedido, o el motor por defecto si no existe."""
+    return nombre if nombre in MOTORES else MOTOR_HTML
+
+
+def renderizar(contexto, motor=MOTOR_HTML):
+    return MOTORES[motor_valido(motor)](contexto)
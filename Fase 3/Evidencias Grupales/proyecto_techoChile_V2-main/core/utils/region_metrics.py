@@ -1,54 +1,84 @@
-from django.db.models import Count, Q, Avg, F, ExpressionWrapper, DurationField
-from core.models import Region
-from proyectos.models import Proyecto, Vivienda
+from django.db.models import Count, Q, Avg
+from proyectos.models import Vivienda
 from incidencias.models import Observacion
+from core.utils.dashboard_metrics import DURACION_RESOLUCION, Q_CERRADA_CON_FECHAS, duracion_a_dias
 
-def get_region_metrics(region_id=None, estado=None, fecha_inicio=None, fecha_fin=None):
-    regiones_qs = Region.objects.filter(activo=True)
+
+def _filtros_vivienda(prefijo='', region_id=None, estado=None, fecha_inicio=None, fecha_fin=None):
+    """
+    Filtros comunes sobre viviendas activas de proyectos activos en regiones activas.
+    ``prefijo`` permite reutilizarlos desde Observacion ('vivienda__').
+    """
+    filtros = Q(**{
+        f'{prefijo}activa': True,
+        f'{prefijo}proyecto__activo': True,
+        f'{prefijo}proyecto__region__activo': True,
+    })
     if region_id:
-        regiones_qs = regiones_qs.filter(id=region_id)
-    regiones = regiones_qs.order_by('nombre')
+        filtros &= Q(**{f'{prefijo}proyecto__region_id': region_id})
+    if fecha_inicio:
+        filtros &= Q(**{f'{prefijo}proyecto__fecha_creacion__date__gte': fecha_inicio})
+    if fecha_fin:
+        filtros &= Q(**{f'{prefijo}proyecto__fecha_creacion__date__lte': fecha_fin})
+    if estado and not _es_id_estado(estado):
+        # Un estado no numérico corresponde al estado de la vivienda
+        filtros &= Q(**{f'{prefijo}estado': estado})
+    return filtros
+
+
+def _es_id_estado(estado):
+    try:
+        int(estado)
+        return True
+    except (ValueError, TypeError):
+        return False
+
+
+def get_region_metrics(region_id=None, estado=None, fecha_inicio=None, fecha_fin=None):
+    """
+    Métricas por región (viviendas, entregadas, observaciones y tiempo promedio de
+    resolución) calculadas con dos consultas agrupadas por región, sin importar
+    cuántas regiones o proyectos existan.
+    """
+    viviendas = (
+        Vivienda.objects
+        .filter(_filtros_vivienda('', region_id, estado, fecha_inicio, fecha_fin))
+        .values('proyecto__region_id', 'proyecto__region__nombre')
+        .annotate(
+            total_viviendas=Count('id'),
+            entregadas=Count('id', filter=Q(estado='entregada')),
+        )
+        .order_by('proyecto__region__nombre')
+    )
+
+    obs_qs = Observacion.objects.filter(
+        _filtros_vivienda('vivienda__', region_id, estado, fecha_inicio, fecha_fin),
+        activo=True,
+    )
+    if estado and _es_id_estado(estado):
+        obs_qs = obs_qs.filter(estado_id=estado)
+    if fecha_inicio:
+        obs_qs = obs_qs.filter(fecha_creacion__date__gte=fecha_inicio)
+    if fecha_fin:
+        obs_qs = obs_qs.filter(fecha_creacion__date__lte=fecha_fin)
+    obs_por_region = {
+        o['vivienda__proyecto__region_id']: o
+        for o in obs_qs.values('vivienda__proyecto__region_id').annotate(
+            casos=Count('id'),
+            promedio=Avg(DURACION_RESOLUCION, filter=Q_CERRADA_CON_FECHAS),
+        ).order_by()
+    }
+
     metrics = []
-    for region in regiones:
-        # Solo proyectos activos de la región actual
-        proyectos_objs = Proyecto.objects.filter(region=region, activo=True)
-        if fecha_inicio:
-            proyectos_objs = proyectos_objs.filter(fecha_creacion__date__gte=fecha_inicio)
-        if fecha_fin:
-            proyectos_objs = proyectos_objs.filter(fecha_creacion__date__lte=fecha_fin)
-        viviendas_qs = Vivienda.objects.filter(proyecto__in=proyectos_objs, activa=True)
-        if estado:
-            # Si estado es numérico (id de EstadoObservacion), no filtrar viviendas
-            try:
-                int_estado = int(estado)
-                # Si es un id, no filtrar viviendas por estado
-            except (ValueError, TypeError):
-                viviendas_qs = viviendas_qs.filter(estado=estado)
-        viviendas_ids = viviendas_qs.values_list('id', flat=True)
-        total_viviendas = viviendas_qs.count()
-        entregadas = viviendas_qs.filter(estado='entregada').count()
-        if total_viviendas == 0:
-            continue
-        obs_region = Observacion.objects.filter(vivienda_id__in=viviendas_ids, activo=True)
-        if estado:
-            obs_region = obs_region.filter(estado_id=estado)
-        if fecha_inicio:
-            obs_region = obs_region.filter(fecha_creacion__date__gte=fecha_inicio)
-        if fecha_fin:
-            obs_region = obs_region.filter(fecha_creacion__date__lte=fecha_fin)
-        total_obs = obs_region.count()
-        obs_cerradas = obs_region.filter(estado__nombre='Cerrada', fecha_cierre__isnull=False, fecha_creacion__isnull=False)
-        tiempo_promedio = None
-        if obs_cerradas.exists():
-            expr = ExpressionWrapper(F('fecha_cierre') - F('fecha_creacion'), output_field=DurationField())
-            promedio = obs_cerradas.annotate(duracion=expr).aggregate(prom=Avg('duracion'))['prom']
-            if promedio is not None:
-                tiempo_promedio = int(promedio.total_seconds() // 86400)
+    for v in viviendas:
+        obs = obs_por_region.get(v['proyecto__region_id'], {})
+        tiempo_promedio = duracion_a_dias(obs.get('promedio'))
         metrics.append({
-            'region': region.nombre,
-            'total_viviendas': total_viviendas,
-            'entregadas': entregadas,
-            'casos_postventa': total_obs,
+            'region_id': v['proyecto__region_id'],
+            'region': v['proyecto__region__nombre'],
+            'total_viviendas': v['total_viviendas'],
+            'entregadas': v['entregadas'],
+            'casos_postventa': obs.get('casos', 0),
             'promedio_dias': tiempo_promedio if tiempo_promedio is not None else '-',
         })
     return metrics
@@ -0,0 +1,161 @@
+"""
+Búsquedas por RUT sobre la columna indexada ``rut_normalizado``
+(Beneficiario, Usuario y Constructora), y validación de columnas completas
+de RUTs (importaciones y auditoría) con ``validar_ruts`` / ``normalizar_ruts``.
+"""
+import numpy as np
+import pandas as pd
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from core.validators import normalizar_rut, validar_rut
+
+# Un RUT completo tiene al menos 7 dígitos más el dígito verificador
+LARGO_MINIMO_RUT = 8
+
+
+def es_rut_completo(valor):
+    """True si ``valor`` es un RUT completo con dígito verificador válido."""
+    if len(normalizar_rut(valor)) < LARGO_MINIMO_RUT:
+        return False
+    try:
+        validar_rut(valor)
+    except ValidationError:
+        return False
+    return True
+
+
+def filtro_rut(valor, campo='rut_normalizado'):
+    """
+    Q para buscar por RUT escrito con o sin puntos/guion.
+
+    Un RUT completo se resuelve con igualdad sobre el índice; un fragmento
+    (búsquedas parciales en listados) compara contra la columna normalizada.
+    ``campo`` permite filtrar a través de relaciones, ej: 'vivienda__beneficiario__rut_normalizado'.
+    """
+    rut_normalizado = normalizar_rut(valor)
+    if es_rut_completo(valor):
+        return Q(**{campo: rut_normalizado})
+    return Q(**{f'{campo}__icontains': rut_normalizado})
+
+
+def filtro_rut_usuario(usuario, campo='rut_normalizado'):
+    """
+    Q por el RUT de ``usuario``, o None si no tiene uno utilizable.
+
+    Se decide por ``rut_normalizado`` y no por ``rut``: un RUT como ' ' o '.'
+    (create_user e importadores no lo validan) normaliza a '' y la igualdad
+    coincidiría con todos los registros sin RUT.
+    """
+    if not usuario.rut_normalizado:
+        return None
+    return Q(**{campo: usuario.rut_normalizado})
+
+
+# Módulo 11: pesos 2,3,...,7,2,3 desde el último dígito, sobre el número
+# rellenado con ceros a 8 dígitos (los ceros a la izquierda no suman)
+DIGITOS_RUT = 8
+PESOS_RUT = np.array([3, 2, 7, 6, 5, 4, 3, 2])
+# Dígito verificador según suma % 11 (11 - resto, con 11 -> '0' y 10 -> 'K')
+DV_POR_RESTO = np.array(['0', 'K', '9', '8', '7', '6', '5', '4', '3', '2', '1'])
+DV_VALIDOS = list('0123456789K')
+
+MOTIVO_VACIO = 'RUT vacío'
+MOTIVO_FORMATO = 'RUT con formato inválido'
+MOTIVO_DV = 'Dígito verificador inválido'
+# np.strings.slice(a, -1, None) equivale a slice(a, -1) (hasta el penúltimo), no
+# a a[-1:]: para tomar el final hay que dar un stop explícito
+FIN = np.iinfo(np.intp).max
+
+
+def _como_texto(valores):
+    """
+    Arreglo de texto de NumPy de ancho fijo; None/NaN pasan a ''. No se usa
+    StringDType: en NumPy 2.3 np.strings.slice falla sobre sus cadenas vacías.
+    """
+    arreglo = np.array(valores.to_numpy() if isinstance(valores, pd.Series) else list(valores), dtype=object)
+    arreglo[pd.isna(arreglo)] = ''
+    return arreglo.astype(str)
+
+
+def _reemplazar(texto, viejo, nuevo):
+    """``np.strings.replace``, que no acepta arreglos vacíos de ancho fijo."""
+    return np.strings.replace(texto, viejo, nuevo) if texto.size else texto
+
+
+def _limpiar(texto):
+    """``clean_rut`` sobre un arreglo: sin puntos ni espacios, en mayúscula y con guion antes del DV."""
+    limpio = np.strings.upper(_reemplazar(_reemplazar(texto, '.', ''), ' ', ''))
+    sin_guion = (np.strings.find(limpio, '-') < 0) & (np.strings.str_len(limpio) > 1)
+    con_guion = np.strings.add(np.strings.add(np.strings.slice(limpio, 0, -1), '-'), np.strings.slice(limpio, -1, FIN))
+    return np.where(sin_guion, con_guion, limpio)
+
+
+def normalizar_ruts(valores):
+    """``normalizar_rut`` para una columna completa (Serie o iterable); los vacíos quedan como ''."""
+    indice = valores.index if isinstance(valores, pd.Series) else None
+    return pd.Series(_reemplazar(_limpiar(_como_texto(valores)), '-', ''), index=indice, dtype=object)
+
+
+def validar_ruts(valores):
+    """
+    ``validar_rut`` para una columna completa. Devuelve un DataFrame (con el
+    índice de ``valores`` si es una Serie) con las columnas:
+
+      - rut: el RUT limpio como lo deja ``clean_rut`` (ej: 12345678-5)
+      - rut_normalizado: forma de búsqueda (ej: 123456785)
+      - valido: máscara de RUTs con formato y dígito verificador correctos
+      - motivo: '' si es válido, o MOTIVO_VACIO / MOTIVO_FORMATO / MOTIVO_DV
+
+    Todo se calcula por columna con las funciones de texto de NumPy: los
+    números se pasan a una matriz de dígitos y la suma ponderada del módulo
+    11 es un producto matricial.
+    """
+    texto = _como_texto(valores)
+    rut = _limpiar(texto)
+    vacio = np.strings.strip(texto) == ''
+
+    # Formato de RUT_REGEX: 1 a 8 dígitos, guion y DV
+    largo = np.strings.str_len(rut)
+    numero = np.strings.slice(rut, 0, -2)
+    dv = np.strings.slice(rut, -1, FIN)
+    formato = (
+        (largo >= 3) & (largo <= DIGITOS_RUT + 2)
+        & (np.strings.slice(rut, -2, -1) == '-')
+        & np.strings.isdecimal(numero)
+        & np.isin(dv, DV_VALIDOS)
+    )
+
+    valido = formato.copy()
+    if formato.any():
+        ceros = np.strings.zfill(numero[formato], DIGITOS_RUT).astype(f'U{DIGITOS_RUT}')
+        digitos = ceros.view(np.uint32).reshape(-1, DIGITOS_RUT).astype(np.int64) - ord('0')
+        # isdecimal también acepta dígitos no ASCII (ej: '٣'): esos quedan con formato inválido
+        ascii_ok = ((digitos >= 0) & (digitos <= 9)).all(axis=1)
+        suma = np.where(ascii_ok[:, None], digitos, 0) @ PESOS_RUT
+        valido[formato] = ascii_ok & (DV_POR_RESTO[suma % 11] == dv[formato])
+        formato[formato] = ascii_ok
+
+    indice = valores.index if isinstance(valores, pd.Series) else None
+    return pd.DataFrame({
+        'rut': rut.astype(object),
+        'rut_normalizado': _reemplazar(rut, '-', '').astype(object),
+        'valido': valido,
+        'motivo': np.select([vacio, ~formato, ~valido], [MOTIVO_VACIO, MOTIVO_FORMATO, MOTIVO_DV], '').astype(object),
+    }, index=indice)
+
+
+def agregar_validacion_rut(bloque, columna, prefijo):
+    """
+    ``bloque`` con el resultado de ``validar_ruts(bloque[columna])`` en las
+    columnas '<prefijo>', '<prefijo>_normalizado', '<prefijo>_valido' y
+    '<prefijo>_motivo', para que los importadores validen la columna una vez
+    por bloque y después la lean fila a fila.
+    """
+    resultado = validar_ruts(bloque[columna])
+    return bloque.assign(**{
+        prefijo: resultado['rut'],
+        f'{prefijo}_normalizado': resultado['rut_normalizado'],
+        f'{prefijo}_valido': resultado['valido'],
+        f'{prefijo}_motivo': resultado['motivo'],
+    })
@@ -0,0 +1,149 @@
+"""
+Sincronización incremental para la app móvil (PWA).
+
+El cliente guarda un token opaco con la fecha de su última sincronización y
+pide solo lo creado, modificado o eliminado desde entonces:
+
+- observaciones: índice sobre ``fecha_ultima_actualizacion`` (las desactivadas
+  con ``activo=False`` se informan como eliminadas);
+- seguimientos y archivos: fecha de creación (no se editan);
+- eliminaciones físicas: tombstones de incidencias.RegistroEliminacion.
+"""
+import base64
+import json
+from datetime import datetime, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+# Cambios confirmados con algo de retraso (transacciones largas) no se pierden:
+# el cliente puede recibir duplicados, que se aplican de forma idempotente.
+MARGEN_TOKEN = timedelta(seconds=5)
+# Tokens más antiguos que la retención de tombstones requieren carga completa;
+# purgar_registros_eliminacion borra los tombstones que ya ningún token válido pide
+RETENCION_TOKEN = timedelta(days=30)
+# Filas por tipo de cambio en cada respuesta; el resto se pide con has_more
+MAX_POR_TIPO = 500
+
+# Tipo de cambio -> campo de fecha por el que se pagina (junto con el id)
+CAMPOS_FECHA = {
+    'observaciones': 'fecha_ultima_actualizacion',
+    'seguimientos': 'fecha',
+    'archivos': 'fecha_subida',
+    'tombstones': 'fecha',
+}
+
+
+class TokenInvalido(ValueError):
+    pass
+
+
+def codificar_token(fecha, posiciones=None):
+    """
+    Token opaco. Sin ``posiciones`` es solo la fecha de la sincronización; al
+    paginar (has_more) lleva además, por tipo de cambio, la última fila
+    entregada como (fecha, id), igual que core.utils.cursor.
+    """
+    if posiciones is None:
+        crudo = fecha.isoformat()
+    else:
+        crudo = json.dumps({
+            'desde': fecha.isoformat(),
+            'posiciones': {tipo: [f.isoformat(), pk] for tipo, (f, pk) in posiciones.items()},
+        })
+    return base64.urlsafe_b64encode(crudo.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _fecha(texto):
+    fecha = datetime.fromisoformat(texto)
+    if timezone.is_naive(fecha):
+        raise ValueError('Fecha sin zona horaria')
+    return fecha
+
+
+def decodificar_token(token):
+    """Retorna (desde, posiciones); ``posiciones`` es None salvo en tokens de paginación."""
+    try:
+        relleno = '=' * (-len(token) % 4)
+        crudo = base64.urlsafe_b64decode(token + relleno).decode('utf-8')
+        if not crudo.startswith('{'):
+            return _fecha(crudo), None
+        datos = json.loads(crudo)
+        posiciones = {tipo: (_fecha(f), int(pk)) for tipo, (f, pk) in datos['posiciones'].items()}
+        if set(posiciones) != set(CAMPOS_FECHA):
+            raise ValueError('Tipos de cambio incompletos')
+        return _fecha(datos['desde']), posiciones
+    except (TypeError, UnicodeDecodeError, ValueError, KeyError, AttributeError) as e:
+        raise TokenInvalido('Token de sincronización inválido') from e
+
+
+def purgar_tombstones(ahora=None):
+    """Borra los tombstones más antiguos que RETENCION_TOKEN (más el margen); retorna cuántos."""
+    from incidencias.models import RegistroEliminacion
+
+    corte = (ahora or timezone.now()) - RETENCION_TOKEN - MARGEN_TOKEN
+    eliminados, _ = RegistroEliminacion.objects.filter(fecha__lt=corte).delete()
+    return eliminados
+
+
+def _pagina(queryset, campo, posicion, limite):
+    """Filas posteriores a ``posicion`` = (fecha, id), en orden (campo, id); y si quedan más."""
+    fecha, pk = posicion
+    filas = list(
+        queryset.filter(Q(**{f'{campo}__gt': fecha}) | Q(**{campo: fecha, 'id__gt': pk}))
+        .order_by(campo, 'id')[:limite + 1]
+    )
+    return filas[:limite], len(filas) > limite
+
+
+def cambios_desde(desde, observaciones, seguimientos, archivos, eliminaciones, posiciones=None, max_por_tipo=MAX_POR_TIPO):
+    """
+    Filtra los QuerySets (ya restringidos al alcance del usuario) a los cambios
+    posteriores a ``desde``, o a ``posiciones`` si el token viene de una
+    página anterior.
+
+    Cada tipo de cambio se pagina por separado con un cursor (fecha, id) y
+    comparación estricta, así muchas filas con la misma fecha (actualizaciones
+    masivas) no repiten la misma página.
+
+    Returns:
+        dict con 'observaciones' (activas modificadas), 'eliminadas' (ids de
+        observaciones desactivadas), 'seguimientos', 'archivos', 'tombstones',
+        'token' y 'has_more'.
+    """
+    ahora = timezone.now()
+    if posiciones is None:
+        corte = desde - MARGEN_TOKEN
+        posiciones = {tipo: (corte, 0) for tipo in CAMPOS_FECHA}
+
+    querysets = {
+        'observaciones': observaciones,
+        'seguimientos': seguimientos,
+        'archivos': archivos,
+        'tombstones': eliminaciones.values('id', 'fecha', 'modelo', 'objeto_id', 'observacion_id'),
+    }
+    paginas, siguientes, has_more = {}, {}, False
+    for tipo, campo in CAMPOS_FECHA.items():
+        filas, quedan = _pagina(querysets[tipo], campo, posiciones[tipo], max_por_tipo)
+        paginas[tipo] = filas
+        has_more |= quedan
+        if filas:
+            ultima = filas[-1]
+            siguientes[tipo] = (ultima[campo], ultima['id']) if isinstance(ultima, dict) else (getattr(ultima, campo), ultima.pk)
+        else:
+            siguientes[tipo] = posiciones[tipo]
+
+    modificadas = paginas['observaciones']
+    return {
+        'observaciones': [o for o in modificadas if o.activo],
+        'eliminadas': [o.pk for o in modificadas if not o.activo],
+        'seguimientos': paginas['seguimientos'],
+        'archivos': paginas['archivos'],
+        'tombstones': [
+            {'modelo': t['modelo'], 'objeto_id': t['objeto_id'], 'observacion_id': t['observacion_id']}
+            for t in paginas['tombstones']
+        ],
+        # Al paginar, el siguiente pedido continúa desde la última fila entregada de cada tipo
+        'token': codificar_token(desde, siguientes) if has_more else codificar_token(ahora),
+        'has_more': has_more,
+    }
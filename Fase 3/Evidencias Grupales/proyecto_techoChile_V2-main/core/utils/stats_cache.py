@@ -0,0 +1,53 @@
+"""
+Caché de los contadores globales del navbar (context processor global_stats_context).
+
+Las entradas se guardan por alcance del rol (global, constructora o usuario FAMILIA)
+e incluyen un número de versión en la llave. Los signals de Proyecto, Vivienda
+y Observacion (core.signals) incrementan la versión, con lo que todas las
+entradas anteriores quedan obsoletas sin tener que borrarlas una por una.
+
+La versión vive en la base de datos (reportes.VersionDatos, igual que la de
+los reportes generados): con la caché local de cada proceso, una escritura
+en un worker invalida también las entradas de los demás.
+"""
+import hashlib
+
+from django.core.cache import cache
+
+from core.utils.cache_reportes import incrementar_version_datos, version_datos
+
+VERSION_ESTADISTICAS = 'estadisticas'
+TIMEOUT = 60 * 10
+
+
+def version_actual():
+    """Versión vigente de las estadísticas (una consulta indexada)."""
+    return version_datos(VERSION_ESTADISTICAS)
+
+
+def invalidar():
+    """Incrementa la versión: las entradas cacheadas dejan de ser válidas en todos los procesos."""
+    incrementar_version_datos(VERSION_ESTADISTICAS)
+
+
+def _llave(alcance, version):
+    return f'global_stats:v{version}:{alcance}'
+
+
+def alcance_empresa(empresa):
+    """Alcance para el campo legacy ``empresa`` (texto libre)."""
+    normalizada = empresa.strip().lower()
+    return 'empresa:' + hashlib.md5(normalizada.encode('utf-8')).hexdigest()
+
+
+def obtener(alcance, calcular):
+    """
+    Retorna el valor cacheado para ``alcance`` o lo calcula con ``calcular()``.
+    Con la entrada en caché solo se consulta la versión vigente.
+    """
+    llave = _llave(alcance, version_actual())
+    valor = cache.get(llave)
+    if valor is None:
+        valor = calcular()
+        cache.set(llave, valor, TIMEOUT)
+    return valor
@@ -0,0 +1,132 @@
+"""
+Cola de reportes respaldada en la base de datos (reportes.TrabajoReporte).
+
+Las vistas llaman a ``encolar`` y responden de inmediato; uno o más procesos
+``manage.py procesar_reportes`` toman los trabajos pendientes y generan los
+archivos fuera del ciclo de la petición.
+
+Para tomar un trabajo se usa un UPDATE condicionado a ``estado='pendiente'``:
+si dos workers eligen la misma fila, solo uno logra actualizarla, sin
+depender de SELECT ... FOR UPDATE (que SQLite no soporta).
+"""
+import logging
+import os
+import socket
+from datetime import timedelta
+
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Trabajos en 'procesando' por más de este tiempo se consideran abandonados
+# (el worker murió) y se devuelven a la cola.
+TIEMPO_MAXIMO = timedelta(minutes=15)
+MAX_INTENTOS = 3
+
+
+def nombre_worker(indice=0):
+    return f'{socket.gethostname()}:{os.getpid()}:{indice}'
+
+
+def _generador(tipo):
+    from reportes.models import TrabajoReporte
+
+    if tipo == TrabajoReporte.TIPO_DASHBOARD_PDF:
+        from core.views_dashboard_pdf import generar_reporte_dashboard_pdf
+        return generar_reporte_dashboard_pdf
+    raise ValueError(f'Tipo de reporte desconocido: {tipo}')
+
+
+def encolar(usuario, parametros, tipo=None):
+    """
+    Crea un trabajo pendiente, o retorna el que ya está en curso para el
+    mismo usuario y parámetros (recargar la página de espera no duplica).
+    """
+    from reportes.models import TrabajoReporte
+
+    tipo = tipo or TrabajoReporte.TIPO_DASHBOARD_PDF
+    en_curso = TrabajoReporte.objects.filter(
+        usuario=usuario, tipo=tipo, parametros=parametros,
+        estado__in=[TrabajoReporte.PENDIENTE, TrabajoReporte.PROCESANDO],
+    ).order_by('-fecha_creacion').first()
+    if en_curso:
+        return en_curso
+    return TrabajoReporte.objects.create(usuario=usuario, tipo=tipo, parametros=parametros)
+
+
+def registrar_completado(usuario, parametros, reporte, tipo=None):
+    """Trabajo ya terminado para un reporte servido desde la caché (no pasa por la cola)."""
+    from reportes.models import TrabajoReporte
+
+    ahora = timezone.now()
+    return TrabajoReporte.objects.create(
+        usuario=usuario, tipo=tipo or TrabajoReporte.TIPO_DASHBOARD_PDF, parametros=parametros,
+        estado=TrabajoReporte.COMPLETADO, reporte=reporte, fecha_inicio=ahora, fecha_termino=ahora,
+    )
+
+
+def tomar_siguiente(worker):
+    """Reserva el trabajo pendiente más antiguo para ``worker``; None si la cola está vacía."""
+    from reportes.models import TrabajoReporte
+
+    pendientes = TrabajoReporte.objects.filter(estado=TrabajoReporte.PENDIENTE)
+    while True:
+        pk = pendientes.order_by('fecha_creacion', 'id').values_list('pk', flat=True).first()
+        if pk is None:
+            return None
+        tomado = pendientes.filter(pk=pk).update(
+            estado=TrabajoReporte.PROCESANDO,
+            worker=worker,
+            fecha_inicio=timezone.now(),
+            intentos=F('intentos') + 1,
+        )
+        if tomado:
+            return TrabajoReporte.objects.select_related('usuario').get(pk=pk)
+        # Otro worker lo tomó primero: probar con el siguiente
+
+
+def ejecutar(trabajo):
+    """Genera el reporte de un trabajo ya reservado y registra el resultado."""
+    from reportes.models import TrabajoReporte
+
+    try:
+        trabajo.reporte = _generador(trabajo.tipo)(trabajo.usuario, trabajo.parametros)
+        trabajo.estado = TrabajoReporte.COMPLETADO
+        trabajo.error = ''
+    except Exception as e:
+        logger.exception('Error generando el reporte del trabajo %s', trabajo.pk)
+        trabajo.estado = TrabajoReporte.ERROR
+        trabajo.error = str(e) or e.__class__.__name__
+    trabajo.fecha_termino = timezone.now()
+    trabajo.save(update_fields=['reporte', 'estado', 'error', 'fecha_termino'])
+    return trabajo
+
+
+def procesar_pendientes(worker, limite=None):
+    """Procesa trabajos hasta vaciar la cola (o hasta ``limite``). Retorna cuántos procesó."""
+    procesados = 0
+    while limite is None or procesados < limite:
+        trabajo = tomar_siguiente(worker)
+        if trabajo is None:
+            break
+        ejecutar(trabajo)
+        procesados += 1
+    return procesados
+
+
+def recuperar_abandonados(tiempo_maximo=TIEMPO_MAXIMO):
+    """
+    Devuelve a la cola los trabajos cuyo worker dejó de responder; los que ya
+    agotaron MAX_INTENTOS quedan en error. Retorna (reencolados, fallidos).
+    """
+    from reportes.models import TrabajoReporte
+
+    abandonados = TrabajoReporte.objects.filter(
+        estado=TrabajoReporte.PROCESANDO, fecha_inicio__lt=timezone.now() - tiempo_maximo,
+    )
+    fallidos = abandonados.filter(intentos__gte=MAX_INTENTOS).update(
+        estado=TrabajoReporte.ERROR, error='El worker no terminó el trabajo', fecha_termino=timezone.now(),
+    )
+    reencolados = abandonados.update(estado=TrabajoReporte.PENDIENTE, worker='')
+    return reencolados, fallidos
@@ -0,0 +1,57 @@
+"""
+ZIP generado por partes, para StreamingHttpResponse o para escribir a un archivo.
+
+``zipfile`` admite destinos no posicionables: escribe cada entrada con un
+descriptor de datos al final en vez de volver atrás a completar el encabezado.
+``SalidaZip`` acumula lo escrito y ``vaciar()`` lo entrega, así el llamador
+puede hacer ``yield`` después de cada entrada (o cada bloque) sin armar el ZIP
+completo en memoria ni en disco.
+"""
+import time
+import zipfile
+
+TAMANO_BLOQUE = 64 * 1024
+
+
+class SalidaZip:
+    """Destino no posicionable para ZipFile: acumula lo escrito hasta que se entrega."""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos, self.partes = b''.join(self.partes), []
+        return datos
+
+
+def abrir_entrada(archivo_zip, nombre, compresion=zipfile.ZIP_DEFLATED):
+    """Abre ``nombre`` para escritura dentro de ``archivo_zip`` con la compresión indicada."""
+    info = zipfile.ZipInfo(nombre, date_time=time.localtime()[:6])
+    info.compress_type = compresion
+    return archivo_zip.open(info, 'w')
+
+
+def copiar_por_bloques(origen, archivo_zip, nombre, salida, compresion=zipfile.ZIP_STORED):
+    """
+    Copia el archivo abierto ``origen`` a la entrada ``nombre`` y genera los
+    bytes del ZIP a medida que se escriben, de a ``TAMANO_BLOQUE``.
+
+    Por defecto sin compresión: fotos y PDFs ya vienen comprimidos.
+    """
+    with abrir_entrada(archivo_zip, nombre, compresion) as destino:
+        while True:
+            bloque = origen.read(TAMANO_BLOQUE)
+            if not bloque:
+                break
+            destino.write(bloque)
+            datos = salida.vaciar()
+            if datos:
+                yield datos
+    yield salida.vaciar()
@@ -11,6 +11,13 @@ def clean_rut(value: str) -> str:
     return v
 
 
+def normalizar_rut(value) -> str:
+    """Forma canónica para búsquedas: sin puntos, espacios ni guion, DV en mayúscula (ej: 12345678K)."""
+    if not value:
+        return ''
+    return clean_rut(value).replace('-', '')
+
+
 def validar_rut(value: str):
     if not value:
         return
@@ -12,6 +12,8 @@ from django.db.models import Count, Q, F, Func
 from django.contrib import messages
 from .models import Comuna, Region, Rol
 from .decorators import rol_requerido, RolRequiredMixin
+from core.utils.dashboard_metrics import DashboardMetrics, ResumenDashboard
+from core.utils.metricas_diarias import metricas_filtradas
 from proyectos.models import Proyecto, Vivienda
 from incidencias.models import ArchivoAdjuntoObservacion, Observacion
 from datetime import datetime, timedelta
@@ -54,16 +56,13 @@ def dashboard(request):
     )
 
     # Comunas de Valparaíso con viviendas (sin filtro)
-    comuna_objs = []
-    try:
-        region_valpo = Region.objects.get(nombre__icontains='valparaiso')
-        comunas_valpo = region_valpo.comunas.all()
-        for comuna in comunas_valpo:
-            total_viv = Vivienda.objects.filter(proyecto__comuna=comuna).count()
-            if total_viv > 0:
-                comuna_objs.append({'nombre': comuna.nombre, 'total_viviendas': total_viv})
-    except Region.DoesNotExist:
-        comuna_objs = []
+    comuna_objs = [
+        {'nombre': c['proyecto__comuna__nombre'], 'total_viviendas': c['total_viviendas']}
+        for c in Vivienda.objects.filter(proyecto__comuna__region__nombre__icontains='valparaiso')
+        .values('proyecto__comuna__nombre')
+        .annotate(total_viviendas=Count('id'))
+        .order_by('proyecto__comuna__nombre')
+    ]
 
     # --- Métricas por región (usando utilitario compartido) ---
     from core.utils.region_metrics import get_region_metrics
@@ -83,30 +82,25 @@ def dashboard(request):
     # **CASO ESPECIAL PARA FAMILIA**
     if es_familia:
         # Buscar el beneficiario asociado al usuario por RUT
-        beneficiario = Beneficiario.objects.filter(rut=user.rut).first() if user.rut else None
+        from core.utils.rut import filtro_rut_usuario
+
+        por_rut = filtro_rut_usuario(user)
+        beneficiario = Beneficiario.objects.filter(por_rut).first() if por_rut else None
         mi_vivienda = Vivienda.objects.filter(beneficiario=beneficiario, activa=True).first() if beneficiario else None
         # Observaciones SOLO de su vivienda
         if mi_vivienda:
             mis_observaciones = Observacion.objects.filter(vivienda=mi_vivienda)
-            obs_total = mis_observaciones.count()
-            obs_abiertas = mis_observaciones.filter(estado__nombre='Abierta').count()
-            obs_cerradas = mis_observaciones.filter(estado__nombre='Cerrada').count()
-            obs_urgentes = mis_observaciones.filter(es_urgente=True, estado__nombre='Abierta').count()
-            obs_vencidas = mis_observaciones.filter(fecha_vencimiento__lt=datetime.now().date(), estado__nombre='Abierta').count()
+            metrics = DashboardMetrics(observaciones=mis_observaciones)
+            resumen = metrics.resumen()
             ultimas_observaciones = mis_observaciones.select_related('vivienda__proyecto', 'vivienda', 'estado').order_by('-fecha_creacion')[:5]
         else:
-            obs_total = obs_abiertas = obs_cerradas = obs_urgentes = obs_vencidas = 0
+            metrics = None
+            resumen = ResumenDashboard()
             ultimas_observaciones = []
-        if obs_total > 0:
-            porc_cerradas = round((obs_cerradas / obs_total) * 100, 1)
-            porc_abiertas = round((obs_abiertas / obs_total) * 100, 1)
-            porc_vencidas = round((obs_vencidas / obs_total) * 100, 1)
-        else:
-            porc_cerradas = porc_abiertas = porc_vencidas = 0
-        viviendas_asignadas = 1 if mi_vivienda and mi_vivienda.beneficiario else 0
-        total_proyectos = 1
-        viviendas_total = 1
-        viviendas_entregadas = 1 if mi_vivienda and mi_vivienda.estado == 'entregada' else 0
+        resumen.viviendas_asignadas = 1 if mi_vivienda and mi_vivienda.beneficiario else 0
+        resumen.total_proyectos = 1
+        resumen.viviendas_total = 1
+        resumen.viviendas_entregadas = 1 if mi_vivienda and mi_vivienda.estado == 'entregada' else 0
         is_admin = False
         sin_vivienda = mi_vivienda is None
     else:
@@ -138,106 +132,41 @@ def dashboard(request):
                 Q(region=user.region) if user.region else Q()
             ).distinct()
         if proyectos_user is not None:
-            total_proyectos = proyectos_user.count()
-            viviendas_total = Vivienda.objects.filter(proyecto__in=proyectos_user, activa=True).count()
-            viviendas_entregadas = Vivienda.objects.filter(
-                proyecto__in=proyectos_user, 
-                estado='entregada'
-            ).count()
             obs_qs = Observacion.objects.filter(vivienda__proyecto__in=proyectos_user)
-            # if estado_id:
-            #     obs_qs = obs_qs.filter(estado_id=estado_id)
             if fecha_inicio:
                 obs_qs = obs_qs.filter(fecha_creacion__date__gte=fecha_inicio)
             if fecha_fin:
                 obs_qs = obs_qs.filter(fecha_creacion__date__lte=fecha_fin)
-            obs_total = obs_qs.count()
-            obs_abiertas = obs_qs.filter(estado__nombre='Abierta').count()
-            obs_cerradas = obs_qs.filter(estado__nombre='Cerrada').count()
-            obs_urgentes = obs_qs.filter(es_urgente=True, estado__nombre='Abierta').count()
-            obs_vencidas = obs_qs.filter(fecha_vencimiento__lt=datetime.now().date(), estado__nombre='Abierta').count()
-            if obs_total > 0:
-                porc_cerradas = round((obs_cerradas / obs_total) * 100, 1)
-                porc_abiertas = round((obs_abiertas / obs_total) * 100, 1)
-                porc_vencidas = round((obs_vencidas / obs_total) * 100, 1)
-            else:
-                porc_cerradas = porc_abiertas = porc_vencidas = 0
+            metrics = DashboardMetrics(
+                proyectos=proyectos_user,
+                viviendas=Vivienda.objects.filter(proyecto__in=proyectos_user),
+                observaciones=obs_qs,
+                metricas=metricas_filtradas(proyectos=proyectos_user, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin),
+            )
+            resumen = metrics.resumen()
             ultimas_observaciones = obs_qs.select_related('vivienda__proyecto', 'vivienda', 'estado').order_by('-fecha_creacion')[:5]
-            viviendas_asignadas = Vivienda.objects.filter(proyecto__in=proyectos_user, activa=True).exclude(beneficiario__isnull=True).count()
             is_admin = user.rol and user.rol.nombre == 'ADMINISTRADOR'
         else:
-            total_proyectos = viviendas_total = viviendas_entregadas = obs_total = obs_abiertas = obs_cerradas = obs_urgentes = obs_vencidas = porc_cerradas = porc_abiertas = porc_vencidas = 0
+            metrics = None
+            resumen = ResumenDashboard()
             ultimas_observaciones = []
-            viviendas_asignadas = 0
             is_admin = False
 
-    # Datos para gráfico de observaciones por tipo
-    if es_familia and mi_vivienda:
-        datos_tipo = (
-            Observacion.objects.filter(vivienda=mi_vivienda)
-            .values('tipo__nombre')
-            .annotate(total=Count('id'))
-            .order_by('-total')
-        )
+    # Datos para gráfico de observaciones por tipo y casos cerrados por mes
+    if metrics is not None:
+        datos_tipo = list(metrics.observaciones_por_tipo())
+        cerradas_por_mes = metrics.cerradas_por_mes()
     else:
-        if proyectos_user is not None:
-            obs_tipo_qs = Observacion.objects.filter(vivienda__proyecto__in=proyectos_user)
-            # if estado_id:
-            #     obs_tipo_qs = obs_tipo_qs.filter(estado_id=estado_id)
-            if fecha_inicio:
-                obs_tipo_qs = obs_tipo_qs.filter(fecha_creacion__date__gte=fecha_inicio)
-            if fecha_fin:
-                obs_tipo_qs = obs_tipo_qs.filter(fecha_creacion__date__lte=fecha_fin)
-            datos_tipo = (
-                obs_tipo_qs
-                .values('tipo__nombre')
-                .annotate(total=Count('id'))
-                .order_by('-total')
-            )
-        else:
-            datos_tipo = []
+        datos_tipo = []
+        cerradas_por_mes = []
     labels = [d['tipo__nombre'] for d in datos_tipo]
-    values = [d['total'] for d in datos_tipo]
-
-    # --- Agregación de casos cerrados por mes ---
-    from django.db.models.functions import TruncMonth
-    if es_familia and mi_vivienda:
-        cerradas_qs = Observacion.objects.filter(vivienda=mi_vivienda, estado__nombre='Cerrada')
-    elif proyectos_user is not None:
-        cerradas_qs = Observacion.objects.filter(vivienda__proyecto__in=proyectos_user, estado__nombre='Cerrada')
-        # if estado_id:
-        #     cerradas_qs = cerradas_qs.filter(estado_id=estado_id)
-        if fecha_inicio:
-            cerradas_qs = cerradas_qs.filter(fecha_creacion__date__gte=fecha_inicio)
-        if fecha_fin:
-            cerradas_qs = cerradas_qs.filter(fecha_creacion__date__lte=fecha_fin)
-    else:
-        cerradas_qs = Observacion.objects.none()
-
-    cerradas_por_mes = (
-        cerradas_qs
-        .annotate(mes=TruncMonth('fecha_cierre'))
-        .values('mes')
-        .annotate(total=Count('id'))
-        .order_by('mes')
-    )
+    values = [d['totales'] for d in datos_tipo]
     meses_cerrados = [d['mes'].strftime('%b %Y') if d['mes'] else 'Sin fecha' for d in cerradas_por_mes]
     valores_cerrados = [d['total'] for d in cerradas_por_mes]
 
     context = {
-        'total_proyectos': total_proyectos,
-        'viviendas_total': viviendas_total,
-        'viviendas_entregadas': viviendas_entregadas,
-        'obs_total': obs_total,
-        'obs_abiertas': obs_abiertas,
-        'obs_cerradas': obs_cerradas,
-        'obs_vencidas': obs_vencidas,
-        'obs_urgentes': obs_urgentes,
-        'porc_cerradas': porc_cerradas,
-        'porc_abiertas': porc_abiertas,
-        'porc_vencidas': porc_vencidas,
+        **resumen.as_context(),
         'ultimas_observaciones': ultimas_observaciones,
-        'viviendas_asignadas': viviendas_asignadas,
         'es_familia': es_familia,
         'is_admin': is_admin,
         'mi_vivienda': mi_vivienda,
@@ -464,8 +393,9 @@ class ConstructoraList(LoginRequiredMixin, RolRequiredMixin, SoftDeleteMixin, Vi
         constructoras = Constructora.objects.filter(activo=True).select_related('region', 'comuna')
         if rut:
             from django.db.models import Q
+            from core.utils.rut import filtro_rut
             constructoras = constructoras.filter(
-                Q(rut__icontains=rut) | Q(nombre__icontains=rut)
+                filtro_rut(rut) | Q(nombre__icontains=rut)
             )
         return render(request, 'maestro/constructora_list.html', {
             'constructoras': constructoras,
@@ -523,7 +453,8 @@ class BeneficiarioList(LoginRequiredMixin, RolRequiredMixin, SoftDeleteMixin, Vi
         rut = request.GET.get('rut', '').strip()
         beneficiarios = Beneficiario.objects.filter(activo=True)
         if rut:
-            beneficiarios = beneficiarios.filter(rut__icontains=rut)
+            from core.utils.rut import filtro_rut
+            beneficiarios = beneficiarios.filter(filtro_rut(rut))
         return render(request, 'maestro/beneficiario_list.html', {
             'beneficiarios': beneficiarios,
             'titulo': 'Beneficiarios',
@@ -581,7 +512,8 @@ class UsuarioList(LoginRequiredMixin, RolRequiredMixin, View):
         empresa = request.GET.get('empresa', '').strip()
         usuarios = Usuario.objects.filter(is_active=True)
         if rut:
-            usuarios = usuarios.filter(rut__icontains=rut)
+            from core.utils.rut import filtro_rut
+            usuarios = usuarios.filter(filtro_rut(rut))
         if correo:
             usuarios = usuarios.filter(email__icontains=correo)
         if rol:
@@ -730,18 +662,10 @@ class ViviendaList(LoginRequiredMixin, RolRequiredMixin, SoftDeleteMixin, View):
         codigo = request.GET.get('codigo', '').strip()
         viviendas = Vivienda.objects.filter(activa=True).select_related('proyecto', 'tipologia', 'beneficiario')
         if beneficiario:
-            # Normalizar rut buscado (eliminar puntos y guion)
-            import re
-            rut_normalizado = re.sub(r'[^\dKk]', '', beneficiario)
-            from django.db import models
-            viviendas = viviendas.annotate(
-                rut_normalizado=models.Func(
-                    models.F('beneficiario__rut'),
-                    function='REPLACE',
-                    template="REPLACE(REPLACE(REPLACE(%(expressions)s, '.', ''), '-', ''), ' ', '')"
-                )
-            ).filter(
-                Q(rut_normalizado__icontains=rut_normalizado) |
+            # RUT con o sin puntos/guion, sobre la columna normalizada
+            from core.utils.rut import filtro_rut
+            viviendas = viviendas.filter(
+                filtro_rut(beneficiario, 'beneficiario__rut_normalizado') |
                 Q(beneficiario__nombre__icontains=beneficiario)
             )
         if codigo:
@@ -817,17 +741,9 @@ class ObservacionList(LoginRequiredMixin, RolRequiredMixin, SoftDeleteMixin, Vie
         # Aplicar filtros
         if buscar_rut:
             # Permitir búsqueda por RUT con o sin formato (puntos/guion)
-            import re
-            from django.db import models
-            rut_normalizado = re.sub(r'[^\dKk]', '', buscar_rut)
-            observaciones_list = observaciones_list.annotate(
-                rut_normalizado=models.Func(
-                    models.F('vivienda__beneficiario__rut'),
-                    function='REPLACE',
-                    template="REPLACE(REPLACE(REPLACE(%(expressions)s, '.', ''), '-', ''), ' ', '')"
-                )
-            ).filter(
-                Q(rut_normalizado__icontains=rut_normalizado) |
+            from core.utils.rut import filtro_rut
+            observaciones_list = observaciones_list.filter(
+                filtro_rut(buscar_rut, 'vivienda__beneficiario__rut_normalizado') |
                 Q(vivienda__beneficiario__nombre__icontains=buscar_rut)
             )
         
@@ -1056,21 +972,13 @@ def buscar_beneficiario_por_rut(request):
                 'error': 'RUT requerido'
             })
         
-        # Limpiar RUT para la búsqueda: remover puntos, espacios y guiones
-        def normalizar_rut(rut):
-            return rut.replace('.', '').replace(' ', '').replace('-', '').lower()
-
-        rut_normalizado = normalizar_rut(rut_original)
+        # RUT sin puntos, espacios ni guion: búsqueda por igualdad sobre la columna indexada
+        from core.validators import normalizar_rut
 
         try:
-            # Buscar todos los beneficiarios activos
-            beneficiarios = Beneficiario.objects.filter(activo=True)
-            beneficiario = None
-            for b in beneficiarios:
-                if b.rut:
-                    if normalizar_rut(b.rut) == rut_normalizado:
-                        beneficiario = b
-                        break
+            beneficiario = Beneficiario.objects.filter(
+                activo=True, rut_normalizado=normalizar_rut(rut_original)
+            ).first()
 
             if beneficiario:
                 return JsonResponse({
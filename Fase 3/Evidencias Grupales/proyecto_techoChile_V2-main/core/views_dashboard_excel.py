@@ -5,12 +5,11 @@ from django.http import HttpResponse
 from django.contrib.auth.decorators import login_required
 from core.utils.region_metrics import get_region_metrics
 from core.utils.cumplimiento_constructora import get_cumplimiento_plazos_por_constructora
+from core.utils.dashboard_metrics import DashboardMetrics, desempeno_equipo, nombre_usuario
+from core.utils.metricas_diarias import metricas_filtradas
 from proyectos.models import Proyecto, Vivienda
 from incidencias.models import Observacion
 from core.models import Region
-from django.db.models import Count, Q, F, ExpressionWrapper, DurationField, Avg
-from django.db.models.functions import TruncMonth
-from django.contrib.auth import get_user_model
 from datetime import datetime
 
 @login_required
@@ -45,19 +44,19 @@ def dashboard_excel_report(request):
     ws_kpi.title = "KPIs"
     kpi_headers = ["Total Viviendas", "Viviendas Entregadas", "% Viviendas Entregadas", "Casos Postventa Abiertos", "Tiempo Promedio Resolución (días)", "Familias Acompañadas", "% Familias Acompañadas", "Tasa Cumplimiento"]
     ws_kpi.append(kpi_headers)
-    viviendas_total = viviendas_qs.count()
-    viviendas_entregadas = viviendas_qs.filter(estado='entregada').count()
-    porc_viviendas_entregadas = round((viviendas_entregadas / viviendas_total) * 100, 1) if viviendas_total else 0
-    casos_postventa_abiertos = obs_qs.filter(estado__nombre='Abierta').count()
-    obs_cerradas = obs_qs.filter(estado__nombre='Cerrada', fecha_cierre__isnull=False, fecha_creacion__isnull=False)
-    if obs_cerradas.exists():
-        expr = ExpressionWrapper(F('fecha_cierre') - F('fecha_creacion'), output_field=DurationField())
-        promedio = obs_cerradas.annotate(duracion=expr).aggregate(prom=Avg('duracion'))['prom']
-        tiempo_promedio_resolucion = int(promedio.total_seconds() // 86400) if promedio else 0
-    else:
-        tiempo_promedio_resolucion = 0
-    familias_acompañadas = viviendas_qs.exclude(beneficiario__isnull=True).count()
-    porc_familias_acompañadas = round((familias_acompañadas / viviendas_total) * 100, 1) if viviendas_total else 0
+    metrics = DashboardMetrics(
+        viviendas=viviendas_qs,
+        observaciones=obs_qs,
+        metricas=metricas_filtradas(region_id=region_id, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, solo_activas=True),
+    )
+    resumen = metrics.resumen()
+    viviendas_total = resumen.viviendas_total
+    viviendas_entregadas = resumen.viviendas_entregadas
+    porc_viviendas_entregadas = resumen.porc_viviendas_entregadas
+    casos_postventa_abiertos = resumen.obs_abiertas
+    tiempo_promedio_resolucion = resumen.tiempo_promedio_resolucion or 0
+    familias_acompañadas = resumen.viviendas_asignadas
+    porc_familias_acompañadas = resumen.porc_viviendas_asignadas
     tasa_cumplimiento = cumplimiento_constructoras['global']
     ws_kpi.append([
         viviendas_total, viviendas_entregadas, porc_viviendas_entregadas, casos_postventa_abiertos,
@@ -71,8 +70,7 @@ def dashboard_excel_report(request):
     # 2. Estados de Vivienda
     ws_estado = wb.create_sheet("Estados Vivienda")
     ws_estado.append(["Estado", "Cantidad", "Porcentaje"])
-    estados_vivienda = viviendas_qs.values('estado').annotate(cantidad=Count('id')).order_by('-cantidad')
-    for ev in estados_vivienda:
+    for ev in metrics.estados_vivienda():
         nombre = ev['estado'].capitalize() if ev['estado'] else 'Sin estado'
         cantidad = ev['cantidad']
         porcentaje = round((cantidad / viviendas_total) * 100, 1) if viviendas_total else 0
@@ -83,13 +81,7 @@ def dashboard_excel_report(request):
     # 3. Observaciones por tipo
     ws_obs = wb.create_sheet("Observaciones")
     ws_obs.append(["Tipo de Observación", "Totales", "Cerrados", "Pendientes", "Tiempo Promedio (días)"])
-    tipos_obs = obs_qs.values('tipo__nombre').annotate(
-        totales=Count('id'),
-        cerrados=Count('id', filter=Q(estado__nombre='Cerrada')),
-        pendientes=Count('id', filter=Q(estado__nombre='Abierta')),
-        tiempo_promedio=Avg(ExpressionWrapper(F('fecha_cierre') - F('fecha_creacion'), output_field=DurationField()), filter=Q(estado__nombre='Cerrada', fecha_cierre__isnull=False, fecha_creacion__isnull=False))
-    ).order_by('-totales')
-    for t in tipos_obs:
+    for t in metrics.observaciones_por_tipo():
         if t['tiempo_promedio']:
             dias = int(t['tiempo_promedio'].total_seconds() // 86400)
         else:
@@ -103,12 +95,8 @@ def dashboard_excel_report(request):
     # 4. Tendencias temporales
     ws_tend = wb.create_sheet("Tendencias")
     ws_tend.append(["Mes", "Abiertos", "Cerrados", "Variación"])
-    obs_mes = obs_qs.annotate(mes=TruncMonth('fecha_creacion')).values('mes').annotate(
-        abiertos=Count('id', filter=Q(estado__nombre='Abierta')),
-        cerrados=Count('id', filter=Q(estado__nombre='Cerrada'))
-    ).order_by('mes')
     prev_cerrados = 0
-    for m in obs_mes:
+    for m in metrics.tendencia_mensual():
         nombre = m['mes'].strftime('%B') if m['mes'] else 'Sin mes'
         abiertos = m['abiertos']
         cerrados = m['cerrados']
@@ -132,22 +120,10 @@ def dashboard_excel_report(request):
     # 6. Desempeño del equipo
     ws_eq = wb.create_sheet("Equipo")
     ws_eq.append(["Técnico", "Asignados", "Cerrados", "Tasa Cierre", "Tiempo Promedio"])
-    User = get_user_model()
-    tecnicos = User.objects.filter(is_active=True, rol__nombre__in=['TECNICO', 'COORDINADOR'])
-    for t in tecnicos:
-        asignados = obs_qs.filter(asignado_a=t).count()
-        cerrados = obs_qs.filter(asignado_a=t, estado__nombre='Cerrada').count()
-        tasa_cierre = round((cerrados / asignados) * 100, 1) if asignados else 0
-        tiempo_promedio = '-'
-        obs_cerradas = obs_qs.filter(asignado_a=t, estado__nombre='Cerrada', fecha_cierre__isnull=False, fecha_creacion__isnull=False)
-        if obs_cerradas.exists():
-            expr = ExpressionWrapper(F('fecha_cierre') - F('fecha_creacion'), output_field=DurationField())
-            promedio = obs_cerradas.annotate(duracion=expr).aggregate(prom=Avg('duracion'))['prom']
-            if promedio:
-                tiempo_promedio = int(promedio.total_seconds() // 86400)
+    for t in desempeno_equipo(obs_qs):
         ws_eq.append([
-            t.get_full_name() if hasattr(t, 'get_full_name') else (t.first_name + ' ' + t.last_name).strip() or t.username,
-            asignados, cerrados, tasa_cierre, tiempo_promedio
+            t['nombre'], t['asignados'], t['cerrados'], t['tasa_cierre'],
+            t['tiempo_promedio'] if t['tiempo_promedio'] is not None else '-',
         ])
     for cell in ws_eq[1]:
         cell.font = Font(bold=True)
@@ -180,6 +156,7 @@ def dashboard_excel_report(request):
     ]
     ws_obsdet.append(obs_headers)
     for o in obs_qs.select_related('vivienda', 'vivienda__proyecto', 'vivienda__proyecto__region', 'tipo', 'estado', 'asignado_a'):
+        asignado = o.asignado_a
         ws_obsdet.append([
             o.id,
             o.vivienda.codigo if o.vivienda else '',
@@ -190,7 +167,7 @@ def dashboard_excel_report(request):
             o.detalle,
             o.fecha_creacion.strftime('%Y-%m-%d') if o.fecha_creacion else '',
             o.fecha_cierre.strftime('%Y-%m-%d') if o.fecha_cierre else '',
-            o.asignado_a.get_full_name() if o.asignado_a and hasattr(o.asignado_a, 'get_full_name') else (o.asignado_a.username if o.asignado_a else ''),
+            nombre_usuario(asignado.nombre, asignado.apellido_paterno, asignado.apellido_materno, asignado.email) if asignado else '',
         ])
     for cell in ws_obsdet[1]:
         cell.font = Font(bold=True)
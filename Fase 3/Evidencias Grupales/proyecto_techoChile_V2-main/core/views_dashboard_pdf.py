@@ -1,21 +1,110 @@
 
-from django.shortcuts import render
+import os
 
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.urls import reverse
+
+from core.utils.cache_reportes import fecha_version_datos, ruta_absoluta
+from core.utils.pdf_dashboard import MOTOR_HTML, ErrorGeneracionPDF, motor_valido
+
+# Parámetros GET que definen un reporte; se guardan tal cual en el trabajo y en ReporteGenerado.
+# ``engine`` elige el motor de core.utils.pdf_dashboard (por defecto, HTML + xhtml2pdf).
+PARAMETROS_REPORTE = ('region', 'estado', 'fecha_inicio', 'fecha_fin', 'periodo', 'engine')
+
+
+def parametros_reporte(querydict):
+    parametros = {clave: querydict.get(clave) or None for clave in PARAMETROS_REPORTE}
+    # El motor por defecto no se guarda, así su clave de caché no cambia
+    motor = motor_valido(parametros['engine'])
+    parametros['engine'] = motor if motor != MOTOR_HTML else None
+    return parametros
+
+
+@login_required
 def generando_reporte(request):
-    """Vista que muestra la pantalla de espera mientras se genera el PDF."""
-    return render(request, 'dashboard/generando_reporte.html')
+    """
+    Encola la generación del PDF y muestra la pantalla de espera, que consulta
+    el estado del trabajo hasta que el comando procesar_reportes lo termina.
+    Si el reporte ya está en caché, el trabajo queda completado de inmediato.
+    """
+    from core.utils.trabajos_reportes import encolar, registrar_completado
+
+    parametros = parametros_reporte(request.GET)
+    reporte = buscar_reporte_dashboard_pdf(request.user, parametros)
+    if reporte:
+        trabajo = registrar_completado(request.user, parametros, reporte)
+    else:
+        trabajo = encolar(request.user, parametros)
+    return render(request, 'dashboard/generando_reporte.html', {
+        'trabajo': trabajo,
+        'url_estado': reverse('dashboard_reporte_pdf_estado', args=[trabajo.pk]),
+        'url_directa': reverse('dashboard_reporte_pdf') + ('?' + request.GET.urlencode() if request.GET else ''),
+    })
+
+
+@login_required
+def estado_reporte_pdf(request, trabajo_id):
+    """Endpoint de sondeo para la pantalla de espera."""
+    from reportes.models import TrabajoReporte
+
+    trabajo = get_object_or_404(TrabajoReporte, pk=trabajo_id, usuario=request.user)
+    datos = {'id': trabajo.pk, 'estado': trabajo.estado, 'terminado': trabajo.terminado}
+    if trabajo.estado == TrabajoReporte.COMPLETADO:
+        datos['url_descarga'] = reverse('dashboard_reporte_pdf_descargar', args=[trabajo.pk])
+    elif trabajo.estado == TrabajoReporte.ERROR:
+        datos['error'] = 'No fue posible generar el reporte'
+    return JsonResponse(datos)
+
+
+@login_required
+def descargar_reporte_pdf(request, trabajo_id):
+    from reportes.models import TrabajoReporte
+
+    trabajo = get_object_or_404(
+        TrabajoReporte.objects.select_related('reporte'),
+        pk=trabajo_id, usuario=request.user, estado=TrabajoReporte.COMPLETADO,
+    )
+    if trabajo.reporte is None:
+        raise Http404('Reporte no encontrado')
+    ruta = ruta_absoluta(trabajo.reporte.ruta_archivo)
+    if not os.path.exists(ruta):
+        raise Http404('Archivo no encontrado')
+    return FileResponse(open(ruta, 'rb'), content_type='application/pdf', filename=trabajo.reporte.nombre_archivo)
 
+
+@login_required
 def dashboard_pdf_report(request):
-    from django.db.models import Count, Q
+    parametros = parametros_reporte(request.GET)
+    if request.GET.get('preview') == '1':
+        from django.template.loader import render_to_string
+        return HttpResponse(render_to_string('dashboard/reporte_pdf.html', contexto_reporte_dashboard(request.user, parametros)))
+
+    try:
+        reporte = generar_reporte_dashboard_pdf(request.user, parametros)
+    except ErrorGeneracionPDF:
+        return HttpResponse('Error al generar el PDF', status=500)
+    with open(ruta_absoluta(reporte.ruta_archivo), 'rb') as f:
+        response = HttpResponse(f.read(), content_type='application/pdf')
+    response['Content-Disposition'] = f'inline; filename="{reporte.nombre_archivo}"'
+    return response
+
+
+def contexto_reporte_dashboard(user, parametros):
+    """Contexto del template dashboard/reporte_pdf.html para los filtros dados."""
     # Importar utilidades dentro de la función para evitar errores de importación
     from core.utils.region_metrics import get_region_metrics
     from core.utils.cumplimiento_constructora import get_cumplimiento_plazos_por_constructora
+    from core.utils.dashboard_metrics import DashboardMetrics, desempeno_equipo
+    from core.utils.metricas_diarias import metricas_filtradas
+    from core.utils.graficos import grafico
 
     # Reutilizar la lógica del dashboard
-    region_id = request.GET.get('region')
-    estado_id = request.GET.get('estado')
-    fecha_inicio = request.GET.get('fecha_inicio')
-    fecha_fin = request.GET.get('fecha_fin')
+    region_id = parametros.get('region')
+    estado_id = parametros.get('estado')
+    fecha_inicio = parametros.get('fecha_inicio')
+    fecha_fin = parametros.get('fecha_fin')
 
     metrics_region = get_region_metrics(region_id=region_id, estado=estado_id, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
     cumplimiento_constructoras = get_cumplimiento_plazos_por_constructora(region_id=region_id, estado=estado_id, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
@@ -25,14 +114,8 @@ def dashboard_pdf_report(request):
     from incidencias.models import Observacion
     from core.models import Region
     from datetime import datetime
-    # Obtener nombre de usuario compatible con modelo personalizado
-    user = request.user
-    if hasattr(user, 'first_name') and hasattr(user, 'last_name'):
-        nombre = f"{user.first_name} {user.last_name}".strip()
-        usuario_reporte = nombre if nombre else (getattr(user, 'username', None) or getattr(user, 'email', 'Usuario'))
-    else:
-        usuario_reporte = getattr(user, 'username', None) or getattr(user, 'email', 'Usuario')
-    periodo_reporte = request.GET.get('periodo', '') or datetime.now().strftime('%B %Y')
+    from django.utils import timezone
+    periodo_reporte = parametros.get('periodo') or datetime.now().strftime('%B %Y')
     region_nombre = Region.objects.get(id=region_id).nombre if region_id else 'Todas'
 
     # Filtrar por región si corresponde
@@ -52,28 +135,31 @@ def dashboard_pdf_report(request):
         viviendas_qs = viviendas_qs.filter(proyecto__fecha_creacion__date__lte=fecha_fin)
         obs_qs = obs_qs.filter(fecha_creacion__date__lte=fecha_fin)
 
-    proyectos_total = proyectos_qs.count()
-    viviendas_total = viviendas_qs.count()
-    obs_total = obs_qs.count()
-    fecha_reporte = datetime.now().strftime('%d/%m/%Y %H:%M')
+    metrics = DashboardMetrics(
+        proyectos=proyectos_qs,
+        viviendas=viviendas_qs,
+        observaciones=obs_qs,
+        metricas=metricas_filtradas(region_id=region_id, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, solo_activas=True),
+    )
+    resumen = metrics.resumen()
+    proyectos_total = resumen.total_proyectos
+    viviendas_total = resumen.viviendas_total
+    obs_total = resumen.obs_total
+    # El archivo se comparte entre usuarios con el mismo alcance (core.utils.cache_reportes):
+    # el contenido no incluye al solicitante ni la hora de generación, sino la fecha de los datos
+    fecha_version = fecha_version_datos()
+    fecha_datos = timezone.localtime(fecha_version).strftime('%d/%m/%Y %H:%M') if fecha_version else 'Sin cambios registrados'
 
 
     # KPIs principales
-    viviendas_entregadas = viviendas_qs.filter(estado='entregada').count()
-    porc_viviendas_entregadas = round((viviendas_entregadas / viviendas_total) * 100, 1) if viviendas_total else 0
-    casos_postventa_abiertos = obs_qs.filter(estado__nombre='Abierta').count()
+    viviendas_entregadas = resumen.viviendas_entregadas
+    porc_viviendas_entregadas = resumen.porc_viviendas_entregadas
+    casos_postventa_abiertos = resumen.obs_abiertas
     # Tiempo promedio de resolución (en días)
-    from django.db.models import F, ExpressionWrapper, DurationField, Avg
-    obs_cerradas = obs_qs.filter(estado__nombre='Cerrada', fecha_cierre__isnull=False, fecha_creacion__isnull=False)
-    if obs_cerradas.exists():
-        expr = ExpressionWrapper(F('fecha_cierre') - F('fecha_creacion'), output_field=DurationField())
-        promedio = obs_cerradas.annotate(duracion=expr).aggregate(prom=Avg('duracion'))['prom']
-        tiempo_promedio_resolucion = int(promedio.total_seconds() // 86400) if promedio else 0
-    else:
-        tiempo_promedio_resolucion = 0
+    tiempo_promedio_resolucion = resumen.tiempo_promedio_resolucion or 0
     # Familias acompañadas: viviendas con beneficiario
-    familias_acompañadas = viviendas_qs.exclude(beneficiario__isnull=True).count()
-    porc_familias_acompañadas = round((familias_acompañadas / viviendas_total) * 100, 1) if viviendas_total else 0
+    familias_acompañadas = resumen.viviendas_asignadas
+    porc_familias_acompañadas = resumen.porc_viviendas_asignadas
     tasa_cumplimiento = cumplimiento_constructoras['global']
     kpi = {
         'total_viviendas': viviendas_total,
@@ -87,25 +173,18 @@ def dashboard_pdf_report(request):
     }
 
     # Estados de vivienda
-    estados_vivienda = viviendas_qs.values('estado').annotate(cantidad=Count('id')).order_by('-cantidad')
     total_viv = viviendas_total
     tabla_estado_vivienda = []
-    for ev in estados_vivienda:
+    for ev in metrics.estados_vivienda():
         nombre = ev['estado'].capitalize() if ev['estado'] else 'Sin estado'
         cantidad = ev['cantidad']
         porcentaje = round((cantidad / total_viv) * 100, 1) if total_viv else 0
         tabla_estado_vivienda.append({'nombre': nombre, 'cantidad': cantidad, 'porcentaje': porcentaje})
-    grafico_estado_vivienda = ''  # Puedes generar imagen si lo deseas
+    grafico_estado_vivienda = grafico('torta', [[e['nombre'], e['cantidad']] for e in tabla_estado_vivienda if e['cantidad']])
 
     # Diagnóstico técnico - Observaciones por tipo
-    tipos_obs = obs_qs.values('tipo__nombre').annotate(
-        totales=Count('id'),
-        cerrados=Count('id', filter=Q(estado__nombre='Cerrada')),
-        pendientes=Count('id', filter=Q(estado__nombre='Abierta')),
-        tiempo_promedio=Avg(ExpressionWrapper(F('fecha_cierre') - F('fecha_creacion'), output_field=DurationField()), filter=Q(estado__nombre='Cerrada', fecha_cierre__isnull=False, fecha_creacion__isnull=False))
-    ).order_by('-totales')
     tabla_observaciones = []
-    for t in tipos_obs:
+    for t in metrics.observaciones_por_tipo():
         if t['tiempo_promedio']:
             dias = int(t['tiempo_promedio'].total_seconds() // 86400)
         else:
@@ -117,24 +196,25 @@ def dashboard_pdf_report(request):
             'pendientes': t['pendientes'],
             'tiempo_promedio': f"{dias} días" if dias != '-' else '-',
         })
-    grafico_observaciones_tipo = ''
+    grafico_observaciones_tipo = grafico('barras', tabla_observaciones and {
+        'categorias': [o['tipo'] for o in tabla_observaciones],
+        'series': [['Cerrados', [o['cerrados'] for o in tabla_observaciones]], ['Pendientes', [o['pendientes'] for o in tabla_observaciones]]],
+    })
 
     # Tendencias temporales (casos abiertos/cerrados por mes)
-    from django.db.models.functions import TruncMonth
-    obs_mes = obs_qs.annotate(mes=TruncMonth('fecha_creacion')).values('mes').annotate(
-        abiertos=Count('id', filter=Q(estado__nombre='Abierta')),
-        cerrados=Count('id', filter=Q(estado__nombre='Cerrada'))
-    ).order_by('mes')
     tabla_tendencia_mensual = []
     prev_cerrados = 0
-    for m in obs_mes:
+    for m in metrics.tendencia_mensual():
         nombre = m['mes'].strftime('%B') if m['mes'] else 'Sin mes'
         abiertos = m['abiertos']
         cerrados = m['cerrados']
         variacion = cerrados - prev_cerrados
         tabla_tendencia_mensual.append({'nombre': nombre, 'abiertos': abiertos, 'cerrados': cerrados, 'variacion': f"{variacion:+d}"})
         prev_cerrados = cerrados
-    grafico_tendencia_mensual = ''
+    grafico_tendencia_mensual = grafico('lineas', tabla_tendencia_mensual and {
+        'categorias': [m['nombre'] for m in tabla_tendencia_mensual],
+        'series': [['Abiertos', [m['abiertos'] for m in tabla_tendencia_mensual]], ['Cerrados', [m['cerrados'] for m in tabla_tendencia_mensual]]],
+    })
 
     # Desempeño regional
     tabla_regional = []
@@ -150,31 +230,23 @@ def dashboard_pdf_report(request):
                 'satisfaccion': '-',  # Puedes calcular si tienes encuestas
                 'estado': '-',        # Se puede calcular con reglas abajo
             })
-    grafico_mapa_calor = ''
+    grafico_mapa_calor = grafico('mapa_calor', tabla_regional and {
+        'filas': [r['region'] for r in tabla_regional],
+        'columnas': ['Total', 'Entregadas', 'Casos'],
+        'valores': [[r['total'], r['entregadas'], r['casos']] for r in tabla_regional],
+    })
 
     # Desempeño del equipo (por técnico/coordinador)
-    from django.contrib.auth import get_user_model
-    User = get_user_model()
-    tecnicos = User.objects.filter(is_active=True, rol__nombre__in=['TECNICO', 'COORDINADOR'])
-    tabla_equipo = []
-    for t in tecnicos:
-        asignados = obs_qs.filter(asignado_a=t).count()
-        cerrados = obs_qs.filter(asignado_a=t, estado__nombre='Cerrada').count()
-        tasa_cierre = round((cerrados / asignados) * 100, 1) if asignados else 0
-        tiempo_promedio = '-'
-        obs_cerradas = obs_qs.filter(asignado_a=t, estado__nombre='Cerrada', fecha_cierre__isnull=False, fecha_creacion__isnull=False)
-        if obs_cerradas.exists():
-            expr = ExpressionWrapper(F('fecha_cierre') - F('fecha_creacion'), output_field=DurationField())
-            promedio = obs_cerradas.annotate(duracion=expr).aggregate(prom=Avg('duracion'))['prom']
-            if promedio:
-                tiempo_promedio = f"{int(promedio.total_seconds() // 86400)} días"
-        tabla_equipo.append({
-            'nombre': t.get_full_name() if hasattr(t, 'get_full_name') else (t.first_name + ' ' + t.last_name).strip() or t.username,
-            'asignados': asignados,
-            'cerrados': cerrados,
-            'tasa_cierre': f"{tasa_cierre}%",
-            'tiempo_promedio': tiempo_promedio,
-        })
+    tabla_equipo = [
+        {
+            'nombre': t['nombre'],
+            'asignados': t['asignados'],
+            'cerrados': t['cerrados'],
+            'tasa_cierre': f"{t['tasa_cierre']}%",
+            'tiempo_promedio': f"{t['tiempo_promedio']} días" if t['tiempo_promedio'] is not None else '-',
+        }
+        for t in desempeno_equipo(obs_qs)
+    ]
 
     # Satisfacción (si tienes encuestas, aquí solo placeholder)
     satisfaccion_promedio = '-'
@@ -268,9 +340,8 @@ def dashboard_pdf_report(request):
     conclusiones_list = conclusiones if conclusiones else ['Sin conclusiones ejecutivas.']
 
     context = {
-        'usuario_reporte': usuario_reporte,
         'periodo_reporte': periodo_reporte,
-        'fecha_reporte': fecha_reporte,
+        'fecha_datos': fecha_datos,
         'region_nombre': region_nombre,
         'fecha_inicio': fecha_inicio,
         'fecha_fin': fecha_fin,
@@ -306,77 +377,52 @@ def dashboard_pdf_report(request):
         'conclusiones': conclusiones_list,
     }
 
-    from django.template.loader import render_to_string
-    html_string = render_to_string('dashboard/reporte_pdf.html', context)
-    if request.GET.get('preview') == '1':
-        from django.http import HttpResponse
-        return HttpResponse(html_string)
-
-    # Usar xhtml2pdf en lugar de WeasyPrint para compatibilidad con Windows
-    from django.http import HttpResponse
-    from io import BytesIO
-    from xhtml2pdf import pisa
-    import os
-    from datetime import datetime, timedelta
-    from reportes.models import ReporteGenerado
-    
-    # Generar PDF con xhtml2pdf
-    pdf_buffer = BytesIO()
-    pisa_status = pisa.CreatePDF(html_string, dest=pdf_buffer)
-    if pisa_status.err:
-        return HttpResponse('Error al generar el PDF', status=500)
-    pdf = pdf_buffer.getvalue()
-    pdf_buffer.close()
+    return context
+
+
+def _parametros_con_periodo(parametros):
+    # El período por defecto (mes actual) forma parte del contenido del reporte
+    from datetime import datetime
+    return {**parametros, 'periodo': parametros.get('periodo') or datetime.now().strftime('%B %Y')}
+
+
+def buscar_reporte_dashboard_pdf(usuario, parametros):
+    """Reporte ya generado para el mismo contenido (filtros, alcance y versión de datos), o None."""
+    from core.utils import cache_reportes
+    from reportes.models import TrabajoReporte
+
+    clave = cache_reportes.clave_reporte(TrabajoReporte.TIPO_DASHBOARD_PDF, usuario, _parametros_con_periodo(parametros))
+    return cache_reportes.buscar(clave)
+
 
-    # Definir filtros relevantes para identificar duplicados
+def generar_reporte_dashboard_pdf(usuario, parametros):
+    """
+    Renderiza el reporte ejecutivo con el motor pedido en ``parametros['engine']``
+    (core.utils.pdf_dashboard) y lo guarda en la caché de reportes
+    (core.utils.cache_reportes). Si ya existe un archivo para el mismo
+    contenido, lo retorna sin volver a renderizar.
+
+    Lo usan la vista síncrona y el comando procesar_reportes.
+    """
+    from django.utils import timezone
+
+    from core.utils import cache_reportes, pdf_dashboard
+    from reportes.models import TrabajoReporte
+
+    parametros = _parametros_con_periodo(parametros)
+    clave = cache_reportes.clave_reporte(TrabajoReporte.TIPO_DASHBOARD_PDF, usuario, parametros)
+    reporte = cache_reportes.buscar(clave)
+    if reporte:
+        return reporte
+
+    contenido = pdf_dashboard.renderizar(contexto_reporte_dashboard(usuario, parametros), parametros.get('engine') or MOTOR_HTML)
+
+    # Filtros que se muestran en el listado de reportes generados
     filtros_dict = {
-        'region': region_id,
-        'estado': estado_id,
-        'fecha_inicio': fecha_inicio,
-        'fecha_fin': fecha_fin,
+        'region': parametros.get('region'),
+        'estado': parametros.get('estado'),
+        'fecha_inicio': parametros.get('fecha_inicio'),
+        'fecha_fin': parametros.get('fecha_fin'),
     }
-    usuario = request.user if request.user.is_authenticated else None
-
-    # Buscar si ya existe un reporte igual en los últimos 10 minutos
-    ahora = datetime.now()
-    hace_10min = ahora - timedelta(minutes=10)
-    reporte_existente = ReporteGenerado.objects.filter(
-        usuario=usuario,
-        filtros=filtros_dict,
-        fecha_generacion__gte=hace_10min
-    ).order_by('-fecha_generacion').first()
-
-    if reporte_existente:
-        # Usar el archivo ya generado
-        ruta_absoluta = os.path.join(os.path.dirname(os.path.dirname(__file__)), reporte_existente.ruta_archivo)
-        with open(ruta_absoluta, 'rb') as f:
-            pdf = f.read()
-        response = HttpResponse(pdf, content_type='application/pdf')
-        response['Content-Disposition'] = f'inline; filename="{reporte_existente.nombre_archivo}"'
-        return response
-
-    # Si no existe, generar uno nuevo
-    fecha_hora = ahora.strftime('%Y%m%d_%H%M')
-    filename = f"reporte_techoChile_{fecha_hora}.pdf"
-    response = HttpResponse(pdf, content_type='application/pdf')
-    response['Content-Disposition'] = f'inline; filename="{filename}"'
-
-    # Guardar PDF en carpeta local
-    ruta_reporte = os.path.join('reportes_generados', filename)
-    ruta_absoluta = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'reportes_generados', filename)
-    with open(ruta_absoluta, 'wb') as f:
-        f.write(pdf)
-
-    # Registrar metadatos en la base de datos
-    try:
-        ReporteGenerado.objects.create(
-            usuario=usuario,
-            nombre_archivo=filename,
-            ruta_archivo=ruta_reporte,
-            fecha_generacion=ahora,
-            filtros=filtros_dict
-        )
-    except Exception as e:
-        pass  # Si hay error, continuar igual
-
-    return response
+    filename = f"reporte_techoChile_{timezone.localtime().strftime('%Y%m%d_%H%M')}.pdf"
+    return cache_reportes.guardar(clave, contenido, usuario, filename, filtros_dict)
@@ -14,6 +14,7 @@ from .forms import FichaPostventaForm, FiltroFichasForm, ArchivoFichaForm, Busqu
 from proyectos.models import Vivienda, Proyecto
 from core.decorators import rol_requerido
 from core.models import Usuario
+from core.validators import normalizar_rut
 import json
 from io import BytesIO
 
@@ -415,7 +416,7 @@ def ajax_buscar_beneficiario(request):
         from proyectos.models import Beneficiario
         
         # Buscar beneficiario por RUT
-        beneficiario = Beneficiario.objects.filter(rut=rut, activo=True).first()
+        beneficiario = Beneficiario.objects.filter(rut_normalizado=normalizar_rut(rut), activo=True).first()
         
         if not beneficiario:
             return JsonResponse({
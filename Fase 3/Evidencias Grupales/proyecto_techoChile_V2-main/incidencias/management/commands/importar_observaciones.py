@@ -1,12 +1,19 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
-from django.utils.dateparse import parse_datetime
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+import hashlib
+import numpy as np
 import pandas as pd
 import os
+import re
 from datetime import datetime
 import traceback
+from collections import Counter
 
 from core.models import Region, Comuna, Constructora
+from core.utils.ingesta_excel import leer_bloques
+from core.utils.metricas_diarias import dias_de_observaciones, marcar_dias_pendientes
 # TipologiaVivienda en el proyecto se llama TipologiaVivienda -> alias como Tipologia
 from proyectos.models import Proyecto, TipologiaVivienda as Tipologia, Vivienda, Recinto
 
@@ -14,6 +21,92 @@ from proyectos.models import Proyecto, TipologiaVivienda as Tipologia, Vivienda,
 User = get_user_model()
 from incidencias.models import TipoObservacion, EstadoObservacion, Observacion
 
+# Filas por bloque leído del Excel (una transacción por bloque) y por INSERT
+TAMANO_LOTE = 2000
+TAMANO_INSERCION = 500
+
+# Tipo de observación según palabras del elemento (la primera coincidencia gana)
+TIPOS_POR_ELEMENTO = [
+    ('Carpintería', ['puerta', 'ventana']),
+    ('Sanitario', ['wc', 'tina', 'lavamanos']),
+    ('Instalaciones', ['luz', 'enchufe']),
+    ('Terminaciones', ['pintura', 'piso', 'cielo']),
+]
+TIPO_POR_DEFECTO = 'General'
+
+# PV_ESTADO del Excel -> EstadoObservacion.nombre (cualquier otro valor: Abierta)
+ESTADOS_PV = {1: 'Cerrada', 99: 'Rechazada'}
+ESTADO_POR_DEFECTO = 'Abierta'
+
+# Campos que vienen del Excel: en --upsert se comparan y se actualizan solo estos
+CAMPOS_SINCRONIZADOS = (
+    'proyecto_id', 'vivienda_id', 'recinto_id', 'elemento', 'detalle', 'tipo_id', 'estado_id',
+    'es_urgente', 'prioridad',
+)
+
+
+def invalidar_caches():
+    """Lo que harían los signals de Observacion (core.signals) tras una escritura en bloque."""
+    from core.utils.cache_reportes import incrementar_version_datos
+    from core.utils.stats_cache import invalidar
+
+    incrementar_version_datos()
+    invalidar()
+
+
+def huella(valores):
+    """Hash del contenido de una observación: ``valores`` en el orden de CAMPOS_SINCRONIZADOS."""
+    return hashlib.sha1('\x1f'.join(map(str, valores)).encode('utf-8')).hexdigest()
+
+
+def _como_codigo(columna):
+    """Códigos numéricos del Excel como texto ('758.0' -> '758'); None si vienen vacíos o no son números."""
+    numeros = pd.to_numeric(columna, errors='coerce')
+    return numeros.map(lambda n: None if pd.isna(n) else str(int(n)))
+
+
+def preparar_observaciones(df):
+    """
+    Convierte las columnas PV_* del Excel a los valores de Observacion, por
+    columnas en vez de fila a fila. Descarta las filas sin PV_ID, PYTO_COD o
+    VDA_CODIGO. Devuelve un DataFrame con id_externo, codigo_proyecto,
+    codigo_vivienda, codigo_recinto, elemento, detalle, tipo, estado,
+    es_urgente, prioridad y fecha_creacion.
+    """
+    datos = pd.DataFrame({
+        'id_externo': _como_codigo(df['PV_ID']),
+        'codigo_vivienda': _como_codigo(df['VDA_CODIGO']),
+        'codigo_recinto': _como_codigo(df['RECINTO_COD']),
+    }, index=df.index)
+    proyecto = _como_codigo(df['PYTO_COD'])
+    validas = datos['id_externo'].notna() & proyecto.notna() & datos['codigo_vivienda'].notna()
+    datos, df = datos[validas].copy(), df[validas]
+    datos['codigo_proyecto'] = proyecto[validas] + '-' + df['PYTO_SIGLAS'].map(str)
+
+    datos['elemento'] = df['PV_ELEMENTO'].map(lambda v: '' if pd.isna(v) else str(v))
+    datos['detalle'] = df['PV_DESCRIPCION'].map(lambda v: '' if pd.isna(v) else str(v))
+
+    elemento = datos['elemento'].str.lower()
+    datos['tipo'] = np.select(
+        [elemento.str.contains('|'.join(map(re.escape, palabras))) for _, palabras in TIPOS_POR_ELEMENTO],
+        [nombre for nombre, _ in TIPOS_POR_ELEMENTO],
+        default=TIPO_POR_DEFECTO,
+    )
+
+    estado = np.trunc(pd.to_numeric(df['PV_ESTADO'], errors='coerce'))
+    datos['estado'] = estado.map(ESTADOS_PV).fillna(ESTADO_POR_DEFECTO)
+
+    datos['es_urgente'] = pd.to_numeric(df['PV_ESURGENTE'], errors='coerce').eq(1.0)
+    datos['prioridad'] = np.where(datos['es_urgente'], 'alta', 'media')
+
+    # Fechas sin zona horaria del Excel, en la hora local del proyecto
+    fechas = pd.to_datetime(df['PV_FECHAREGISTRO'], errors='coerce', format='mixed')
+    datos['fecha_creacion'] = fechas.dt.tz_localize(
+        timezone.get_current_timezone(), ambiguous='NaT', nonexistent='NaT'
+    )
+    return datos
+
+
 class Command(BaseCommand):
     help = 'Importa datos del Excel de observaciones de Techo Chile'
 
@@ -29,6 +122,17 @@ class Command(BaseCommand):
             action='store_true',
             help='Simula la importación sin escribir en la base de datos'
         )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=TAMANO_LOTE,
+            help=f'Filas del Excel leídas e importadas por bloque, en una transacción (por defecto {TAMANO_LOTE})'
+        )
+        parser.add_argument(
+            '--upsert',
+            action='store_true',
+            help='Actualiza las observaciones ya importadas (por id_externo) cuyo contenido cambió en el Excel'
+        )
 
     def handle(self, *args, **options):
         archivo = options['archivo']
@@ -38,26 +142,41 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f'El archivo {archivo} no existe'))
             return
 
+        bloque = 0
         try:
-            # Leer archivo Excel
-            self.stdout.write('Leyendo archivo Excel...')
-            df = pd.read_excel(archivo, sheet_name=0)
-            self.stdout.write(f'Archivo leído: {len(df)} registros')
-
             # Crear datos base (si corresponde)
             self.crear_datos_base(dry_run=dry_run)
+            contexto = self.contexto_observaciones(upsert=options['upsert'])
 
-            # Importar datos (pasamos dry_run para simular)
-            self.importar_proyectos(df, dry_run=dry_run)
-            self.importar_viviendas(df, dry_run=dry_run)
-            self.importar_recintos(df, dry_run=dry_run)
-            self.importar_observaciones(df, dry_run=dry_run)
+            # Leer el Excel por bloques e importar cada uno antes de leer el siguiente
+            self.stdout.write('Leyendo archivo Excel...')
+            registros = 0
+            for df in leer_bloques(archivo, tamano=options['lote']):
+                bloque += 1
+                registros += len(df)
+                self.stdout.write(f'Bloque leído: {len(df)} registros ({registros} en total)')
+
+                # Importar datos (pasamos dry_run para simular)
+                self.importar_proyectos(df, dry_run=dry_run)
+                self.importar_viviendas(df, dry_run=dry_run)
+                self.importar_recintos(df, dry_run=dry_run)
+                self.importar_observaciones(df, contexto, dry_run=dry_run)
+                self.stdout.write(f"Observaciones creadas: {contexto['resumen']['creadas']}")
+
+            self.resumen_observaciones(contexto, dry_run=dry_run)
 
             self.stdout.write(self.style.SUCCESS('Importación completada exitosamente'))
 
         except Exception:
             tb = traceback.format_exc()
-            self.stdout.write(self.style.ERROR('Error durante la importación:'))
+            if bloque:
+                # Cada bloque se guarda en su propia transacción: los anteriores ya quedaron importados
+                self.stdout.write(self.style.ERROR(
+                    f'Error durante la importación en el bloque {bloque} '
+                    f'(registros {registros - len(df) + 1} a {registros}); los bloques anteriores quedaron guardados:'
+                ))
+            else:
+                self.stdout.write(self.style.ERROR('Error durante la importación:'))
             self.stdout.write(self.style.ERROR(tb))
 
     def crear_datos_base(self, dry_run=False):
@@ -242,106 +361,204 @@ class Command(BaseCommand):
                 except Exception as e:
                     self.stdout.write(f'Error creando recinto: {e}')
 
-    def importar_observaciones(self, df, dry_run=False):
-        """Importar observaciones del Excel"""
-        self.stdout.write('Importando observaciones...')
+    def contexto_observaciones(self, upsert=False):
+        """Datos que se cargan una sola vez para todos los bloques de importar_observaciones.
 
-        # Obtener usuario por defecto
+        ``existentes`` son las observaciones ya importadas: con ``upsert``,
+        id_externo -> (pk, huella) en una sola consulta; sin él, el conjunto
+        de id_externo. Los bloques agregan lo que van importando.
+        """
         # Obtener el usuario importador por email
         try:
             usuario = User.objects.get(email='import@techo.org')
         except User.DoesNotExist:
             usuario = User.objects.create(email='import@techo.org', nombre='Importador Techo')
 
-        # Estados por defecto
-        estado_abierta = EstadoObservacion.objects.get(nombre='Abierta')
-        estado_cerrada = EstadoObservacion.objects.get(nombre='Cerrada')
-        estado_rechazada = EstadoObservacion.objects.get(nombre='Rechazada')
-
-        # Tipo por defecto
-        tipo_general = TipoObservacion.objects.get(nombre='General')
+        importadas = Observacion.objects.exclude(id_externo=None)
+        if upsert:
+            existentes = {}
+            for pk, id_externo, *valores in importadas.order_by('-id').values_list(
+                'id', 'id_externo', *CAMPOS_SINCRONIZADOS
+            ):
+                existentes[id_externo] = (pk, huella(valores))
+        else:
+            existentes = set(importadas.values_list('id_externo', flat=True))
+
+        return {
+            'usuario': usuario,
+            'upsert': upsert,
+            'existentes': existentes,
+            'tipos': dict(TipoObservacion.objects.order_by('-id').values_list('nombre', 'id')),
+            'estados': dict(EstadoObservacion.objects.filter(
+                nombre__in=[ESTADO_POR_DEFECTO, *ESTADOS_PV.values()]
+            ).values_list('nombre', 'id')),
+            'resumen': Counter(),
+        }
+
+    def importar_observaciones(self, df, contexto, dry_run=False):
+        """Importar en bloque las observaciones de un bloque del Excel.
+
+        Proyectos, viviendas y recintos del bloque se buscan en diccionarios
+        cargados con una consulta cada uno, y las filas se insertan con
+        bulk_create en una sola transacción.
+
+        Sin ``upsert`` las observaciones ya importadas se omiten. Con
+        ``upsert`` se comparan por huella de CAMPOS_SINCRONIZADOS y solo las
+        que cambiaron se actualizan con bulk_update.
+        """
+        existentes, tipos, estados = contexto['existentes'], contexto['tipos'], contexto['estados']
+        upsert, resumen = contexto['upsert'], contexto['resumen']
+
+        datos = preparar_observaciones(df)
+        resumen['invalidas'] += len(df) - len(datos)
+        datos = datos.drop_duplicates('id_externo')
+        if not upsert:
+            datos = datos[~datos['id_externo'].isin(existentes)]
+
+        # Proyecto por código
+        proyectos = dict(
+            Proyecto.objects.filter(codigo__in=datos['codigo_proyecto'].unique().tolist()).values_list('codigo', 'id')
+        )
+        datos = datos.assign(proyecto_id=datos['codigo_proyecto'].map(proyectos))
+        for codigo in datos.loc[datos['proyecto_id'].isna(), 'codigo_proyecto'].unique():
+            self.stdout.write(f'Proyecto no encontrado: {codigo}')
+        datos = datos[datos['proyecto_id'].notna()]
+        datos['proyecto_id'] = datos['proyecto_id'].astype('int64')
+
+        # Vivienda por (proyecto, código)
+        viviendas = {}
+        for vivienda_id, proyecto_id, codigo, tipologia_id in Vivienda.objects.filter(
+            proyecto_id__in=list(proyectos.values())
+        ).values_list('id', 'proyecto_id', 'codigo', 'tipologia_id'):
+            viviendas[f'{proyecto_id}|{codigo}'] = (vivienda_id, tipologia_id)
+        clave = datos['proyecto_id'].astype(str) + '|' + datos['codigo_vivienda']
+        datos['vivienda_id'] = clave.map(lambda c: viviendas.get(c, (None, None))[0])
+        datos['tipologia_id'] = clave.map(lambda c: viviendas.get(c, (None, None))[1])
+        resumen['sin_vivienda'] += int(datos['vivienda_id'].isna().sum())
+        datos = datos[datos['vivienda_id'].notna()]
+
+        # Recinto por (tipología de la vivienda, código); si el código es único basta con él
+        por_tipologia, por_codigo = {}, {}
+        for recinto_id, tipologia_id, codigo in Recinto.objects.values_list('id', 'tipologia_id', 'codigo'):
+            por_tipologia[f'{tipologia_id}|{codigo}'] = recinto_id
+            por_codigo[codigo] = None if codigo in por_codigo else recinto_id
+        recinto = (datos['tipologia_id'].astype('int64').astype(str) + '|' + datos['codigo_recinto']).map(por_tipologia)
+        datos['recinto_id'] = recinto.fillna(datos['codigo_recinto'].map(por_codigo))
+
+        # Tipos que falten: se crean una vez
+        for nombre in sorted(set(datos['tipo']) - set(tipos)):
+            if dry_run:
+                self.stdout.write(f'[dry-run] Tipo que se crearía: {nombre}')
+                tipos[nombre] = None
+            else:
+                tipos[nombre] = TipoObservacion.objects.create(nombre=nombre).id
+
+        ahora = timezone.now()
+        nuevas, cambiadas = [], []
+        for fila in datos.itertuples(index=False):
+            valores = {
+                'proyecto_id': int(fila.proyecto_id),
+                'vivienda_id': int(fila.vivienda_id),
+                'recinto_id': None if pd.isna(fila.recinto_id) else int(fila.recinto_id),
+                'elemento': fila.elemento[:100],  # Limitar longitud
+                'detalle': fila.detalle,
+                'tipo_id': tipos[fila.tipo],
+                'estado_id': estados[fila.estado],
+                'es_urgente': bool(fila.es_urgente),
+                'prioridad': fila.prioridad,
+            }
+            actual = existentes.get(fila.id_externo) if upsert else None
+            if actual is None:
+                fecha = ahora if pd.isna(fila.fecha_creacion) else fila.fecha_creacion.to_pydatetime()
+                nuevas.append(Observacion(id_externo=fila.id_externo, fecha_creacion=fecha, creado_por=contexto['usuario'], **valores))
+            elif actual[1] != huella(valores[campo] for campo in CAMPOS_SINCRONIZADOS):
+                # bulk_update no toca auto_now: se marca la fecha para la sincronización móvil
+                cambiadas.append(Observacion(pk=actual[0], fecha_ultima_actualizacion=ahora, **valores))
+            else:
+                resumen['sin_cambios'] += 1
 
-        observaciones_creadas = 0
+        if not dry_run:
+            try:
+                with transaction.atomic():
+                    self.escribir_observaciones(nuevas, cambiadas)
+            except DatabaseError as error:
+                # Una fila inválida no debe descartar el bloque: se reintenta fila por fila
+                self.stdout.write(f'Error al guardar el bloque ({error}); se reintenta fila por fila')
+                nuevas, cambiadas = self.escribir_fila_por_fila(nuevas, cambiadas, resumen)
+        resumen['creadas'] += len(nuevas)
+        resumen['actualizadas'] += len(cambiadas)
+
+        # Las filas repetidas en bloques siguientes ya cuentan como importadas
+        for obs in nuevas:
+            if upsert:
+                existentes[obs.id_externo] = (obs.pk, huella(getattr(obs, campo) for campo in CAMPOS_SINCRONIZADOS))
+            else:
+                existentes.add(obs.id_externo)
 
-        for _, row in df.iterrows():
-            if pd.notna(row['PV_ID']) and pd.notna(row['PYTO_COD']) and pd.notna(row['VDA_CODIGO']):
+    def escribir_observaciones(self, nuevas, cambiadas):
+        """
+        Inserta y actualiza en bloque; se llama dentro de una transacción.
+        bulk_create/bulk_update no disparan signals (core.signals): al
+        confirmarse la transacción se invalidan a mano las cachés, así cada
+        bloque guardado queda visible aunque un bloque posterior falle.
+        """
+        Observacion.objects.bulk_create(nuevas, batch_size=TAMANO_INSERCION)
+        Observacion.objects.bulk_update(
+            cambiadas, [*CAMPOS_SINCRONIZADOS, 'fecha_ultima_actualizacion'], batch_size=TAMANO_INSERCION
+        )
+        if not nuevas and not cambiadas:
+            return
+        # Días del snapshot de métricas a recalcular
+        marcar_dias_pendientes(
+            {timezone.localdate(obs.fecha_creacion) for obs in nuevas}
+            | dias_de_observaciones(Observacion.objects.filter(pk__in=[obs.pk for obs in cambiadas]))
+        )
+        transaction.on_commit(invalidar_caches)
+
+    def escribir_fila_por_fila(self, nuevas, cambiadas, resumen):
+        """Reintento de ``escribir_observaciones`` con un savepoint por fila; retorna las filas guardadas."""
+        guardadas_nuevas, guardadas_cambiadas = [], []
+        with transaction.atomic():
+            for obs, es_nueva in [(obs, True) for obs in nuevas] + [(obs, False) for obs in cambiadas]:
+                if es_nueva:
+                    # El bulk_create fallido pudo asignar pk a parte del bloque
+                    obs.pk, obs._state.adding = None, True
                 try:
-                    # Buscar proyecto y vivienda por proyecto_id para evitar cargar campos Decimal
-                    codigo_proyecto = f"{int(row['PYTO_COD'])}-{row['PYTO_SIGLAS']}"
-                    proyecto_id = Proyecto.objects.filter(codigo=codigo_proyecto).values_list('id', flat=True).first()
-                    if not proyecto_id:
-                        self.stdout.write(f'Proyecto no encontrado: {codigo_proyecto}')
-                        continue
-                    vivienda = Vivienda.objects.get(codigo=str(int(row['VDA_CODIGO'])), proyecto_id=proyecto_id)
-
-                    # Buscar recinto si existe
-                    recinto = None
-                    if pd.notna(row['RECINTO_COD']):
-                        try:
-                            recinto = Recinto.objects.get(codigo=str(int(row['RECINTO_COD'])))
-                        except Recinto.DoesNotExist:
-                            pass
-
-                    # Mapear estado
-                    estado = estado_abierta  # Por defecto
-                    if pd.notna(row['PV_ESTADO']):
-                        if int(row['PV_ESTADO']) == 1:
-                            estado = estado_cerrada
-                        elif int(row['PV_ESTADO']) == 99:
-                            estado = estado_rechazada
-
-                    # Parsear fecha
-                    fecha_creacion = None
-                    if pd.notna(row['PV_FECHAREGISTRO']):
-                        try:
-                            fecha_creacion = parse_datetime(str(row['PV_FECHAREGISTRO']))
-                        except:
-                            fecha_creacion = datetime.now()
-
-                    # Determinar tipo de observación basado en elemento
-                    tipo = tipo_general
-                    elemento = str(row['PV_ELEMENTO']) if pd.notna(row['PV_ELEMENTO']) else ''
-
-                    if any(x in elemento.lower() for x in ['puerta', 'ventana']):
-                        tipo, _ = TipoObservacion.objects.get_or_create(nombre='Carpintería')
-                    elif any(x in elemento.lower() for x in ['wc', 'tina', 'lavamanos']):
-                        tipo, _ = TipoObservacion.objects.get_or_create(nombre='Sanitario')
-                    elif any(x in elemento.lower() for x in ['luz', 'enchufe']):
-                        tipo, _ = TipoObservacion.objects.get_or_create(nombre='Instalaciones')
-                    elif any(x in elemento.lower() for x in ['pintura', 'piso', 'cielo']):
-                        tipo, _ = TipoObservacion.objects.get_or_create(nombre='Terminaciones')
-
-                    # Crear observación (verificar existencia por id_externo)
-                    id_externo = str(int(row['PV_ID']))
-                    existe = Observacion.objects.filter(id_externo=id_externo).exists()
-                    if not existe:
-                        if dry_run:
-                            observaciones_creadas += 1
-                            if observaciones_creadas % 100 == 0:
-                                self.stdout.write(f'[dry-run] Observaciones que se crearían: {observaciones_creadas}')
-                        else:
-                            observacion = Observacion.objects.create(
-                                id_externo=id_externo,
-                                proyecto_id=proyecto_id,
-                                vivienda=vivienda,
-                                recinto=recinto,
-                                elemento=elemento[:100],  # Limitar longitud
-                                detalle=str(row['PV_DESCRIPCION']) if pd.notna(row['PV_DESCRIPCION']) else '',
-                                tipo=tipo,
-                                estado=estado,
-                                es_urgente=row['PV_ESURGENTE'] == 1.0 if pd.notna(row['PV_ESURGENTE']) else False,
-                                fecha_creacion=fecha_creacion or datetime.now(),
-                                creado_por=usuario,
-                                prioridad='alta' if row['PV_ESURGENTE'] == 1.0 else 'media'
-                            )
-                            observaciones_creadas += 1
-                            if observaciones_creadas % 100 == 0:
-                                self.stdout.write(f'Observaciones creadas: {observaciones_creadas}')
+                    with transaction.atomic():
+                        self.escribir_observaciones([obs] if es_nueva else [], [] if es_nueva else [obs])
+                except DatabaseError as error:
+                    resumen['con_error'] += 1
+                    self.stdout.write(f'Error guardando observación {obs.id_externo or obs.pk}: {error}')
+                    continue
+                (guardadas_nuevas if es_nueva else guardadas_cambiadas).append(obs)
+        return guardadas_nuevas, guardadas_cambiadas
+
+    def resumen_observaciones(self, contexto, dry_run=False):
+        """Mensajes finales de importar_observaciones."""
+        resumen = contexto['resumen']
+        if resumen['invalidas'] or resumen['sin_vivienda']:
+            self.stdout.write(
+                f"Filas omitidas: {resumen['invalidas']} sin PV_ID/PYTO_COD/VDA_CODIGO, "
+                f"{resumen['sin_vivienda']} sin vivienda"
+            )
 
-                except Exception as e:
-                    self.stdout.write(f'Error creando observación {row["PV_ID"]}: {e}')
+        if dry_run:
+            self.stdout.write(f"[dry-run] Observaciones que se crearían: {resumen['creadas']}")
+            if contexto['upsert']:
+                self.stdout.write(
+                    f"[dry-run] Observaciones que se actualizarían: {resumen['actualizadas']} "
+                    f"({resumen['sin_cambios']} sin cambios)"
+                )
+            return
 
-        self.stdout.write(f'Total observaciones creadas: {observaciones_creadas}')
+        self.stdout.write(f"Total observaciones creadas: {resumen['creadas']}")
+        if resumen['con_error']:
+            self.stdout.write(self.style.WARNING(f"Observaciones con error (no guardadas): {resumen['con_error']}"))
+        if contexto['upsert']:
+            self.stdout.write(
+                f"Upsert: {resumen['creadas']} insertadas, {resumen['actualizadas']} actualizadas, "
+                f"{resumen['sin_cambios']} sin cambios"
+            )
 
     def obtener_usuario_email(self, email):
         """Obtener o crear usuario por email"""
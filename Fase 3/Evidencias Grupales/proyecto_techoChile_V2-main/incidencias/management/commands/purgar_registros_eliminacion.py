@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.utils.sincronizacion import RETENCION_TOKEN, purgar_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        'Elimina los tombstones de la sincronización móvil (RegistroEliminacion) más '
+        'antiguos que la retención de los tokens. Los clientes con tokens más antiguos '
+        'ya hacen una carga completa. Pensado para ejecutarse a diario (cron).'
+    )
+
+    def handle(self, *args, **options):
+        eliminados = purgar_tombstones()
+        if eliminados == 0:
+            self.stdout.write(self.style.WARNING('No hay registros de eliminación para purgar'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ {eliminados} registro(s) de eliminación con más de {RETENCION_TOKEN.days} días purgado(s)'
+            ))
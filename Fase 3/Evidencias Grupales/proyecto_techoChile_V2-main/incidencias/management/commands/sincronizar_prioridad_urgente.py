@@ -1,25 +1,38 @@
 from django.core.management.base import BaseCommand
+from django.utils import timezone
 from incidencias.models import Observacion
 
 class Command(BaseCommand):
     help = 'Sincroniza el campo es_urgente con prioridad=urgente en todas las observaciones'
 
     def handle(self, *args, **options):
+        # update() no toca auto_now: se marca la fecha para la sincronización móvil
+        ahora = timezone.now()
+
         # Sincronizar: si es_urgente=True entonces prioridad='urgente'
         actualizadas_urgente = Observacion.objects.filter(
             es_urgente=True
         ).exclude(
             prioridad='urgente'
-        ).update(prioridad='urgente')
+        ).update(prioridad='urgente', fecha_ultima_actualizacion=ahora)
         
         # Sincronizar: si prioridad='urgente' entonces es_urgente=True
-        actualizadas_flag = Observacion.objects.filter(
+        sin_flag = Observacion.objects.filter(
             prioridad='urgente'
         ).exclude(
             es_urgente=True
-        ).update(es_urgente=True)
+        )
+        # es_urgente entra en el snapshot de métricas: sus días quedan pendientes
+        from core.utils.metricas_diarias import dias_de_observaciones, marcar_dias_pendientes
+        dias = dias_de_observaciones(sin_flag)
+        actualizadas_flag = sin_flag.update(es_urgente=True, fecha_ultima_actualizacion=ahora)
         
         total = actualizadas_urgente + actualizadas_flag
+        if total:
+            # update() no dispara signals: invalidar a mano la caché de reportes
+            from core.utils.cache_reportes import incrementar_version_datos
+            incrementar_version_datos()
+            marcar_dias_pendientes(dias)
         
         self.stdout.write(
             self.style.SUCCESS(f'✓ Sincronizadas {total} observación(es)')
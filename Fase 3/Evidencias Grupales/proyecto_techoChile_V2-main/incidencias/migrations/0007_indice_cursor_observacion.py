@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('incidencias', '0006_mejoras_seguridad_finales'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='observacion',
+            index=models.Index(fields=['-fecha_creacion', '-id'], name='obs_cursor_fecha_id_idx'),
+        ),
+    ]
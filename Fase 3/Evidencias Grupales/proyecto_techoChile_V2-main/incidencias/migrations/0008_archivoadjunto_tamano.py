@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:05
+
+from django.db import migrations, models
+
+
+def poblar_tamano(apps, schema_editor):
+    ArchivoAdjuntoObservacion = apps.get_model('incidencias', 'ArchivoAdjuntoObservacion')
+    pendientes = []
+    for adjunto in ArchivoAdjuntoObservacion.objects.exclude(archivo='').only('id', 'archivo').iterator():
+        try:
+            adjunto.tamano = adjunto.archivo.size
+        except (OSError, ValueError):
+            # Archivo ausente en el almacenamiento: queda en 0
+            continue
+        pendientes.append(adjunto)
+    ArchivoAdjuntoObservacion.objects.bulk_update(pendientes, ['tamano'], batch_size=500)
+
+
+def noop_reverse(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('incidencias', '0007_indice_cursor_observacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivoadjuntoobservacion',
+            name='tamano',
+            field=models.PositiveBigIntegerField(default=0, help_text='Tamaño en bytes (evita consultar el sistema de archivos)'),
+        ),
+        migrations.RunPython(poblar_tamano, noop_reverse),
+    ]
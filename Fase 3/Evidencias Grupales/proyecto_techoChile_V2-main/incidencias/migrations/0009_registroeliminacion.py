@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('incidencias', '0008_archivoadjunto_tamano'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroEliminacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(choices=[('observacion', 'Observación'), ('seguimiento', 'Seguimiento'), ('archivo', 'Archivo adjunto')], max_length=20)),
+                ('objeto_id', models.BigIntegerField()),
+                ('observacion_id', models.BigIntegerField()),
+                ('vivienda_id', models.BigIntegerField(blank=True, help_text='Para aplicar el alcance por rol', null=True)),
+                ('fecha', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Registro de Eliminación',
+                'verbose_name_plural': 'Registros de Eliminación',
+                'ordering': ['fecha'],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('incidencias', '0009_registroeliminacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registroeliminacion',
+            name='constructora_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='registroeliminacion',
+            name='proyecto_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='registroeliminacion',
+            name='rut_beneficiario',
+            field=models.CharField(blank=True, default='', help_text='RUT normalizado', max_length=12),
+        ),
+    ]
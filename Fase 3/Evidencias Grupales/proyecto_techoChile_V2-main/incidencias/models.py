@@ -1,6 +1,8 @@
 from django.db import models
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from proyectos.models import Proyecto, Vivienda, Recinto
 import os
 
@@ -99,6 +101,14 @@ class Observacion(models.Model):
     def __str__(self):
         return f"{self.proyecto.codigo} - {self.vivienda.codigo} - {self.elemento}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Fecha de creación guardada: si save() la cambia, el día anterior del
+        # snapshot de métricas también queda desactualizado (core.signals)
+        instancia._fecha_creacion_guardada = instancia.__dict__.get('fecha_creacion')
+        return instancia
+
     @property
     def esta_vencida(self):
         if self.fecha_vencimiento and self.estado.nombre == 'Abierta':
@@ -133,6 +143,7 @@ class Observacion(models.Model):
             models.Index(fields=["fecha_ultima_actualizacion"]),   # Ordenamiento temporal
             models.Index(fields=["prioridad", "es_urgente"]),      # Filtros de prioridad
             models.Index(fields=["creado_por", "fecha_creacion"]), # Historiales por usuario
+            models.Index(fields=["-fecha_creacion", "-id"], name="obs_cursor_fecha_id_idx"),  # Paginación por cursor
         ]
         # Validaciones de integridad
         constraints = [
@@ -158,13 +169,30 @@ class ArchivoAdjuntoObservacion(models.Model):
     )
     nombre_original = models.CharField(max_length=255, blank=True)
     descripcion = models.CharField(max_length=255, blank=True, help_text="Descripción opcional del archivo")
+    tamano = models.PositiveBigIntegerField(default=0, help_text="Tamaño en bytes (evita consultar el sistema de archivos)")
     fecha_subida = models.DateTimeField(auto_now_add=True)
     subido_por = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT)
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Nombre del archivo guardado, para detectar reemplazos en save()
+        instancia._archivo_guardado = instancia.__dict__.get('archivo')
+        return instancia
+
     def save(self, *args, **kwargs):
         if not self.nombre_original and self.archivo:
             self.nombre_original = self.archivo.name
+        if not self.archivo:
+            self.tamano = 0
+        elif not self.tamano or self.archivo.name != getattr(self, '_archivo_guardado', None):
+            # Archivo nuevo o reemplazado: el tamaño guardado ya no corresponde
+            try:
+                self.tamano = self.archivo.size
+            except (OSError, ValueError):
+                pass
         super().save(*args, **kwargs)
+        self._archivo_guardado = self.archivo.name
     
     def __str__(self):
         return f"{self.observacion.pk} - {self.nombre_original}"
@@ -199,3 +227,77 @@ class SeguimientoObservacion(models.Model):
             models.Index(fields=["usuario", "fecha"]),
         ]
         # Sin restricciones de estado por ahora para permitir flexibilidad
+
+
+class RegistroEliminacion(models.Model):
+    """
+    Tombstone de eliminaciones físicas, usado por la sincronización incremental
+    de la app móvil (/incidencias/movil/api/cambios/) para informar qué
+    registros borrar en el dispositivo.
+    """
+    MODELO_OBSERVACION = 'observacion'
+    MODELO_SEGUIMIENTO = 'seguimiento'
+    MODELO_ARCHIVO = 'archivo'
+    MODELO_CHOICES = [
+        (MODELO_OBSERVACION, 'Observación'),
+        (MODELO_SEGUIMIENTO, 'Seguimiento'),
+        (MODELO_ARCHIVO, 'Archivo adjunto'),
+    ]
+
+    modelo = models.CharField(max_length=20, choices=MODELO_CHOICES)
+    objeto_id = models.BigIntegerField()
+    # Sin FK: los registros referenciados ya no existen
+    observacion_id = models.BigIntegerField()
+    vivienda_id = models.BigIntegerField(null=True, blank=True, help_text="Para aplicar el alcance por rol")
+    # Copiados al eliminar: si se borra la vivienda o el proyecto en cascada, el
+    # alcance ya no puede resolverse a partir de vivienda_id
+    proyecto_id = models.BigIntegerField(null=True, blank=True)
+    constructora_id = models.BigIntegerField(null=True, blank=True)
+    rut_beneficiario = models.CharField(max_length=12, blank=True, default='', help_text="RUT normalizado")
+    fecha = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.modelo} {self.objeto_id} eliminado {self.fecha:%d/%m/%Y %H:%M}"
+
+    class Meta:
+        verbose_name = "Registro de Eliminación"
+        verbose_name_plural = "Registros de Eliminación"
+        ordering = ['fecha']
+
+
+def _alcance_eliminacion(viviendas):
+    """
+    Vivienda, proyecto, constructora y RUT del beneficiario para el tombstone.
+    En un borrado en cascada el Collector elimina primero los detalles, luego la
+    observación y al final la vivienda y el proyecto, así que aquí aún existen.
+    """
+    fila = viviendas.values('id', 'proyecto_id', 'proyecto__constructora_id', 'beneficiario__rut_normalizado').first()
+    if fila is None:
+        return {}
+    return {
+        'vivienda_id': fila['id'],
+        'proyecto_id': fila['proyecto_id'],
+        'constructora_id': fila['proyecto__constructora_id'],
+        'rut_beneficiario': fila['beneficiario__rut_normalizado'] or '',
+    }
+
+
+@receiver(post_delete, sender=Observacion)
+def registrar_eliminacion_observacion(sender, instance, **kwargs):
+    RegistroEliminacion.objects.create(
+        modelo=RegistroEliminacion.MODELO_OBSERVACION, objeto_id=instance.pk, observacion_id=instance.pk,
+        **_alcance_eliminacion(Vivienda.objects.filter(pk=instance.vivienda_id)),
+    )
+
+
+@receiver(post_delete, sender=SeguimientoObservacion)
+@receiver(post_delete, sender=ArchivoAdjuntoObservacion)
+def registrar_eliminacion_detalle(sender, instance, **kwargs):
+    modelo = (
+        RegistroEliminacion.MODELO_SEGUIMIENTO if sender is SeguimientoObservacion
+        else RegistroEliminacion.MODELO_ARCHIVO
+    )
+    RegistroEliminacion.objects.create(
+        modelo=modelo, objeto_id=instance.pk, observacion_id=instance.observacion_id,
+        **_alcance_eliminacion(Vivienda.objects.filter(observaciones__pk=instance.observacion_id)),
+    )
@@ -18,6 +18,7 @@ urlpatterns = [
     # URLs móviles
     path('movil/', views_movil.observaciones_movil, name='observaciones_movil'),
     path('movil/api/', views_movil.observaciones_api_movil, name='observaciones_api_movil'),
+    path('movil/api/cambios/', views_movil.cambios_api_movil, name='cambios_api_movil'),
     path('movil/cambiar-estado/<int:observacion_id>/', views_movil.cambiar_estado_movil, name='cambiar_estado_movil'),
     path('movil/actualizar-descripcion/<int:observacion_id>/', views_movil.actualizar_descripcion_movil, name='actualizar_descripcion_movil'),
     path('movil/descripcion-completa/<int:observacion_id>/', views_movil.obtener_descripcion_completa, name='obtener_descripcion_completa'),
@@ -55,7 +55,7 @@ def lista_observaciones(request):
     if es_familia:
         # Obtener vivienda del beneficiario por RUT o nombre
         if getattr(request.user, 'rut', None):
-            mi_vivienda = Vivienda.objects.filter(beneficiario__rut=request.user.rut).first()
+            mi_vivienda = Vivienda.objects.filter(beneficiario__rut_normalizado=request.user.rut_normalizado).first()
         else:
             mi_vivienda = Vivienda.objects.filter(
                 Q(beneficiario__nombre__icontains=request.user.nombre) |
@@ -179,11 +179,13 @@ def crear_observacion(request):
     # Si es familia Y NO es admin/techo, usar lógica especial
     if es_familia and not es_admin_o_techo:
         from django.db.models import Q
+        from core.utils.rut import filtro_rut_usuario
         
         # Buscar vivienda por RUT (más preciso) o por nombre (fallback)
-        if request.user.rut:
+        por_rut = filtro_rut_usuario(request.user, 'beneficiario__rut_normalizado')
+        if por_rut:
             # Búsqueda exacta por RUT (más confiable)
-            mi_vivienda = Vivienda.objects.filter(beneficiario__rut=request.user.rut).first()
+            mi_vivienda = Vivienda.objects.filter(por_rut).first()
         else:
             # Fallback: buscar por nombre si no tiene RUT (usuarios antiguos)
             mi_vivienda = Vivienda.objects.filter(
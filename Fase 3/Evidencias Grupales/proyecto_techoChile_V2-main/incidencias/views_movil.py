@@ -2,17 +2,23 @@
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
-from django.db.models import Q, Count
+from django.db.models import Q, Count, F, Prefetch, Window, prefetch_related_objects
+from django.db.models.functions import RowNumber
 from django.core.paginator import Paginator
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.utils import timezone
+import hashlib
 import json
 
-from .models import Observacion, EstadoObservacion, SeguimientoObservacion, TipoObservacion
+from .models import Observacion, EstadoObservacion, SeguimientoObservacion, TipoObservacion, ArchivoAdjuntoObservacion
 from proyectos.models import Proyecto, Vivienda
-from core.permisos import filtrar_observaciones_por_rol, puede_ver_observacion, puede_editar_observacion
+from core.utils import stats_cache
+from core.utils.cursor import paginar_por_cursor
+from core.permisos import (
+    filtrar_observaciones_por_rol, puede_ver_observacion, puede_editar_observacion, anotar_permisos_observaciones,
+)
 
 @login_required
 def observaciones_movil(request):
@@ -35,6 +41,89 @@ def observaciones_movil(request):
     
     return render(request, 'incidencias/observaciones_movil.html', context)
 
+def _prefetch_recientes(relacion, queryset, orden, to_attr, limite=3):
+    """
+    Prefetch de las ``limite`` filas más recientes por observación en una sola
+    consulta (ROW_NUMBER por observación); cada fila trae además el total de
+    su observación (COUNT como ventana), sin consultas por fila.
+    """
+    particion = {'partition_by': F('observacion_id')}
+    return Prefetch(
+        relacion,
+        queryset=queryset.annotate(
+            posicion=Window(RowNumber(), order_by=orden, **particion),
+            total_observacion=Window(Count('id'), **particion),
+        ).filter(posicion__lte=limite).order_by('observacion_id', 'posicion'),
+        to_attr=to_attr,
+    )
+
+
+def _total_prefetch(filas):
+    return filas[0].total_observacion if filas else 0
+
+
+def _serializar_observaciones(usuario, observaciones):
+    """Datos mínimos de cada observación para el listado móvil"""
+    observaciones_data = []
+    # Permisos evaluados en bloque para toda la página
+    observaciones = anotar_permisos_observaciones(usuario, observaciones)
+    # Archivos y comentarios recientes de toda la página: una consulta por relación
+    prefetch_related_objects(
+        observaciones,
+        _prefetch_recientes(
+            'archivos_adjuntos', ArchivoAdjuntoObservacion.objects.all(),
+            [F('fecha_subida').desc(), F('id').desc()], 'archivos_recientes',
+        ),
+        _prefetch_recientes(
+            'seguimientos', SeguimientoObservacion.objects.select_related('usuario'),
+            [F('fecha').desc(), F('id').desc()], 'seguimientos_recientes',
+        ),
+    )
+    for obs in observaciones:
+        archivos_data = [{
+            'id': archivo.id,
+            'nombre': archivo.nombre_original,
+            'url': archivo.archivo.url if archivo.archivo else None,
+            'tipo': archivo.archivo.name.split('.')[-1].lower() if archivo.archivo else 'unknown',
+            'tamaño': archivo.tamano,
+        } for archivo in obs.archivos_recientes]
+
+        # Seguimientos/comentarios recientes (últimos 3 para móvil)
+        comentarios_data = [{
+            'id': seg.id,
+            'accion': seg.accion,
+            'comentario': seg.comentario,
+            'fecha': seg.fecha.strftime('%d/%m/%Y %H:%M'),
+            'usuario': seg.usuario.nombre if seg.usuario else 'Sistema'
+        } for seg in obs.seguimientos_recientes]
+
+        observaciones_data.append({
+            'id': obs.id,
+            'elemento': obs.elemento,
+            'detalle': obs.detalle[:100] + '...' if len(obs.detalle) > 100 else obs.detalle,
+            'vivienda_codigo': obs.vivienda.codigo,
+            'proyecto_codigo': obs.vivienda.proyecto.codigo,
+            'estado': {
+                'id': obs.estado.id,
+                'nombre': obs.estado.nombre,
+                'codigo': obs.estado.codigo
+            },
+            'prioridad': obs.prioridad,
+            'es_urgente': obs.es_urgente,
+            'fecha_creacion': obs.fecha_creacion.strftime('%d/%m/%Y %H:%M'),
+            'creado_por': obs.creado_por.nombre if obs.creado_por else 'Sistema',
+            'puede_ver': obs.puede_ver,
+            'puede_editar': obs.puede_editar,
+            'puede_cambiar_estado': obs.puede_cambiar_estado,
+            'esta_vencida': obs.esta_vencida if hasattr(obs, 'esta_vencida') else False,
+            'total_archivos': _total_prefetch(obs.archivos_recientes),
+            'archivos': archivos_data,
+            'total_comentarios': _total_prefetch(obs.seguimientos_recientes),
+            'comentarios': comentarios_data
+        })
+    return observaciones_data
+
+
 @login_required
 def observaciones_api_movil(request):
     """API ligera para cargar observaciones en móvil"""
@@ -51,7 +140,7 @@ def observaciones_api_movil(request):
         
         # Query base optimizado - solo campos necesarios
         observaciones = Observacion.objects.select_related(
-            'vivienda__proyecto', 'estado', 'creado_por'
+            'vivienda__proyecto__constructora', 'vivienda__beneficiario', 'estado', 'creado_por'
         ).filter(activo=True)
         
         # Aplicar permisos por rol
@@ -74,59 +163,15 @@ def observaciones_api_movil(request):
         # Ordenar por fecha más reciente
         observaciones = observaciones.order_by('-fecha_creacion')
         
+        # Modo cursor (?cursor=): sin COUNT(*) ni OFFSET, la página N cuesta lo mismo que la 1
+        if 'cursor' in request.GET:
+            return _respuesta_por_cursor(request, observaciones, per_page)
+
         # Paginación
         paginator = Paginator(observaciones, per_page)
         page_obj = paginator.get_page(page)
         
-        # Serializar datos mínimos
-        observaciones_data = []
-        for obs in page_obj:
-            # Obtener archivos adjuntos
-            archivos = obs.archivos_adjuntos.all()[:3]  # Solo primeros 3 archivos para performance
-            archivos_data = []
-            for archivo in archivos:
-                archivos_data.append({
-                    'id': archivo.id,
-                    'nombre': archivo.nombre_original,
-                    'url': archivo.archivo.url if archivo.archivo else None,
-                    'tipo': archivo.archivo.name.split('.')[-1].lower() if archivo.archivo else 'unknown',
-                    'tamaño': archivo.archivo.size if archivo.archivo else 0
-                })
-            
-            # Obtener seguimientos/comentarios recientes (últimos 3 para móvil)
-            seguimientos = obs.seguimientos.select_related('usuario').order_by('-fecha')[:3]
-            comentarios_data = []
-            for seg in seguimientos:
-                comentarios_data.append({
-                    'id': seg.id,
-                    'accion': seg.accion,
-                    'comentario': seg.comentario,
-                    'fecha': seg.fecha.strftime('%d/%m/%Y %H:%M'),
-                    'usuario': seg.usuario.nombre if seg.usuario else 'Sistema'
-                })
-            
-            observaciones_data.append({
-                'id': obs.id,
-                'elemento': obs.elemento,
-                'detalle': obs.detalle[:100] + '...' if len(obs.detalle) > 100 else obs.detalle,
-                'vivienda_codigo': obs.vivienda.codigo,
-                'proyecto_codigo': obs.vivienda.proyecto.codigo,
-                'estado': {
-                    'id': obs.estado.id,
-                    'nombre': obs.estado.nombre,
-                    'codigo': obs.estado.codigo
-                },
-                'prioridad': obs.prioridad,
-                'es_urgente': obs.es_urgente,
-                'fecha_creacion': obs.fecha_creacion.strftime('%d/%m/%Y %H:%M'),
-                'creado_por': obs.creado_por.nombre if obs.creado_por else 'Sistema',
-                'puede_editar': puede_editar_observacion(request.user, obs),
-                'esta_vencida': obs.esta_vencida if hasattr(obs, 'esta_vencida') else False,
-                'total_archivos': obs.archivos_adjuntos.count(),
-                'archivos': archivos_data,
-                'total_comentarios': obs.seguimientos.count(),
-                'comentarios': comentarios_data
-            })
+        observaciones_data = _serializar_observaciones(request.user, page_obj)
         
         return JsonResponse({
             'observaciones': observaciones_data,
@@ -142,6 +187,100 @@ def observaciones_api_movil(request):
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
+
+def _respuesta_por_cursor(request, observaciones, per_page):
+    """Página por cursor sobre (fecha_creacion, id); el total es opcional (?total=1) y se cachea aparte"""
+    try:
+        filas, siguiente = paginar_por_cursor(observaciones, request.GET.get('cursor') or None, per_page)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    pagination = {
+        'next_cursor': siguiente,
+        'has_next': siguiente is not None,
+        'per_page': per_page,
+    }
+    if request.GET.get('total') in ('1', 'true'):
+        filtros = request.GET.copy()
+        filtros.pop('cursor', None)
+        filtros.pop('total', None)
+        alcance = 'movil_total:{}:{}'.format(
+            request.user.pk, hashlib.md5(filtros.urlencode().encode('utf-8')).hexdigest()
+        )
+        pagination['total_items'] = stats_cache.obtener(alcance, observaciones.count)
+
+    return JsonResponse({
+        'observaciones': _serializar_observaciones(request.user, filas),
+        'pagination': pagination,
+    })
+
+@login_required
+@require_http_methods(["GET"])
+def cambios_api_movil(request):
+    """
+    Sincronización incremental: observaciones, seguimientos y archivos creados,
+    modificados o eliminados desde ``?since=<token>``, dentro del alcance del rol.
+    Sin token se entrega solo un token nuevo y el cliente debe hacer la carga completa.
+    """
+    from core.permisos import ScopeResolver
+    from core.utils.sincronizacion import RETENCION_TOKEN, TokenInvalido, cambios_desde, codificar_token, decodificar_token
+    from .models import RegistroEliminacion
+
+    token = request.GET.get('since', '').strip()
+    if not token:
+        return JsonResponse({'token': codificar_token(timezone.now()), 'requiere_carga_completa': True})
+    try:
+        desde, posiciones = decodificar_token(token)
+    except TokenInvalido as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if timezone.now() - desde > RETENCION_TOKEN:
+        return JsonResponse({'token': codificar_token(timezone.now()), 'requiere_carga_completa': True})
+
+    alcance = ScopeResolver.para(request.user)
+    observaciones = alcance.filter_observaciones(
+        Observacion.objects.select_related(
+            'vivienda__proyecto__constructora', 'vivienda__beneficiario', 'estado', 'creado_por'
+        )
+    )
+    visibles = alcance.filter_observaciones(Observacion.objects.filter(activo=True)).values('id')
+    cambios = cambios_desde(
+        desde,
+        observaciones,
+        SeguimientoObservacion.objects.select_related('usuario', 'estado_anterior', 'estado_nuevo').filter(
+            observacion_id__in=visibles
+        ),
+        ArchivoAdjuntoObservacion.objects.filter(observacion_id__in=visibles),
+        alcance.filter_registros_eliminacion(RegistroEliminacion.objects.all()),
+        posiciones=posiciones,
+    )
+
+    return JsonResponse({
+        'token': cambios['token'],
+        'has_more': cambios['has_more'],
+        'observaciones': _serializar_observaciones(request.user, cambios['observaciones']),
+        'observaciones_eliminadas': cambios['eliminadas'],
+        'seguimientos': [{
+            'id': seg.id,
+            'observacion_id': seg.observacion_id,
+            'accion': seg.accion,
+            'comentario': seg.comentario,
+            'fecha': seg.fecha.strftime('%d/%m/%Y %H:%M'),
+            'usuario': seg.usuario.nombre if seg.usuario else 'Sistema',
+            'estado_anterior': seg.estado_anterior.nombre if seg.estado_anterior else None,
+            'estado_nuevo': seg.estado_nuevo.nombre if seg.estado_nuevo else None,
+            'activo': seg.activo,
+        } for seg in cambios['seguimientos']],
+        'archivos': [{
+            'id': archivo.id,
+            'observacion_id': archivo.observacion_id,
+            'nombre': archivo.nombre_original,
+            'url': archivo.archivo.url if archivo.archivo else None,
+            'tipo': archivo.archivo.name.split('.')[-1].lower() if archivo.archivo else 'unknown',
+            'tamaño': archivo.tamano,
+        } for archivo in cambios['archivos']],
+        'eliminados': cambios['tombstones'],
+    })
+
 @login_required
 @require_http_methods(["POST"])
 def cambiar_estado_movil(request, observacion_id):
@@ -427,9 +566,12 @@ def crear_observacion_movil(request):
     
     # Si es familia Y NO es admin/techo, usar lógica especial
     if es_familia and not es_admin_o_techo:
+        from core.utils.rut import filtro_rut_usuario
+
         # Buscar vivienda por RUT (más preciso) o por nombre (fallback)
-        if request.user.rut:
-            mi_vivienda = Vivienda.objects.filter(beneficiario__rut=request.user.rut).first()
+        por_rut = filtro_rut_usuario(request.user, 'beneficiario__rut_normalizado')
+        if por_rut:
+            mi_vivienda = Vivienda.objects.filter(por_rut).first()
         else:
             mi_vivienda = Vivienda.objects.filter(
                 Q(beneficiario__nombre__icontains=request.user.nombre) |
@@ -3,8 +3,21 @@ import pandas as pd
 from django.core.management.base import BaseCommand
 
 from proyectos.models import Beneficiario
-from core.models import Constructora
-from core.validators import clean_rut
+from proyectos.usuarios_familia import provisionar_usuarios_familia, sin_usuario_familia_automatico
+from core.models import Constructora, Rol
+from core.utils.ingesta_excel import TAMANO_BLOQUE, Alias, HojaExcel, detectar_columnas
+from core.utils.rut import agregar_validacion_rut
+
+BENEFICIARIO = ('benef', 'beneficiario', 'vda', 'famil')
+CONSTRUCTORA = ('construct', 'empresa', 'constructor')
+
+# Columnas reconocidas por palabras del encabezado
+COLUMNAS = {
+    'ben_nom': Alias(alguna=BENEFICIARIO, excluye=('rut', 'tel')),
+    'ben_rut': Alias(alguna=BENEFICIARIO, todas=('rut',)),
+    'cons_nom': Alias(alguna=CONSTRUCTORA, excluye=('rut',)),
+    'cons_rut': Alias(alguna=CONSTRUCTORA, todas=('rut',)),
+}
 
 
 class Command(BaseCommand):
@@ -25,6 +38,7 @@ class Command(BaseCommand):
         parser.add_argument('--apply', action='store_true', help='Aplicar los cambios a la base de datos')
         parser.add_argument('--create-missing', action='store_true', help='Crear beneficiarios o constructoras que no existan (solo si --apply)')
         parser.add_argument('--dry-run-output', type=str, help='Ruta de archivo CSV para volcar el dry-run (propuestas)')
+        parser.add_argument('--bloque', type=int, default=TAMANO_BLOQUE, help=f'Filas leídas por bloque (por defecto {TAMANO_BLOQUE})')
 
     def handle(self, *args, **options):
         archivo = options['archivo']
@@ -34,40 +48,43 @@ class Command(BaseCommand):
         dry_run_output = options.get('dry_run_output')
 
         try:
-            df = pd.read_excel(archivo, sheet_name=sheet)
+            hoja = HojaExcel(archivo, sheet)
         except Exception as e:
             self.stderr.write(self.style.ERROR(f'Error leyendo Excel: {e}'))
             return
 
-        # normalizar columnas
-        cols_map = {c: c.strip().lower() for c in df.columns}
-        df.rename(columns=cols_map, inplace=True)
-
+        # El signal crear_usuario_familia queda desactivado durante la carga: las
+        # cuentas de los beneficiarios creados se generan al final, en bloque
+        with hoja, sin_usuario_familia_automatico():
+            creados = self.actualizar(hoja, apply_changes, create_missing, dry_run_output, options['bloque'])
+        if creados:
+            try:
+                resumen = provisionar_usuarios_familia(Beneficiario.objects.filter(pk__in=creados))
+            except Rol.DoesNotExist:
+                self.stderr.write(self.style.ERROR(
+                    'No existe el rol FAMILIA: no se crearon cuentas (ejecute provisionar_usuarios_familia al crearlo)'
+                ))
+                return
+            self.stdout.write(f"  Cuentas FAMILIA creadas: {resumen['creados']}")
+
+    def actualizar(self, hoja, apply_changes, create_missing, dry_run_output, tamano_bloque):
         # detectar columnas heurísticamente
-        col_ben_nom = None
-        col_ben_rut = None
-        col_cons_nom = None
-        col_cons_rut = None
-
-        for c in df.columns:
-            lc = c.lower()
-            if any(x in lc for x in ('benef', 'beneficiario', 'vda', 'famil')) and 'rut' not in lc and 'tel' not in lc:
-                col_ben_nom = col_ben_nom or c
-            if 'rut' in lc and any(x in lc for x in ('benef', 'beneficiario', 'vda', 'famil')):
-                col_ben_rut = col_ben_rut or c
-            if any(x in lc for x in ('construct', 'empresa', 'constructor')) and 'rut' not in lc:
-                col_cons_nom = col_cons_nom or c
-            if 'rut' in lc and any(x in lc for x in ('construct', 'empresa', 'constructor')):
-                col_cons_rut = col_cons_rut or c
+        columnas = detectar_columnas(hoja.columnas, COLUMNAS)
+        col_ben_nom = columnas['ben_nom']
+        col_ben_rut = columnas['ben_rut']
+        col_cons_nom = columnas['cons_nom']
+        col_cons_rut = columnas['cons_rut']
 
         if not any([col_ben_nom, col_ben_rut, col_cons_nom, col_cons_rut]):
             self.stderr.write(self.style.ERROR('No se encontraron columnas reconocibles en el Excel.'))
             return
 
-        total_rows = len(df)
+        total_rows = 0
+        creados = []
         updated_benef = 0
         updated_cons = 0
         skipped = 0
+        invalid_ruts = 0
         all_actions = []
 
         def norm(v):
@@ -75,33 +92,43 @@ class Command(BaseCommand):
                 return ''
             return str(v).strip()
 
-        for idx, row in df.iterrows():
+        def validar_bloque(bloque):
+            # las columnas de RUT se validan y normalizan una vez por bloque (core.utils.rut.validar_ruts)
+            if col_ben_rut:
+                bloque = agregar_validacion_rut(bloque, col_ben_rut, '_ben_rut')
+            if col_cons_rut:
+                bloque = agregar_validacion_rut(bloque, col_cons_rut, '_cons_rut')
+            return bloque
+
+        # la hoja se lee por bloques: la memoria no depende del largo del Excel
+        for idx, row in hoja.filas(tamano_bloque, validar_bloque):
+            total_rows += 1
             rownum = idx + 2
             actions = []
 
             ben_name = norm(row.get(col_ben_nom)) if col_ben_nom else ''
-            ben_rut_raw = norm(row.get(col_ben_rut)) if col_ben_rut else ''
+            ben_rut_clean = row.get('_ben_rut', '')
             cons_name = norm(row.get(col_cons_nom)) if col_cons_nom else ''
-            cons_rut_raw = norm(row.get(col_cons_rut)) if col_cons_rut else ''
-
-            ben_rut_clean = ''
-            if ben_rut_raw:
-                try:
-                    ben_rut_clean = clean_rut(ben_rut_raw)
-                except Exception:
-                    ben_rut_clean = ben_rut_raw
-
-            cons_rut_clean = ''
-            if cons_rut_raw:
-                try:
-                    cons_rut_clean = clean_rut(cons_rut_raw)
-                except Exception:
-                    cons_rut_clean = cons_rut_raw
+            cons_rut_clean = row.get('_cons_rut', '')
+
+            # un RUT inválido no se guarda ni se usa para buscar: se omite ese registro de la fila
+            if ben_rut_clean and not row['_ben_rut_valido']:
+                self.stdout.write(self.style.WARNING(f'Fila {rownum}: RUT beneficiario "{ben_rut_clean}" inválido ({row["_ben_rut_motivo"]}).'))
+                actions.append({'action': 'invalid_rut_benef', 'object': 'beneficiario', 'object_id': None, 'old_rut': None, 'new_rut': ben_rut_clean, 'name': ben_name})
+                ben_name = ben_rut_clean = ''
+                invalid_ruts += 1
+                skipped += 1
+            if cons_rut_clean and not row['_cons_rut_valido']:
+                self.stdout.write(self.style.WARNING(f'Fila {rownum}: RUT constructora "{cons_rut_clean}" inválido ({row["_cons_rut_motivo"]}).'))
+                actions.append({'action': 'invalid_rut_cons', 'object': 'constructora', 'object_id': None, 'old_rut': None, 'new_rut': cons_rut_clean, 'name': cons_name})
+                cons_name = cons_rut_clean = ''
+                invalid_ruts += 1
+                skipped += 1
 
             # beneficiario: buscar por RUT primero
             benef = None
             if ben_rut_clean:
-                qs = Beneficiario.objects.filter(rut__iexact=ben_rut_clean)
+                qs = Beneficiario.objects.filter(rut_normalizado=row['_ben_rut_normalizado'])
                 if qs.exists():
                     benef = qs.first()
 
@@ -126,7 +153,7 @@ class Command(BaseCommand):
                 if ben_rut_clean and create_missing:
                     actions.append({'action': 'create_benef', 'object': 'beneficiario', 'object_id': None, 'old_rut': None, 'new_rut': ben_rut_clean, 'name': ben_name})
                     if apply_changes:
-                        Beneficiario.objects.create(nombre=ben_name or ben_rut_clean, rut=ben_rut_clean)
+                        creados.append(Beneficiario.objects.create(nombre=ben_name or ben_rut_clean, rut=ben_rut_clean).pk)
                         updated_benef += 1
                 else:
                     if ben_name or ben_rut_clean:
@@ -136,7 +163,7 @@ class Command(BaseCommand):
             # constructora: buscar por RUT primero
             cons = None
             if cons_rut_clean:
-                qs = Constructora.objects.filter(rut__iexact=cons_rut_clean)
+                qs = Constructora.objects.filter(rut_normalizado=row['_cons_rut_normalizado'])
                 if qs.exists():
                     cons = qs.first()
 
@@ -193,7 +220,9 @@ class Command(BaseCommand):
         self.stdout.write(f'  Beneficiarios actualizados: {updated_benef}')
         self.stdout.write(f'  Constructoras actualizadas: {updated_cons}')
         self.stdout.write(f'  Filas omitidas/ambiguas: {skipped}')
+        self.stdout.write(f'  RUTs inválidos: {invalid_ruts}')
         if not apply_changes:
             self.stdout.write(self.style.WARNING('\nModo dry-run: no se aplicaron cambios. Ejecute con --apply para persistir.'))
         else:
             self.stdout.write(self.style.SUCCESS('\nCambios aplicados con --apply.'))
+        return creados
@@ -1,8 +1,16 @@
 from django.core.management.base import BaseCommand
+from core.utils.ingesta_excel import TAMANO_BLOQUE, Alias, HojaExcel, detectar_columnas
 from proyectos.models import Recinto, TipologiaVivienda
 import pandas as pd
 import os
 
+# Columnas del Excel central de observaciones
+COLUMNAS = {
+    'tipologia': Alias(alguna=('vda_tipologia',)),
+    'nombre': Alias(alguna=('recinto_nombre',)),
+    'elementos': Alias(alguna=('pv_elemento',)),
+}
+
 class Command(BaseCommand):
     help = 'Carga o actualiza recintos desde el archivo Excel Base-central-de-observaciones-de-postventa-sin-filtro.xlsx'
 
@@ -18,6 +26,12 @@ class Command(BaseCommand):
             action='store_true',
             help='Sobrescribir elementos existentes en lugar de agregar'
         )
+        parser.add_argument(
+            '--bloque',
+            type=int,
+            default=TAMANO_BLOQUE,
+            help=f'Filas leídas por bloque (por defecto {TAMANO_BLOQUE})'
+        )
 
     def handle(self, *args, **options):
         archivo = options['archivo']
@@ -48,9 +62,9 @@ class Command(BaseCommand):
         self.stdout.write(f'📂 Archivo encontrado: {ruta_archivo}')
         
         try:
-            # Leer el archivo Excel con codificación correcta
+            # Leer el archivo Excel por bloques (la hoja no se carga completa en memoria)
             self.stdout.write('📖 Leyendo archivo Excel...')
-            df = pd.read_excel(ruta_archivo, engine='openpyxl')
+            hoja = HojaExcel(ruta_archivo)
             
             # Función para limpiar caracteres mal codificados
             def limpiar_texto(texto):
@@ -70,30 +84,14 @@ class Command(BaseCommand):
                     texto = texto.replace(mal, bien)
                 return texto
             
-            # Limpiar todas las columnas de texto
-            for col in df.columns:
-                if df[col].dtype == 'object':  # Solo para columnas de texto
-                    df[col] = df[col].apply(limpiar_texto)
-            
             # Mostrar las columnas disponibles
-            self.stdout.write(f'\n📋 Columnas encontradas: {list(df.columns)}\n')
-            
-            # Buscar columnas relevantes (ajustar según estructura real del Excel)
-            columnas_necesarias = ['tipologia', 'nombre', 'descripcion', 'elementos_disponibles']
+            self.stdout.write(f'\n📋 Columnas encontradas: {hoja.columnas}\n')
             
             # Intentar identificar columnas por similitud de nombres
-            col_tipologia = None
-            col_nombre = None
-            col_elementos = None
-            
-            for col in df.columns:
-                col_lower = str(col).lower()
-                if 'vda_tipologia' in col_lower or col == 'VDA_TIPOLOGIA':
-                    col_tipologia = col
-                elif 'recinto_nombre' in col_lower or col == 'RECINTO_NOMBRE':
-                    col_nombre = col
-                elif 'pv_elemento' in col_lower or col == 'PV_ELEMENTO':
-                    col_elementos = col
+            columnas = detectar_columnas(hoja.columnas, COLUMNAS)
+            col_tipologia = columnas['tipologia']
+            col_nombre = columnas['nombre']
+            col_elementos = columnas['elementos']
             
             if not all([col_tipologia, col_nombre, col_elementos]):
                 self.stdout.write(
@@ -108,7 +106,8 @@ class Command(BaseCommand):
                 
                 # Mostrar vista previa de los datos
                 self.stdout.write('\n📊 Vista previa de los datos:')
-                self.stdout.write(str(df.head()))
+                self.stdout.write(str(next(hoja.bloques(5), pd.DataFrame(columns=hoja.columnas))))
+                hoja.cerrar()
                 return
             
             self.stdout.write(f'\n✅ Columnas identificadas:')
@@ -121,8 +120,23 @@ class Command(BaseCommand):
             recintos_creados = 0
             elementos_agregados = 0
             
-            # Agrupar por tipología y nombre de recinto
-            for (tipologia_nombre, recinto_nombre), grupo in df.groupby([col_tipologia, col_nombre]):
+            # Agrupar por tipología y nombre de recinto: bloque a bloque se juntan
+            # los elementos de cada grupo (textos limpios, sin repetir)
+            grupos = {}
+            with hoja:
+                for df in hoja.bloques(options['bloque']):
+                    for col in (col_tipologia, col_nombre, col_elementos):
+                        if df[col].dtype == 'object' or pd.api.types.is_string_dtype(df[col]):
+                            df[col] = df[col].apply(limpiar_texto)
+                    df = df[df[col_tipologia].notna() & df[col_nombre].notna()]
+                    for clave, elementos_grupo in df.groupby([col_tipologia, col_nombre])[col_elementos]:
+                        elementos = grupos.setdefault(clave, set())
+                        for valor in elementos_grupo.dropna():
+                            elemento = str(valor).strip()
+                            if elemento:
+                                elementos.add(elemento)
+
+            for (tipologia_nombre, recinto_nombre), elementos in sorted(grupos.items()):
                 self.stdout.write(f'\n🔄 Procesando: {tipologia_nombre} - {recinto_nombre}')
                 
                 # Buscar la tipología - primero intentar por código exacto, luego por nombre
@@ -160,14 +174,6 @@ class Command(BaseCommand):
                     )
                     continue
                 
-                # Obtener todos los elementos únicos para este recinto
-                elementos = set()
-                for _, row in grupo.iterrows():
-                    if pd.notna(row[col_elementos]):
-                        elemento = str(row[col_elementos]).strip()
-                        if elemento:
-                            elementos.add(elemento)
-                
                 elementos_lista = sorted(list(elementos))
                 
                 # Buscar o crear el recinto
@@ -3,7 +3,16 @@ import pandas as pd
 from django.core.management.base import BaseCommand
 
 from proyectos.models import Beneficiario
-from core.validators import clean_rut
+from proyectos.usuarios_familia import provisionar_usuarios_familia, sin_usuario_familia_automatico
+from core.models import Rol
+from core.utils.ingesta_excel import TAMANO_BLOQUE, Alias, HojaExcel, detectar_columnas
+from core.utils.rut import agregar_validacion_rut
+
+# Columnas de beneficiario reconocidas por palabras del encabezado (nombre y rut)
+COLUMNAS = {
+    'nombre': Alias(alguna=('benef', 'beneficiario', 'vda', 'famil', 'nombre'), excluye=('rut', 'tel')),
+    'rut': Alias(alguna=('benef', 'beneficiario', 'vda', 'famil'), todas=('rut',)),
+}
 
 
 class Command(BaseCommand):
@@ -24,6 +33,7 @@ class Command(BaseCommand):
         parser.add_argument('--apply', action='store_true', help='Aplicar los cambios a la base de datos')
         parser.add_argument('--create-missing', action='store_true', help='Crear beneficiarios que no existan (solo si --apply)')
         parser.add_argument('--dry-run-output', type=str, help='Ruta de archivo CSV para volcar el dry-run (auditoría)')
+        parser.add_argument('--bloque', type=int, default=TAMANO_BLOQUE, help=f'Filas leídas por bloque (por defecto {TAMANO_BLOQUE})')
 
     def handle(self, *args, **options):
         archivo = options['archivo']
@@ -33,33 +43,41 @@ class Command(BaseCommand):
         dry_run_output = options.get('dry_run_output')
 
         try:
-            df = pd.read_excel(archivo, sheet_name=sheet)
+            hoja = HojaExcel(archivo, sheet)
         except Exception as e:
             self.stderr.write(self.style.ERROR(f'Error leyendo Excel: {e}'))
             return
 
-        # normalizar columnas
-        cols_map = {c: c.strip().lower() for c in df.columns}
-        df.rename(columns=cols_map, inplace=True)
-
+        # El signal crear_usuario_familia queda desactivado durante la carga: las
+        # cuentas de los beneficiarios creados se generan al final, en bloque
+        with hoja, sin_usuario_familia_automatico():
+            creados = self.importar(hoja, apply_changes, create_missing, dry_run_output, options['bloque'])
+        if creados:
+            try:
+                resumen = provisionar_usuarios_familia(Beneficiario.objects.filter(pk__in=creados))
+            except Rol.DoesNotExist:
+                self.stderr.write(self.style.ERROR(
+                    'No existe el rol FAMILIA: no se crearon cuentas (ejecute provisionar_usuarios_familia al crearlo)'
+                ))
+                return
+            self.stdout.write(f"  Cuentas FAMILIA creadas: {resumen['creados']}")
+
+    def importar(self, hoja, apply_changes, create_missing, dry_run_output, tamano_bloque):
         # detectar columnas heurísticamente (nombre y rut de beneficiario)
-        col_ben_nom = None
-        col_ben_rut = None
-        for c in df.columns:
-            lc = c.lower()
-            if any(x in lc for x in ('benef', 'beneficiario', 'vda', 'famil', 'nombre')) and 'rut' not in lc and 'tel' not in lc:
-                col_ben_nom = col_ben_nom or c
-            if 'rut' in lc and any(x in lc for x in ('benef', 'beneficiario', 'vda', 'famil')):
-                col_ben_rut = col_ben_rut or c
+        columnas = detectar_columnas(hoja.columnas, COLUMNAS)
+        col_ben_nom = columnas['nombre']
+        col_ben_rut = columnas['rut']
 
         if not any([col_ben_nom, col_ben_rut]):
             self.stderr.write(self.style.ERROR('No se encontraron columnas de beneficiario reconocibles en el Excel.'))
             return
 
-        total_rows = len(df)
+        total_rows = 0
+        creados = []
         updated = 0
         created = 0
         skipped = 0
+        invalid_ruts = 0
         all_actions = []
 
         def norm(v):
@@ -67,22 +85,29 @@ class Command(BaseCommand):
                 return ''
             return str(v).strip()
 
-        for idx, row in df.iterrows():
+        def validar_bloque(bloque):
+            # la columna de RUT se valida y normaliza una vez por bloque (core.utils.rut.validar_ruts)
+            return agregar_validacion_rut(bloque, col_ben_rut, '_rut') if col_ben_rut else bloque
+
+        # la hoja se lee por bloques: la memoria no depende del largo del Excel
+        for idx, row in hoja.filas(tamano_bloque, validar_bloque):
+            total_rows += 1
             rownum = idx + 2
             ben_name = norm(row.get(col_ben_nom)) if col_ben_nom else ''
-            ben_rut_raw = norm(row.get(col_ben_rut)) if col_ben_rut else ''
+            ben_rut_clean = row.get('_rut', '')
 
-            ben_rut_clean = ''
-            if ben_rut_raw:
-                try:
-                    ben_rut_clean = clean_rut(ben_rut_raw)
-                except Exception:
-                    ben_rut_clean = ben_rut_raw
+            # un RUT inválido no se guarda ni se usa para buscar: la fila se omite
+            if ben_rut_clean and not row['_rut_valido']:
+                self.stdout.write(self.style.WARNING(f'Fila {rownum}: RUT "{ben_rut_clean}" inválido ({row["_rut_motivo"]}).'))
+                all_actions.append({'row': rownum, 'action': 'invalid_rut', 'object': 'beneficiario', 'object_id': None, 'old_name': None, 'old_rut': None, 'new_name': ben_name, 'new_rut': ben_rut_clean, 'message': row['_rut_motivo']})
+                invalid_ruts += 1
+                skipped += 1
+                continue
 
             benef = None
             # buscar por RUT primero
             if ben_rut_clean:
-                qs = Beneficiario.objects.filter(rut__iexact=ben_rut_clean)
+                qs = Beneficiario.objects.filter(rut_normalizado=row['_rut_normalizado'])
                 if qs.exists():
                     benef = qs.first()
 
@@ -121,7 +146,7 @@ class Command(BaseCommand):
                 if ben_rut_clean and create_missing:
                     all_actions.append({'row': rownum, 'action': 'create_benef', 'object': 'beneficiario', 'object_id': None, 'old_name': None, 'old_rut': None, 'new_name': ben_name, 'new_rut': ben_rut_clean, 'message': f'create_benef name="{ben_name}" rut={ben_rut_clean}'})
                     if apply_changes:
-                        Beneficiario.objects.create(nombre=ben_name or ben_rut_clean, rut=ben_rut_clean)
+                        creados.append(Beneficiario.objects.create(nombre=ben_name or ben_rut_clean, rut=ben_rut_clean).pk)
                         created += 1
                 else:
                     if ben_name or ben_rut_clean:
@@ -147,7 +172,9 @@ class Command(BaseCommand):
         self.stdout.write(f'  Beneficiarios actualizados: {updated}')
         self.stdout.write(f'  Beneficiarios creados: {created}')
         self.stdout.write(f'  Filas omitidas/ambiguas: {skipped}')
+        self.stdout.write(f'  RUTs inválidos: {invalid_ruts}')
         if not apply_changes:
             self.stdout.write(self.style.WARNING('\nModo dry-run: no se aplicaron cambios. Ejecute con --apply para persistir.'))
         else:
             self.stdout.write(self.style.SUCCESS('\nCambios aplicados con --apply.'))
+        return creados
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Rol
+from proyectos.usuarios_familia import TAMANO_LOTE, beneficiarios_sin_usuario, provisionar_usuarios_familia
+
+
+class Command(BaseCommand):
+    help = (
+        'Crea las cuentas FAMILIA de los beneficiarios con RUT y email que aún no tienen usuario. '
+        'Ej: python manage.py provisionar_usuarios_familia --workers 4'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Procesos para hashear contraseñas (por defecto, uno por CPU)')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help=f'Usuarios insertados por transacción (por defecto {TAMANO_LOTE})')
+        parser.add_argument('--dry-run', action='store_true', help='Solo informa cuántas cuentas se crearían')
+
+    def handle(self, *args, **options):
+        if options['workers'] is not None and options['workers'] < 1:
+            raise CommandError('--workers debe ser al menos 1')
+
+        self.stdout.write(f'Beneficiarios sin cuenta: {beneficiarios_sin_usuario().count()}')
+        try:
+            resumen = provisionar_usuarios_familia(
+                workers=options['workers'], tamano_lote=options['lote'], dry_run=options['dry_run']
+            )
+        except Rol.DoesNotExist:
+            raise CommandError('No existe el rol FAMILIA')
+
+        if resumen['repetidos']:
+            self.stdout.write(self.style.WARNING(
+                f"{resumen['repetidos']} beneficiario(s) comparten RUT o email con otro: se crea una sola cuenta"
+            ))
+        if options['dry_run']:
+            self.stdout.write(f"[dry-run] Cuentas que se crearían: {resumen['creados']}")
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"✓ {resumen['creados']} cuenta(s) FAMILIA creada(s). Contraseña inicial: 6 últimos dígitos del RUT"
+            ))
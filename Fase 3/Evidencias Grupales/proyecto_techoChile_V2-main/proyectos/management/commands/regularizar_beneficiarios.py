@@ -4,6 +4,7 @@ from pathlib import Path
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from proyectos.models import Beneficiario
+from core.utils.rut import validar_ruts
 from unidecode import unidecode
 
 def normalize_text(text):
@@ -45,6 +46,9 @@ class Command(BaseCommand):
 
         summary = {'updated': 0, 'not_found': 0, 'ambiguous': 0, 'no_change': 0, 'errors': 0}
 
+        # Validar todos los RUTs del CSV de una vez
+        ruts = validar_ruts(df['rut_limpio'])
+
         # Crear un mapa de nombres normalizados a beneficiarios de la DB
         db_beneficiarios = list(Beneficiario.objects.all())
         beneficiarios_map = {}
@@ -64,6 +68,10 @@ class Command(BaseCommand):
                         self.stdout.write(self.style.ERROR(f"Fila {index+2}: Nombre o RUT vacío, se omite."))
                         summary['errors'] += 1
                         continue
+                    if not ruts.at[index, 'valido']:
+                        self.stdout.write(self.style.ERROR(f"Fila {index+2}: RUT '{csv_rut}' inválido ({ruts.at[index, 'motivo']}), se omite."))
+                        summary['errors'] += 1
+                        continue
 
                     normalized_csv_nombre = normalize_text(csv_nombre)
                     
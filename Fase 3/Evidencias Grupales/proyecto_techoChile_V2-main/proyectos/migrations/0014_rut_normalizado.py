@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:02
+
+from django.db import migrations, models
+
+from core.validators import normalizar_rut
+
+
+def poblar_rut_normalizado(apps, schema_editor):
+    for nombre in ('Beneficiario',):
+        Modelo = apps.get_model('proyectos', nombre)
+        pendientes = []
+        for obj in Modelo.objects.exclude(rut__isnull=True).exclude(rut='').only('id', 'rut').iterator():
+            obj.rut_normalizado = normalizar_rut(obj.rut)
+            pendientes.append(obj)
+        Modelo.objects.bulk_update(pendientes, ['rut_normalizado'], batch_size=500)
+
+
+def noop_reverse(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0013_tipologiavivienda_metros_cuadrados_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='beneficiario',
+            name='rut_normalizado',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.RunPython(poblar_rut_normalizado, noop_reverse),
+    ]
@@ -1,6 +1,6 @@
 
 from django.db import models
-from core.validators import validar_rut
+from core.validators import validar_rut, normalizar_rut
 from django.conf import settings
 from datetime import timedelta, datetime
 from core.models import Region, Comuna
@@ -128,6 +128,7 @@ class Beneficiario(models.Model):
     apellido_paterno = models.CharField(max_length=100, verbose_name="Apellido Paterno", default="")
     apellido_materno = models.CharField(max_length=100, verbose_name="Apellido Materno", blank=True, null=True)
     rut = models.CharField(max_length=12, unique=True, validators=[validar_rut], blank=True, null=True)
+    rut_normalizado = models.CharField(max_length=12, blank=True, default='', editable=False, db_index=True)
     email = models.EmailField(max_length=254, blank=True, null=True)
     activo = models.BooleanField(default=True)
 
@@ -138,6 +139,10 @@ class Beneficiario(models.Model):
     def __str__(self):
         return self.nombre_completo
 
+    def save(self, *args, **kwargs):
+        self.rut_normalizado = normalizar_rut(self.rut)
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Beneficiario"
         verbose_name_plural = "Beneficiarios"
@@ -251,15 +256,18 @@ def crear_usuario_familia(sender, instance, created, **kwargs):
     - Rol: FAMILIA
     - Nombre: Nombre completo del beneficiario
     """
+    from proyectos.usuarios_familia import creacion_automatica_activa, nombre_usuario_familia, password_inicial
+
+    # Importaciones masivas: desactivado con sin_usuario_familia_automatico() (ver provisionar_usuarios_familia)
+    if not creacion_automatica_activa():
+        return
     if created and instance.rut and instance.email:
         from core.models import Usuario, Rol
-        if not Usuario.objects.filter(rut=instance.rut).exists():
+        if not Usuario.objects.filter(rut_normalizado=instance.rut_normalizado).exists():
             try:
                 rol_familia = Rol.objects.get(nombre='FAMILIA')
-                nombre_completo = f"{instance.nombre} {instance.apellido_paterno} {instance.apellido_materno or ''}".strip()
-                # Obtener los 6 últimos dígitos del RUT (sin puntos ni guion)
-                rut_limpio = instance.rut.replace('.', '').replace('-', '')
-                password = rut_limpio[-6:] if len(rut_limpio) >= 6 else rut_limpio
+                nombre_completo = nombre_usuario_familia(instance.nombre, instance.apellido_paterno, instance.apellido_materno)
+                password = password_inicial(instance.rut)
                 usuario = Usuario.objects.create_user(
                     email=instance.email,
                     password=password,
@@ -0,0 +1,151 @@
+"""
+Cuentas de usuario FAMILIA para los beneficiarios.
+
+El signal ``crear_usuario_familia`` (proyectos.models) crea la cuenta al
+guardar cada Beneficiario: un hash PBKDF2 y varias consultas por fila, en
+serie. En importaciones masivas conviene desactivarlo con
+``sin_usuario_familia_automatico()`` y crear después todas las cuentas con
+``provisionar_usuarios_familia``: los beneficiarios sin cuenta se buscan en
+una consulta, las contraseñas se hashean en un pool de procesos y los
+usuarios se insertan con bulk_create.
+"""
+import multiprocessing
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+
+from core.validators import normalizar_rut
+
+ROL_FAMILIA = 'FAMILIA'
+TAMANO_LOTE = 500
+
+_estado = threading.local()
+
+
+@contextmanager
+def sin_usuario_familia_automatico():
+    """
+    Desactiva el signal crear_usuario_familia en este hilo mientras dura el
+    bloque. Las cuentas que no se crearon se generan después con
+    provisionar_usuarios_familia.
+    """
+    anterior = getattr(_estado, 'desactivado', 0)
+    _estado.desactivado = anterior + 1
+    try:
+        yield
+    finally:
+        _estado.desactivado = anterior
+
+
+def creacion_automatica_activa():
+    return not getattr(_estado, 'desactivado', 0)
+
+
+def nombre_usuario_familia(nombre, apellido_paterno, apellido_materno):
+    return f"{nombre} {apellido_paterno} {apellido_materno or ''}".strip()
+
+
+def password_inicial(rut):
+    """Contraseña temporal: los 6 últimos dígitos del RUT (sin puntos ni guion)."""
+    rut_limpio = rut.replace('.', '').replace('-', '')
+    return rut_limpio[-6:] if len(rut_limpio) >= 6 else rut_limpio
+
+
+def beneficiarios_sin_usuario(beneficiarios=None):
+    """Beneficiarios con RUT y email cuya cuenta aún no existe (ni por RUT ni por email), en una consulta."""
+    from core.models import Usuario
+    from proyectos.models import Beneficiario
+
+    qs = Beneficiario.objects.all() if beneficiarios is None else beneficiarios
+    return qs.exclude(rut__isnull=True).exclude(rut='').exclude(email__isnull=True).exclude(email='').filter(
+        ~Exists(Usuario.objects.filter(rut_normalizado=OuterRef('rut_normalizado'))),
+        # Usuario.email pasa por normalize_email (dominio en minúsculas): se compara sin mayúsculas
+        ~Exists(Usuario.objects.filter(email__iexact=OuterRef('email'))),
+    ).order_by('id')
+
+
+def _hashear(passwords, pool, workers):
+    if pool is None:
+        return [make_password(password) for password in passwords]
+    return pool.map(make_password, list(passwords), chunksize=max(1, len(passwords) // (workers * 4)))
+
+
+def provisionar_usuarios_familia(beneficiarios=None, workers=None, tamano_lote=TAMANO_LOTE, dry_run=False):
+    """
+    Crea las cuentas FAMILIA que faltan para ``beneficiarios`` (por defecto,
+    todos). Con ``workers`` > 1 las contraseñas se hashean en un pool de
+    procesos; los usuarios se insertan de a ``tamano_lote`` por transacción.
+
+    Devuelve un Counter con 'creados' y 'repetidos' (beneficiarios que
+    comparten RUT o email con otro del mismo lote o con una cuenta creada
+    mientras tanto: se crea una sola cuenta).
+    """
+    from core.models import Rol, Usuario
+    from core.permisos import invalidar_alcances
+
+    resumen = Counter(creados=0, repetidos=0)
+    filas = list(beneficiarios_sin_usuario(beneficiarios).values_list(
+        'nombre', 'apellido_paterno', 'apellido_materno', 'rut', 'email'
+    ))
+    if not filas:
+        return resumen
+
+    rol = Rol.objects.get(nombre=ROL_FAMILIA)
+    vistos = set()
+    pendientes = []
+    for nombre, apellido_paterno, apellido_materno, rut, email in filas:
+        email = Usuario.objects.normalize_email(email)
+        rut_normalizado = normalizar_rut(rut)
+        claves = {('rut', rut_normalizado), ('email', email.lower())}
+        if claves & vistos:
+            resumen['repetidos'] += 1
+            continue
+        vistos |= claves
+        usuario = Usuario(
+            email=email,
+            nombre=nombre_usuario_familia(nombre, apellido_paterno, apellido_materno),
+            rut=rut,
+            rut_normalizado=rut_normalizado,  # bulk_create no pasa por Usuario.save()
+            rol=rol,
+        )
+        pendientes.append((usuario, password_inicial(rut)))
+
+    if dry_run:
+        resumen['creados'] = len(pendientes)
+        return resumen
+
+    workers = workers or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(processes=workers) if workers > 1 and len(pendientes) > 1 else None
+    try:
+        for inicio in range(0, len(pendientes), tamano_lote):
+            usuarios, passwords = zip(*pendientes[inicio:inicio + tamano_lote])
+            for usuario, hash_password in zip(usuarios, _hashear(passwords, pool, workers)):
+                usuario.password = hash_password
+            try:
+                with transaction.atomic():
+                    Usuario.objects.bulk_create(usuarios)
+                resumen['creados'] += len(usuarios)
+            except IntegrityError:
+                # Otra cuenta con el mismo RUT o email apareció entre la consulta y el insert:
+                # se insertan de a uno y se omiten los que chocan
+                for usuario in usuarios:
+                    usuario.pk = None
+                    try:
+                        with transaction.atomic():
+                            Usuario.objects.bulk_create([usuario])
+                        resumen['creados'] += 1
+                    except IntegrityError:
+                        resumen['repetidos'] += 1
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    if resumen['creados']:
+        # bulk_create no dispara post_save de Usuario (core.signals)
+        invalidar_alcances()
+    return resumen
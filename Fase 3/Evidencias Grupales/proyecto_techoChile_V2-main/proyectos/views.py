@@ -233,15 +233,12 @@ def buscar_beneficiario_por_rut(request):
         if not rut_original:
             return JsonResponse({'error': 'RUT no proporcionado'}, status=400)
         
-        numero, dv = rut_original.split("-")
-        numero_formateado = f"{int(numero):,}".replace(",", ".")
-        rut_formateado = f"{numero_formateado}-{dv}"
+        from core.validators import normalizar_rut
         
         try:
             # Buscar beneficiario por RUT (con o sin puntos)
             beneficiario = Beneficiario.objects.filter(
-                rut=rut_formateado,
-                # Q(rut=rut_original) | Q(rut=rut_limpio),
+                rut_normalizado=normalizar_rut(rut_original),
                 activo=True
             ).first()
             
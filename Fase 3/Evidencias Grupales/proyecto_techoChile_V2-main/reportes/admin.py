@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ActaRecepcion, FamiliarBeneficiario  # , ConstructorActa
+from .models import ActaRecepcion, FamiliarBeneficiario, TrabajoReporte  # , ConstructorActa
 
 
 @admin.register(ActaRecepcion)
@@ -56,4 +56,10 @@ class FamiliarBeneficiarioAdmin(admin.ModelAdmin):
 # @admin.register(ConstructorActa)
 # class ConstructorActaAdmin(admin.ModelAdmin):
 #     list_display = ['nombre_empresa', 'representante', 'rut', 'acta']
-#     search_fields = ['nombre_empresa', 'representante', 'rut', 'acta__numero_acta']
\ No newline at end of file
+#     search_fields = ['nombre_empresa', 'representante', 'rut', 'acta__numero_acta']
+
+@admin.register(TrabajoReporte)
+class TrabajoReporteAdmin(admin.ModelAdmin):
+    list_display = ['id', 'tipo', 'usuario', 'estado', 'intentos', 'worker', 'fecha_creacion', 'fecha_termino']
+    list_filter = ['estado', 'tipo']
+    readonly_fields = ['reporte', 'error', 'worker', 'intentos', 'fecha_creacion', 'fecha_inicio', 'fecha_termino']
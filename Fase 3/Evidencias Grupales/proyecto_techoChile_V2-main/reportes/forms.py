@@ -2,7 +2,7 @@ from django import forms
 from django.forms import ModelForm
 from .models import ActaRecepcion, FamiliarBeneficiario
 from proyectos.models import Proyecto, Vivienda, Beneficiario
-from core.validators import validar_rut
+from core.validators import validar_rut, normalizar_rut
 from datetime import datetime
 
 
@@ -211,10 +211,15 @@ class ActaRecepcionForm(ModelForm):
         rut = self.cleaned_data.get('rut_beneficiario')
         if rut:
             try:
-                beneficiario = Beneficiario.objects.get(rut=rut, activo=True)
+                beneficiario = Beneficiario.objects.get(rut_normalizado=normalizar_rut(rut), activo=True)
                 return rut
             except Beneficiario.DoesNotExist:
                 raise forms.ValidationError(f"No se encontró beneficiario con RUT {rut}")
+            except Beneficiario.MultipleObjectsReturned:
+                # Solo 'rut' es único: '12.345.678-5' y '12345678-5' pueden coexistir (ver verificar_ruts)
+                raise forms.ValidationError(
+                    f"El RUT {rut} está registrado en más de un beneficiario; corrija los duplicados antes de continuar."
+                )
         return rut
 
     def clean(self):
@@ -227,14 +232,10 @@ class ActaRecepcionForm(ModelForm):
         
         # Si se proporcionó RUT de búsqueda, validar coherencia
         if rut_beneficiario and beneficiario:
-            try:
-                beneficiario_por_rut = Beneficiario.objects.get(rut=rut_beneficiario)
-                if beneficiario_por_rut != beneficiario:
-                    raise forms.ValidationError(
-                        "El beneficiario seleccionado no coincide con el RUT ingresado para búsqueda."
-                    )
-            except Beneficiario.DoesNotExist:
-                pass  # Ya se validó en clean_rut_beneficiario
+            if beneficiario.rut_normalizado != normalizar_rut(rut_beneficiario):
+                raise forms.ValidationError(
+                    "El beneficiario seleccionado no coincide con el RUT ingresado para búsqueda."
+                )
         
         # Verificar que no exista otra acta para la misma vivienda
         if vivienda:
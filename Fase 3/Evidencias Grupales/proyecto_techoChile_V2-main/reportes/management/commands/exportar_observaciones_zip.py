@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Usuario
+from core.permisos import filtrar_observaciones_por_rol
+from incidencias.models import Observacion
+from proyectos.models import Proyecto
+from reportes.registro import filtrar_observaciones
+from reportes.zip_observaciones import zip_observaciones
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera un ZIP con el manifiesto y los archivos adjuntos de las observaciones filtradas. '
+        'Ej: python manage.py exportar_observaciones_zip --proyecto LC1 --usuario constructora@techo.cl'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--proyecto', help='Código (ej: LC1) o id del proyecto')
+        parser.add_argument('--vivienda', type=int, help='Id de la vivienda')
+        parser.add_argument('--rut', help='RUT del beneficiario')
+        parser.add_argument('--usuario', help='Email del usuario cuyo alcance se aplica (por defecto, sin restricción de rol)')
+        parser.add_argument('--salida', help='Ruta del ZIP (por defecto observaciones[_<proyecto>].zip)')
+
+    def handle(self, *args, **options):
+        observaciones = Observacion.objects.all()
+        if options['usuario']:
+            usuario = Usuario.objects.filter(email=options['usuario']).first()
+            if usuario is None:
+                raise CommandError(f"No existe el usuario {options['usuario']}")
+            observaciones = filtrar_observaciones_por_rol(usuario, observaciones)
+
+        proyecto = None
+        if options['proyecto']:
+            valor = options['proyecto']
+            proyecto = Proyecto.objects.filter(codigo=valor).first()
+            if proyecto is None and valor.isdigit():
+                proyecto = Proyecto.objects.filter(pk=int(valor)).first()
+            if proyecto is None:
+                raise CommandError(f'No existe el proyecto {valor}')
+
+        observaciones = filtrar_observaciones(observaciones, {
+            'proyecto': proyecto.pk if proyecto else None,
+            'vivienda': options['vivienda'],
+            'rut': options['rut'],
+        })
+        salida = options['salida'] or (f'observaciones_{proyecto.codigo}.zip' if proyecto else 'observaciones.zip')
+        with open(salida, 'wb') as archivo:
+            for parte in zip_observaciones(observaciones):
+                archivo.write(parte)
+        self.stdout.write(self.style.SUCCESS(f'{observaciones.count()} observación(es) exportada(s) en {salida}'))
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from proyectos.models import Proyecto
+from reportes.models import ActaRecepcion
+from reportes.pdf_actas import TIMEOUT_ACTA, actas_para_pdf, zip_actas
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera en un ZIP los PDFs de todas las actas de un proyecto, repartiendo la '
+        'conversión en varios procesos. Ej: python manage.py generar_actas --proyecto LC1'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--proyecto', required=True, help='Código (ej: LC1) o id del proyecto')
+        parser.add_argument('--salida', help='Ruta del ZIP (por defecto Actas_<codigo>.zip)')
+        parser.add_argument('--workers', type=int, default=None, help='Procesos de conversión (por defecto, uno por CPU)')
+        parser.add_argument('--timeout', type=int, default=TIMEOUT_ACTA, help='Segundos máximos por acta')
+
+    def handle(self, *args, **options):
+        valor = options['proyecto']
+        proyecto = Proyecto.objects.filter(codigo=valor).first()
+        if proyecto is None and valor.isdigit():
+            proyecto = Proyecto.objects.filter(pk=int(valor)).first()
+        if proyecto is None:
+            raise CommandError(f'No existe el proyecto {valor}')
+        if options['workers'] is not None and options['workers'] < 1:
+            raise CommandError('--workers debe ser al menos 1')
+
+        actas = ActaRecepcion.objects.filter(proyecto=proyecto).order_by('numero_acta')
+        total = actas.count()
+        salida = options['salida'] or f'Actas_{proyecto.codigo}.zip'
+
+        inicio = time.monotonic()
+        with open(salida, 'wb') as archivo:
+            for parte in zip_actas(actas_para_pdf(actas).iterator(chunk_size=100), workers=options['workers'], timeout=options['timeout']):
+                archivo.write(parte)
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} acta(s) de {proyecto.codigo} en {salida} ({time.monotonic() - inicio:.1f} s)'
+        ))
@@ -0,0 +1,92 @@
+import multiprocessing
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.utils.trabajos_reportes import (
+    TIEMPO_MAXIMO, nombre_worker, procesar_pendientes, recuperar_abandonados,
+)
+
+
+def _bucle_worker(indice, una_vez, intervalo, tiempo_maximo=TIEMPO_MAXIMO):
+    """
+    Punto de entrada de cada proceso worker. Con la cola vacía reencola los
+    trabajos abandonados por workers caídos, no solo al iniciar el comando.
+    """
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        # Con el método 'spawn' (Windows/macOS) el proceso hijo parte sin Django cargado
+        django.setup()
+    worker = nombre_worker(indice)
+    total = 0
+    try:
+        while True:
+            procesados = procesar_pendientes(worker)
+            total += procesados
+            if una_vez:
+                break
+            if not procesados and not recuperar_abandonados(tiempo_maximo)[0]:
+                time.sleep(intervalo)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        connections.close_all()
+    return total
+
+
+class Command(BaseCommand):
+    help = (
+        'Procesa la cola de reportes (TrabajoReporte) fuera del ciclo de las peticiones. '
+        'Con --workers N lanza N procesos que toman trabajos en paralelo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='Cantidad de procesos worker (por defecto 1)')
+        parser.add_argument('--una-vez', action='store_true', help='Vacía la cola y termina, en vez de quedar esperando')
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos de espera cuando la cola está vacía')
+        parser.add_argument(
+            '--timeout', type=int, default=int(TIEMPO_MAXIMO.total_seconds() // 60),
+            help='Minutos tras los cuales un trabajo en proceso se considera abandonado',
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if workers < 1:
+            raise CommandError('--workers debe ser al menos 1')
+
+        tiempo_maximo = timedelta(minutes=options['timeout'])
+        reencolados, fallidos = recuperar_abandonados(tiempo_maximo)
+        if reencolados or fallidos:
+            self.stdout.write(self.style.WARNING(
+                f'{reencolados} trabajo(s) abandonado(s) reencolado(s), {fallidos} marcado(s) con error'
+            ))
+
+        una_vez, intervalo = options['una_vez'], options['intervalo']
+        if workers == 1:
+            total = _bucle_worker(0, una_vez, intervalo, tiempo_maximo)
+            self.stdout.write(self.style.SUCCESS(f'✓ {total} reporte(s) procesado(s)'))
+            return
+
+        # Las conexiones abiertas no deben heredarse entre procesos
+        connections.close_all()
+        procesos = [
+            multiprocessing.Process(target=_bucle_worker, args=(i, una_vez, intervalo, tiempo_maximo), daemon=True)
+            for i in range(workers)
+        ]
+        for proceso in procesos:
+            proceso.start()
+        self.stdout.write(f'{workers} worker(s) iniciados')
+        try:
+            for proceso in procesos:
+                proceso.join()
+        except KeyboardInterrupt:
+            for proceso in procesos:
+                proceso.terminate()
+        fallaron = [p for p in procesos if p.exitcode not in (0, None, -15)]
+        if fallaron:
+            raise CommandError(f'{len(fallaron)} worker(s) terminaron con error')
+        self.stdout.write(self.style.SUCCESS('✓ Workers finalizados'))
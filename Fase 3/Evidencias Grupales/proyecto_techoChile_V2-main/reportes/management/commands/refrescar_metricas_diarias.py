@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from core.utils.metricas_diarias import refrescar_metricas_diarias
+
+
+class Command(BaseCommand):
+    help = (
+        'Refresca el snapshot diario de KPIs (MetricaDiaria). Por defecto recalcula solo '
+        'los días marcados como pendientes (DiaPendienteMetrica) al guardar o borrar '
+        'observaciones, viviendas o proyectos. Los cambios hechos con QuerySet.update() '
+        'fuera de la aplicación requieren --desde o --completo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--completo', action='store_true', help='Reconstruye todo el snapshot')
+        parser.add_argument('--desde', type=str, help='Recalcula todos los días desde esta fecha (YYYY-MM-DD) hasta --hasta')
+        parser.add_argument('--hasta', type=str, help='Fecha final (YYYY-MM-DD) para --desde; por defecto hoy')
+
+    def handle(self, *args, **options):
+        dias = None
+        if options['desde']:
+            from django.utils import timezone
+            desde = parse_date(options['desde'])
+            hasta = parse_date(options['hasta']) if options['hasta'] else timezone.localdate()
+            if not desde or not hasta or desde > hasta:
+                raise CommandError('Rango de fechas inválido')
+            dias = {desde + timedelta(days=i) for i in range((hasta - desde).days + 1)}
+
+        cantidad_dias, cantidad_filas = refrescar_metricas_diarias(dias=dias, completo=options['completo'])
+        if cantidad_dias == 0:
+            self.stdout.write(self.style.WARNING('Sin cambios desde el último refresco'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ {cantidad_dias} día(s) recalculado(s), {cantidad_filas} fila(s) escrita(s)'
+            ))
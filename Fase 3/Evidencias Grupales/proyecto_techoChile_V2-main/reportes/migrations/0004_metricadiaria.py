@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-17 14:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('incidencias', '0006_mejoras_seguridad_finales'),
+        ('proyectos', '0013_tipologiavivienda_metros_cuadrados_and_more'),
+        ('core', '0008_usuario_apellido_materno_usuario_apellido_paterno_and_more'),
+        ('reportes', '0003_reportegenerado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField(verbose_name='Día de creación')),
+                ('activo', models.BooleanField(default=True, help_text="Estado 'activo' de las observaciones agregadas")),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('urgentes', models.PositiveIntegerField(default=0)),
+                ('con_cierre', models.PositiveIntegerField(default=0, help_text='Observaciones con fecha de cierre')),
+                ('duracion_resolucion', models.DurationField(blank=True, help_text='Suma de (fecha_cierre - fecha_creacion)', null=True)),
+                ('cerradas_con_vencimiento', models.PositiveIntegerField(default=0)),
+                ('cerradas_en_plazo', models.PositiveIntegerField(default=0)),
+                ('fecha_calculo', models.DateTimeField(help_text='Inicio de la corrida de refresco que generó la fila')),
+                ('comuna', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.comuna')),
+                ('constructora', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.constructora')),
+                ('estado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='incidencias.estadoobservacion')),
+                ('proyecto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='metricas_diarias', to='proyectos.proyecto')),
+                ('region', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.region')),
+                ('tipo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='incidencias.tipoobservacion')),
+            ],
+            options={
+                'verbose_name': 'Métrica diaria',
+                'verbose_name_plural': 'Métricas diarias',
+                'ordering': ['-dia'],
+                'indexes': [models.Index(fields=['region', 'dia'], name='reportes_me_region__09c7ec_idx'), models.Index(fields=['constructora', 'dia'], name='reportes_me_constru_55bf67_idx'), models.Index(fields=['proyecto', 'dia'], name='reportes_me_proyect_5403c5_idx'), models.Index(fields=['fecha_calculo'], name='reportes_me_fecha_c_122984_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='metricadiaria',
+            constraint=models.UniqueConstraint(fields=('dia', 'proyecto', 'tipo', 'estado', 'activo'), name='uniq_metrica_diaria_clave'),
+        ),
+    ]
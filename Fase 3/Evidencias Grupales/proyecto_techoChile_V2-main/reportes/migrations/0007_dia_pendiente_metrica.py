@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-17 16:15
+
+from django.db import migrations, models
+from django.db.models import Max, Q
+from django.db.models.functions import TruncDate
+
+
+def marcar_dias_sin_consolidar(apps, schema_editor):
+    # Hasta ahora los días pendientes se deducían de las fechas de modificación:
+    # se marcan los que cambiaron después del último refresco para no perderlos
+    MetricaDiaria = apps.get_model('reportes', 'MetricaDiaria')
+    DiaPendienteMetrica = apps.get_model('reportes', 'DiaPendienteMetrica')
+    Observacion = apps.get_model('incidencias', 'Observacion')
+    ultimo = MetricaDiaria.objects.aggregate(ultimo=Max('fecha_calculo'))['ultimo']
+    if ultimo is None:
+        return
+    dias = (
+        Observacion.objects.filter(
+            Q(fecha_ultima_actualizacion__gt=ultimo)
+            | Q(vivienda__fecha_actualizacion__gt=ultimo)
+            | Q(vivienda__proyecto__fecha_actualizacion__gt=ultimo)
+        )
+        .annotate(dia=TruncDate('fecha_creacion'))
+        .order_by()
+        .values_list('dia', flat=True)
+        .distinct()
+    )
+    DiaPendienteMetrica.objects.bulk_create([DiaPendienteMetrica(dia=dia) for dia in dias], ignore_conflicts=True)
+
+
+def noop_reverse(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('incidencias', '0009_registroeliminacion'),
+        ('reportes', '0006_cache_reportes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiaPendienteMetrica',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField(unique=True, verbose_name='Día de creación')),
+                ('fecha_marca', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Día pendiente de métricas',
+                'verbose_name_plural': 'Días pendientes de métricas',
+            },
+        ),
+        migrations.RunPython(marcar_dias_sin_consolidar, noop_reverse),
+    ]
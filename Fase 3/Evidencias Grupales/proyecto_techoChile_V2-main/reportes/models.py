@@ -9,6 +9,8 @@ class ReporteGenerado(models.Model):
     ruta_archivo = models.CharField(max_length=255)
     fecha_generacion = models.DateTimeField(auto_now_add=True)
     filtros = models.JSONField(default=dict, blank=True)
+    # Hash de (tipo, filtros normalizados, alcance del rol, versión de datos); ver core.utils.cache_reportes
+    clave_contenido = models.CharField(max_length=64, null=True, blank=True, unique=True, editable=False)
 
     def __str__(self):
         return f"{self.nombre_archivo} ({self.fecha_generacion:%d/%m/%Y %H:%M})"
@@ -20,7 +22,8 @@ class ReporteGenerado(models.Model):
 from django.db import models
 from django.conf import settings
 from proyectos.models import Proyecto, Vivienda, Beneficiario
-from core.models import Constructora
+from core.models import Constructora, Region, Comuna
+from incidencias.models import TipoObservacion, EstadoObservacion
 
 
 class ActaRecepcion(models.Model):
@@ -195,6 +198,144 @@ class FamiliarBeneficiario(models.Model):
         verbose_name_plural = "Familiares del Beneficiario"
 
 
+class MetricaDiaria(models.Model):
+    """
+    Snapshot pre-agregado de observaciones por día de creación.
+
+    Una fila por día × proyecto × tipo × estado × activo; región, comuna y
+    constructora se copian del proyecto para filtrar sin joins. Lo mantiene
+    el comando ``refrescar_metricas_diarias``.
+    """
+    dia = models.DateField(verbose_name="Día de creación")
+    region = models.ForeignKey(Region, on_delete=models.CASCADE, related_name='+')
+    comuna = models.ForeignKey(Comuna, on_delete=models.CASCADE, related_name='+')
+    constructora = models.ForeignKey(Constructora, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    proyecto = models.ForeignKey(Proyecto, on_delete=models.CASCADE, related_name='metricas_diarias')
+    tipo = models.ForeignKey(TipoObservacion, on_delete=models.CASCADE, related_name='+')
+    estado = models.ForeignKey(EstadoObservacion, on_delete=models.CASCADE, related_name='+')
+    activo = models.BooleanField(default=True, help_text="Estado 'activo' de las observaciones agregadas")
+
+    total = models.PositiveIntegerField(default=0)
+    urgentes = models.PositiveIntegerField(default=0)
+    con_cierre = models.PositiveIntegerField(default=0, help_text="Observaciones con fecha de cierre")
+    duracion_resolucion = models.DurationField(null=True, blank=True, help_text="Suma de (fecha_cierre - fecha_creacion)")
+    cerradas_con_vencimiento = models.PositiveIntegerField(default=0)
+    cerradas_en_plazo = models.PositiveIntegerField(default=0)
+
+    fecha_calculo = models.DateTimeField(help_text="Inicio de la corrida de refresco que generó la fila")
+
+    def __str__(self):
+        return f"{self.dia} - {self.proyecto_id} - {self.total}"
+
+    class Meta:
+        verbose_name = "Métrica diaria"
+        verbose_name_plural = "Métricas diarias"
+        ordering = ['-dia']
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dia", "proyecto", "tipo", "estado", "activo"],
+                name="uniq_metrica_diaria_clave"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["region", "dia"]),
+            models.Index(fields=["constructora", "dia"]),
+            models.Index(fields=["proyecto", "dia"]),
+            models.Index(fields=["fecha_calculo"]),
+        ]
+
+
+class DiaPendienteMetrica(models.Model):
+    """
+    Día de MetricaDiaria desactualizado por una escritura posterior al último
+    refresco. Lo marcan los signals de core (observaciones, viviendas y
+    proyectos, incluidos los borrados); ``particionar`` lee esos días crudos y
+    ``refrescar_metricas_diarias`` los recalcula y borra la marca.
+    """
+    dia = models.DateField(unique=True, verbose_name="Día de creación")
+    fecha_marca = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.dia} pendiente"
+
+    class Meta:
+        verbose_name = "Día pendiente de métricas"
+        verbose_name_plural = "Días pendientes de métricas"
+
+
+class VersionDatos(models.Model):
+    """
+    Contadores de versión de datos, uno por ``nombre``: 'reportes' (archivos
+    generados), 'estadisticas' (contadores del navbar) y 'alcances' (alcance
+    de datos por usuario). Los signals de core los incrementan al escribir
+    proyectos, viviendas, observaciones o usuarios; al vivir en la base de
+    datos los comparten todos los procesos web y los workers de reportes.
+    """
+    nombre = models.CharField(max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=1)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.nombre} v{self.version}"
+
+    class Meta:
+        verbose_name = "Versión de datos"
+        verbose_name_plural = "Versiones de datos"
+
+
+class TrabajoReporte(models.Model):
+    """
+    Cola de generación de reportes en segundo plano.
+
+    Las vistas encolan un trabajo y responden de inmediato; el comando
+    ``procesar_reportes`` lo toma, genera el archivo y lo registra en
+    ReporteGenerado. La página de espera consulta el estado hasta que termina.
+    """
+    TIPO_DASHBOARD_PDF = 'dashboard_pdf'
+    TIPO_CHOICES = [
+        (TIPO_DASHBOARD_PDF, 'Reporte ejecutivo del dashboard (PDF)'),
+    ]
+
+    PENDIENTE = 'pendiente'
+    PROCESANDO = 'procesando'
+    COMPLETADO = 'completado'
+    ERROR = 'error'
+    ESTADO_CHOICES = [
+        (PENDIENTE, 'Pendiente'),
+        (PROCESANDO, 'Procesando'),
+        (COMPLETADO, 'Completado'),
+        (ERROR, 'Error'),
+    ]
+
+    tipo = models.CharField(max_length=30, choices=TIPO_CHOICES, default=TIPO_DASHBOARD_PDF)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='trabajos_reporte')
+    parametros = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default=PENDIENTE)
+    reporte = models.ForeignKey(ReporteGenerado, on_delete=models.SET_NULL, null=True, blank=True, related_name='trabajos')
+    error = models.TextField(blank=True)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True, help_text="Proceso que tomó el trabajo")
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_termino = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.pk} ({self.get_estado_display()})"
+
+    @property
+    def terminado(self):
+        return self.estado in (self.COMPLETADO, self.ERROR)
+
+    class Meta:
+        verbose_name = "Trabajo de reporte"
+        verbose_name_plural = "Trabajos de reporte"
+        ordering = ['fecha_creacion']
+        indexes = [
+            models.Index(fields=["estado", "fecha_creacion"]),
+            models.Index(fields=["usuario", "estado"]),
+        ]
+
+
 # TEMPORALMENTE COMENTADO HASTA RESOLVER MIGRACIONES
 # class ConstructorActa(models.Model):
 #     """Información del constructor para el acta"""
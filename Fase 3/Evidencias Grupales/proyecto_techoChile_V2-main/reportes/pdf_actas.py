@@ -0,0 +1,416 @@
+"""
+Generación de PDFs de Actas de Recepción, individual y por lotes.
+
+El HTML (reportes/acta_template.html) y los datos para el respaldo ReportLab
+se preparan en el proceso principal, que es el único que consulta la base de
+datos. La conversión a PDF, que es la parte costosa, solo recibe texto y
+diccionarios, por lo que puede repartirse en varios procesos:
+
+1. xhtml2pdf sobre el HTML del acta;
+2. si falla, el documento ReportLab equivalente;
+3. como último recurso, un PDF mínimo.
+
+En los lotes cada acta tiene un tiempo máximo: si su conversión se cuelga,
+su proceso se reemplaza, el acta se registra en ERRORES.txt dentro del ZIP
+y el lote sigue con las demás.
+"""
+import logging
+import multiprocessing
+import multiprocessing.connection
+import time
+import zipfile
+from io import BytesIO
+
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from core.utils.zip_stream import SalidaZip
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT_ACTA = 60
+# Procesos de conversión para la descarga web: una petición no debe ocupar todas las CPU
+WORKERS_HTTP = 2
+MOTOR_XHTML2PDF = 'xhtml2pdf'
+MOTOR_REPORTLAB = 'reportlab'
+MOTOR_MINIMO = 'reportlab-min-fallback'
+
+
+def actas_para_pdf(queryset):
+    """Carga en pocas consultas todo lo que usan el template y el respaldo ReportLab."""
+    return queryset.select_related(
+        'proyecto__comuna', 'proyecto__region', 'vivienda__tipologia', 'beneficiario',
+    ).prefetch_related('familiares', 'beneficiario__telefonos')
+
+
+def html_acta(acta, request=None):
+    context = {
+        'acta': acta,
+        'proyecto': acta.proyecto,
+        'beneficiario': acta.beneficiario,
+        'vivienda': acta.vivienda,
+        'familiares': acta.familiares.all(),
+        'fecha_generacion': timezone.now(),
+        'es_descarga': True,
+        'para_pdf': True,
+    }
+    return render_to_string('reportes/acta_template.html', context, request=request)
+
+
+def datos_acta(acta):
+    """Contenido del acta como pares (etiqueta, valor) para el respaldo ReportLab."""
+    proyecto, beneficiario, vivienda = acta.proyecto, acta.beneficiario, acta.vivienda
+    datos = {
+        'numero_acta': acta.numero_acta,
+        'generada': timezone.now().strftime('%d/%m/%Y %H:%M'),
+        'proyecto': [
+            ('Proyecto:', proyecto.nombre if proyecto else 'N/A'),
+            ('Comuna:', proyecto.comuna.nombre if (proyecto and proyecto.comuna) else 'N/A'),
+            ('Región:', proyecto.region.nombre if (proyecto and proyecto.region) else 'N/A'),
+        ],
+        'beneficiario': None,
+        'vivienda': None,
+        'detalles': [
+            ('Fecha de Entrega:', acta.fecha_entrega.strftime("%d/%m/%Y") if acta.fecha_entrega else 'N/A'),
+            ('Entrega Conforme:', 'Sí' if acta.entregado_beneficiario else 'No'),
+            ('Estructura:', 'Conforme' if getattr(acta, 'estado_estructura', True) else 'Con observaciones'),
+            ('Instalaciones:', 'Conforme' if getattr(acta, 'estado_instalaciones', True) else 'Con observaciones'),
+        ],
+        'familiares': [
+            [familiar.nombre_completo, familiar.parentesco, familiar.rut or 'N/A', str(familiar.edad) if familiar.edad else 'N/A']
+            for familiar in acta.familiares.all()
+        ],
+        'observaciones': acta.observaciones,
+    }
+    if beneficiario:
+        telefonos = list(beneficiario.telefonos.all())
+        # Teléfonos activos; si no hay, el primero registrado
+        numeros = [t.numero for t in telefonos if t.activo] or [t.numero for t in telefonos[:1]]
+        datos['beneficiario'] = [
+            ('Nombre Completo:', f"{beneficiario.nombre} {beneficiario.apellido_paterno} {beneficiario.apellido_materno or ''}".strip()),
+            ('RUT:', beneficiario.rut or 'N/A'),
+            ('Teléfonos:', ', '.join(numeros) if numeros else 'N/A'),
+            ('Email:', beneficiario.email or 'N/A'),
+        ]
+    if vivienda:
+        datos['vivienda'] = [
+            ('Código de Vivienda:', vivienda.codigo),
+            ('Tipología:', vivienda.tipologia.nombre if vivienda.tipologia else 'N/A'),
+            ('Estado:', vivienda.get_estado_display()),
+            ('Familia Beneficiaria:', vivienda.familia_beneficiaria or 'N/A'),
+        ]
+    return datos
+
+
+def pdf_xhtml2pdf(html):
+    """PDF con xhtml2pdf, o None si la conversión reporta errores."""
+    from xhtml2pdf import pisa
+
+    pdf_buffer = BytesIO()
+    pisa_status = pisa.CreatePDF(html, dest=pdf_buffer)
+    if pisa_status.err:
+        return None
+    return pdf_buffer.getvalue()
+
+
+def pdf_reportlab(datos):
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=2*cm, leftMargin=2*cm, topMargin=2*cm, bottomMargin=2*cm)
+
+    # Estilos personalizados que coincidan con el HTML
+    styles = getSampleStyleSheet()
+    header_style = ParagraphStyle(
+        'CustomHeader', parent=styles['Title'], fontSize=18, spaceAfter=10, alignment=1,
+        textColor=colors.black, fontName='Helvetica-Bold',
+    )
+    subtitle_style = ParagraphStyle(
+        'CustomSubtitle', parent=styles['Heading2'], fontSize=14, spaceAfter=20, alignment=1,
+        textColor=colors.black, fontName='Helvetica-Bold',
+    )
+    section_style = ParagraphStyle(
+        'SectionHeader', parent=styles['Heading3'], fontSize=12, spaceBefore=15, spaceAfter=10,
+        textColor=colors.black, fontName='Helvetica-Bold',
+    )
+    normal_style = ParagraphStyle('CustomNormal', parent=styles['Normal'], fontSize=10, spaceAfter=4, fontName='Helvetica')
+
+    def pares(filas):
+        for label, value in filas:
+            story.append(Paragraph(f"<b>{label}</b> {value}", normal_style))
+
+    story = []
+
+    # === ENCABEZADO ===
+    story.append(Paragraph("ACTA DE RECEPCIÓN DE VIVIENDA", header_style))
+    story.append(Paragraph("TECHO CHILE", subtitle_style))
+    story.append(Paragraph(f"<b>Acta N°:</b> {datos['numero_acta']} | <b>Generada:</b> {datos['generada']}", normal_style))
+    story.append(Spacer(1, 20))
+
+    story.append(Paragraph("INFORMACIÓN DEL PROYECTO", section_style))
+    pares(datos['proyecto'])
+    story.append(Spacer(1, 12))
+
+    story.append(Paragraph("INFORMACIÓN DEL BENEFICIARIO", section_style))
+    if datos['beneficiario']:
+        pares(datos['beneficiario'])
+    else:
+        story.append(Paragraph("<b>Beneficiario:</b> No asignado", normal_style))
+    story.append(Spacer(1, 12))
+
+    story.append(Paragraph("INFORMACIÓN DE LA VIVIENDA", section_style))
+    if datos['vivienda']:
+        pares(datos['vivienda'])
+    else:
+        story.append(Paragraph("<b>Vivienda:</b> No asignada", normal_style))
+    story.append(Spacer(1, 12))
+
+    story.append(Paragraph("DETALLES DEL ACTA", section_style))
+    pares(datos['detalles'])
+    story.append(Spacer(1, 15))
+
+    # === FAMILIARES (si los hay) ===
+    if datos['familiares']:
+        story.append(Paragraph("FAMILIARES REGISTRADOS", section_style))
+        familiares_table = Table(
+            [['Nombre Completo', 'Parentesco', 'RUT', 'Edad']] + datos['familiares'],
+            colWidths=[8*cm, 3*cm, 3*cm, 2*cm],
+        )
+        familiares_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]))
+        story.append(familiares_table)
+        story.append(Spacer(1, 15))
+
+    if datos['observaciones']:
+        story.append(Paragraph("OBSERVACIONES", section_style))
+        story.append(Paragraph(datos['observaciones'], normal_style))
+        story.append(Spacer(1, 20))
+
+    # === FIRMAS ===
+    story.append(Spacer(1, 30))
+    story.append(Paragraph("FIRMAS Y CONFORMIDAD", section_style))
+    firma_table = Table([
+        ['', '', ''],
+        ['_________________________', '_________________________', '_________________________'],
+        ['Beneficiario', 'Representante TECHO', 'Supervisor'],
+        ['', '', ''],
+        ['Fecha: _______________', 'Fecha: _______________', 'Fecha: _______________'],
+    ], colWidths=[5.5*cm, 5.5*cm, 5.5*cm])
+    firma_table.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 1), (-1, 1), 'Helvetica'),
+        ('FONTNAME', (0, 2), (-1, 2), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ]))
+    story.append(firma_table)
+
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def pdf_minimo(numero_acta, generada):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    c.setFont('Helvetica', 12)
+    c.drawString(72, 800, f"Acta {numero_acta}")
+    c.drawString(72, 780, "No se pudo generar el PDF completo. Este es un PDF mínimo de respaldo.")
+    c.drawString(72, 760, generada)
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def renderizar_pdf(html, datos):
+    """
+    Convierte un acta ya preparada (``html_acta`` + ``datos_acta``) a PDF.
+    Retorna (bytes, motor). No accede a la base de datos.
+    """
+    try:
+        pdf = pdf_xhtml2pdf(html)
+        if pdf is not None:
+            return pdf, MOTOR_XHTML2PDF
+    except Exception:
+        logger.exception('Error xhtml2pdf en acta %s', datos['numero_acta'])
+    try:
+        return pdf_reportlab(datos), MOTOR_REPORTLAB
+    except Exception:
+        logger.exception('Error ReportLab en acta %s', datos['numero_acta'])
+    return pdf_minimo(datos['numero_acta'], datos['generada']), MOTOR_MINIMO
+
+
+def nombre_pdf_acta(numero_acta, motor):
+    if motor == MOTOR_MINIMO:
+        return f"Acta de Recepción - {numero_acta} (respaldo).pdf"
+    return f"Acta de Recepción - {numero_acta}.pdf"
+
+
+def _renderizar_en_proceso(html, datos):
+    return renderizar_pdf(html, datos)
+
+
+def _atender(conexion):
+    """Bucle de un proceso de conversión: recibe (html, datos) y responde ('ok'|'error', valor)."""
+    while True:
+        try:
+            tarea = conexion.recv()
+        except EOFError:
+            return
+        if tarea is None:
+            return
+        try:
+            conexion.send(('ok', _renderizar_en_proceso(*tarea)))
+        except Exception as e:
+            conexion.send(('error', str(e) or e.__class__.__name__))
+
+
+class _ProcesoConversion:
+    """Proceso dedicado a convertir actas de a una; se puede matar si una conversión se cuelga."""
+
+    def __init__(self):
+        self.conexion, extremo_hijo = multiprocessing.Pipe()
+        self.proceso = multiprocessing.Process(target=_atender, args=(extremo_hijo,), daemon=True)
+        self.proceso.start()
+        extremo_hijo.close()
+        self.indice = None
+        self.inicio = None
+
+    def enviar(self, indice, html, datos):
+        self.conexion.send((html, datos))
+        # El tiempo máximo corre desde que el proceso recibe el acta
+        self.indice, self.inicio = indice, time.monotonic()
+
+    def liberar(self):
+        indice = self.indice
+        self.indice = self.inicio = None
+        return indice
+
+    def detener(self):
+        self.proceso.terminate()
+        self.proceso.join()
+        self.conexion.close()
+
+
+def renderizar_lote(actas, workers=None, timeout=TIMEOUT_ACTA):
+    """
+    Genera (acta, pdf, motor, error) por cada acta, en el mismo orden.
+
+    Con ``workers`` > 1 la conversión se reparte en procesos dedicados con
+    una ventana de actas en curso acotada (la memoria no depende del tamaño
+    del lote). Cada acta tiene ``timeout`` segundos desde que su proceso la
+    recibe: si se excede, el proceso se mata y se reemplaza por uno nuevo,
+    así las actas colgadas no bloquean al resto. ``pdf`` es None si el acta
+    superó el tiempo o falló. Con un solo worker se convierte en línea, sin
+    tiempo máximo.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    if workers <= 1:
+        for acta in actas:
+            try:
+                pdf, motor = renderizar_pdf(html_acta(acta), datos_acta(acta))
+                yield acta, pdf, motor, None
+            except Exception as e:
+                logger.exception('Error generando el acta %s', acta.numero_acta)
+                yield acta, None, None, str(e) or e.__class__.__name__
+        return
+
+    procesos = []
+    pendientes = iter(actas)
+    por_indice = {}       # índice -> acta, hasta entregarla
+    resultados = {}       # índice -> (pdf, motor, error), en espera de las anteriores
+    enviadas = entregadas = 0
+    agotadas = False
+    try:
+        procesos = [_ProcesoConversion() for _ in range(workers)]
+        while True:
+            # Asignar actas a los procesos libres sin adelantarse más de la ventana
+            for proceso in procesos:
+                while proceso.indice is None and not agotadas and enviadas - entregadas < workers * 2:
+                    acta = next(pendientes, None)
+                    if acta is None:
+                        agotadas = True
+                        break
+                    indice, enviadas = enviadas, enviadas + 1
+                    por_indice[indice] = acta
+                    try:
+                        proceso.enviar(indice, html_acta(acta), datos_acta(acta))
+                    except Exception as e:
+                        logger.exception('Error preparando el acta %s', acta.numero_acta)
+                        resultados[indice] = (None, None, str(e) or e.__class__.__name__)
+
+            while entregadas in resultados:
+                pdf, motor, error = resultados.pop(entregadas)
+                yield (por_indice.pop(entregadas), pdf, motor, error)
+                entregadas += 1
+
+            ocupados = [proceso for proceso in procesos if proceso.indice is not None]
+            if not ocupados:
+                if agotadas and entregadas == enviadas:
+                    return
+                continue
+
+            espera = max(0, min(proceso.inicio + timeout for proceso in ocupados) - time.monotonic())
+            listos = set(multiprocessing.connection.wait([proceso.conexion for proceso in ocupados], timeout=espera))
+            for i, proceso in enumerate(procesos):
+                if proceso.indice is None:
+                    continue
+                acta = por_indice[proceso.indice]
+                if proceso.conexion in listos:
+                    try:
+                        estado, valor = proceso.conexion.recv()
+                    except EOFError:
+                        logger.error('El proceso de conversión del acta %s terminó inesperadamente', acta.numero_acta)
+                        resultados[proceso.liberar()] = (None, None, 'El proceso de conversión terminó inesperadamente')
+                        proceso.detener()
+                        procesos[i] = _ProcesoConversion()
+                        continue
+                    if estado == 'ok':
+                        resultados[proceso.liberar()] = (*valor, None)
+                    else:
+                        logger.error('Error generando el acta %s: %s', acta.numero_acta, valor)
+                        resultados[proceso.liberar()] = (None, None, valor)
+                elif time.monotonic() - proceso.inicio >= timeout:
+                    logger.error('Acta %s superó el tiempo máximo de %s s', acta.numero_acta, timeout)
+                    resultados[proceso.liberar()] = (None, None, f'Tiempo máximo excedido ({timeout} s)')
+                    # El proceso sigue ocupado con la conversión colgada: se reemplaza
+                    proceso.detener()
+                    procesos[i] = _ProcesoConversion()
+    finally:
+        for proceso in procesos:
+            proceso.detener()
+
+
+def zip_actas(actas, workers=None, timeout=TIMEOUT_ACTA):
+    """
+    Genera el ZIP de las actas por partes (para StreamingHttpResponse o un
+    archivo): cada PDF se entrega apenas está listo, sin armar el ZIP completo
+    en memoria. Las actas que fallaron se listan en ERRORES.txt.
+    """
+    salida = SalidaZip()
+    errores = []
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_DEFLATED) as archivo_zip:
+        for acta, pdf, motor, error in renderizar_lote(actas, workers=workers, timeout=timeout):
+            if pdf is None:
+                errores.append(f'{acta.numero_acta}: {error}')
+                continue
+            archivo_zip.writestr(nombre_pdf_acta(acta.numero_acta, motor), pdf)
+            yield salida.vaciar()
+        if errores:
+            archivo_zip.writestr('ERRORES.txt', '\n'.join(errores) + '\n')
+    yield salida.vaciar()
@@ -0,0 +1,315 @@
+"""
+Registro declarativo de los reportes Excel.
+
+Cada reporte es una EspecificacionReporte (modelo base, filtro, columnas y
+orden) y lo sirve la vista genérica ``reportes.views.reporte_excel``. Todos
+comparten el mismo camino:
+
+- consulta única con ``values_list``: los JOIN salen de los lookups de las
+  columnas, por lo que no hace falta un select_related aparte;
+- escritura en streaming (core.utils.exportar_excel);
+- caché por contenido (core.utils.cache_reportes), invalidada por los
+  signals de core al cambiar los datos;
+- registro en el log de filas, duración y aciertos de caché.
+
+Agregar un reporte es agregar una entrada con ``registrar(...)``.
+"""
+import logging
+import os
+import time
+from datetime import datetime
+
+from django.apps import apps
+from django.db.models import Q
+
+from core.utils import cache_reportes
+from core.utils.exportar_excel import Columna, display, escribir_xlsx, fecha_texto, filas_queryset, nombre_completo, si_no
+from core.validators import normalizar_rut
+
+logger = logging.getLogger(__name__)
+
+REGISTRO = {}
+
+
+class EspecificacionReporte:
+    """
+    - ``modelo``: 'app_label.Modelo' de la consulta base.
+    - ``filtro``: Q o dict fijo aplicado a la consulta.
+    - ``filtrar``: función opcional ``(queryset, parametros) -> queryset`` para
+      los filtros que llegan por GET; ``parametros`` lista los aceptados.
+    - ``columnas``: lista de Columna, o una función que la retorna (para
+      columnas que dependen de modelos o choices).
+    - ``url``/``nombre_url``: ruta histórica del reporte, si la tiene.
+    """
+
+    def __init__(self, nombre, titulo, archivo, modelo, columnas, filtro=None, filtrar=None,
+                 parametros=(), orden=None, url=None, nombre_url=None):
+        self.nombre = nombre
+        self.titulo = titulo
+        self.archivo = archivo
+        self.modelo = modelo
+        self._columnas = columnas
+        self.filtro = filtro
+        self.filtrar = filtrar
+        self.parametros = tuple(parametros)
+        self.orden = orden
+        self.url = url
+        self.nombre_url = nombre_url
+
+    def __repr__(self):
+        return f'<EspecificacionReporte {self.nombre}>'
+
+    @property
+    def columnas(self):
+        return self._columnas() if callable(self._columnas) else self._columnas
+
+    def parametros_de(self, querydict):
+        return {clave: querydict.get(clave) for clave in self.parametros}
+
+    def queryset(self, parametros=None):
+        queryset = apps.get_model(self.modelo)._default_manager.all()
+        if isinstance(self.filtro, Q):
+            queryset = queryset.filter(self.filtro)
+        elif self.filtro:
+            queryset = queryset.filter(**self.filtro)
+        if self.filtrar:
+            queryset = self.filtrar(queryset, parametros or {})
+        if self.orden:
+            queryset = queryset.order_by(*self.orden)
+        return queryset
+
+
+def registrar(especificacion):
+    if especificacion.nombre in REGISTRO:
+        raise ValueError(f'Reporte duplicado: {especificacion.nombre}')
+    REGISTRO[especificacion.nombre] = especificacion
+    return especificacion
+
+
+def generar(especificacion, usuario, parametros):
+    """Ruta absoluta del .xlsx para estos parámetros; se reutiliza si ya existe en caché."""
+    parametros = especificacion.parametros_de(parametros)
+    generacion = cache_reportes.generacion()
+    clave = cache_reportes.clave_reporte(f'excel:{especificacion.nombre}', usuario, parametros, generacion)
+    ruta_archivo = cache_reportes.ruta_reporte(clave, 'xlsx', generacion)
+    destino = cache_reportes.ruta_absoluta(ruta_archivo)
+    if os.path.exists(destino):
+        logger.info('Reporte %s servido desde caché', especificacion.nombre)
+        return destino
+
+    inicio = time.perf_counter()
+    cantidad = 0
+    columnas = especificacion.columnas
+
+    def contar(filas):
+        nonlocal cantidad
+        for fila in filas:
+            cantidad += 1
+            yield fila
+
+    filas = contar(filas_queryset(especificacion.queryset(parametros), columnas))
+    cache_reportes.escribir_atomico(
+        ruta_archivo, lambda archivo: escribir_xlsx(archivo, especificacion.titulo, columnas, filas),
+    )
+    cache_reportes.purgar_generaciones_anteriores(generacion)
+    logger.info(
+        'Reporte %s generado: %d filas en %.2f s', especificacion.nombre, cantidad, time.perf_counter() - inicio,
+    )
+    return destino
+
+
+# --- Columnas compartidas ---
+
+BENEFICIARIO_NOMBRE = ('beneficiario__nombre', 'beneficiario__apellido_paterno', 'beneficiario__apellido_materno')
+
+
+def columnas_observacion(detalle='Descripción', fecha='Fecha'):
+    return [
+        Columna('ID', 'id'),
+        Columna('Proyecto', 'vivienda__proyecto__nombre'),
+        Columna('Vivienda', 'vivienda__codigo'),
+        Columna(detalle, 'detalle'),
+        Columna('Estado', 'estado__nombre'),
+        Columna('Urgente', 'es_urgente'),
+        Columna(fecha, 'fecha_creacion'),
+        Columna('Usuario', 'creado_por__email'),
+    ]
+
+
+def _parsear_fecha(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+
+# --- Observaciones por estado y urgencia ---
+
+for nombre, titulo, archivo, filtro, url in [
+    ('observaciones_abiertas', 'Observaciones Abiertas', 'observaciones_abiertas.xlsx',
+     {'estado__nombre': 'Abierta', 'es_urgente': False}, 'observaciones/abiertas_excel/'),
+    ('observaciones_cerradas', 'Observaciones Cerradas', 'observaciones_cerradas.xlsx',
+     {'estado__nombre': 'Cerrada', 'es_urgente': False}, 'observaciones/cerradas_excel/'),
+    ('observaciones_abiertas_urgentes', 'Observaciones Abiertas Urgentes', 'observaciones_abiertas_urgentes.xlsx',
+     {'estado__nombre': 'Abierta', 'es_urgente': True}, 'observaciones/abiertas_urgentes_excel/'),
+    ('observaciones_cerradas_urgentes', 'Observaciones Cerradas Urgentes', 'observaciones_cerradas_urgentes.xlsx',
+     {'estado__nombre': 'Cerrada', 'es_urgente': True}, 'observaciones/cerradas_urgentes_excel/'),
+    ('observaciones_urgentes_pendientes', 'Urgentes Pendientes', 'urgentes_pendientes.xlsx',
+     {'estado__nombre': 'Abierta', 'es_urgente': True}, 'observaciones/urgentes_pendientes_excel/'),
+    ('observaciones_urgentes_cerradas', 'Urgentes Cerradas', 'urgentes_cerradas.xlsx',
+     {'estado__nombre': 'Cerrada', 'es_urgente': True}, 'observaciones/urgentes_cerradas_excel/'),
+    ('observaciones_urgentes_abiertas', 'Urgentes Abiertas', 'urgentes_abiertas.xlsx',
+     {'estado__nombre': 'Abierta', 'es_urgente': True}, 'observaciones/urgentes_abiertas_excel/'),
+]:
+    registrar(EspecificacionReporte(
+        nombre, titulo, archivo, 'incidencias.Observacion', columnas_observacion(), filtro=filtro,
+        url=url, nombre_url=f'reporte_{nombre}_excel',
+    ))
+
+registrar(EspecificacionReporte(
+    'observaciones_en_ejecucion', 'Observaciones en Ejecución', 'observaciones_en_ejecucion.xlsx',
+    'incidencias.Observacion', columnas_observacion(detalle='Detalle', fecha='Fecha Creación'),
+    filtro={'estado__nombre': 'En Ejecución'},
+    url='observaciones/en_ejecucion_excel/', nombre_url='reporte_observaciones_en_ejecucion_excel',
+))
+
+
+def filtrar_observaciones(queryset, parametros):
+    """Filtros de la página "Observaciones filtradas" (proyecto, vivienda y RUT del beneficiario)."""
+    if parametros.get('proyecto'):
+        queryset = queryset.filter(vivienda__proyecto_id=parametros['proyecto'])
+    if parametros.get('vivienda'):
+        queryset = queryset.filter(vivienda_id=parametros['vivienda'])
+    rut = (parametros.get('rut') or '').strip()
+    if rut:
+        queryset = queryset.filter(vivienda__beneficiario__rut_normalizado=normalizar_rut(rut))
+    return queryset
+
+
+# LEFT JOIN con seguimientos: una fila por entrada del historial, o una sola
+# fila con el historial vacío si la observación no tiene seguimientos
+registrar(EspecificacionReporte(
+    'observaciones_filtradas', 'Observaciones Filtradas', 'observaciones_filtradas.xlsx', 'incidencias.Observacion',
+    [
+        Columna('ID', 'id'),
+        Columna('Proyecto', 'vivienda__proyecto__nombre'),
+        Columna('Vivienda', 'vivienda__codigo'),
+        Columna('Beneficiario', *(f'vivienda__{c}' for c in BENEFICIARIO_NOMBRE), formato=nombre_completo),
+        Columna('RUT', 'vivienda__beneficiario__rut'),
+        Columna('Estado', 'estado__nombre'),
+        Columna('Detalle', 'detalle'),
+        Columna('Notas Seguimiento', 'observaciones_seguimiento'),
+        Columna('Fecha Creación', 'fecha_creacion', formato=fecha_texto('%d/%m/%Y')),
+        Columna('Urgente', 'es_urgente', formato=si_no),
+        Columna('Historial - Fecha', 'seguimientos__fecha', formato=fecha_texto('%d/%m/%Y %H:%M')),
+        Columna('Historial - Acción', 'seguimientos__accion'),
+        Columna('Historial - Comentario', 'seguimientos__comentario'),
+        Columna('Historial - Estado Anterior', 'seguimientos__estado_anterior__nombre'),
+        Columna('Historial - Estado Nuevo', 'seguimientos__estado_nuevo__nombre'),
+    ],
+    filtrar=filtrar_observaciones, parametros=('proyecto', 'vivienda', 'rut'),
+    orden=('-fecha_creacion', '-id', '-seguimientos__fecha', '-seguimientos__id'),
+    url='observaciones/filtrar_excel/', nombre_url='reporte_observaciones_filtradas_excel',
+))
+
+# --- Viviendas y beneficiarios ---
+
+registrar(EspecificacionReporte(
+    'viviendas_sin_observaciones', 'Viviendas sin Observaciones', 'viviendas_sin_observaciones.xlsx',
+    'proyectos.Vivienda',
+    [
+        Columna('Proyecto', 'proyecto__nombre'),
+        Columna('Código Vivienda', 'codigo'),
+        Columna('Tipología', 'tipologia__nombre'),
+        Columna('Estado', 'estado'),
+        Columna('Beneficiario', *BENEFICIARIO_NOMBRE, formato=nombre_completo),
+        Columna('RUT', 'beneficiario__rut'),
+        Columna('Email', 'beneficiario__email'),
+        Columna('Constructora', 'proyecto__constructora__nombre'),
+        Columna('Región', 'proyecto__region__nombre'),
+        Columna('Comuna', 'proyecto__comuna__nombre'),
+    ],
+    filtro={'observaciones__isnull': True, 'activa': True},
+    url='viviendas_sin_observaciones_excel/', nombre_url='reporte_viviendas_sin_observaciones_excel',
+))
+
+registrar(EspecificacionReporte(
+    'total', 'Reporte Total', 'reporte_total.xlsx', 'proyectos.Vivienda',
+    [
+        Columna('Proyecto', 'proyecto__nombre'),
+        Columna('Vivienda', 'codigo'),
+        Columna('Tipología', 'tipologia__nombre'),
+        Columna('Estado Vivienda', 'estado'),
+        Columna('Beneficiario', *BENEFICIARIO_NOMBRE, formato=nombre_completo),
+        Columna('RUT', 'beneficiario__rut'),
+        Columna('Email', 'beneficiario__email'),
+    ],
+    url='reporte_total_excel/', nombre_url='reporte_total_excel',
+))
+
+# El orden por defecto de Vivienda agrupa por proyecto (más recientes primero)
+registrar(EspecificacionReporte(
+    'beneficiarios_por_proyecto', 'Beneficiarios por Proyecto', 'beneficiarios_por_proyecto.xlsx', 'proyectos.Vivienda',
+    [
+        Columna('Proyecto', 'proyecto__nombre'),
+        Columna('Vivienda', 'codigo'),
+        Columna('Beneficiario', *BENEFICIARIO_NOMBRE, formato=nombre_completo),
+        Columna('RUT', 'beneficiario__rut'),
+        Columna('Email', 'beneficiario__email'),
+    ],
+    filtro={'proyecto__activo': True, 'beneficiario__isnull': False},
+    url='beneficiarios_por_proyecto_excel/', nombre_url='reporte_beneficiarios_por_proyecto_excel',
+))
+
+registrar(EspecificacionReporte(
+    'viviendas_sin_beneficiario', 'Viviendas sin Beneficiario', 'viviendas_sin_beneficiario.xlsx', 'proyectos.Vivienda',
+    [
+        Columna('Proyecto', 'proyecto__nombre'),
+        Columna('Vivienda', 'codigo'),
+        Columna('Tipología', 'tipologia__nombre'),
+        Columna('Estado', 'estado'),
+    ],
+    filtro={'beneficiario__isnull': True, 'activa': True},
+    url='viviendas_sin_beneficiario_excel/', nombre_url='reporte_viviendas_sin_beneficiario_excel',
+))
+
+# --- Actas de entrega ---
+
+
+def _filtrar_entregas(queryset, parametros):
+    if parametros.get('proyecto'):
+        queryset = queryset.filter(proyecto_id=parametros['proyecto'])
+    fecha_inicio = _parsear_fecha(parametros.get('fecha_inicio'))
+    if fecha_inicio:
+        queryset = queryset.filter(fecha_entrega__gte=fecha_inicio)
+    fecha_fin = _parsear_fecha(parametros.get('fecha_fin'))
+    if fecha_fin:
+        queryset = queryset.filter(fecha_entrega__lte=fecha_fin)
+    return queryset
+
+
+def _columnas_entregas():
+    from proyectos.models import Vivienda
+
+    return [
+        Columna('N° Acta', 'numero_acta'),
+        Columna('Fecha Entrega', 'fecha_entrega', formato=fecha_texto('%d/%m/%Y')),
+        Columna('Proyecto', 'proyecto__nombre'),
+        Columna('Código Proyecto', 'proyecto__codigo'),
+        Columna('Comuna', 'proyecto__comuna__nombre'),
+        Columna('Región', 'proyecto__region__nombre'),
+        Columna('Beneficiario', *BENEFICIARIO_NOMBRE, formato=nombre_completo),
+        Columna('RUT', 'beneficiario__rut'),
+        Columna('Email', 'beneficiario__email'),
+        Columna('Código Vivienda', 'vivienda__codigo'),
+        Columna('Tipología', 'vivienda__tipologia__nombre'),
+        Columna('Estado Vivienda', 'vivienda__estado', formato=display(Vivienda.ESTADOS_CHOICES)),
+        Columna('Familia Beneficiaria', 'vivienda__familia_beneficiaria'),
+    ]
+
+
+registrar(EspecificacionReporte(
+    'entregas', 'Entregas', 'entregas_techo_chile.xlsx', 'reportes.ActaRecepcion', _columnas_entregas,
+    filtrar=_filtrar_entregas, parametros=('proyecto', 'fecha_inicio', 'fecha_fin'),
+    url='actas/entregas_excel/', nombre_url='reporte_entregas_excel',
+))
@@ -2,8 +2,11 @@ from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from .models import ReporteGenerado
 from django.http import FileResponse, Http404
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 # Vista para listar reportes generados
 @login_required
 def listar_reportes_generados(request):
@@ -64,162 +67,35 @@ def descargar_reporte_generado(request, reporte_id):
 from django.http import HttpResponse
 import openpyxl
 from django.contrib.auth.decorators import login_required
-
-@login_required
-def reporte_viviendas_sin_observaciones_excel(request):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Viviendas sin Observaciones"
-    headers = [
-        "Proyecto", "Código Vivienda", "Tipología", "Estado", "Beneficiario", "RUT", "Email", "Constructora", "Región", "Comuna"
-    ]
-    ws.append(headers)
-    from proyectos.models import Vivienda
-    viviendas = Vivienda.objects.select_related('proyecto', 'beneficiario', 'tipologia', 'proyecto__constructora', 'proyecto__region', 'proyecto__comuna')\
-        .filter(observaciones__isnull=True, activa=True)
-    for vivienda in viviendas:
-        beneficiario = vivienda.beneficiario
-        proyecto = vivienda.proyecto
-        ws.append([
-            proyecto.nombre if proyecto else "",
-            vivienda.codigo,
-            vivienda.tipologia.nombre if vivienda.tipologia else "",
-            vivienda.estado,
-            beneficiario.nombre_completo if beneficiario else "",
-            beneficiario.rut if beneficiario else "",
-            beneficiario.email if beneficiario else "",
-            proyecto.constructora.nombre if proyecto and proyecto.constructora else "",
-            proyecto.region.nombre if proyecto and proyecto.region else "",
-            proyecto.comuna.nombre if proyecto and proyecto.comuna else ""
-        ])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=viviendas_sin_observaciones.xlsx'
-    wb.save(response)
-    return response
+from core.utils.exportar_excel import CONTENT_TYPE_XLSX
 
 
-# Reporte Total: Viviendas y Beneficiarios
-
 @login_required
-def reporte_total_excel(request):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Reporte Total"
-    headers = ["Proyecto", "Vivienda", "Tipología", "Estado Vivienda", "Beneficiario", "RUT", "Email"]
-    ws.append(headers)
-    from proyectos.models import Proyecto, Vivienda
-    viviendas = Vivienda.objects.select_related('proyecto', 'beneficiario', 'tipologia').all()
-    for vivienda in viviendas:
-        beneficiario = vivienda.beneficiario
-        ws.append([
-            vivienda.proyecto.nombre if vivienda.proyecto else "",
-            vivienda.codigo,
-            vivienda.tipologia.nombre if hasattr(vivienda, 'tipologia') and vivienda.tipologia else "",
-            vivienda.estado,
-            beneficiario.nombre_completo if beneficiario else "",
-            beneficiario.rut if beneficiario else "",
-            beneficiario.email if beneficiario else ""
-        ])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=reporte_total.xlsx'
-    wb.save(response)
-    return response
+def reporte_excel(request, nombre):
+    """Vista genérica para los reportes declarados en reportes.registro."""
+    from .registro import REGISTRO, generar
 
-from django.contrib.auth.decorators import login_required
-from proyectos.models import Proyecto, Vivienda, Beneficiario
+    especificacion = REGISTRO.get(nombre)
+    if especificacion is None:
+        raise Http404('Reporte no encontrado')
+    ruta = generar(especificacion, request.user, request.GET)
+    return FileResponse(open(ruta, 'rb'), as_attachment=True, filename=especificacion.archivo, content_type=CONTENT_TYPE_XLSX)
 
-@login_required
-def reporte_beneficiarios_por_proyecto_excel(request):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Beneficiarios por Proyecto"
-    headers = ["Proyecto", "Vivienda", "Beneficiario", "RUT", "Email"]
-    ws.append(headers)
-    proyectos = Proyecto.objects.filter(activo=True)
-    for proyecto in proyectos:
-        viviendas = Vivienda.objects.filter(proyecto=proyecto)
-        for vivienda in viviendas:
-            beneficiario = vivienda.beneficiario
-            if beneficiario:
-                ws.append([
-                    proyecto.nombre,
-                    vivienda.codigo,
-                    beneficiario.nombre_completo,
-                    beneficiario.rut,
-                    beneficiario.email
-                ])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=beneficiarios_por_proyecto.xlsx'
-    wb.save(response)
-    return response
 
 @login_required
-def reporte_viviendas_sin_beneficiario_excel(request):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Viviendas sin Beneficiario"
-    headers = ["Proyecto", "Vivienda", "Tipología", "Estado"]
-    ws.append(headers)
-    viviendas = Vivienda.objects.filter(beneficiario__isnull=True, activa=True)
-    for vivienda in viviendas:
-        ws.append([
-            vivienda.proyecto.nombre,
-            vivienda.codigo,
-            vivienda.tipologia.nombre,
-            vivienda.estado
-        ])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=viviendas_sin_beneficiario.xlsx'
-    wb.save(response)
-    return response
-@login_required
-def reporte_observaciones_abiertas_urgentes_excel(request):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Observaciones Abiertas Urgentes"
-    headers = ["ID", "Proyecto", "Vivienda", "Descripción", "Estado", "Urgente", "Fecha", "Usuario"]
-    ws.append(headers)
-    obs = Observacion.objects.filter(estado__nombre='Abierta', es_urgente=True)
-    for o in obs:
-        fecha = o.fecha_creacion.replace(tzinfo=None) if o.fecha_creacion else ""
-        ws.append([
-            o.id,
-            getattr(o.vivienda.proyecto, 'nombre', ''),
-            getattr(o.vivienda, 'codigo', ''),
-            o.detalle,
-            o.estado.nombre,
-            o.es_urgente,
-            fecha,
-            getattr(o.creado_por, 'username', '')
-        ])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=observaciones_abiertas_urgentes.xlsx'
-    wb.save(response)
-    return response
+def reporte_observaciones_zip(request):
+    """ZIP con manifiesto y archivos adjuntos de las observaciones filtradas que el usuario puede ver."""
+    from django.http import StreamingHttpResponse
+    from django.utils import timezone
+    from core.permisos import filtrar_observaciones_por_rol
+    from incidencias.models import Observacion
+    from .registro import filtrar_observaciones
+    from .zip_observaciones import zip_observaciones
 
-@login_required
-def reporte_observaciones_cerradas_urgentes_excel(request):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Observaciones Cerradas Urgentes"
-    headers = ["ID", "Proyecto", "Vivienda", "Descripción", "Estado", "Urgente", "Fecha", "Usuario"]
-    ws.append(headers)
-    obs = Observacion.objects.filter(estado__nombre='Cerrada', es_urgente=True)
-    for o in obs:
-        fecha = o.fecha_creacion.replace(tzinfo=None) if o.fecha_creacion else ""
-        ws.append([
-            o.id,
-            getattr(o.vivienda.proyecto, 'nombre', ''),
-            getattr(o.vivienda, 'codigo', ''),
-            o.detalle,
-            o.estado.nombre,
-            o.es_urgente,
-            fecha,
-            getattr(o.creado_por, 'username', '')
-        ])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=observaciones_cerradas_urgentes.xlsx'
-    wb.save(response)
+    parametros = {clave: request.GET.get(clave) for clave in ('proyecto', 'vivienda', 'rut')}
+    observaciones = filtrar_observaciones(filtrar_observaciones_por_rol(request.user, Observacion.objects.all()), parametros)
+    response = StreamingHttpResponse(zip_observaciones(observaciones), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="observaciones_{timezone.localtime().strftime("%Y%m%d_%H%M")}.zip"'
     return response
 
 from django.http import HttpResponse
@@ -241,43 +117,49 @@ def reporte_estadisticas_region_excel(request):
     ]
     ws.append(headers)
 
-    from proyectos.models import Proyecto, Vivienda
-    from incidencias.models import Observacion
-    regiones = Proyecto.objects.values_list('region', flat=True).distinct()
-    for region_id in regiones:
-        region_obj = None
-        try:
-            from core.models import Region
-            region_obj = Region.objects.get(pk=region_id)
-            region_nombre = region_obj.nombre
-        except Exception:
-            region_nombre = str(region_id)
-        proyectos = Proyecto.objects.filter(region=region_id)
-        for proyecto in proyectos:
-            constructora = proyecto.constructora.nombre if proyecto.constructora else "-"
-            total_casas = Vivienda.objects.filter(proyecto=proyecto).count()
-            casas_con_obs = Vivienda.objects.filter(proyecto=proyecto, observaciones__isnull=False).distinct().count()
-            obs = Observacion.objects.filter(vivienda__proyecto=proyecto)
-            total_obs = obs.count()
-            abiertas = obs.filter(estado__nombre='Abierta').count()
-            urgentes = obs.filter(es_urgente=True, estado__nombre='Abierta').count()
-            cerradas = obs.filter(estado__nombre='Cerrada').count()
-            porc_abiertas = round((abiertas / total_obs) * 100, 1) if total_obs else 0
-            porc_urgentes = round((urgentes / total_obs) * 100, 1) if total_obs else 0
-            porc_cerradas = round((cerradas / total_obs) * 100, 1) if total_obs else 0
-            ws.append([
-                region_nombre,
-                proyecto.nombre,
-                constructora,
-                total_casas,
-                casas_con_obs,
-                abiertas,
-                urgentes,
-                cerradas,
-                porc_abiertas,
-                porc_urgentes,
-                porc_cerradas
-            ])
+    from django.db.models import Count, Q
+    from proyectos.models import Proyecto
+    # Toda la tabla en una consulta: conteos condicionales sobre el JOIN
+    # proyecto -> viviendas -> observaciones (distinct evita contar de más
+    # por la multiplicación de filas del JOIN)
+    observacion_abierta = Q(viviendas__observaciones__estado__nombre='Abierta')
+    proyectos = (
+        Proyecto.objects.select_related('region', 'constructora')
+        .annotate(
+            total_casas=Count('viviendas', distinct=True),
+            casas_con_obs=Count('viviendas', filter=Q(viviendas__observaciones__isnull=False), distinct=True),
+            total_obs=Count('viviendas__observaciones', distinct=True),
+            abiertas=Count('viviendas__observaciones', filter=observacion_abierta, distinct=True),
+            urgentes=Count(
+                'viviendas__observaciones',
+                filter=observacion_abierta & Q(viviendas__observaciones__es_urgente=True), distinct=True,
+            ),
+            cerradas=Count(
+                'viviendas__observaciones', filter=Q(viviendas__observaciones__estado__nombre='Cerrada'), distinct=True,
+            ),
+        )
+        .order_by('region__codigo', '-fecha_creacion')
+    )
+    for proyecto in proyectos:
+        region_nombre = proyecto.region.nombre if proyecto.region else str(proyecto.region_id)
+        constructora = proyecto.constructora.nombre if proyecto.constructora else "-"
+        total_obs = proyecto.total_obs
+        porc_abiertas = round((proyecto.abiertas / total_obs) * 100, 1) if total_obs else 0
+        porc_urgentes = round((proyecto.urgentes / total_obs) * 100, 1) if total_obs else 0
+        porc_cerradas = round((proyecto.cerradas / total_obs) * 100, 1) if total_obs else 0
+        ws.append([
+            region_nombre,
+            proyecto.nombre,
+            constructora,
+            proyecto.total_casas,
+            proyecto.casas_con_obs,
+            proyecto.abiertas,
+            proyecto.urgentes,
+            proyecto.cerradas,
+            porc_abiertas,
+            porc_urgentes,
+            porc_cerradas
+        ])
 
     # Crear gráfico de barras para observaciones por región
     chart = BarChart()
@@ -299,235 +181,6 @@ def reporte_estadisticas_region_excel(request):
     wb.save(response)
     return response
 
-@login_required
-def reporte_observaciones_cerradas_excel(request):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Observaciones Cerradas"
-    headers = ["ID", "Proyecto", "Vivienda", "Descripción", "Estado", "Urgente", "Fecha", "Usuario"]
-    ws.append(headers)
-    obs = Observacion.objects.filter(estado__nombre='Cerrada', es_urgente=False)
-    for o in obs:
-        fecha = o.fecha_creacion.replace(tzinfo=None) if o.fecha_creacion else ""
-        ws.append([
-            o.id,
-            getattr(o.vivienda.proyecto, 'nombre', ''),
-            getattr(o.vivienda, 'codigo', ''),
-            o.detalle,
-            o.estado.nombre,
-            o.es_urgente,
-            fecha,
-            getattr(o.creado_por, 'username', '')
-        ])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=observaciones_cerradas.xlsx'
-    wb.save(response)
-    return response
-
-@login_required
-def reporte_observaciones_abiertas_excel(request):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Observaciones Abiertas"
-    headers = ["ID", "Proyecto", "Vivienda", "Descripción", "Estado", "Urgente", "Fecha", "Usuario"]
-    ws.append(headers)
-    obs = Observacion.objects.filter(estado__nombre='Abierta', es_urgente=False)
-    for o in obs:
-        fecha = o.fecha_creacion.replace(tzinfo=None) if o.fecha_creacion else ""
-        ws.append([
-            o.id,
-            getattr(o.vivienda.proyecto, 'nombre', ''),
-            getattr(o.vivienda, 'codigo', ''),
-            o.detalle,
-            o.estado.nombre,
-            o.es_urgente,
-            fecha,
-            getattr(o.creado_por, 'username', '')
-        ])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=observaciones_abiertas.xlsx'
-    wb.save(response)
-    return response
-
-@login_required
-def reporte_observaciones_en_ejecucion_excel(request):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Observaciones en Ejecución"
-    headers = ["ID", "Proyecto", "Vivienda", "Detalle", "Estado", "Urgente", "Fecha Creación", "Usuario"]
-    ws.append(headers)
-    obs = Observacion.objects.filter(estado__nombre='En Ejecución')
-    for o in obs:
-        fecha = o.fecha_creacion.replace(tzinfo=None) if o.fecha_creacion else ""
-        ws.append([
-            o.id,
-            getattr(o.vivienda.proyecto, 'nombre', ''),
-            getattr(o.vivienda, 'codigo', ''),
-            o.detalle,
-            o.estado.nombre,
-            o.es_urgente,
-            fecha,
-            getattr(o.creado_por, 'username', '')
-        ])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=observaciones_en_ejecucion.xlsx'
-    wb.save(response)
-    return response
-    for o in obs:
-        fecha = o.fecha_creacion.replace(tzinfo=None) if o.fecha_creacion else ""
-        ws.append([
-            o.id,
-            getattr(o.vivienda.proyecto, 'nombre', ''),
-            getattr(o.vivienda, 'codigo', ''),
-            o.detalle,
-            o.estado.nombre,
-            o.es_urgente,
-            fecha,
-            getattr(o.creado_por, 'username', '')
-        ])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=observaciones_abiertas.xlsx'
-    wb.save(response)
-    return response
-
-@login_required
-def reporte_observaciones_urgentes_pendientes_excel(request):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Urgentes Pendientes"
-    headers = ["ID", "Proyecto", "Vivienda", "Descripción", "Estado", "Urgente", "Fecha", "Usuario"]
-    ws.append(headers)
-    obs = Observacion.objects.filter(es_urgente=True, estado__nombre='Abierta')
-    for o in obs:
-        fecha = o.fecha_creacion.replace(tzinfo=None) if o.fecha_creacion else ""
-        ws.append([
-            o.id,
-            getattr(o.vivienda.proyecto, 'nombre', ''),
-            getattr(o.vivienda, 'codigo', ''),
-            o.detalle,
-            o.estado.nombre,
-            o.es_urgente,
-            fecha,
-            getattr(o.creado_por, 'username', '')
-        ])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=urgentes_pendientes.xlsx'
-    wb.save(response)
-    return response
-
-@login_required
-def reporte_observaciones_urgentes_cerradas_excel(request):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Urgentes Cerradas"
-    headers = ["ID", "Proyecto", "Vivienda", "Descripción", "Estado", "Urgente", "Fecha", "Usuario"]
-    ws.append(headers)
-    obs = Observacion.objects.filter(es_urgente=True, estado__nombre='Cerrada')
-    for o in obs:
-        fecha = o.fecha_creacion.replace(tzinfo=None) if o.fecha_creacion else ""
-        ws.append([
-            o.id,
-            getattr(o.vivienda.proyecto, 'nombre', ''),
-            getattr(o.vivienda, 'codigo', ''),
-            o.detalle,
-            o.estado.nombre,
-            o.es_urgente,
-            fecha,
-            getattr(o.creado_por, 'username', '')
-        ])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=urgentes_cerradas.xlsx'
-    wb.save(response)
-    return response
-
-@login_required
-def reporte_observaciones_urgentes_abiertas_excel(request):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Urgentes Abiertas"
-    headers = ["ID", "Proyecto", "Vivienda", "Descripción", "Estado", "Urgente", "Fecha", "Usuario"]
-    ws.append(headers)
-    obs = Observacion.objects.filter(es_urgente=True, estado__nombre='Abierta')
-    for o in obs:
-        fecha = o.fecha_creacion.replace(tzinfo=None) if o.fecha_creacion else ""
-        ws.append([
-            o.id,
-            getattr(o.vivienda.proyecto, 'nombre', ''),
-            getattr(o.vivienda, 'codigo', ''),
-            o.detalle,
-            o.estado.nombre,
-            o.es_urgente,
-            fecha,
-            getattr(o.creado_por, 'username', '')
-        ])
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=urgentes_abiertas.xlsx'
-    wb.save(response)
-    return response
-import openpyxl
-from openpyxl.utils import get_column_letter
-from django.contrib.auth.decorators import login_required
-@login_required
-def reporte_entregas_excel(request):
-    """Exporta todas las actas de entrega y estadísticas en formato Excel"""
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Entregas"
-
-    # Encabezados
-    headers = [
-        "N° Acta", "Fecha Entrega", "Proyecto", "Código Proyecto", "Comuna", "Región", "Beneficiario", "RUT", "Email", "Código Vivienda", "Tipología", "Estado Vivienda", "Familia Beneficiaria"
-    ]
-    ws.append(headers)
-
-    # Datos
-    # Filtros por proyecto y fechas
-    proyecto_id = request.GET.get('proyecto')
-    fecha_inicio = request.GET.get('fecha_inicio')
-    fecha_fin = request.GET.get('fecha_fin')
-
-    actas = ActaRecepcion.objects.select_related('proyecto', 'vivienda', 'beneficiario')
-    if proyecto_id:
-        actas = actas.filter(proyecto_id=proyecto_id)
-    if fecha_inicio:
-        try:
-            fecha_inicio_dt = datetime.strptime(fecha_inicio, '%Y-%m-%d')
-            actas = actas.filter(fecha_entrega__gte=fecha_inicio_dt)
-        except Exception:
-            pass
-    if fecha_fin:
-        try:
-            fecha_fin_dt = datetime.strptime(fecha_fin, '%Y-%m-%d')
-            actas = actas.filter(fecha_entrega__lte=fecha_fin_dt)
-        except Exception:
-            pass
-
-    for acta in actas:
-        ws.append([
-            acta.numero_acta,
-            acta.fecha_entrega.strftime('%d/%m/%Y') if acta.fecha_entrega else '',
-            acta.proyecto.nombre if acta.proyecto else '',
-            acta.proyecto.codigo if acta.proyecto else '',
-            acta.proyecto.comuna.nombre if acta.proyecto and acta.proyecto.comuna else '',
-            acta.proyecto.region.nombre if acta.proyecto and acta.proyecto.region else '',
-            acta.beneficiario.nombre_completo if acta.beneficiario else '',
-            acta.beneficiario.rut if acta.beneficiario else '',
-            acta.beneficiario.email if acta.beneficiario else '',
-            acta.vivienda.codigo if acta.vivienda else '',
-            acta.vivienda.tipologia.nombre if acta.vivienda and acta.vivienda.tipologia else '',
-            acta.vivienda.get_estado_display() if acta.vivienda else '',
-            acta.vivienda.familia_beneficiaria if acta.vivienda else '',
-        ])
-
-    # Ajustar ancho de columnas
-    for i, col in enumerate(headers, 1):
-        ws.column_dimensions[get_column_letter(i)].width = max(12, len(col) + 2)
-
-    # Respuesta HTTP
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=entregas_techo_chile.xlsx'
-    wb.save(response)
-    return response
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
@@ -543,25 +196,13 @@ from io import BytesIO
 # El sistema ahora usa xhtml2pdf en lugar de WeasyPrint para compatibilidad con Windows
 # WEASYPRINT_AVAILABLE = False  # deprecado - ahora se usa xhtml2pdf
 
-# Fallback a ReportLab
-try:
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import inch, cm
-    from reportlab.lib import colors
-    REPORTLAB_AVAILABLE = True
-except ImportError:
-    REPORTLAB_AVAILABLE = False
-    # Definir valores por defecto si no está disponible
-    inch = 72
-    cm = 28.35
-
 # Usaremos xhtml2pdf para generar PDFs (compatible con Windows); si falla, usamos ReportLab
+# (ver reportes/pdf_actas.py)
 
 from .models import ActaRecepcion, FamiliarBeneficiario  # , ConstructorActa
 from proyectos.models import Vivienda, Proyecto, Beneficiario
 from core.decorators import rol_requerido
+from core.validators import normalizar_rut
 
 
 @login_required
@@ -670,6 +311,7 @@ def acta_pdf(request, pk):
         # Ruta mínima de diagnóstico: generar un PDF básico si ?mode=min
         if request.GET.get('mode') == 'min':
             try:
+                from reportlab.lib.pagesizes import A4
                 from reportlab.pdfgen import canvas  # type: ignore
                 buffer = BytesIO()
                 c = canvas.Canvas(buffer, pagesize=A4)
@@ -684,261 +326,16 @@ def acta_pdf(request, pk):
                 return response
             except Exception as e:
                 print(f"ERROR PDF minimal: {e}")
-        # 1) Usar xhtml2pdf para compatibilidad con Windows
-        try:
-            from xhtml2pdf import pisa
-            context = {
-                'acta': acta,
-                'proyecto': acta.proyecto,
-                'beneficiario': acta.beneficiario,
-                'vivienda': acta.vivienda,
-                'familiares': acta.familiares.all(),
-                'fecha_generacion': timezone.now(),
-                'es_descarga': True,
-                'para_pdf': True,
-            }
-            html_content = render_to_string('reportes/acta_template.html', context, request=request)
-            pdf_buffer = BytesIO()
-            pisa_status = pisa.CreatePDF(html_content, dest=pdf_buffer)
-            if not pisa_status.err:
-                pdf_file = pdf_buffer.getvalue()
-                pdf_buffer.close()
-                response = HttpResponse(pdf_file, content_type='application/pdf')
-                response['Content-Disposition'] = f'attachment; filename="Acta de Recepción - {acta.numero_acta}.pdf"'
-                response['X-PDF-Engine'] = 'xhtml2pdf'
-                return response
-            pdf_buffer.close()
-        except Exception:
-            import traceback
-            print("ERROR PDF xhtml2pdf:\n" + traceback.format_exc())
-        # 2) Intentar con ReportLab (estable en Windows)
-        # Usar ReportLab si está disponible a nivel de módulo
-
-        if REPORTLAB_AVAILABLE:
-            try:
-                # Generar PDF usando ReportLab
-                buffer = BytesIO()
-                doc = SimpleDocTemplate(
-                    buffer,
-                    pagesize=A4,
-                    rightMargin=2*cm,
-                    leftMargin=2*cm,
-                    topMargin=2*cm,
-                    bottomMargin=2*cm,
-                )
-
-                # Estilos personalizados que coincidan con el HTML
-                styles = getSampleStyleSheet()
-
-                # Estilo para el encabezado principal
-                header_style = ParagraphStyle(
-                    'CustomHeader',
-                    parent=styles['Title'],
-                    fontSize=18,
-                    spaceAfter=10,
-                    alignment=1,  # Centrado
-                    textColor=colors.black,
-                    fontName='Helvetica-Bold'
-                )
-
-                # Estilo para subtítulo
-                subtitle_style = ParagraphStyle(
-                    'CustomSubtitle',
-                    parent=styles['Heading2'],
-                    fontSize=14,
-                    spaceAfter=20,
-                    alignment=1,
-                    textColor=colors.black,
-                    fontName='Helvetica-Bold'
-                )
-
-                # Estilo para secciones
-                section_style = ParagraphStyle(
-                    'SectionHeader',
-                    parent=styles['Heading3'],
-                    fontSize=12,
-                    spaceBefore=15,
-                    spaceAfter=10,
-                    textColor=colors.black,
-                    fontName='Helvetica-Bold'
-                )
-
-                # Estilo para texto normal
-                normal_style = ParagraphStyle(
-                    'CustomNormal',
-                    parent=styles['Normal'],
-                    fontSize=10,
-                    spaceAfter=4,
-                    fontName='Helvetica'
-                )
-
-                story = []
-
-                # === ENCABEZADO ===
-                story.append(Paragraph("ACTA DE RECEPCIÓN DE VIVIENDA", header_style))
-                story.append(Paragraph("TECHO CHILE", subtitle_style))
-                story.append(Paragraph(f"<b>Acta N°:</b> {acta.numero_acta} | <b>Generada:</b> {timezone.now().strftime('%d/%m/%Y %H:%M')}", normal_style))
-                story.append(Spacer(1, 20))
-
-                # === INFORMACIÓN DEL PROYECTO ===
-                story.append(Paragraph("INFORMACIÓN DEL PROYECTO", section_style))
-                proyecto_data = [
-                    ['Proyecto:', acta.proyecto.nombre if acta.proyecto else 'N/A'],
-                    ['Comuna:', acta.proyecto.comuna.nombre if (acta.proyecto and acta.proyecto.comuna) else 'N/A'],
-                    ['Región:', acta.proyecto.region.nombre if (acta.proyecto and acta.proyecto.region) else 'N/A'],
-                ]
-
-                for label, value in proyecto_data:
-                    story.append(Paragraph(f"<b>{label}</b> {value}", normal_style))
-                story.append(Spacer(1, 12))
-
-                # === INFORMACIÓN DEL BENEFICIARIO ===
-                story.append(Paragraph("INFORMACIÓN DEL BENEFICIARIO", section_style))
-                if acta.beneficiario:
-                    # Construir string de teléfonos activos
-                    telefonos_activos = list(acta.beneficiario.telefonos.filter(activo=True).values_list('numero', flat=True))
-                    if not telefonos_activos:
-                        telefonos_activos = list(acta.beneficiario.telefonos.values_list('numero', flat=True)[:1])
-                    telefonos_str = ', '.join(telefonos_activos) if telefonos_activos else 'N/A'
-
-                    beneficiario_data = [
-                        ['Nombre Completo:', f"{acta.beneficiario.nombre} {acta.beneficiario.apellido_paterno} {acta.beneficiario.apellido_materno or ''}".strip()],
-                        ['RUT:', acta.beneficiario.rut or 'N/A'],
-                        ['Teléfonos:', telefonos_str],
-                        ['Email:', acta.beneficiario.email or 'N/A'],
-                    ]
-
-                    for label, value in beneficiario_data:
-                        story.append(Paragraph(f"<b>{label}</b> {value}", normal_style))
-                else:
-                    story.append(Paragraph("<b>Beneficiario:</b> No asignado", normal_style))
-                story.append(Spacer(1, 12))
-
-                # === INFORMACIÓN DE LA VIVIENDA ===
-                story.append(Paragraph("INFORMACIÓN DE LA VIVIENDA", section_style))
-                if acta.vivienda:
-                    vivienda_data = [
-                        ['Código de Vivienda:', acta.vivienda.codigo],
-                        ['Tipología:', acta.vivienda.tipologia.nombre if acta.vivienda.tipologia else 'N/A'],
-                        ['Estado:', acta.vivienda.get_estado_display()],
-                        ['Familia Beneficiaria:', acta.vivienda.familia_beneficiaria or 'N/A'],
-                    ]
-
-                    for label, value in vivienda_data:
-                        story.append(Paragraph(f"<b>{label}</b> {value}", normal_style))
-                else:
-                    story.append(Paragraph("<b>Vivienda:</b> No asignada", normal_style))
-                story.append(Spacer(1, 12))
-
-                # === DETALLES DEL ACTA ===
-                story.append(Paragraph("DETALLES DEL ACTA", section_style))
-                acta_data = [
-                    ['Fecha de Entrega:', acta.fecha_entrega.strftime("%d/%m/%Y") if acta.fecha_entrega else 'N/A'],
-                    ['Entrega Conforme:', 'Sí' if acta.entregado_beneficiario else 'No'],
-                    ['Estructura:', 'Conforme' if getattr(acta, 'estado_estructura', True) else 'Con observaciones'],
-                    ['Instalaciones:', 'Conforme' if getattr(acta, 'estado_instalaciones', True) else 'Con observaciones'],
-                ]
-
-                for label, value in acta_data:
-                    story.append(Paragraph(f"<b>{label}</b> {value}", normal_style))
-                story.append(Spacer(1, 15))
-
-                # === FAMILIARES (si los hay) ===
-                familiares = acta.familiares.all()
-                if familiares.exists():
-                    story.append(Paragraph("FAMILIARES REGISTRADOS", section_style))
-
-                    # Crear tabla de familiares
-                    familiares_data = [['Nombre Completo', 'Parentesco', 'RUT', 'Edad']]
-                    for familiar in familiares:
-                        familiares_data.append([
-                            familiar.nombre_completo,
-                            familiar.parentesco,
-                            familiar.rut or 'N/A',
-                            str(familiar.edad) if familiar.edad else 'N/A'
-                        ])
-
-                    familiares_table = Table(familiares_data, colWidths=[8*cm, 3*cm, 3*cm, 2*cm])
-                    familiares_table.setStyle(TableStyle([
-                        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-                        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-                        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                        ('FONTSIZE', (0, 0), (-1, -1), 9),
-                        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                    ]))
-
-                    story.append(familiares_table)
-                    story.append(Spacer(1, 15))
-
-                # === OBSERVACIONES ===
-                if acta.observaciones:
-                    story.append(Paragraph("OBSERVACIONES", section_style))
-                    story.append(Paragraph(acta.observaciones, normal_style))
-                    story.append(Spacer(1, 20))
-
-                # === FIRMAS ===
-                story.append(Spacer(1, 30))
-                story.append(Paragraph("FIRMAS Y CONFORMIDAD", section_style))
-
-                # Tabla de firmas
-                firma_data = [
-                    ['', '', ''],
-                    ['_________________________', '_________________________', '_________________________'],
-                    ['Beneficiario', 'Representante TECHO', 'Supervisor'],
-                    ['', '', ''],
-                    ['Fecha: _______________', 'Fecha: _______________', 'Fecha: _______________']
-                ]
-
-                firma_table = Table(firma_data, colWidths=[5.5*cm, 5.5*cm, 5.5*cm])
-                firma_table.setStyle(TableStyle([
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                    ('FONTNAME', (0, 1), (-1, 1), 'Helvetica'),
-                    ('FONTNAME', (0, 2), (-1, 2), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, -1), 10),
-                    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                    ('TOPPADDING', (0, 0), (-1, -1), 8),
-                    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-                ]))
-
-                story.append(firma_table)
-
-                # Construir PDF
-                doc.build(story)
-
-                # Preparar respuesta PDF
-                buffer.seek(0)
-                response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-                response['Content-Disposition'] = f'attachment; filename="Acta de Recepción - {acta.numero_acta}.pdf"'
-                response['X-PDF-Engine'] = 'reportlab'
-
-                return response
-
-            except Exception as e:
-                # Log del error pero continuar con HTML
-                import traceback
-                print("ERROR PDF ReportLab:\n" + traceback.format_exc())
-
-        # (xhtml2pdf y ReportLab ya fueron intentados arriba)
-
-        # 3) Si ambos fallaron, generar un PDF mínimo como último recurso
+        # xhtml2pdf sobre el template; si falla, ReportLab y, como último recurso, un PDF mínimo
         try:
-            from reportlab.pdfgen import canvas  # type: ignore
-            buffer = BytesIO()
-            c = canvas.Canvas(buffer, pagesize=A4)
-            c.setFont('Helvetica', 12)
-            c.drawString(72, 800, f"Acta {acta.numero_acta}")
-            c.drawString(72, 780, "No se pudo generar el PDF completo. Este es un PDF mínimo de respaldo.")
-            c.drawString(72, 760, timezone.now().strftime('%d/%m/%Y %H:%M'))
-            c.showPage()
-            c.save()
-            buffer.seek(0)
-            response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="Acta de Recepción - {acta.numero_acta} (respaldo).pdf"'
-            response['X-PDF-Engine'] = 'reportlab-min-fallback'
+            from .pdf_actas import html_acta, datos_acta, renderizar_pdf, nombre_pdf_acta
+            pdf_file, motor = renderizar_pdf(html_acta(acta, request=request), datos_acta(acta))
+            response = HttpResponse(pdf_file, content_type='application/pdf')
+            response['Content-Disposition'] = f'attachment; filename="{nombre_pdf_acta(acta.numero_acta, motor)}"'
+            response['X-PDF-Engine'] = motor
             return response
         except Exception:
+            logger.exception('Error generando el acta %s', acta.numero_acta)
             return HttpResponse("No se pudo generar el PDF en este momento.", status=500, content_type='text/plain; charset=utf-8')
     
     # HTML por defecto (vista previa)
@@ -966,6 +363,20 @@ def acta_pdf(request, pk):
     return response
 
 
+@login_required
+@rol_requerido('ADMINISTRADOR', 'TECHO')
+def actas_proyecto_zip(request, proyecto_id):
+    """Descarga en un ZIP los PDFs de todas las actas del proyecto, generados en paralelo."""
+    from django.http import StreamingHttpResponse
+    from .pdf_actas import WORKERS_HTTP, actas_para_pdf, zip_actas
+
+    proyecto = get_object_or_404(Proyecto, pk=proyecto_id)
+    actas = actas_para_pdf(ActaRecepcion.objects.filter(proyecto=proyecto).order_by('numero_acta')).iterator(chunk_size=100)
+    response = StreamingHttpResponse(zip_actas(actas, workers=WORKERS_HTTP), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="Actas_{proyecto.codigo}.zip"'
+    return response
+
+
 @login_required
 def get_viviendas_by_proyecto(request):
     """AJAX: Obtener viviendas por proyecto"""
@@ -1100,7 +511,7 @@ def buscar_beneficiario_ajax(request):
     
     try:
         # Buscar beneficiario por RUT
-        beneficiario = Beneficiario.objects.select_related().get(rut=rut, activo=True)
+        beneficiario = Beneficiario.objects.get(rut_normalizado=normalizar_rut(rut), activo=True)
         
         # Obtener datos de la vivienda asociada
         vivienda = None
@@ -1189,6 +600,12 @@ def buscar_beneficiario_ajax(request):
             'success': False, 
             'error': f'No se encontró beneficiario con RUT {rut}'
         })
+    except Beneficiario.MultipleObjectsReturned:
+        # Solo 'rut' es único: distintas escrituras del mismo RUT pueden coexistir (ver verificar_ruts)
+        return JsonResponse({
+            'success': False,
+            'error': f'El RUT {rut} está registrado en más de un beneficiario; corrija los duplicados antes de continuar'
+        })
     except Exception as e:
         return JsonResponse({
             'success': False, 
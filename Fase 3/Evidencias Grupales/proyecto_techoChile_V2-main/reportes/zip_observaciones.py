@@ -0,0 +1,112 @@
+"""
+Exportación en ZIP de observaciones con sus archivos adjuntos.
+
+El ZIP contiene ``manifiesto.csv`` (una fila por archivo, o una fila sin
+archivo si la observación no tiene adjuntos) y cada archivo en
+``<proyecto>/<vivienda>/obs_<id>/``: los ArchivoAdjuntoObservacion y el
+``archivo_adjunto`` heredado de la observación.
+
+Se genera por partes (core.utils.zip_stream): el manifiesto y los archivos
+se leen con ``iterator()`` en dos pasadas sobre la misma consulta, y cada
+archivo se copia desde el storage por bloques, sin copias temporales. La
+memoria usada no depende de la cantidad ni del tamaño de los archivos.
+"""
+import csv
+import io
+import logging
+import os
+import zipfile
+
+from django.utils import timezone
+
+from core.utils.zip_stream import SalidaZip, abrir_entrada, copiar_por_bloques
+
+logger = logging.getLogger(__name__)
+
+MANIFIESTO = 'manifiesto.csv'
+ERRORES = 'ERRORES.txt'
+TAMANO_LOTE = 500
+
+CAMPOS = (
+    'id', 'vivienda__proyecto__codigo', 'vivienda__codigo', 'estado__nombre', 'tipo__nombre', 'elemento',
+    'detalle', 'fecha_creacion', 'archivo_adjunto',
+    'archivos_adjuntos__id', 'archivos_adjuntos__archivo', 'archivos_adjuntos__nombre_original',
+    'archivos_adjuntos__descripcion',
+)
+ENCABEZADOS = [
+    'ID Observación', 'Proyecto', 'Vivienda', 'Estado', 'Tipo', 'Elemento', 'Detalle', 'Fecha Creación',
+    'Origen', 'Archivo en ZIP', 'Nombre Original', 'Descripción',
+]
+
+
+def _segmento(valor):
+    """Nombre seguro para un directorio o archivo dentro del ZIP."""
+    limpio = ''.join(c if c.isalnum() or c in '-_. ' else '_' for c in str(valor or '')).strip(' .')
+    return limpio or 'sin_nombre'
+
+
+def entradas(queryset):
+    """
+    Genera (fila del manifiesto, ruta en el storage o None) por cada archivo
+    de las observaciones de ``queryset``. Una observación sin archivos produce
+    una sola fila con ruta None.
+    """
+    filas = queryset.order_by('vivienda__proyecto__codigo', 'vivienda__codigo', 'id', 'archivos_adjuntos__id')
+    anterior = None
+    for (obs_id, proyecto, vivienda, estado, tipo, elemento, detalle, fecha, heredado,
+         adjunto_id, adjunto, nombre_original, descripcion) in filas.values_list(*CAMPOS).iterator(chunk_size=TAMANO_LOTE):
+        carpeta = f'{_segmento(proyecto)}/{_segmento(vivienda)}/obs_{obs_id}'
+        base = [
+            obs_id, proyecto or '', vivienda or '', estado or '', tipo or '', elemento or '', detalle or '',
+            timezone.localtime(fecha).strftime('%Y-%m-%d %H:%M') if fecha else '',
+        ]
+        if obs_id != anterior:
+            anterior = obs_id
+            if heredado:
+                nombre = os.path.basename(heredado)
+                yield base + ['Observación', f'{carpeta}/principal_{_segmento(nombre)}', nombre, ''], heredado
+            elif adjunto is None:
+                yield base + ['', '', '', ''], None
+        if adjunto:
+            nombre = nombre_original or os.path.basename(adjunto)
+            destino = f'{carpeta}/adjunto_{adjunto_id}_{_segmento(os.path.basename(nombre))}'
+            yield base + ['Adjunto', destino, nombre, descripcion or ''], adjunto
+
+
+def zip_observaciones(queryset):
+    """Genera los bytes del ZIP de las observaciones de ``queryset`` (ya filtrado por rol)."""
+    from django.core.files.storage import default_storage
+
+    salida = SalidaZip()
+    errores = []
+    with zipfile.ZipFile(salida, 'w') as archivo_zip:
+        # 1) Manifiesto, escrito fila a fila
+        with abrir_entrada(archivo_zip, MANIFIESTO) as destino:
+            texto = io.TextIOWrapper(destino, encoding='utf-8-sig', newline='')
+            escritor = csv.writer(texto)
+            escritor.writerow(ENCABEZADOS)
+            for i, (fila, _) in enumerate(entradas(queryset), 1):
+                escritor.writerow(fila)
+                if i % TAMANO_LOTE == 0:
+                    texto.flush()
+                    yield salida.vaciar()
+            texto.flush()
+            texto.detach()
+        yield salida.vaciar()
+
+        # 2) Archivos, copiados por bloques desde el storage
+        for fila, ruta in entradas(queryset):
+            if ruta is None:
+                continue
+            try:
+                origen = default_storage.open(ruta, 'rb')
+            except (OSError, ValueError):
+                logger.warning('Archivo no encontrado para la observación %s: %s', fila[0], ruta)
+                errores.append(f'Observación {fila[0]}: no se encontró {ruta}')
+                continue
+            with origen:
+                yield from copiar_por_bloques(origen, archivo_zip, fila[9], salida)
+
+        if errores:
+            archivo_zip.writestr(ERRORES, '\n'.join(errores) + '\n')
+    yield salida.vaciar()